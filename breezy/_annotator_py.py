@@ -23,9 +23,21 @@ from . import graph as _mod_graph
 class Annotator:
     """Class that drives performing annotations."""
 
-    def __init__(self, vf):
-        """Create a new Annotator from a VersionedFile."""
+    def __init__(self, vf, cache=None):
+        """Create a new Annotator from a VersionedFile.
+
+        :param cache: Optional AnnotationCache to reuse the annotations of
+            texts from, and to store the annotations of annotated texts in.
+        """
         self._vf = vf
+        self._cache = cache
+        # Keys whose annotations were loaded from the cache, and those of
+        # them whose ancestry has not been added to self._parent_map yet
+        self._cached_keys = set()
+        self._unwalked_cached_keys = set()
+        # Parents of the ancestors of those keys, only used to resolve heads
+        self._cached_ancestry = {}
+        self._special_keys = set()
         self._parent_map = {}
         self._text_cache = {}
         # Map from key => number of nexts that will be built from this key
@@ -75,11 +87,17 @@ class Annotator:
                     parent_lookup.append(key)
                     vf_keys_needed.add(key)
             needed_keys = set()
-            next_parent_map.update(self._vf.get_parent_map(parent_lookup))
+            vf_parent_map = self._vf.get_parent_map(parent_lookup)
+            next_parent_map.update(vf_parent_map)
             for key, parent_keys in next_parent_map.items():
                 if parent_keys is None:  # No graph versionedfile
                     parent_keys = ()
                     next_parent_map[key] = ()
+                if key in vf_parent_map and self._load_cached_annotations(
+                    key, parent_keys
+                ):
+                    # Only the text is needed, not that of its ancestors
+                    continue
                 self._update_needed_children(key, parent_keys)
                 needed_keys.update(
                     [key for key in parent_keys if key not in parent_map]
@@ -90,6 +108,21 @@ class Annotator:
             self._heads_provider = None
         return vf_keys_needed, ann_keys_needed
 
+    def _load_cached_annotations(self, key, parent_keys):
+        """Use the annotations of key from the cache, if they are present.
+
+        :return: True if the annotations were found
+        """
+        if self._cache is None:
+            return False
+        annotations = self._cache.get(key, parent_keys)
+        if annotations is None:
+            return False
+        self._annotations_cache[key] = annotations
+        self._cached_keys.add(key)
+        self._unwalked_cached_keys.add(key)
+        return True
+
     def _get_needed_texts(self, key, pb=None):
         """Get the texts we need to properly annotate key.
 
@@ -208,12 +241,18 @@ class Annotator:
             num -= 1
             if num == 0:
                 del self._text_cache[parent_key]
-                del self._annotations_cache[parent_key]
+                # Cached annotations can not be recomputed without the
+                # ancestry of the text, so they are kept
+                if parent_key not in self._cached_keys:
+                    del self._annotations_cache[parent_key]
                 # Do we want to clean up _num_needed_children at this point as
                 # well?
             self._num_needed_children[parent_key] = num
 
     def _annotate_one(self, key, text, num_lines):
+        if key in self._cached_keys:
+            # The annotations were loaded from the cache
+            return
         this_annotation = (key,)
         # Note: annotations will be mutated by calls to _update_from*
         annotations = [this_annotation] * num_lines
@@ -239,6 +278,7 @@ class Annotator:
         """
         self._parent_map[key] = parent_keys
         self._text_cache[key] = osutils.split_lines(text)
+        self._special_keys.add(key)
         self._heads_provider = None
 
     def annotate(self, key):
@@ -257,11 +297,48 @@ class Annotator:
             annotations = self._annotations_cache[key]
         except KeyError as exc:
             raise errors.RevisionNotPresent(key, self._vf) from exc
+        if (
+            self._cache is not None
+            and key not in self._cached_keys
+            and key not in self._special_keys
+        ):
+            self._cache.put(key, self._parent_map[key], annotations)
         return annotations, self._text_cache[key]
 
+    def _walk_cached_ancestry(self):
+        """Find the ancestry of the texts annotated from the cache.
+
+        Cached annotations can refer to any of the ancestors of a text, and
+        resolving them needs the full graph.
+        """
+        known = self._cached_ancestry
+        pending = set()
+        for key in self._unwalked_cached_keys:
+            pending.update(self._parent_map[key])
+        self._unwalked_cached_keys.clear()
+        while pending:
+            pending = [
+                key
+                for key in pending
+                if key not in self._parent_map and key not in known
+            ]
+            next_parent_map = self._vf.get_parent_map(pending)
+            pending = set()
+            for key, parent_keys in next_parent_map.items():
+                if parent_keys is None:
+                    parent_keys = ()
+                known[key] = parent_keys
+                pending.update(parent_keys)
+
     def _get_heads_provider(self):
         if self._heads_provider is None:
-            self._heads_provider = _mod_graph.KnownGraph(self._parent_map)
+            if self._unwalked_cached_keys:
+                self._walk_cached_ancestry()
+            parent_map = self._parent_map
+            if self._cached_ancestry:
+                parent_map = dict(self._cached_ancestry)
+                parent_map.update(self._parent_map)
+            self._heads_provider = _mod_graph.KnownGraph(parent_map)
         return self._heads_provider
 
     def _resolve_annotation_tie(self, the_heads, line, tiebreaker):
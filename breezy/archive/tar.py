@@ -17,15 +17,19 @@
 """Export a tree to a tarball."""
 
 import os
+import queue
 import tarfile
+import threading
 from contextlib import closing
 from io import BytesIO
 
 from .. import errors, osutils
-from ..export import _export_iter_entries
+from ..export import _export_iter_contents
 
 
-def prepare_tarball_item(tree, root, final_path, tree_path, entry, force_mtime=None):
+def prepare_tarball_item(
+    tree, root, final_path, tree_path, entry, force_mtime=None, content=None
+):
     """Prepare a tarball item for exporting.
 
     :param tree: Tree to export
@@ -34,6 +38,7 @@ def prepare_tarball_item(tree, root, final_path, tree_path, entry, force_mtime=N
     :param entry: Entry to export
     :param force_mtime: Option mtime to force, instead of using tree
         timestamps.
+    :param content: The text of the file, if it has already been retrieved.
 
     Returns a (tarinfo, fileobj) tuple
     """
@@ -53,7 +58,8 @@ def prepare_tarball_item(tree, root, final_path, tree_path, entry, force_mtime=N
         # the tarfile contract, which wants the size of the file up front.  We
         # want to make sure it doesn't change, and we need to read it in one
         # go for content filtering.
-        content = tree.get_file_text(tree_path)
+        if content is None:
+            content = tree.get_file_text(tree_path)
         item.size = len(content)
         fileobj = BytesIO(content)
     elif entry.kind in ("directory", "tree-reference"):
@@ -92,11 +98,11 @@ def tarball_generator(
     """
     buf = BytesIO()
     with closing(tarfile.open(None, f"w:{format}", buf)) as ball, tree.lock_read():
-        for final_path, tree_path, entry in _export_iter_entries(
+        for final_path, tree_path, entry, content in _export_iter_contents(
             tree, subdir, recurse_nested=recurse_nested
         ):
             (item, fileobj) = prepare_tarball_item(
-                tree, root, final_path, tree_path, entry, force_mtime
+                tree, root, final_path, tree_path, entry, force_mtime, content
             )
             ball.addfile(item, fileobj)
             # Yield the data that was written so far, rinse, repeat.
@@ -106,6 +112,55 @@ def tarball_generator(
     yield buf.getvalue()
 
 
+def _compress_in_thread(chunks, compress, flush, queue_size=16):
+    """Compress a stream of chunks in a separate thread.
+
+    The chunks are produced in the calling thread while the previous ones
+    are being compressed; zlib, bz2 and lzma release the GIL while they
+    work.
+
+    :param chunks: Iterator over the bytes to compress.
+    :param compress: Callable that compresses a chunk and returns the
+        compressed bytes that are available so far.
+    :param flush: Callable that returns the remaining compressed bytes.
+    :return: Iterator over compressed bytes.
+    """
+    pending = queue.Queue(queue_size)
+    compressed = queue.SimpleQueue()
+    failure = []
+
+    def worker():
+        try:
+            while True:
+                chunk = pending.get()
+                if chunk is None:
+                    break
+                compressed.put(compress(chunk))
+            compressed.put(flush())
+        except BaseException as e:
+            failure.append(e)
+            # Keep consuming so that the producer does not block
+            while chunk is not None:
+                chunk = pending.get()
+
+    thread = threading.Thread(target=worker, name="archive-compress")
+    thread.start()
+    try:
+        for chunk in chunks:
+            if failure:
+                break
+            pending.put(chunk)
+            while not compressed.empty():
+                yield compressed.get()
+    finally:
+        pending.put(None)
+        thread.join()
+    if failure:
+        raise failure[0]
+    while not compressed.empty():
+        yield compressed.get()
+
+
 def tgz_generator(tree, dest, root, subdir, force_mtime=None, recurse_nested=False):
     """Export this tree to a new tar file.
 
@@ -135,17 +190,27 @@ def tgz_generator(tree, dest, root, subdir, force_mtime=None, recurse_nested=Fal
         basename = os.path.basename(dest)
         buf = BytesIO()
         zipstream = gzip.GzipFile(basename, "w", fileobj=buf, mtime=root_mtime)
-        for chunk in tarball_generator(
-            tree, root, subdir, force_mtime, recurse_nested=recurse_nested
-        ):
+
+        def compress(chunk):
             zipstream.write(chunk)
-            # Yield the data that was written so far, rinse, repeat.
-            yield buf.getvalue()
+            # Return the data that was written so far, rinse, repeat.
+            data = buf.getvalue()
             buf.truncate(0)
             buf.seek(0)
-        # Closing zipstream may trigger writes to stream
-        zipstream.close()
-        yield buf.getvalue()
+            return data
+
+        def flush():
+            # Closing zipstream may trigger writes to stream
+            zipstream.close()
+            return buf.getvalue()
+
+        yield from _compress_in_thread(
+            tarball_generator(
+                tree, root, subdir, force_mtime, recurse_nested=recurse_nested
+            ),
+            compress,
+            flush,
+        )
 
 
 def tbz_generator(tree, dest, root, subdir, force_mtime=None, recurse_nested=False):
@@ -154,8 +219,15 @@ def tbz_generator(tree, dest, root, subdir, force_mtime=None, recurse_nested=Fal
     `dest` will be created holding the contents of this tree; if it
     already exists, it will be clobbered, like with "tar -c".
     """
-    return tarball_generator(
-        tree, root, subdir, force_mtime, format="bz2", recurse_nested=recurse_nested
+    import bz2
+
+    compressor = bz2.BZ2Compressor(9)
+    return _compress_in_thread(
+        tarball_generator(
+            tree, root, subdir, force_mtime, recurse_nested=recurse_nested
+        ),
+        compressor.compress,
+        compressor.flush,
     )
 
 
@@ -205,9 +277,10 @@ def tar_lzma_generator(
         }[compression_format]
     )
 
-    for chunk in tarball_generator(
-        tree, root, subdir, force_mtime=force_mtime, recurse_nested=recurse_nested
-    ):
-        yield compressor.compress(chunk)
-
-    yield compressor.flush()
+    return _compress_in_thread(
+        tarball_generator(
+            tree, root, subdir, force_mtime=force_mtime, recurse_nested=recurse_nested
+        ),
+        compressor.compress,
+        compressor.flush,
+    )
@@ -23,7 +23,7 @@ import zipfile
 from contextlib import closing
 
 from .. import osutils
-from ..export import _export_iter_entries
+from ..export import _export_iter_contents
 from ..trace import mutter
 
 # Windows expects this bit to be set in the 'external_attr' section,
@@ -47,7 +47,7 @@ def zip_archive_generator(
     compression = zipfile.ZIP_DEFLATED
     with tempfile.SpooledTemporaryFile() as buf:
         with closing(zipfile.ZipFile(buf, "w", compression)) as zipf, tree.lock_read():
-            for dp, tp, ie in _export_iter_entries(
+            for dp, tp, ie, content in _export_iter_contents(
                 tree, subdir, recurse_nested=recurse_nested
             ):
                 mutter("  export {%s} kind %s to %s", tp, ie.kind, dest)
@@ -64,7 +64,6 @@ def zip_archive_generator(
                     zinfo = zipfile.ZipInfo(filename=filename, date_time=date_time)
                     zinfo.compress_type = compression
                     zinfo.external_attr = _FILE_ATTR
-                    content = tree.get_file_text(tp)
                     zipf.writestr(zinfo, content)
                 elif ie.kind in ("directory", "tree-reference"):
                     # Directories must contain a trailing slash, to indicate
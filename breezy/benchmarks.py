@@ -0,0 +1,523 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Benchmarks of common operations on synthetic repositories.
+
+A scenario describes the shape of a repository: the number of revisions and
+files, the sizes of the files and how often branches are merged. The
+repository for a scenario is generated from a seeded random number
+generator, so every run of a scenario times exactly the same history.
+
+Each operation is timed a number of times, each time on freshly opened
+objects, and the fastest time is used to compare against a baseline.
+"""
+
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+from . import osutils, registry
+from .branchbuilder import BranchBuilder
+from .commands import Command
+from .errors import CommandError
+from .option import Option
+from .trace import note
+
+COMMITTER = "Benchmark <benchmark@example.com>"
+FIRST_TIMESTAMP = 1200000000
+
+
+class Scenario:
+    """The shape of a synthetic repository.
+
+    :ivar revisions: The number of mainline revisions.
+    :ivar files: The number of files.
+    :ivar lines: The mean number of lines in a file; file sizes are
+        exponentially distributed.
+    :ivar changes: The number of files modified by each revision.
+    :ivar merge_interval: Every merge_interval-th mainline revision merges a
+        revision from a side branch, or 0 for a linear history.
+    :ivar seed: The seed of the random number generator.
+    """
+
+    def __init__(
+        self, revisions, files, lines=100, changes=5, merge_interval=5, seed=0
+    ):
+        self.revisions = revisions
+        self.files = files
+        self.lines = lines
+        self.changes = changes
+        self.merge_interval = merge_interval
+        self.seed = seed
+
+    def as_dict(self):
+        return {
+            "revisions": self.revisions,
+            "files": self.files,
+            "lines": self.lines,
+            "changes": self.changes,
+            "merge_interval": self.merge_interval,
+            "seed": self.seed,
+        }
+
+
+scenario_registry = registry.Registry[str, Scenario, None]()
+scenario_registry.register(
+    "tiny", Scenario(10, 20, lines=20, changes=3, merge_interval=3), help="For tests."
+)
+scenario_registry.register(
+    "small", Scenario(100, 200), help="100 revisions of 200 files."
+)
+scenario_registry.register(
+    "medium", Scenario(1000, 2000), help="1000 revisions of 2000 files."
+)
+scenario_registry.register(
+    "large",
+    Scenario(5000, 20000, changes=20),
+    help="5000 revisions of 20000 files.",
+)
+scenario_registry.default_key = "small"
+
+
+class SyntheticRepository:
+    """A branch and working tree generated for a scenario.
+
+    :ivar path: The directory of the branch and working tree.
+    :ivar mainline: The mainline revision ids, oldest first.
+    :ivar paths: The paths of the files.
+    :ivar most_modified_path: The path of the file modified most often.
+    """
+
+    def __init__(self, path, mainline, paths, most_modified_path):
+        self.path = path
+        self.mainline = mainline
+        self.paths = paths
+        self.most_modified_path = most_modified_path
+
+
+def _new_lines(rng, count, file_index, revision):
+    return [
+        b"line %d of file %d from revision %d: %d\n"
+        % (i, file_index, revision, rng.randrange(1000000))
+        for i in range(count)
+    ]
+
+
+def build_repository(path, scenario, format=None):
+    """Generate the repository for a scenario.
+
+    :param path: The directory to create the branch and working tree in.
+    :param scenario: A Scenario.
+    :param format: The name of the format to use, or None for the default.
+    :return: A SyntheticRepository.
+    """
+    from . import transport as _mod_transport
+
+    rng = random.Random(scenario.seed)  # noqa: S311
+    builder = BranchBuilder(_mod_transport.get_transport_from_path(path), format=format)
+    paths = []
+    indices = {}
+    directories = set()
+    contents = {}
+    actions = [("add", ("", None, "directory", None))]
+    for file_index in range(scenario.files):
+        directory = f"dir{file_index // 50}"
+        if directory not in directories:
+            directories.add(directory)
+            actions.append(("add", (directory, None, "directory", None)))
+        file_path = f"{directory}/file{file_index}"
+        size = max(1, int(rng.expovariate(1.0 / scenario.lines)))
+        contents[file_path] = _new_lines(rng, size, file_index, 0)
+        indices[file_path] = file_index
+        paths.append(file_path)
+        actions.append(
+            ("add", (file_path, None, "file", b"".join(contents[file_path])))
+        )
+    modifications = dict.fromkeys(paths, 0)
+
+    def modify(contents, revision):
+        actions = []
+        for file_path in rng.sample(paths, min(scenario.changes, len(paths))):
+            lines = list(contents[file_path])
+            start = rng.randrange(len(lines) + 1)
+            lines[start : start + rng.randrange(4)] = _new_lines(
+                rng, rng.randrange(1, 4), indices[file_path], revision
+            )
+            contents[file_path] = lines
+            modifications[file_path] += 1
+            actions.append(("modify", (file_path, b"".join(lines))))
+        return actions
+
+    def snapshot(parent_ids, actions, revision):
+        return builder.build_snapshot(
+            parent_ids,
+            actions,
+            message=f"revision {revision}",
+            timestamp=FIRST_TIMESTAMP + revision * 60,
+            timezone=0,
+            committer=COMMITTER,
+        )
+
+    builder.start_series()
+    try:
+        mainline = [snapshot([], actions, 0)]
+        history = [dict(contents)]
+        for revision in range(1, scenario.revisions):
+            if (
+                scenario.merge_interval
+                and revision % scenario.merge_interval == 0
+                and len(mainline) >= 2
+            ):
+                # Merge a revision made on top of the previous mainline
+                # revision, taking its texts for the files it changed
+                side_contents = dict(history[-2])
+                side_actions = modify(side_contents, revision)
+                side = snapshot([mainline[-2]], side_actions, revision)
+                actions = side_actions
+                parent_ids = [mainline[-1], side]
+                for _action, (file_path, _text) in side_actions:
+                    contents[file_path] = side_contents[file_path]
+            else:
+                actions = modify(contents, revision)
+                parent_ids = [mainline[-1]]
+            mainline.append(snapshot(parent_ids, actions, revision))
+            history = [history[-1], dict(contents)]
+    finally:
+        builder.finish_series()
+    branch = builder.get_branch()
+    branch.controldir.create_workingtree()
+    most_modified_path = max(paths, key=lambda p: (modifications[p], p))
+    return SyntheticRepository(path, mainline, paths, most_modified_path)
+
+
+# Operations are context managers that prepare an operation on a synthetic
+# repository, and provide a callable that runs it. Only the callable is
+# timed.
+operation_registry = registry.Registry[str, Callable, None]()
+
+
+@contextlib.contextmanager
+def _time_status(repo, scratch):
+    from .status import show_tree_status
+    from .workingtree import WorkingTree
+
+    tree = WorkingTree.open(repo.path)
+    yield lambda: show_tree_status(tree, to_file=io.StringIO())
+
+
+@contextlib.contextmanager
+def _time_commit(repo, scratch):
+    from .controldir import ControlDir
+
+    target = os.path.join(scratch, "commit")
+    tree = ControlDir.open(repo.path).sprout(target).open_workingtree()
+    rng = random.Random(len(repo.mainline))  # noqa: S311
+    for file_path in rng.sample(repo.paths, min(20, len(repo.paths))):
+        with open(os.path.join(target, file_path), "ab") as f:
+            f.write(b"changed by the commit benchmark\n")
+    yield lambda: tree.commit(
+        "benchmark", committer=COMMITTER, timestamp=FIRST_TIMESTAMP, timezone=0
+    )
+
+
+@contextlib.contextmanager
+def _time_log(repo, scratch):
+    from . import log
+    from .branch import Branch
+
+    branch = Branch.open(repo.path)
+
+    def run():
+        log.show_log(branch, log.log_formatter("long", to_file=io.StringIO()))
+
+    yield run
+
+
+@contextlib.contextmanager
+def _time_annotate(repo, scratch):
+    from .branch import Branch
+
+    branch = Branch.open(repo.path)
+
+    def run():
+        tree = branch.basis_tree()
+        with tree.lock_read():
+            list(tree.annotate_iter(repo.most_modified_path))
+
+    yield run
+
+
+@contextlib.contextmanager
+def _time_diff(repo, scratch):
+    from .branch import Branch
+    from .diff import show_diff_trees
+
+    repository = Branch.open(repo.path).repository
+
+    def run():
+        with repository.lock_read():
+            old_tree = repository.revision_tree(repo.mainline[len(repo.mainline) // 2])
+            new_tree = repository.revision_tree(repo.mainline[-1])
+            show_diff_trees(old_tree, new_tree, io.BytesIO())
+
+    yield run
+
+
+@contextlib.contextmanager
+def _time_branch(repo, scratch):
+    from .controldir import ControlDir
+
+    controldir = ControlDir.open(repo.path)
+    yield lambda: controldir.sprout(os.path.join(scratch, "branch"))
+
+
+@contextlib.contextmanager
+def _time_pull(repo, scratch):
+    from . import transport as _mod_transport
+    from .branch import Branch
+    from .bzr.smart.server import SmartTCPServer
+    from .controldir import ControlDir
+
+    target = (
+        ControlDir.open(repo.path)
+        .sprout(
+            os.path.join(scratch, "pull"),
+            revision_id=repo.mainline[len(repo.mainline) // 2],
+            create_tree_if_local=False,
+        )
+        .open_branch()
+    )
+    server = SmartTCPServer(_mod_transport.get_transport_from_path(repo.path))
+    server.start_server("127.0.0.1", 0)
+    server.start_background_thread("-benchmark")
+    try:
+        yield lambda: target.pull(Branch.open(server.get_url()))
+    finally:
+        server.stop_background_thread()
+
+
+@contextlib.contextmanager
+def _time_export(repo, scratch):
+    from .branch import Branch
+    from .export import export
+
+    branch = Branch.open(repo.path)
+
+    def run():
+        tree = branch.basis_tree()
+        with tree.lock_read():
+            export(tree, os.path.join(scratch, "export.tar"), format="tar")
+
+    yield run
+
+
+operation_registry.register(
+    "status", _time_status, help="Show the status of an unmodified tree."
+)
+operation_registry.register(
+    "commit", _time_commit, help="Commit changes to 20 files in a new branch."
+)
+operation_registry.register("log", _time_log, help="Show the long log of the branch.")
+operation_registry.register(
+    "annotate", _time_annotate, help="Annotate the most frequently modified file."
+)
+operation_registry.register(
+    "diff", _time_diff, help="Diff the tip against the middle mainline revision."
+)
+operation_registry.register("branch", _time_branch, help="Branch the repository.")
+operation_registry.register(
+    "pull",
+    _time_pull,
+    help="Pull half of the mainline from a local smart server.",
+)
+operation_registry.register("export", _time_export, help="Export the tip as a tarball.")
+
+
+def time_operation(repo, name, repeat=3):
+    """Time an operation on a synthetic repository.
+
+    :param repo: A SyntheticRepository.
+    :param name: The name of the operation in operation_registry.
+    :param repeat: The number of times to run the operation.
+    :return: A list with the time taken by each run, in seconds.
+    """
+    operation = operation_registry.get(name)
+    timings = []
+    for _i in range(repeat):
+        scratch = tempfile.mkdtemp(prefix="brz-benchmark-")
+        try:
+            with operation(repo, scratch) as run:
+                start = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - start)
+        finally:
+            osutils.rmtree(scratch)
+    return timings
+
+
+def compare_results(baseline, results, threshold=0.1):
+    """Find the operations that got slower than in a baseline.
+
+    :param baseline: Results as returned by run_benchmarks.
+    :param results: Results as returned by run_benchmarks.
+    :param threshold: The fraction an operation has to be slower by to count
+        as a regression.
+    :return: A list of (name, baseline time, time) tuples.
+    """
+    regressions = []
+    for name, result in sorted(results["operations"].items()):
+        old = baseline["operations"].get(name)
+        if old is not None and result["min"] > old["min"] * (1 + threshold):
+            regressions.append((name, old["min"], result["min"]))
+    return regressions
+
+
+def run_benchmarks(scenario_name, operations=None, repeat=3, format=None):
+    """Generate the repository of a scenario and time operations on it.
+
+    :param scenario_name: The name of the scenario in scenario_registry.
+    :param operations: The names of the operations to time, or None for all.
+    :param repeat: The number of times to run each operation.
+    :param format: The name of the format of the repository, or None.
+    :return: A dict that can be serialized as JSON.
+    """
+    import breezy
+
+    if operations is None:
+        operations = operation_registry.keys()
+    scenario = scenario_registry.get(scenario_name)
+    results = {}
+    tempdir = tempfile.mkdtemp(prefix="brz-benchmark-")
+    try:
+        repo = build_repository(os.path.join(tempdir, "repo"), scenario, format)
+        for name in operations:
+            timings = time_operation(repo, name, repeat)
+            results[name] = {
+                "min": min(timings),
+                "median": statistics.median(timings),
+                "runs": timings,
+            }
+    finally:
+        osutils.rmtree(tempdir)
+    return {
+        "version": breezy.version_string,
+        "scenario": scenario_name,
+        "parameters": scenario.as_dict(),
+        "format": format,
+        "repeat": repeat,
+        "operations": results,
+    }
+
+
+class cmd_benchmark(Command):
+    __doc__ = """Time common operations on a synthetic repository.
+
+    A repository is generated for the scenario, with the same history on
+    every run, and each operation is run a number of times on it; the
+    fastest run counts. If no operations are given, all of them are timed.
+
+    Results can be saved with --output and later passed to --baseline, in
+    which case the command fails if any operation is slower than in the
+    baseline by more than the threshold.
+
+    :Examples:
+        Save the timings of a release::
+
+            brz benchmark --scenario=medium --output=baseline.json
+
+        Check for regressions of log and annotate::
+
+            brz benchmark --scenario=medium --baseline=baseline.json log annotate
+    """
+
+    hidden = True
+    takes_args = ["operation*"]
+    takes_options = [
+        Option(
+            "scenario",
+            type=str,
+            help="Shape of the generated repository: {}.".format(
+                ", ".join(scenario_registry.keys())
+            ),
+        ),
+        Option("repeat", type=int, help="Number of times to run each operation."),
+        Option("format", type=str, help="Format of the generated repository."),
+        Option("output", type=str, help="Write the results as JSON to this file."),
+        Option("baseline", type=str, help="Compare with results saved by --output."),
+        Option(
+            "threshold",
+            type=int,
+            help="Percentage by which an operation has to be slower than the "
+            "baseline to fail (default: 10).",
+        ),
+    ]
+
+    def run(
+        self,
+        operation_list=None,
+        scenario=None,
+        repeat=3,
+        format=None,
+        output=None,
+        baseline=None,
+        threshold=10,
+    ):
+        if scenario is None:
+            scenario = scenario_registry.default_key
+        elif scenario not in scenario_registry:
+            raise CommandError(f"Unknown benchmark scenario {scenario!r}.")
+        for name in operation_list or []:
+            if name not in operation_registry:
+                raise CommandError(f"Unknown benchmark operation {name!r}.")
+        if repeat < 1:
+            raise CommandError("--repeat must be at least 1.")
+        baseline_results = None
+        if baseline is not None:
+            with open(baseline) as f:
+                baseline_results = json.load(f)
+            if (
+                baseline_results["parameters"]
+                != scenario_registry.get(scenario).as_dict()
+            ):
+                raise CommandError(
+                    f"Baseline {baseline} was recorded for a different scenario."
+                )
+        results = run_benchmarks(
+            scenario, operation_list or None, repeat=repeat, format=format
+        )
+        for name, result in results["operations"].items():
+            self.outf.write(
+                f"{name:<10} {result['min']:9.3f}s (median {result['median']:.3f}s)\n"
+            )
+        if output is not None:
+            with open(output, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            note(f"Results written to {output}.")
+        if baseline_results is None:
+            return 0
+        regressions = compare_results(baseline_results, results, threshold / 100)
+        for name, old, new in regressions:
+            self.outf.write(
+                f"{name} regressed from {old:.3f}s to {new:.3f}s "
+                f"({(new / old - 1) * 100:+.0f}%)\n"
+            )
+        return 1 if regressions else 0
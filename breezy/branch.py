@@ -508,10 +508,8 @@ class Branch(ControlComponent):
             # we need the full graph to get stable numbers, regardless of the
             # start_revision_id.
             if self._merge_sorted_revisions_cache is None:
-                last_revision = self.last_revision()
-                known_graph = self.repository.get_known_graph_ancestry([last_revision])
-                self._merge_sorted_revisions_cache = known_graph.merge_sort(
-                    last_revision
+                self._merge_sorted_revisions_cache = self._merge_sort_history(
+                    self.last_revision()
                 )
             filtered = self._filter_merge_sorted_revisions(
                 self._merge_sorted_revisions_cache,
@@ -529,6 +527,18 @@ class Branch(ControlComponent):
             else:
                 raise ValueError(f"invalid direction {direction!r}")
 
+    def _merge_sort_history(self, last_revision):
+        """Compute the merge sorted history of the branch.
+
+        Args:
+          last_revision: The tip of the branch.
+
+        Returns: A list of merge sort nodes, see
+            ``KnownGraph.merge_sort``.
+        """
+        known_graph = self.repository.get_known_graph_ancestry([last_revision])
+        return known_graph.merge_sort(last_revision)
+
     def _filter_merge_sorted_revisions(
         self, merge_sorted_revisions, start_revision_id, stop_revision_id, stop_rule
     ):
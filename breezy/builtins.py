@@ -8069,6 +8069,7 @@ def _register_lazy_builtins():
     # be only called once.
     for name, aliases, module_name in [
         ("cmd_bisect", [], "breezy.bisect"),
+        ("cmd_benchmark", [], "breezy.benchmarks"),
         ("cmd_bundle_info", [], "breezy.bzr.bundle.commands"),
         ("cmd_config", [], "breezy.config"),
         ("cmd_dump_btree", [], "breezy.bzr.debug_commands"),
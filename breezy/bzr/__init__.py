@@ -321,6 +321,11 @@ repository_format_registry.register_lazy(
     "breezy.bzr.groupcompress_repo",
     "RepositoryFormat2aSubtree",
 )
+repository_format_registry.register_lazy(
+    b"Bazaar development format 2a with zstd compression\n",
+    "breezy.bzr.groupcompress_repo",
+    "RepositoryFormat2aZstd",
+)
 
 
 workingtree_format_registry.register_lazy(
@@ -537,6 +542,18 @@ register_metadir(
     hidden=True,
 )
 
+register_metadir(
+    controldir.format_registry,
+    "development-zstd",
+    "breezy.bzr.groupcompress_repo.RepositoryFormat2aZstd",
+    help="The 2a format with groupcompress blocks compressed using zstd "
+    "rather than zlib. Requires the zstandard module. Repositories in this "
+    "format can only be read by bzr.dev.\n",
+    branch_format="breezy.bzr.branch.BzrBranchFormat7",
+    tree_format="breezy.bzr.workingtree_4.WorkingTreeFormat6",
+    experimental=True,
+    hidden=True,
+)
 register_metadir(
     controldir.format_registry,
     "development-colo",
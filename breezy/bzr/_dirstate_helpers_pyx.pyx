@@ -577,7 +577,12 @@ cpdef update_entry(self, entry, abspath, stat_value):
                 # Could check for size changes for further optimised
                 # avoidance of sha1's. However the most prominent case of
                 # over-shaing is during initial add, which this catches.
-            link_or_sha1 = self._sha1_file(abspath)
+            prefetched = (self._sha1_prefetch
+                          and self._take_prefetched_sha1(abspath))
+            if prefetched and _pack_stat(prefetched[0]) == packed_stat:
+                link_or_sha1 = prefetched[1]
+            else:
+                link_or_sha1 = self._sha1_file(abspath)
             entry[1][0] = (b'f', link_or_sha1, stat_value.st_size,
                            executable, packed_stat)
         else:
@@ -892,9 +897,13 @@ cdef class ProcessEntryC:
                         # map to the same content
                         if link_or_sha1 is None:
                             # Stat cache miss:
-                            statvalue, link_or_sha1 = \
-                                self.state._sha1_provider.stat_and_sha1(
+                            prefetched = self.state._take_prefetched_sha1(
                                 path_info[4])
+                            if prefetched is None:
+                                prefetched = \
+                                    self.state._sha1_provider.stat_and_sha1(
+                                    path_info[4])
+                            statvalue, link_or_sha1 = prefetched
                             self.state._observed_sha1(entry, link_or_sha1,
                                 statvalue)
                         content_change = (link_or_sha1 != source_details[1])
@@ -1438,6 +1447,8 @@ cdef class ProcessEntryC:
             # cdef Py_ssize_t temp_str_length
             # PyBytes_AsStringAndSize(disk_kind, &temp_str, &temp_str_length)
             # if not strncmp(temp_str, "directory", temp_str_length):
+            self.state._prefetch_sha1s(self.current_block,
+                                       self.current_dir_info)
             if (self.current_block is not None and
                 self.current_block_pos < PyList_GET_SIZE(self.current_block_list)):
                 current_entry = PyList_GET_ITEM(self.current_block_list,
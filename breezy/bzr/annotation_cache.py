@@ -0,0 +1,142 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Persistent storage of the annotations of texts.
+
+The annotations of a text only depend on its ancestry, which never changes
+once the text has been added. An Annotator that finds the annotations of a
+text in the cache uses them rather than annotating the ancestry of that
+text again, so annotating a new revision of a file only requires diffs
+against the texts added since the last annotation.
+
+Entries record the parents of the text they were created for and are
+ignored if those no longer match, e.g. after a reconcile.
+"""
+
+import zlib
+
+import fastbencode as bencode
+
+from .. import errors, osutils
+from .. import transport as _mod_transport
+from ..trace import mutter
+
+FORMAT_MARKER = b"bzr annotation cache v1"
+
+
+def serialize(parent_keys, annotations):
+    """Serialize the annotations of a text.
+
+    :param parent_keys: The parents of the text.
+    :param annotations: A list with a tuple of keys for each line.
+    :return: A bytestring.
+    """
+    positions = {}
+    origins = []
+    lines = []
+    for annotation in annotations:
+        line = []
+        for key in annotation:
+            pos = positions.get(key)
+            if pos is None:
+                pos = positions[key] = len(origins)
+                origins.append(list(key))
+            line.append(pos)
+        lines.append(line)
+    return zlib.compress(
+        bencode.bencode(
+            [FORMAT_MARKER, [list(key) for key in parent_keys], origins, lines]
+        )
+    )
+
+
+def deserialize(data):
+    """Deserialize data created by serialize().
+
+    :return: Tuple with the parent keys and the annotations.
+    :raises ValueError: if data is not a valid annotation cache entry
+    """
+    try:
+        marker, parent_keys, origins, lines = bencode.bdecode(zlib.decompress(data))
+    except (TypeError, ValueError, zlib.error) as e:
+        raise ValueError(f"invalid annotation cache entry: {e}") from e
+    if marker != FORMAT_MARKER:
+        raise ValueError(f"unknown annotation cache format {marker!r}")
+    try:
+        origins = [tuple(key) for key in origins]
+        # Share the tuples between lines, like Annotator does
+        annotation_cache = {}
+        annotations = []
+        for line in lines:
+            line = tuple(line)
+            annotation = annotation_cache.get(line)
+            if annotation is None:
+                annotation = annotation_cache[line] = tuple(
+                    origins[pos] for pos in line
+                )
+            annotations.append(annotation)
+    except (TypeError, IndexError) as e:
+        raise ValueError(f"invalid annotation cache entry: {e}") from e
+    return tuple(tuple(key) for key in parent_keys), annotations
+
+
+class AnnotationCache:
+    """Annotations of texts, stored in files below a transport."""
+
+    def __init__(self, transport, file_mode=None):
+        self._transport = transport
+        self._file_mode = file_mode
+
+    def _path(self, key):
+        name = osutils.sha_string(b"\0".join(key)).decode("ascii")
+        return f"{name[:2]}/{name[2:]}"
+
+    def get(self, key, parent_keys):
+        """Return the cached annotations of a text.
+
+        :param key: The key of the text.
+        :param parent_keys: The parents of the text.
+        :return: A list with a tuple of keys for each line, or None if the
+            text has no usable cache entry.
+        """
+        try:
+            data = self._transport.get_bytes(self._path(key))
+        except _mod_transport.NoSuchFile:
+            return None
+        try:
+            cached_parent_keys, annotations = deserialize(data)
+        except ValueError as e:
+            mutter("ignoring annotation cache entry for %r: %s", key, e)
+            return None
+        if cached_parent_keys != tuple(tuple(key) for key in parent_keys):
+            return None
+        return annotations
+
+    def put(self, key, parent_keys, annotations):
+        """Store the annotations of a text.
+
+        Failures to write are ignored, as the cache is only an optimization.
+        """
+        path = self._path(key)
+        data = serialize(parent_keys, annotations)
+        try:
+            try:
+                self._transport.put_bytes(path, data, mode=self._file_mode)
+            except _mod_transport.NoSuchFile:
+                self._transport.clone(path[:2]).create_prefix()
+                self._transport.put_bytes(path, data, mode=self._file_mode)
+        except (errors.TransportNotPossible, errors.PermissionDenied) as e:
+            mutter("unable to write annotation cache entry: %s", e)
@@ -32,6 +32,7 @@ from breezy import (
 )
 
 import contextlib
+import itertools
 
 from .. import errors, urlutils
 from .. import revision as _mod_revision
@@ -254,6 +255,8 @@ class BzrBranch(Branch, _RelockDebugMixin):
             self._write_last_revision_info(revno, revision_id)
             self._clear_cached_state()
             self._last_revision_info_cache = revno, revision_id
+            if self.get_config_stack().get("branch.merge_sort_cache"):
+                self._update_merge_sort_cache(revno, revision_id)
             self._run_post_change_branch_tip_hooks(old_revno, old_revid)
 
     def basis_tree(self):
@@ -445,6 +448,141 @@ class BzrBranch(Branch, _RelockDebugMixin):
         super()._clear_cached_state()
         self._tags_bytes = None
 
+    def _merge_sort_history(self, last_revision):
+        """See Branch._merge_sort_history.
+
+        If branch.merge_sort_cache is enabled and the history stored by
+        _update_merge_sort_cache is still valid, it is used.
+        """
+        if last_revision != _mod_revision.NULL_REVISION and self.get_config_stack().get(
+            "branch.merge_sort_cache"
+        ):
+            cached = self._read_merge_sort_cache(last_revision)
+            if cached is not None:
+                return cached[2]
+        return super()._merge_sort_history(last_revision)
+
+    def _read_merge_sort_cache(self, last_revision=None):
+        """Read the stored merge sorted history.
+
+        :param last_revision: If not None, only return the history if it was
+            stored for this tip.
+        Returns: Tuple with the tip, the set of ghosts in its ancestry and
+            the list of merge sort nodes, or None if there is no valid
+            history stored.
+        """
+        from .merge_sort_cache import read_header, read_nodes
+
+        try:
+            f = self._transport.get("merge-sort-cache")
+        except _mod_transport.NoSuchFile:
+            return None
+        try:
+            tip, ghosts = read_header(f)
+            if last_revision is not None and tip != last_revision:
+                return None
+            if ghosts and self.repository.has_revisions(ghosts):
+                # A ghost has been filled in since the history was stored
+                return None
+            return tip, ghosts, read_nodes(f)
+        except ValueError as e:
+            mutter("ignoring invalid merge sort cache: %s", e)
+            return None
+        finally:
+            f.close()
+
+    def _update_merge_sort_cache(self, revno, last_revision):
+        """Store the merge sorted history of last_revision.
+
+        The stored history is truncated or extended when last_revision is
+        in the left-hand history of the stored tip or the other way around,
+        and only computed from scratch otherwise.
+
+        The branch must be write locked.
+        """
+        from .merge_sort_cache import serialize, truncate_merge_sort
+
+        if last_revision == _mod_revision.NULL_REVISION:
+            with contextlib.suppress(_mod_transport.NoSuchFile):
+                self._transport.delete("merge-sort-cache")
+            return
+        nodes = None
+        cached = self._read_merge_sort_cache()
+        if cached is not None:
+            old_tip, ghosts, old_nodes = cached
+            if old_tip == last_revision:
+                return
+            # Ghosts are kept after truncating, which at worst means the
+            # history is recomputed when one of them is filled in.
+            nodes = truncate_merge_sort(old_nodes, last_revision)
+            if nodes is None:
+                extended = self._extend_merge_sort_history(
+                    old_tip, old_nodes, revno, last_revision
+                )
+                if extended is not None:
+                    nodes, new_ghosts = extended
+                    ghosts = ghosts.union(new_ghosts)
+        if nodes is None:
+            known_graph = self.repository.get_known_graph_ancestry([last_revision])
+            nodes = known_graph.merge_sort(last_revision)
+            keys = {node.key for node in nodes}
+            ghosts = set()
+            for node in nodes:
+                ghosts.update(
+                    parent
+                    for parent in known_graph.get_parent_keys(node.key)
+                    if parent not in keys
+                )
+            ghosts.discard(_mod_revision.NULL_REVISION)
+        try:
+            self._transport.put_bytes(
+                "merge-sort-cache",
+                b"".join(serialize(last_revision, ghosts, nodes)),
+                mode=self.controldir._get_file_mode(),
+            )
+        except (errors.TransportNotPossible, errors.PermissionDenied) as e:
+            mutter("unable to write merge sort cache: %s", e)
+        self._merge_sorted_revisions_cache = nodes
+
+    def _extend_merge_sort_history(self, old_tip, old_nodes, revno, last_revision):
+        """Extend the merge sorted history of old_tip to last_revision.
+
+        Returns: Tuple with the merge sorted history of last_revision and
+            the ghosts among the parents of the new revisions, or None if
+            old_tip is not in the left-hand history of last_revision.
+        """
+        from .merge_sort_cache import extend_merge_sort
+
+        if not old_nodes or len(old_nodes[0].revno) != 1:
+            return None
+        distance = revno - old_nodes[0].revno[0]
+        if distance <= 0:
+            return None
+        graph = self.repository.get_graph()
+        try:
+            lefthand = list(
+                itertools.islice(
+                    graph.iter_lefthand_ancestry(last_revision), distance + 1
+                )
+            )
+        except errors.RevisionNotPresent:
+            return None
+        if len(lefthand) <= distance or lefthand[distance] != old_tip:
+            return None
+        new_revids = graph.find_unique_ancestors(last_revision, [old_tip])
+        parent_map = {
+            revid: tuple(p for p in parents if p != _mod_revision.NULL_REVISION)
+            for revid, parents in graph.get_parent_map(new_revids).items()
+        }
+        old_keys = {node.key for node in old_nodes}
+        ghosts = {
+            parent
+            for parents in parent_map.values()
+            for parent in parents
+            if parent not in parent_map and parent not in old_keys
+        }
+        return extend_merge_sort(old_nodes, parent_map, last_revision), ghosts
+
     def reconcile(self, thorough=True):
         """Make sure the data stored in this branch is consistent."""
         from .reconcile import BranchReconciler
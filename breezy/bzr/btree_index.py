@@ -17,6 +17,7 @@
 
 """B+Tree indices."""
 
+import sys
 from io import BytesIO
 
 from ..lazy_import import lazy_import
@@ -25,12 +26,23 @@ lazy_import(
     globals(),
     """
 import math
+import mmap
 import tempfile
 import zlib
 """,
 )
 
-from .. import chunk_writer, debug, fifo_cache, lru_cache, osutils, trace, transport
+from .. import (
+    chunk_writer,
+    debug,
+    errors,
+    fifo_cache,
+    lru_cache,
+    osutils,
+    trace,
+    trace_events,
+    transport,
+)
 from . import index as _mod_index
 from . import static_tuple
 from .index import _OPTION_KEY_ELEMENTS, _OPTION_LEN, _OPTION_NODE_REFS
@@ -623,6 +635,122 @@ class _LeafNode(dict):
         return keys
 
 
+class _LazyLeafNode:
+    """A leaf node that only parses the rows that are asked for.
+
+    Rows in a leaf page are sorted by key, so single key lookups can bisect
+    through the raw page bytes rather than building a dict for every row on
+    the page. This pays off when most pages are only consulted for one or
+    two keys, such as when looking up keys in a large index.
+    """
+
+    __slots__ = (
+        "_bytes",
+        "_key_length",
+        "_ref_list_length",
+        "_rows_end",
+        "_rows_start",
+    )
+
+    def __init__(self, bytes, key_length, ref_list_length):
+        self._bytes = bytes
+        self._key_length = key_length
+        self._ref_list_length = ref_list_length
+        # Skip the 'type=leaf' line
+        self._rows_start = bytes.index(b"\n") + 1
+        # Rows stop at the first empty line, if any
+        end = bytes.find(b"\n\n", self._rows_start - 1)
+        if end == -1:
+            self._rows_end = len(bytes)
+        else:
+            self._rows_end = end + 1
+
+    def _parse_row(self, start, end):
+        """Parse the row in self._bytes[start:end] into (key, value)."""
+        return _btree_serializer._parse_leaf_lines(
+            _LEAF_FLAG + self._bytes[start:end], self._key_length, self._ref_list_length
+        )[0]
+
+    def _row_key_end(self, start):
+        """Return the offset just past the serialized key of a row."""
+        pos = start
+        for _ in range(self._key_length):
+            pos = self._bytes.index(b"\x00", pos) + 1
+        return pos
+
+    def _find_row(self, key):
+        """Bisect for the row with the given key.
+
+        :return: (start, end) of the row, or None if key is not present.
+        """
+        data = self._bytes
+        search = b"\x00".join(key) + b"\x00"
+        lo = self._rows_start
+        hi = self._rows_end
+        # Invariant: lo and hi are both at the start of a row.
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b"\n", lo, mid) + 1
+            if start < lo:
+                start = lo
+            end = data.index(b"\n", start) + 1
+            row_key = data[start : self._row_key_end(start)]
+            if row_key == search:
+                return start, end
+            elif row_key < search:
+                lo = end
+            else:
+                hi = start
+        return None
+
+    def __contains__(self, key):
+        return self._find_row(key) is not None
+
+    def __getitem__(self, key):
+        row = self._find_row(key)
+        if row is None:
+            raise KeyError(key)
+        return self._parse_row(*row)[1]
+
+    def get(self, key, default=None):
+        row = self._find_row(key)
+        if row is None:
+            return default
+        return self._parse_row(*row)[1]
+
+    @property
+    def min_key(self):
+        start = self._rows_start
+        if start >= self._rows_end:
+            return None
+        return self._parse_row(start, self._bytes.index(b"\n", start) + 1)[0]
+
+    @property
+    def max_key(self):
+        end = self._rows_end
+        if self._rows_start >= end:
+            return None
+        start = self._bytes.rfind(b"\n", self._rows_start, end - 1) + 1
+        if start < self._rows_start:
+            start = self._rows_start
+        return self._parse_row(start, end)[0]
+
+    def all_items(self):
+        """Return a sorted list of (key, (value, refs)) items."""
+        return sorted(
+            _btree_serializer._parse_leaf_lines(
+                self._bytes, self._key_length, self._ref_list_length
+            )
+        )
+
+    def all_keys(self):
+        """Return a sorted list of all keys."""
+        return [key for key, value in self.all_items()]
+
+    def __len__(self):
+        return self._bytes.count(b"\n", self._rows_start, self._rows_end)
+
+
 class _InternalNode:
     """An internal node for a serialised B+Tree index."""
 
@@ -653,7 +781,9 @@ class BTreeGraphIndex:
     memory except when very large walks are done.
     """
 
-    def __init__(self, transport, name, size, unlimited_cache=False, offset=0):
+    def __init__(
+        self, transport, name, size, unlimited_cache=False, offset=0, use_mmap=False
+    ):
         """Create a B+Tree index object on the index name.
 
         :param transport: The transport to read data for the index from.
@@ -668,15 +798,26 @@ class BTreeGraphIndex:
             cache all leaf nodes.
         :param offset: The start of the btree index data isn't byte 0 of the
             file. Instead it starts at some point later.
+        :param use_mmap: If set to True and the index is on a local
+            transport, the index file is memory mapped rather than read
+            with readv, and leaf rows are only parsed when they are looked
+            up.
         """
         self._transport = transport
         self._name = name
         self._size = size
         self._file = None
+        self._mmap = None
+        # mmapped files cannot be renamed or deleted on Windows, which we need
+        # to be able to do with obsolete packs.
+        self._use_mmap = use_mmap and sys.platform != "win32"
         self._recommended_pages = self._compute_recommended_pages()
         self._root_node = None
         self._base_offset = offset
-        self._leaf_factory = _LeafNode
+        if self._use_mmap:
+            self._leaf_factory = _LazyLeafNode
+        else:
+            self._leaf_factory = _LeafNode
         # Default max size is 100,000 leave values
         self._leaf_value_cache = None  # lru_cache.LRUCache(100*1000)
         if unlimited_cache:
@@ -904,6 +1045,10 @@ class BTreeGraphIndex:
         # round-trips in the future. We may re-evaluate this if InternalNode
         # memory starts to be an issue.
         self._leaf_node_cache.clear()
+        if self._mmap is not None:
+            # The file is mapped again if it is read from later.
+            self._mmap.close()
+            self._mmap = None
 
     def external_references(self, ref_list_num):
         if self._root_node is None:
@@ -964,7 +1109,10 @@ class BTreeGraphIndex:
         if not needed:
             return found
         needed = self._expand_offsets(needed)
-        found.update(self._get_and_cache_nodes(needed))
+        with trace_events.span(
+            "read_nodes", "index", index=self._name, nodes=len(needed)
+        ):
+            found.update(self._get_and_cache_nodes(needed))
         return found
 
     def _get_internal_nodes(self, node_indexes):
@@ -1197,14 +1345,18 @@ class BTreeGraphIndex:
         needed_keys = keys
         if not needed_keys:
             return
-        nodes, nodes_and_keys = self._walk_through_internal_nodes(needed_keys)
+        with trace_events.span(
+            "iter_entries", "index", index=self._name, keys=len(needed_keys)
+        ):
+            nodes, nodes_and_keys = self._walk_through_internal_nodes(needed_keys)
         for node_index, sub_keys in nodes_and_keys:
             if not sub_keys:
                 continue
             node = nodes[node_index]
             for next_sub_key in sub_keys:
-                if next_sub_key in node:
-                    value, refs = node[next_sub_key]
+                entry = node.get(next_sub_key)
+                if entry is not None:
+                    value, refs = entry
                     if self.node_ref_lists:
                         yield (self, next_sub_key, value, refs)
                     else:
@@ -1282,11 +1434,12 @@ class BTreeGraphIndex:
             node = nodes[node_index]
             parents_to_check = set()
             for next_sub_key in sub_keys:
-                if next_sub_key not in node:
+                entry = node.get(next_sub_key)
+                if entry is None:
                     # This one is just not present in the index at all
                     missing_keys.add(next_sub_key)
                 else:
-                    value, refs = node[next_sub_key]
+                    value, refs = entry
                     parent_keys = refs[ref_list_num]
                     parent_map[next_sub_key] = parent_keys
                     parents_to_check.update(parent_keys)
@@ -1299,8 +1452,9 @@ class BTreeGraphIndex:
             while parents_to_check:
                 next_parents_to_check = set()
                 for key in parents_to_check:
-                    if key in node:
-                        value, refs = node[key]
+                    entry = node.get(key)
+                    if entry is not None:
+                        value, refs = entry
                         parent_keys = refs[ref_list_num]
                         parent_map[key] = parent_keys
                         next_parents_to_check.update(parent_keys)
@@ -1483,6 +1637,28 @@ class BTreeGraphIndex:
         header_end = len(signature) + sum(map(len, lines[0:4])) + 4
         return header_end, bytes[header_end:]
 
+    def _get_mmap(self):
+        """Get a memory map of the index file.
+
+        :return: An mmap object, or None if the index can not be mapped (for
+            example, because it is not on a local transport).
+        """
+        if self._mmap is None and self._use_mmap:
+            try:
+                path = self._transport.local_abspath(self._name)
+                with open(path, "rb") as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (
+                errors.NotLocalUrl,
+                errors.TransportNotPossible,
+                OSError,
+                ValueError,
+            ) as e:
+                # ValueError is raised for empty files
+                trace.mutter("not memory mapping %s: %s", self._name, e)
+                self._use_mmap = False
+        return self._mmap
+
     def _read_nodes(self, nodes):
         """Read some nodes from disk into the LRU cache.
 
@@ -1510,7 +1686,9 @@ class BTreeGraphIndex:
                 else:
                     # The only case where we don't know the size, is for very
                     # small indexes. So we read the whole thing
-                    bytes = self._transport.get_bytes(self._name)
+                    bytes = self._get_mmap()
+                    if bytes is None:
+                        bytes = self._transport.get_bytes(self._name)
                     num_bytes = len(bytes)
                     self._size = num_bytes - base_offset
                     # the whole thing should be parsed out of 'bytes'
@@ -1534,6 +1712,11 @@ class BTreeGraphIndex:
             data_ranges = [
                 (start, bytes[start : start + size]) for start, size in ranges
             ]
+        elif self._file is None and self._get_mmap() is not None:
+            index_map = self._mmap
+            data_ranges = [
+                (start, index_map[start : start + size]) for start, size in ranges
+            ]
         elif self._file is None:
             data_ranges = self._transport.readv(self._name, ranges)
         else:
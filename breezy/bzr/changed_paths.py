@@ -0,0 +1,294 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Index of the paths changed by each revision of a repository.
+
+For every revision the index stores the changes against its left-hand
+parent, as found by Repository.get_revision_deltas: the kind of change,
+the old and new path and the file id of each changed entry. Commands that
+only care about the revisions touching some paths, such as ``log FILE``,
+use it to skip revisions without comparing their trees.
+
+The changes made by a revision never change once it has been added, so the
+index stays valid as revisions are added; revisions it doesn't contain
+simply have to be compared the slow way. Pack repositories store an index
+for the revisions of each pack, and combine them when they are read.
+"""
+
+import bisect
+import zlib
+
+import fastbencode as bencode
+
+FORMAT_MARKER = b"bzr changed paths v1"
+
+# The kinds of change, in the order they are serialized in. These match
+# the names of the lists in a TreeDelta.
+CHANGE_KINDS = ("added", "removed", "renamed", "copied", "kind_changed", "modified")
+
+
+def changes_from_delta(delta):
+    """Return the changes of a TreeDelta in the form stored in the index.
+
+    :return: A tuple of (kind, old_path, new_path, file_id) tuples; paths
+        are None for entries that don't exist on that side.
+    """
+    changes = []
+    for kind in CHANGE_KINDS:
+        for change in getattr(delta, kind):
+            changes.append(
+                (kind, change.path[0], change.path[1], getattr(change, "file_id", None))
+            )
+    return tuple(changes)
+
+
+def _parent_dirs(path):
+    """Yield the directories containing path, innermost first."""
+    while path:
+        path = path.rpartition("/")[0]
+        yield path
+
+
+class ChangedPathsIndex:
+    """The changes made by each revision of a repository.
+
+    :ivar pack_names: Tuple of the names of the packs whose revisions have
+        been indexed.
+    """
+
+    def __init__(self, pack_names=()):
+        self.pack_names = tuple(pack_names)
+        self._changes = {}
+        # path -> set of revision ids, built on first use
+        self._path_revisions = None
+        self._sorted_paths = None
+
+    def __contains__(self, revision_id):
+        return revision_id in self._changes
+
+    def revision_count(self):
+        """Return the number of indexed revisions."""
+        return len(self._changes)
+
+    def add_revision(self, revision_id, changes):
+        """Record the changes of a revision.
+
+        :param changes: An iterable of (kind, old_path, new_path, file_id)
+            tuples, as returned by changes_from_delta.
+        """
+        changes = tuple(changes)
+        self._changes[revision_id] = changes
+        if self._path_revisions is not None:
+            for path in self._iter_paths(changes):
+                revisions = self._path_revisions.get(path)
+                if revisions is None:
+                    revisions = self._path_revisions[path] = set()
+                    self._sorted_paths = None
+                revisions.add(revision_id)
+
+    def update(self, other):
+        """Add the revisions and pack names of another index."""
+        self.pack_names = tuple(sorted(set(self.pack_names).union(other.pack_names)))
+        self._changes.update(other._changes)
+        self._path_revisions = None
+        self._sorted_paths = None
+
+    def get_changes(self, revision_id):
+        """Return the changes of a revision, or None if it isn't indexed."""
+        return self._changes.get(revision_id)
+
+    def get_changed_paths(self, revision_id):
+        """Return the old and new paths changed by a revision.
+
+        :return: A set of paths, or None if the revision isn't indexed.
+        """
+        changes = self._changes.get(revision_id)
+        if changes is None:
+            return None
+        return set(self._iter_paths(changes))
+
+    def get_changed_file_ids(self, revision_id):
+        """Return the file ids changed by a revision.
+
+        :return: A set of file ids, or None if the revision isn't indexed.
+        """
+        changes = self._changes.get(revision_id)
+        if changes is None:
+            return None
+        return {
+            file_id for (_kind, _old, _new, file_id) in changes if file_id is not None
+        }
+
+    def touches_paths(self, revision_id, paths):
+        """Check whether a revision may have changed any of paths.
+
+        Changes to a path itself, to anything below it and to the
+        directories containing it count, like for the specific_files of
+        Repository.get_revision_deltas.
+
+        :param paths: A collection of paths in the revision.
+        :return: A boolean, or None if the revision isn't indexed.
+        """
+        changes = self._changes.get(revision_id)
+        if changes is None:
+            return None
+        paths = set(paths)
+        parents = set()
+        for path in paths:
+            parents.update(_parent_dirs(path))
+        for changed in self._iter_paths(changes):
+            if changed in paths or changed in parents:
+                return True
+            for parent in _parent_dirs(changed):
+                if parent in paths:
+                    return True
+        return False
+
+    def get_renamed_paths(self, revision_id, paths):
+        """Return the other names of paths across a revision.
+
+        Renames and copies of paths and of the directories containing them
+        are followed in both directions, so the result can be used whichever
+        way history is being walked.
+
+        :return: A set of paths, or None if the revision isn't indexed.
+        """
+        changes = self._changes.get(revision_id)
+        if changes is None:
+            return None
+        result = set()
+        for kind, old_path, new_path, _file_id in changes:
+            if kind not in ("renamed", "copied"):
+                continue
+            for path in paths:
+                for source, target in ((old_path, new_path), (new_path, old_path)):
+                    if path == source:
+                        result.add(target)
+                    elif path.startswith(source + "/"):
+                        result.add(target + path[len(source) :])
+        return result
+
+    def revisions_touching(self, path):
+        """Return the indexed revisions that changed path or anything below it.
+
+        :return: A set of revision ids.
+        """
+        if self._path_revisions is None:
+            self._path_revisions = {}
+            for revision_id, changes in self._changes.items():
+                for changed in self._iter_paths(changes):
+                    self._path_revisions.setdefault(changed, set()).add(revision_id)
+        if self._sorted_paths is None:
+            self._sorted_paths = sorted(self._path_revisions)
+        result = set(self._path_revisions.get(path, ()))
+        if path == "":
+            prefix_paths = self._sorted_paths
+        else:
+            # Paths below path sort between path + "/" and path + "0"
+            start = bisect.bisect_left(self._sorted_paths, path + "/")
+            end = bisect.bisect_left(self._sorted_paths, path + "0", start)
+            prefix_paths = self._sorted_paths[start:end]
+        for changed in prefix_paths:
+            result.update(self._path_revisions[changed])
+        return result
+
+    def _iter_paths(self, changes):
+        for _kind, old_path, new_path, _file_id in changes:
+            if old_path is not None:
+                yield old_path
+            if new_path is not None and new_path != old_path:
+                yield new_path
+
+    def to_bytes(self):
+        """Serialize the index."""
+        path_positions = {}
+        paths = []
+        file_id_positions = {}
+        file_ids = []
+        kind_positions = {kind: pos for pos, kind in enumerate(CHANGE_KINDS)}
+
+        def path_position(path):
+            if path is None:
+                return -1
+            pos = path_positions.get(path)
+            if pos is None:
+                pos = path_positions[path] = len(paths)
+                paths.append(path.encode("utf-8"))
+            return pos
+
+        def file_id_position(file_id):
+            if file_id is None:
+                return -1
+            pos = file_id_positions.get(file_id)
+            if pos is None:
+                pos = file_id_positions[file_id] = len(file_ids)
+                file_ids.append(file_id)
+            return pos
+
+        revisions = []
+        for revision_id, changes in self._changes.items():
+            revisions.append(
+                [
+                    revision_id,
+                    [
+                        [
+                            kind_positions[kind],
+                            path_position(old_path),
+                            path_position(new_path),
+                            file_id_position(file_id),
+                        ]
+                        for (kind, old_path, new_path, file_id) in changes
+                    ],
+                ]
+            )
+        return zlib.compress(
+            bencode.bencode(
+                [
+                    FORMAT_MARKER,
+                    [name.encode("ascii") for name in self.pack_names],
+                    paths,
+                    file_ids,
+                    revisions,
+                ]
+            )
+        )
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Deserialize data created by to_bytes().
+
+        :raises ValueError: if data is not a valid changed paths index
+        """
+        try:
+            marker, pack_names, paths, file_ids, revisions = bencode.bdecode(
+                zlib.decompress(data)
+            )
+        except (TypeError, ValueError, zlib.error) as e:
+            raise ValueError(f"invalid changed paths index: {e}") from e
+        if marker != FORMAT_MARKER:
+            raise ValueError(f"unknown changed paths index format {marker!r}")
+        try:
+            paths = [path.decode("utf-8") for path in paths] + [None]
+            file_ids = list(file_ids) + [None]
+            index = cls(name.decode("ascii") for name in pack_names)
+            for revision_id, changes in revisions:
+                index._changes[revision_id] = tuple(
+                    (CHANGE_KINDS[kind], paths[old], paths[new], file_ids[file_id])
+                    for (kind, old, new, file_id) in changes
+                )
+        except (TypeError, ValueError, IndexError) as e:
+            raise ValueError(f"invalid changed paths index: {e}") from e
+        return index
@@ -40,7 +40,7 @@ import heapq
 import threading
 from typing import Callable
 
-from .. import errors, lru_cache, osutils, registry, trace
+from .. import debug, errors, lru_cache, osutils, registry, trace
 from .._bzr_rs import chk_map as _chk_map_rs
 from .static_tuple import StaticTuple, expect_static_tuple
 
@@ -60,12 +60,136 @@ _thread_caches = threading.local()
 _thread_caches.page_cache = None
 
 
+# Optional process-wide page cache, shared by all threads. This is useful in
+# long running multi-threaded processes (e.g. 'brz serve'), where every
+# thread would otherwise warm up its own copy of the same pages.
+_shared_page_cache = None
+
+
+class SharedPageCache:
+    """A size bounded page cache that can be used from multiple threads.
+
+    The cache is split into a number of stripes, each of which is an
+    LRUSizeCache protected by its own lock. Keys (CHK sha1 keys) are assigned
+    to a stripe based on their hash, so concurrent lookups of different pages
+    rarely contend on the same lock.
+
+    Hit and miss counts are recorded, see stats().
+    """
+
+    def __init__(self, max_size, stripes=16):
+        """Create a SharedPageCache.
+
+        :param max_size: The total number of bytes to cache, across all
+            stripes.
+        :param stripes: The number of independently locked stripes.
+        """
+        self._max_size = max_size
+        stripe_size = max(max_size // stripes, 1)
+        self._stripes = [
+            (threading.Lock(), lru_cache.LRUSizeCache(stripe_size))
+            for _ in range(stripes)
+        ]
+        # Hit and miss counts of each stripe, updated under its lock
+        self._hits = [0] * stripes
+        self._misses = [0] * stripes
+
+    @property
+    def hits(self):
+        return sum(self._hits)
+
+    @property
+    def misses(self):
+        return sum(self._misses)
+
+    def _get_stripe(self, key):
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def __getitem__(self, key):
+        index = hash(key) % len(self._stripes)
+        lock, cache = self._stripes[index]
+        with lock:
+            try:
+                value = cache[key]
+            except KeyError:
+                self._misses[index] += 1
+                raise
+            self._hits[index] += 1
+        return value
+
+    def __setitem__(self, key, value):
+        lock, cache = self._get_stripe(key)
+        with lock:
+            cache[key] = value
+
+    def __contains__(self, key):
+        lock, cache = self._get_stripe(key)
+        with lock:
+            return key in cache
+
+    def __len__(self):
+        return sum(len(cache) for _, cache in self._stripes)
+
+    def clear(self):
+        for lock, cache in self._stripes:
+            with lock:
+                cache.clear()
+
+    def stats(self):
+        """Return a dict describing the cache usage.
+
+        :return: A dict with 'hits', 'misses', 'entries', 'size' (the number
+            of bytes cached) and 'max_size'.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self),
+            "size": sum(cache._value_size for _, cache in self._stripes),
+            "max_size": self._max_size,
+        }
+
+
+def enable_shared_page_cache(max_size):
+    """Use a single page cache of max_size bytes for all threads.
+
+    :return: The SharedPageCache now in use.
+    """
+    global _shared_page_cache
+    _shared_page_cache = SharedPageCache(max_size)
+    if debug.debug_flag_enabled("cache"):
+        import breezy
+
+        breezy.get_global_state().exit_stack.callback(
+            _report_cache_stats, _shared_page_cache
+        )
+    return _shared_page_cache
+
+
+def disable_shared_page_cache():
+    """Go back to using per-thread page caches."""
+    global _shared_page_cache
+    _shared_page_cache = None
+
+
+def _report_cache_stats(page_cache):
+    trace.note(
+        "CHK page cache: %(hits)d hits, %(misses)d misses, "
+        "%(entries)d pages, %(size)d/%(max_size)d bytes",
+        page_cache.stats(),
+    )
+
+
 def _get_cache():
-    """Get the per-thread page cache.
+    """Get the page cache for the current thread.
 
-    We need a function to do this because in a new thread the _thread_caches
-    threading.local object does not have the cache initialized yet.
+    This is the shared page cache if one has been enabled, otherwise it is
+    a per-thread cache. We need a function to do this because in a new thread
+    the _thread_caches threading.local object does not have the cache
+    initialized yet.
     """
+    if _shared_page_cache is not None:
+        return _shared_page_cache
     page_cache = getattr(_thread_caches, "page_cache", None)
     if page_cache is None:
         # We are caching bytes so len(value) is perfectly accurate
@@ -0,0 +1,148 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Clone bundles: saved streams for fetching into empty repositories.
+
+A clone bundle holds the container records of a Repository.get_stream reply
+for the ancestry of some heads, as sent by a smart server. When a client
+later fetches the ancestry of those heads or their descendants into an empty
+repository, the server sends the saved records followed by a stream of just
+the revisions that are not in the bundle, rather than generating the whole
+stream again.
+"""
+
+import tempfile
+
+from .. import errors, osutils, trace
+from .. import transport as _mod_transport
+from ..revision import NULL_REVISION
+
+FORMAT_MARKER = b"bzr clone bundle v1\n"
+
+BUNDLE_NAME = "clone-bundle"
+
+_READ_SIZE = 65536
+
+
+class CloneBundle:
+    """A clone bundle read from a repository.
+
+    :ivar network_name: The network name of the repository format the
+        records are in.
+    :ivar heads: The revisions whose ancestry is in the bundle.
+    """
+
+    def __init__(self, f, network_name, heads):
+        self._file = f
+        self.network_name = network_name
+        self.heads = heads
+
+    def missing_revisions(self, graph, heads):
+        """Find the revisions in the ancestry of heads not in the bundle.
+
+        :param graph: The graph of the repository.
+        :param heads: A set of revision ids.
+        :return: A set of revision ids, or None if the bundle contains
+            revisions that are not in the ancestry of heads.
+        """
+        if not graph.heads(heads.union(self.heads)).issubset(heads):
+            return None
+        missing = set()
+        for head in heads:
+            missing.update(graph.find_unique_ancestors(head, self.heads))
+        missing.discard(NULL_REVISION)
+        return missing
+
+    def iter_record_bytes(self):
+        """Yield the serialised container records of the bundle.
+
+        The bundle is closed afterwards.
+        """
+        try:
+            while True:
+                data = self._file.read(_READ_SIZE)
+                if not data:
+                    break
+                yield data
+        finally:
+            self.close()
+
+    def close(self):
+        self._file.close()
+
+
+def read_clone_bundle(transport):
+    """Open the clone bundle of a repository.
+
+    :param transport: The transport of the repository.
+    :return: A CloneBundle, or None if there is no usable bundle.
+    """
+    try:
+        f = transport.get(BUNDLE_NAME)
+    except _mod_transport.NoSuchFile:
+        return None
+    if f.readline() != FORMAT_MARKER:
+        trace.mutter("Ignoring clone bundle in unknown format at %s", transport.base)
+        f.close()
+        return None
+    network_name = f.readline().rstrip(b"\n")
+    heads = frozenset(f.readline().split())
+    return CloneBundle(f, network_name, heads)
+
+
+class CloneBundleWriter:
+    """Save container records as the clone bundle of a repository.
+
+    The records are spooled to a temporary file, and only replace the
+    existing bundle when commit() is called. The bundle is uploaded under a
+    temporary name and then renamed into place, so that readers never see a
+    partially written bundle.
+    """
+
+    def __init__(self, transport, network_name, heads):
+        self._transport = transport
+        self._file = tempfile.TemporaryFile()
+        self._file.write(FORMAT_MARKER)
+        self._file.write(network_name + b"\n")
+        self._file.write(b" ".join(sorted(heads)) + b"\n")
+
+    def write(self, data):
+        self._file.write(data)
+
+    def commit(self):
+        """Replace the clone bundle with the records written.
+
+        The bundle is only a cache, so failures to save it are logged
+        rather than raised.
+        """
+        tmp_name = f"{BUNDLE_NAME}.{osutils.rand_chars(10)}.tmp"
+        try:
+            self._file.seek(0)
+            self._transport.put_file(tmp_name, self._file)
+            try:
+                self._transport.rename(tmp_name, BUNDLE_NAME)
+            except BaseException:
+                self._transport.delete(tmp_name)
+                raise
+        except (errors.TransportError, errors.PathError) as e:
+            trace.mutter(
+                "unable to save clone bundle at %s: %s", self._transport.base, e
+            )
+        finally:
+            self._file.close()
+
+    def abort(self):
+        self._file.close()
@@ -0,0 +1,331 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Reachability index for the revisions of a repository.
+
+A commit graph stores every revision of a repository, with its parents
+as integer positions and its generation number: one more than the
+largest generation of its parents, with ghosts and NULL_REVISION at
+generation 1. A revision can only be an ancestor of revisions with a
+larger generation, which lets graph searches stop early rather than
+walking all of history.
+
+Revisions are stored in topological order, so new revisions can be
+appended without renumbering. The index records the pack names it was
+built for and is only used while those match the repository.
+"""
+
+import heapq
+import sys
+from array import array
+
+from .. import tsort
+from ..revision import NULL_REVISION
+
+FORMAT_MARKER = b"bzr commit graph v1\n"
+
+_LEFT = 1
+_RIGHT = 2
+_STALE = _LEFT | _RIGHT
+
+
+def _array_from_bytes(data):
+    result = array("I")
+    result.frombytes(data)
+    if sys.byteorder == "big":
+        result.byteswap()
+    return result
+
+
+def _array_to_bytes(values):
+    if sys.byteorder == "big":
+        values = array("I", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class CommitGraph:
+    """Revision ids, parents and generation numbers of a repository.
+
+    :ivar pack_names: Sorted tuple of the pack names the graph covers.
+    """
+
+    def __init__(self, pack_names=()):
+        self.pack_names = tuple(pack_names)
+        self._keys = []
+        self._positions = {}
+        self._generations = array("I")
+        self._parent_offsets = array("I", [0])
+        self._parents = array("I")
+        self._ghosts = set()
+        self._append(NULL_REVISION, ())
+
+    @classmethod
+    def from_parent_map(cls, parent_map, pack_names=()):
+        """Build a commit graph for all revisions in parent_map."""
+        graph = cls(pack_names)
+        graph.add_revisions(parent_map)
+        return graph
+
+    def _append(self, key, parent_positions, ghost=False):
+        pos = len(self._keys)
+        self._keys.append(key)
+        self._positions[key] = pos
+        generation = 0
+        for parent_pos in parent_positions:
+            generation = max(generation, self._generations[parent_pos])
+        self._generations.append(generation + 1)
+        self._parents.extend(parent_positions)
+        self._parent_offsets.append(len(self._parents))
+        if ghost:
+            self._ghosts.add(pos)
+        return pos
+
+    def _parent_positions(self, pos):
+        return self._parents[self._parent_offsets[pos] : self._parent_offsets[pos + 1]]
+
+    def _lookup(self, keys):
+        positions = []
+        for key in keys:
+            pos = self._positions.get(key)
+            if pos is None:
+                return None
+            positions.append(pos)
+        return positions
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def revision_count(self):
+        """Return the number of revisions, excluding ghosts."""
+        return len(self._keys) - len(self._ghosts) - 1
+
+    def get_generation(self, key):
+        """Return the generation number of key, or None if it is unknown."""
+        pos = self._positions.get(key)
+        if pos is None:
+            return None
+        return self._generations[pos]
+
+    def add_revisions(self, parent_map):
+        """Add revisions to the graph.
+
+        :param parent_map: Map from revision id to parent revision ids, as
+            returned by Repository.get_parent_map. Revisions that are already
+            in the graph are skipped.
+        :return: False if the graph can not be extended, because a ghost was
+            filled in or the parents of a revision changed; the graph needs
+            to be rebuilt in that case and has not been modified.
+        """
+        new = {}
+        for key, parents in parent_map.items():
+            pos = self._positions.get(key)
+            if pos is None:
+                new[key] = parents
+            elif pos in self._ghosts:
+                return False
+            elif [self._keys[p] for p in self._parent_positions(pos)] != list(parents):
+                return False
+        for key in tsort.topo_sort(new):
+            parent_positions = []
+            for parent in new[key]:
+                parent_pos = self._positions.get(parent)
+                if parent_pos is None:
+                    parent_pos = self._append(parent, (), ghost=True)
+                parent_positions.append(parent_pos)
+            self._append(key, parent_positions)
+        return True
+
+    def heads(self, keys):
+        """Return the heads from amongst keys.
+
+        :return: A set of heads, or None if any of keys is not in the graph.
+        """
+        positions = self._lookup(keys)
+        if positions is None:
+            return None
+        generations = self._generations
+        min_generation = min(generations[pos] for pos in positions)
+        seen = set()
+        pending = []
+        for pos in positions:
+            pending.extend(self._parent_positions(pos))
+        while pending:
+            pos = pending.pop()
+            if pos in seen:
+                continue
+            seen.add(pos)
+            # Nothing at or below the lowest candidate can reach a candidate
+            if generations[pos] > min_generation:
+                pending.extend(self._parent_positions(pos))
+        return {self._keys[pos] for pos in positions if pos not in seen}
+
+    def is_ancestor(self, candidate_ancestor, candidate_descendant):
+        """Determine whether a revision is an ancestor of another.
+
+        :return: A boolean, or None if the graph can not answer the question.
+        """
+        if NULL_REVISION in (candidate_ancestor, candidate_descendant):
+            # NULL_REVISION is special cased by Graph.heads
+            return None
+        positions = self._lookup([candidate_ancestor, candidate_descendant])
+        if positions is None:
+            return None
+        ancestor, descendant = positions
+        if ancestor == descendant:
+            return True
+        generations = self._generations
+        target_generation = generations[ancestor]
+        if target_generation >= generations[descendant]:
+            return False
+        seen = set()
+        pending = [descendant]
+        while pending:
+            pos = pending.pop()
+            for parent_pos in self._parent_positions(pos):
+                if parent_pos == ancestor:
+                    return True
+                if generations[parent_pos] > target_generation and (
+                    parent_pos not in seen
+                ):
+                    seen.add(parent_pos)
+                    pending.append(parent_pos)
+        return False
+
+    def _paint(self, left, right):
+        """Find which of the ancestry of left and right is reachable from each.
+
+        Revisions are visited in decreasing generation order, so all
+        descendants of a revision have been visited by the time it is
+        reached. The walk stops once only revisions reachable from both
+        sides are left.
+
+        :return: A dict mapping each visited position to _LEFT, _RIGHT or
+            _STALE.
+        """
+        flags = {}
+        for pos in left:
+            flags[pos] = _LEFT
+        for pos in right:
+            flags[pos] = flags.get(pos, 0) | _RIGHT
+        generations = self._generations
+        queue = [(-generations[pos], pos) for pos in flags]
+        heapq.heapify(queue)
+        active = sum(1 for flag in flags.values() if flag != _STALE)
+        while active:
+            pos = heapq.heappop(queue)[1]
+            flag = flags[pos]
+            if flag != _STALE:
+                active -= 1
+            for parent_pos in self._parent_positions(pos):
+                old_flag = flags.get(parent_pos)
+                if old_flag is None:
+                    flags[parent_pos] = flag
+                    heapq.heappush(queue, (-generations[parent_pos], parent_pos))
+                    if flag != _STALE:
+                        active += 1
+                elif old_flag | flag != old_flag:
+                    # parent_pos has a lower generation, so it is still queued
+                    flags[parent_pos] = _STALE
+                    active -= 1
+        return flags
+
+    def find_difference(self, left_revision, right_revision):
+        """Determine the graph difference between two revisions.
+
+        :return: A tuple of the revisions only in the ancestry of
+            left_revision and those only in the ancestry of right_revision,
+            or None if either revision is not in the graph.
+        """
+        positions = self._lookup([left_revision, right_revision])
+        if positions is None:
+            return None
+        flags = self._paint(positions[:1], positions[1:])
+        left = set()
+        right = set()
+        for pos, flag in flags.items():
+            if flag == _LEFT:
+                left.add(self._keys[pos])
+            elif flag == _RIGHT:
+                right.add(self._keys[pos])
+        return left, right
+
+    def find_unique_ancestors(self, unique_revision, common_revisions):
+        """Find the unique ancestors for a revision versus others.
+
+        :return: The set of revisions in the ancestry of unique_revision but
+            not in that of any of common_revisions, or None if any of the
+            revisions is not in the graph.
+        """
+        positions = self._lookup([unique_revision])
+        common = self._lookup(common_revisions)
+        if positions is None or common is None:
+            return None
+        flags = self._paint(positions, common)
+        return {self._keys[pos] for pos, flag in flags.items() if flag == _LEFT}
+
+    def to_bytes(self):
+        """Serialize the graph."""
+        for key in self._keys:
+            if b"\n" in key:
+                raise ValueError(f"invalid revision id {key!r}")
+        lines = [
+            FORMAT_MARKER,
+            b" ".join(name.encode("ascii") for name in self.pack_names) + b"\n",
+            b"%d %d\n" % (len(self._keys), len(self._parents)),
+        ]
+        lines.extend(key + b"\n" for key in self._keys)
+        lines.append(_array_to_bytes(self._generations))
+        lines.append(_array_to_bytes(self._parent_offsets))
+        lines.append(_array_to_bytes(self._parents))
+        lines.append(_array_to_bytes(array("I", sorted(self._ghosts))))
+        return b"".join(lines)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Deserialize data created by to_bytes().
+
+        :raises ValueError: if data is not a valid commit graph
+        """
+        if not data.startswith(FORMAT_MARKER):
+            raise ValueError("unknown commit graph format")
+        try:
+            names, counts, rest = data[len(FORMAT_MARKER) :].split(b"\n", 2)
+            num_keys, num_parents = (int(count) for count in counts.split())
+        except ValueError as e:
+            raise ValueError(f"invalid commit graph: {e}") from e
+        keys = rest.split(b"\n", num_keys)
+        if len(keys) != num_keys + 1:
+            raise ValueError("invalid commit graph: truncated revision ids")
+        binary = keys.pop()
+        offset = 0
+        arrays = []
+        for count in (num_keys, num_keys + 1, num_parents):
+            chunk = binary[offset : offset + count * 4]
+            if len(chunk) != count * 4:
+                raise ValueError("invalid commit graph: truncated data")
+            arrays.append(_array_from_bytes(chunk))
+            offset += count * 4
+        ghosts = binary[offset:]
+        if len(ghosts) % 4 != 0:
+            raise ValueError("invalid commit graph: truncated data")
+        graph = cls()
+        graph.pack_names = tuple(name.decode("ascii") for name in names.split())
+        graph._keys = keys
+        graph._positions = {key: pos for pos, key in enumerate(keys)}
+        graph._generations, graph._parent_offsets, graph._parents = arrays
+        graph._ghosts = set(_array_from_bytes(ghosts))
+        return graph
@@ -237,6 +237,7 @@ from .. import (
     lock,
     osutils,
     trace,
+    trace_events,
     urlutils,
 )
 from . import inventory, static_tuple
@@ -401,6 +402,10 @@ class DirState:
         self._worth_saving_limit = worth_saving_limit
         self._config_stack = config.LocationStack(urlutils.local_path_to_url(path))
         self._use_filesystem_for_exec = use_filesystem_for_exec
+        # Background hashing for iter_changes, see _prefetch_sha1s
+        self._sha1_executor = None
+        self._sha1_prefetch = {}
+        self._sha1_prefetch_dir = None
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self._filename!r})"
@@ -1955,6 +1960,88 @@ class DirState:
         """Return the os.lstat value for this path."""
         return os.lstat(abspath)
 
+    def _prefetch_sha1s(self, block, dir_info):
+        """Start hashing the modified files of a directory in the background.
+
+        This is used by iter_changes when the dirstate.sha1_threads option is
+        larger than 1: files whose stat information no longer matches their
+        dirblock entry are hashed concurrently, and update_entry and
+        _process_entry then claim the results as they reach each entry.
+
+        :param block: The dirblock for the directory.
+        :param dir_info: The directory listing from _walkdirs_utf8 for the
+            same directory.
+        """
+        if dir_info is self._sha1_prefetch_dir:
+            return
+        self._sha1_prefetch_dir = dir_info
+        self._sha1_prefetch = {}
+        if block is None or dir_info is None:
+            return
+        if self._sha1_executor is None:
+            threads = self._config_stack.get("dirstate.sha1_threads")
+            if threads is None or threads <= 1:
+                self._sha1_executor = False
+            else:
+                from concurrent.futures import ThreadPoolExecutor
+
+                self._sha1_executor = ThreadPoolExecutor(max_workers=threads)
+        if not self._sha1_executor:
+            return
+        paths = {}
+        for path_info in dir_info[1]:
+            if path_info[2] == "file":
+                paths[path_info[1]] = path_info
+        for entry in block[1]:
+            path_info = paths.get(entry[0][1])
+            if path_info is None:
+                continue
+            details = entry[1][0]
+            if details[0] != b"f":
+                continue
+            stat_value = path_info[3]
+            if (
+                details[4] == pack_stat(stat_value)
+                and details[2] == stat_value.st_size
+            ):
+                # The saved sha1 is still valid
+                continue
+            for parent_details in entry[1][1:]:
+                if parent_details[0] == b"f":
+                    break
+            else:
+                # Nothing to compare the content with
+                continue
+            abspath = path_info[4]
+            self._sha1_prefetch[abspath] = self._sha1_executor.submit(
+                self._prefetch_stat_and_sha1, abspath
+            )
+
+    def _prefetch_stat_and_sha1(self, abspath):
+        try:
+            return self._sha1_provider.stat_and_sha1(abspath)
+        except OSError:
+            # Let the caller hash the file again and report the error
+            return None
+
+    def _take_prefetched_sha1(self, abspath):
+        """Claim the background hashing result for abspath.
+
+        :return: A (stat_value, sha1) tuple, or None if abspath was not
+            hashed in the background.
+        """
+        future = self._sha1_prefetch.pop(abspath, None)
+        if future is None:
+            return None
+        return future.result()
+
+    def _stop_sha1_prefetch(self):
+        self._sha1_prefetch = {}
+        self._sha1_prefetch_dir = None
+        if self._sha1_executor:
+            self._sha1_executor.shutdown(wait=True)
+        self._sha1_executor = None
+
     def _sha1_file_and_mutter(self, abspath):
         # when -Dhashcache is turned on, this is monkey-patched in to log
         # file reads
@@ -2398,7 +2485,8 @@ class DirState:
         """
         self._read_header_if_needed()
         if self._dirblock_state == DirState.NOT_IN_MEMORY:
-            _read_dirblocks(self)
+            with trace_events.span("read_dirblocks", "dirstate"):
+                _read_dirblocks(self)
 
     def _read_header(self):
         """This reads in the metadata header, and the parent ids.
@@ -3431,6 +3519,7 @@ class DirState:
         self._lock_token.unlock()
         self._lock_token = None
         self._split_path_cache = {}
+        self._stop_sha1_prefetch()
 
     def _requires_lock(self):
         """Check that a lock is currently held by someone on the dirstate."""
@@ -3502,7 +3591,13 @@ def py_update_entry(
             # Besides, if content filtering happens, size and sha
             # are calculated at the same time, so checking just the size
             # gains nothing w.r.t. performance.
-            link_or_sha1 = state._sha1_file(abspath)
+            prefetched = state._sha1_prefetch and state._take_prefetched_sha1(
+                abspath
+            )
+            if prefetched and pack_stat(prefetched[0]) == packed_stat:
+                link_or_sha1 = prefetched[1]
+            else:
+                link_or_sha1 = state._sha1_file(abspath)
             entry[1][0] = (
                 b"f",
                 link_or_sha1,
@@ -3717,10 +3812,14 @@ class ProcessEntryPython:
                         # map to the same content
                         if link_or_sha1 is None:
                             # Stat cache miss:
-                            (
-                                statvalue,
-                                link_or_sha1,
-                            ) = self.state._sha1_provider.stat_and_sha1(path_info[4])
+                            prefetched = self.state._take_prefetched_sha1(
+                                path_info[4]
+                            )
+                            if prefetched is None:
+                                prefetched = self.state._sha1_provider.stat_and_sha1(
+                                    path_info[4]
+                                )
+                            statvalue, link_or_sha1 = prefetched
                             self.state._observed_sha1(entry, link_or_sha1, statvalue)
                         content_change = link_or_sha1 != source_details[1]
                     # Target details is updated at update_entry time
@@ -4157,6 +4256,7 @@ class ProcessEntryPython:
                         else:
                             current_block = None
                     continue
+                self.state._prefetch_sha1s(current_block, current_dir_info)
                 entry_index = 0
                 if current_block and entry_index < len(current_block[1]):
                     current_entry = current_block[1][entry_index]
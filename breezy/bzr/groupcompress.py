@@ -16,6 +16,7 @@
 
 """Core compression logic for compressing streams of related files."""
 
+import collections
 import time
 import zlib
 
@@ -35,7 +36,7 @@ from breezy.bzr import (
 """,
 )
 
-from .. import errors, osutils, trace
+from .. import errors, osutils, trace, trace_events
 from .._bzr_rs import groupcompress as _groupcompress_rs
 from ..lru_cache import LRUSizeCache
 from .btree_index import BTreeBuilder
@@ -100,6 +101,31 @@ class DecompressCorruption(errors.BzrError):
 # num_bytes coming out.
 _ZLIB_DECOMP_WINDOW = 32 * 1024
 
+# Compression level used for zstd blocks. Level 3 is the zstd default and
+# compresses both faster and smaller than zlib's default level.
+_ZSTD_COMPRESSION_LEVEL = 3
+
+
+def _get_zstandard():
+    """Import and return the zstandard module.
+
+    :raises DependencyNotPresent: if the module is not installed
+    """
+    try:
+        import zstandard
+    except ImportError as e:
+        raise errors.DependencyNotPresent("zstandard", e) from e
+    return zstandard
+
+
+def _zstandard_available():
+    """Check whether zstd compressed blocks can be created."""
+    try:
+        _get_zstandard()
+    except errors.DependencyNotPresent:
+        return False
+    return True
+
 
 class GroupCompressBlock:
     """An object which maintains the internal structure of the compressed data.
@@ -111,11 +137,18 @@ class GroupCompressBlock:
     GCB_HEADER = b"gcb1z\n"
     # Group Compress Block v1 Lzma
     GCB_LZ_HEADER = b"gcb1l\n"
-    GCB_KNOWN_HEADERS = (GCB_HEADER, GCB_LZ_HEADER)
+    # Group Compress Block v1 Zstandard
+    GCB_ZSTD_HEADER = b"gcb1s\n"
+    GCB_KNOWN_HEADERS = (GCB_HEADER, GCB_LZ_HEADER, GCB_ZSTD_HEADER)
+
+    def __init__(self, compressor_name=None):
+        """Create a new GroupCompressBlock.
 
-    def __init__(self):
+        :param compressor_name: The compressor to use when serializing this
+            block ('zlib' or 'zstd'). None means 'zlib'.
+        """
         # map by key? or just order in file?
-        self._compressor_name = None
+        self._compressor_name = compressor_name
         self._z_content_chunks = None
         self._z_content_decompressor = None
         self._z_content_length = None
@@ -162,6 +195,26 @@ class GroupCompressBlock:
                 import pylzma
 
                 self._content = pylzma.decompress(z_content)
+            elif self._compressor_name == "zstd":
+                zstandard = _get_zstandard()
+                decompressor = zstandard.ZstdDecompressor()
+                if num_bytes * 4 > self._content_length * 3:
+                    # Same heuristic as for zlib, below.
+                    num_bytes = self._content_length
+                    try:
+                        self._content = decompressor.decompress(
+                            z_content, max_output_size=self._content_length
+                        )
+                    except zstandard.ZstdError as e:
+                        raise DecompressCorruption("zstd: " + str(e)) from e
+                else:
+                    # zstd frames are always decoded front to back, so a
+                    # stream reader gives us partial decompression without
+                    # needing to track a window like zlib does.
+                    self._z_content_decompressor = decompressor.stream_reader(
+                        z_content
+                    )
+                    self._content = b""
             elif self._compressor_name == "zlib":
                 # Start a zlib decompressor
                 if num_bytes * 4 > self._content_length * 3:
@@ -189,6 +242,9 @@ class GroupCompressBlock:
         # If we got this far, and don't have a decompressor, something is wrong
         if self._z_content_decompressor is None:
             raise AssertionError("No decompressor to decompress %d bytes" % num_bytes)
+        if self._compressor_name == "zstd":
+            self._read_zstd_content(num_bytes)
+            return
         remaining_decomp = self._z_content_decompressor.unconsumed_tail
         if not remaining_decomp:
             raise AssertionError("Nothing left to decompress")
@@ -208,6 +264,30 @@ class GroupCompressBlock:
             # The stream is finished
             self._z_content_decompressor = None
 
+    def _read_zstd_content(self, num_bytes):
+        """Read from the zstd stream until we have num_bytes of content."""
+        zstandard = _get_zstandard()
+        content_chunks = [self._content]
+        content_len = len(self._content)
+        try:
+            while content_len < num_bytes:
+                data = self._z_content_decompressor.read(num_bytes - content_len)
+                if not data:
+                    break
+                content_chunks.append(data)
+                content_len += len(data)
+        except zstandard.ZstdError as e:
+            raise DecompressCorruption("zstd: " + str(e)) from e
+        self._content = b"".join(content_chunks)
+        if content_len < num_bytes:
+            raise AssertionError(
+                "%d bytes wanted, only %d available" % (num_bytes, content_len)
+            )
+        if content_len >= self._content_length:
+            # The stream is finished
+            self._z_content_decompressor.close()
+            self._z_content_decompressor = None
+
     def _parse_bytes(self, data, pos):
         """Read the various lengths from the header.
 
@@ -254,6 +334,8 @@ class GroupCompressBlock:
             out._compressor_name = "zlib"
         elif header == cls.GCB_LZ_HEADER:
             out._compressor_name = "lzma"
+        elif header == cls.GCB_ZSTD_HEADER:
+            out._compressor_name = "zstd"
         else:
             raise ValueError(f"unknown compressor: {header!r}")
         out._parse_bytes(bytes, 6)
@@ -310,6 +392,14 @@ class GroupCompressBlock:
         self._z_content_chunks = None
 
     def _create_z_content_from_chunks(self, chunks):
+        if self._compressor_name == "zstd":
+            if _zstandard_available():
+                self._create_zstd_content_from_chunks(chunks)
+                return
+            # Blocks are self-describing, so falling back to zlib still
+            # produces a valid block.
+            trace.mutter("zstandard not available, compressing block with zlib")
+        self._compressor_name = "zlib"
         compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION)
         # Peak in this point is 1 fulltext, 1 compressed text, + zlib overhead
         # (measured peak is maybe 30MB over the above...)
@@ -319,6 +409,17 @@ class GroupCompressBlock:
         self._z_content_chunks = [c for c in compressed_chunks if c]
         self._z_content_length = sum(map(len, self._z_content_chunks))
 
+    def _create_zstd_content_from_chunks(self, chunks):
+        zstandard = _get_zstandard()
+        compressor = zstandard.ZstdCompressor(
+            level=_ZSTD_COMPRESSION_LEVEL, write_content_size=False
+        )
+        compressobj = compressor.compressobj()
+        compressed_chunks = list(map(compressobj.compress, chunks))
+        compressed_chunks.append(compressobj.flush())
+        self._z_content_chunks = [c for c in compressed_chunks if c]
+        self._z_content_length = sum(map(len, self._z_content_chunks))
+
     def _create_z_content(self):
         if self._z_content_chunks is not None:
             return
@@ -331,7 +432,12 @@ class GroupCompressBlock:
     def to_chunks(self):
         """Create the byte stream as a series of 'chunks'."""
         self._create_z_content()
-        header = self.GCB_HEADER
+        if self._compressor_name == "zstd":
+            header = self.GCB_ZSTD_HEADER
+        elif self._compressor_name == "lzma":
+            header = self.GCB_LZ_HEADER
+        else:
+            header = self.GCB_HEADER
         chunks = [
             b"%s%d\n%d\n" % (header, self._z_content_length, self._content_length),
         ]
@@ -557,7 +663,7 @@ class _LazyGroupContentManager:
             self._block._content_length,
             last_byte,
         )
-        new_block = GroupCompressBlock()
+        new_block = GroupCompressBlock(self._block._compressor_name)
         self._block._ensure_content(last_byte)
         new_block.set_content(self._block._content[:last_byte])
         self._block = new_block
@@ -609,7 +715,10 @@ class _LazyGroupContentManager:
         # helps prevent all of them from extracting a small amount at a time.
         # Which in itself isn't terribly expensive, but resizing 2MB 32kB at a
         # time (self._block._content) is a little expensive.
-        self._block._ensure_content(self._last_byte)
+        with trace_events.span(
+            "extract_block", "groupcompress", bytes=self._last_byte
+        ):
+            self._block._ensure_content(self._last_byte)
 
     def _check_rebuild_action(self):
         """Check to see if our block should be repacked."""
@@ -858,11 +967,11 @@ class PyrexGroupCompressor:
         self.input_bytes = 0
         self.labels_deltas = {}
         self._delta_index = None  # Set by the children
-        self._block = GroupCompressBlock()
         if settings is None:
             self._settings = {}
         else:
             self._settings = settings
+        self._block = GroupCompressBlock(self._settings.get("compressor"))
         self.chunks = []
         max_bytes_to_index = self._settings.get("max_bytes_to_index", 0)
         self._delta_index = DeltaIndex(max_bytes_to_index=max_bytes_to_index)
@@ -1193,7 +1302,13 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
     _DEFAULT_COMPRESSOR_SETTINGS = {"max_bytes_to_index": _DEFAULT_MAX_BYTES_TO_INDEX}
 
     def __init__(
-        self, index, access, delta=True, _unadded_refs=None, _group_cache=None
+        self,
+        index,
+        access,
+        delta=True,
+        _unadded_refs=None,
+        _group_cache=None,
+        block_compressor=None,
     ):
         """Create a GroupCompressVersionedFiles object.
 
@@ -1202,10 +1317,14 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
         :param delta: Whether to delta compress or just entropy compress.
         :param _unadded_refs: private parameter, don't use.
         :param _group_cache: private parameter, don't use.
+        :param block_compressor: The compressor to use for new blocks
+            ('zlib' or 'zstd'). This is determined by the repository format;
+            None means the default of 'zlib'.
         """
         self._index = index
         self._access = access
         self._delta = delta
+        self._block_compressor = block_compressor
         if _unadded_refs is None:
             _unadded_refs = {}
         self._unadded_refs = _unadded_refs
@@ -1214,6 +1333,9 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
         self._group_cache = _group_cache
         self._immediate_fallback_vfs = []
         self._max_bytes_to_index = None
+        self._compression_threads = None
+        # Writes the blocks still being compressed during an insert
+        self._write_pending_blocks = None
 
     def without_fallbacks(self):
         """Return a clone of this object without any fallbacks configured."""
@@ -1223,6 +1345,7 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
             self._delta,
             _unadded_refs=dict(self._unadded_refs),
             _group_cache=self._group_cache,
+            block_compressor=self._block_compressor,
         )
 
     def add_lines(
@@ -1343,7 +1466,7 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
     def get_annotator(self):
         from ..annotate import Annotator
 
-        return Annotator(self)
+        return Annotator(self, cache=self._annotation_cache)
 
     def check(self, progress_bar=None, keys=None):
         """See VersionedFiles.check()."""
@@ -1435,8 +1558,9 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
                 yield read_memo, cached[read_memo]
             except KeyError:
                 # Read the block, and cache it.
-                zdata = next(raw_records)
-                block = GroupCompressBlock.from_bytes(zdata)
+                with trace_events.span("read_block", "groupcompress"):
+                    zdata = next(raw_records)
+                    block = GroupCompressBlock.from_bytes(zdata)
                 self._group_cache[read_memo] = block
                 cached[read_memo] = block
                 yield read_memo, block
@@ -1590,6 +1714,8 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
         :return: An iterator of ContentFactory objects, each of which is only
             valid until the iterator is advanced.
         """
+        if self._write_pending_blocks is not None:
+            self._write_pending_blocks(wait_for=0)
         # Cheap: iterate
         locations = self._index.get_build_details(keys)
         unadded_keys = set(self._unadded_refs).intersection(keys)
@@ -1700,11 +1826,34 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
             if val is None:
                 val = self._DEFAULT_MAX_BYTES_TO_INDEX
             self._max_bytes_to_index = val
-        return {"max_bytes_to_index": self._max_bytes_to_index}
+        settings = {"max_bytes_to_index": self._max_bytes_to_index}
+        if self._block_compressor is not None:
+            settings["compressor"] = self._block_compressor
+        return settings
+
+    def _can_reuse_block(self, block):
+        """Can a block be copied verbatim into this container?
+
+        zlib blocks can be read by every client, but blocks using any other
+        compressor may only be stored if the repository format allows it.
+        """
+        compressor_name = block._compressor_name
+        if compressor_name in (None, "zlib"):
+            return True
+        return compressor_name == self._block_compressor
 
     def _make_group_compressor(self):
         return GroupCompressor(self._get_compressor_settings())
 
+    def _get_compression_threads(self):
+        from ..config import GlobalStack
+
+        if self._compression_threads is None:
+            self._compression_threads = GlobalStack().get(
+                "bzr.groupcompress.compression_threads"
+            )
+        return self._compression_threads
+
     def _insert_record_stream(
         self, stream, random_id=False, nostore_sha=None, reuse_blocks=True
     ):
@@ -1723,26 +1872,18 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
         :seealso insert_record_stream:
         :seealso add_lines:
         """
-        adapters = {}
-
-        def get_adapter(adapter_key):
-            try:
-                return adapters[adapter_key]
-            except KeyError:
-                adapter_factory = adapter_registry.get(adapter_key)
-                adapter = adapter_factory(self)
-                adapters[adapter_key] = adapter
-                return adapter
-
         # This will go up to fulltexts for gc to gc fetching, which isn't
         # ideal.
         self._compressor = self._make_group_compressor()
         self._unadded_refs = {}
         keys_to_add = []
+        threads = self._get_compression_threads()
+        executor = None
+        # Blocks that are being compressed, with the index entries of their
+        # texts, in the order they have to be written
+        pending_blocks = collections.deque()
 
-        def flush(block):
-            bytes_len, chunks = block.to_chunks()
-            self._compressor = self._make_group_compressor()
+        def write_block(bytes_len, chunks, nodes_to_add):
             # Note: At this point we still have 1 copy of the fulltext (in
             #       record and the var 'bytes'), and this generates 2 copies of
             #       the compressed text (one for bytes, one in chunks)
@@ -1752,11 +1893,94 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
             #       time we won't (everything else)
             index, start, length = self._access.add_raw_record(None, bytes_len, chunks)
             nodes = []
-            for key, reads, refs in keys_to_add:
+            for key, reads, refs in nodes_to_add:
                 nodes.append((key, b"%d %d %s" % (start, length, reads), refs))
+                self._unadded_refs.pop(key, None)
             self._index.add_records(nodes, random_id=random_id)
-            self._unadded_refs = {}
+
+        def write_pending_blocks(wait_for=0):
+            # Write blocks in order until at most wait_for are left, and then
+            # the ones that have been compressed already.
+            while pending_blocks and (
+                len(pending_blocks) > wait_for or pending_blocks[0][0].done()
+            ):
+                future, nodes_to_add = pending_blocks.popleft()
+                write_block(*future.result(), nodes_to_add)
+
+        def write_raw_block(bytes_len, chunks):
+            # Blocks reused as-is go after the groups before them
+            write_pending_blocks()
+            return self._access.add_raw_record(None, bytes_len, chunks)
+
+        def flush(block, last=False):
+            nonlocal executor
+            self._compressor = self._make_group_compressor()
+            nodes_to_add = list(keys_to_add)
             del keys_to_add[:]
+            if threads <= 1 or (last and not pending_blocks):
+                # Nothing else to do while the block is compressed
+                write_block(*block.to_chunks(), nodes_to_add)
+                return
+            if executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                executor = ThreadPoolExecutor(threads)
+                # Reads of texts in pending blocks need them in the index
+                self._write_pending_blocks = write_pending_blocks
+            # The block is compressed while the next group is filled; zlib
+            # and zstd release the GIL while compressing. Only a few blocks
+            # are kept waiting, to bound the memory used.
+            pending_blocks.append(
+                (executor.submit(_compress_block, block), nodes_to_add)
+            )
+            write_pending_blocks(wait_for=threads)
+
+        try:
+            yield from self._compress_record_stream(
+                stream,
+                random_id,
+                nostore_sha,
+                reuse_blocks,
+                keys_to_add,
+                flush,
+                write_raw_block,
+            )
+            write_pending_blocks()
+        finally:
+            self._write_pending_blocks = None
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+    def _compress_record_stream(
+        self,
+        stream,
+        random_id,
+        nostore_sha,
+        reuse_blocks,
+        keys_to_add,
+        flush,
+        write_raw_block,
+    ):
+        """Compress the records of stream into groups.
+
+        :param keys_to_add: List that the index entries of the texts in the
+            current group are appended to.
+        :param flush: Callable that writes a full group, as a
+            GroupCompressBlock.
+        :param write_raw_block: Callable that writes a block that is reused
+            as-is, returning its index, start and length.
+        :return: An iterator over (sha1, length) of the inserted records.
+        """
+        adapters = {}
+
+        def get_adapter(adapter_key):
+            try:
+                return adapters[adapter_key]
+            except KeyError:
+                adapter_factory = adapter_registry.get(adapter_key)
+                adapter = adapter_factory(self)
+                adapters[adapter_key] = adapter
+                return adapter
 
         last_prefix = None
         max_fulltext_len = 0
@@ -1791,7 +2015,9 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
                 if record.storage_kind == "groupcompress-block":
                     # Check to see if we really want to re-use this block
                     insert_manager = record._manager
-                    reuse_this_block = insert_manager.check_is_well_utilized()
+                    reuse_this_block = self._can_reuse_block(
+                        insert_manager._block
+                    ) and insert_manager.check_is_well_utilized()
             else:
                 reuse_this_block = False
             if reuse_this_block:
@@ -1800,9 +2026,7 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
                     # Insert the raw block into the target repo
                     insert_manager = record._manager
                     bytes_len, chunks = record._manager._block.to_chunks()
-                    _, start, length = self._access.add_raw_record(
-                        None, bytes_len, chunks
-                    )
+                    _, start, length = write_raw_block(bytes_len, chunks)
                     block_start = start
                     block_length = length
                 if record.storage_kind in (
@@ -1892,7 +2116,7 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
             refs = static_tuple.StaticTuple(parents)
             keys_to_add.append((key, b"%d %d" % (start_point, end_point), refs))
         if len(keys_to_add):
-            flush(self._compressor.flush())
+            flush(self._compressor.flush(), last=True)
         self._compressor = None
 
     def iter_lines_added_or_present_in_keys(self, keys, pb=None):
@@ -1946,6 +2170,12 @@ class GroupCompressVersionedFiles(VersionedFilesWithFallbacks):
         return result
 
 
+def _compress_block(block):
+    """Serialize a GroupCompressBlock, see GroupCompressBlock.to_chunks."""
+    with trace_events.span("compress_block", "groupcompress"):
+        return block.to_chunks()
+
+
 class _GCBuildDetails:
     """A blob of data about the build details.
 
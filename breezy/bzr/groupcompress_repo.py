@@ -896,6 +896,7 @@ class CHKInventoryRepository(PackRepository):
             _format.index_class,
             use_chk_index=self._format.supports_chks,
         )
+        block_compressor = self._format._block_compressor
         self.inventories = GroupCompressVersionedFiles(
             _GCGraphIndex(
                 self._pack_collection.inventory_index.combined_index,
@@ -905,6 +906,7 @@ class CHKInventoryRepository(PackRepository):
                 inconsistency_fatal=False,
             ),
             access=self._pack_collection.inventory_index.data_access,
+            block_compressor=block_compressor,
         )
         self.revisions = GroupCompressVersionedFiles(
             _GCGraphIndex(
@@ -917,6 +919,7 @@ class CHKInventoryRepository(PackRepository):
             ),
             access=self._pack_collection.revision_index.data_access,
             delta=False,
+            block_compressor=block_compressor,
         )
         self.signatures = GroupCompressVersionedFiles(
             _GCGraphIndex(
@@ -928,6 +931,7 @@ class CHKInventoryRepository(PackRepository):
             ),
             access=self._pack_collection.signature_index.data_access,
             delta=False,
+            block_compressor=block_compressor,
         )
         self.texts = GroupCompressVersionedFiles(
             _GCGraphIndex(
@@ -938,7 +942,9 @@ class CHKInventoryRepository(PackRepository):
                 inconsistency_fatal=False,
             ),
             access=self._pack_collection.text_index.data_access,
+            block_compressor=block_compressor,
         )
+        self.texts._annotation_cache = self._get_annotation_cache()
         # No parents, individual CHK pages don't have specific ancestry
         self.chk_bytes = GroupCompressVersionedFiles(
             _GCGraphIndex(
@@ -949,6 +955,7 @@ class CHKInventoryRepository(PackRepository):
                 inconsistency_fatal=False,
             ),
             access=self._pack_collection.chk_index.data_access,
+            block_compressor=block_compressor,
         )
         search_key_name = self._format._inventory_serializer.search_key_name
         search_key_func = chk_map.search_key_registry.get(search_key_name)
@@ -1513,6 +1520,8 @@ class RepositoryFormat2a(RepositoryFormatPack):
     fast_deltas = True
     pack_compresses = True
     supports_tree_reference = True
+    # The compressor used for new groupcompress blocks. None means zlib.
+    _block_compressor = None
 
     def _get_matching_bzrdir(self):
         return controldir.format_registry.make_controldir("2a")
@@ -1558,3 +1567,35 @@ class RepositoryFormat2aSubtree(RepositoryFormat2a):
 
     experimental = True
     supports_tree_reference = True
+
+
+class RepositoryFormat2aZstd(RepositoryFormat2a):
+    """A 2a repository format that compresses groupcompress blocks with zstd.
+
+    zstd blocks decompress considerably faster than zlib ones, which speeds
+    up text extraction for operations like 'log -p' and 'annotate'. Reading
+    and writing zstd blocks requires the zstandard module.
+    """
+
+    _block_compressor = "zstd"
+
+    def _get_matching_bzrdir(self):
+        return controldir.format_registry.make_controldir("development-zstd")
+
+    def _ignore_setting_bzrdir(self, format):
+        pass
+
+    _matchingcontroldir = property(_get_matching_bzrdir, _ignore_setting_bzrdir)
+
+    @classmethod
+    def get_format_string(cls):
+        return b"Bazaar development format 2a with zstd compression\n"
+
+    def get_format_description(self):
+        """See RepositoryFormat.get_format_description()."""
+        return (
+            "Development repository format - rich roots, zstd group "
+            "compression and chk inventories"
+        )
+
+    experimental = True
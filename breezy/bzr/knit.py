@@ -1204,7 +1204,7 @@ class KnitVersionedFiles(VersionedFilesWithFallbacks):
         return self._factory.annotate(self, key)
 
     def get_annotator(self):
-        return _KnitAnnotator(self)
+        return _KnitAnnotator(self, cache=self._annotation_cache)
 
     def check(self, progress_bar=None, keys=None):
         """See VersionedFiles.check()."""
@@ -3440,8 +3440,8 @@ def annotate_knit(knit, revision_id):
 class _KnitAnnotator(annotate.Annotator):
     """Build up the annotations for a text."""
 
-    def __init__(self, vf):
-        annotate.Annotator.__init__(self, vf)
+    def __init__(self, vf, cache=None):
+        annotate.Annotator.__init__(self, vf, cache=cache)
 
         # TODO: handle Nodes which cannot be extracted
         # self._ghosts = set()
@@ -3531,8 +3531,9 @@ class _KnitAnnotator(annotate.Annotator):
 
     def _get_needed_texts(self, key, pb=None):
         # if True or len(self._vf._immediate_fallback_vfs) > 0:
-        if len(self._vf._immediate_fallback_vfs) > 0:
-            # If we have fallbacks, go to the generic path
+        if self._cache is not None or len(self._vf._immediate_fallback_vfs) > 0:
+            # If we have fallbacks or cached annotations, go to the generic
+            # path
             yield from annotate.Annotator._get_needed_texts(self, key, pb=pb)
             return
         while True:
@@ -139,6 +139,7 @@ class KnitPackRepository(PackRepository, KnitRepository):
             data_access=self._pack_collection.text_index.data_access,
             max_delta_chain=200,
         )
+        self.texts._annotation_cache = self._get_annotation_cache()
         self.chk_bytes = None
         # True when the repository object is 'write locked' (as opposed to the
         # physical lock only taken out around changes to the pack-names list.)
@@ -0,0 +1,281 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Persistent storage and incremental extension of merge sorted history.
+
+The merge sorted history of a branch (see ``Branch.iter_merge_sorted_revisions``)
+is expensive to compute for large histories, as it requires the whole
+ancestry of the tip. This module stores it on disk, together with the tip
+it was generated for and the ghosts in the ancestry of that tip. Filling in
+one of those ghosts can change the history, so the stored copy is only valid
+while they are all still absent.
+
+The history only ever grows at the front when the tip advances along its
+left-hand history: the ancestry of the old tip is sorted exactly as before,
+and keeps the same depths, dotted revnos and end-of-merge markers. Likewise
+the history of a revision in the left-hand history of the tip is the tail of
+the history of the tip. So when the tip moves either way, the stored history
+is extended or truncated rather than computed again.
+
+The tip and ghosts are stored in a small bencoded header in front of the
+history, so that a stale cache can be detected without decoding the history.
+"""
+
+import fastbencode as bencode
+
+from .. import errors
+
+FORMAT_MARKER = b"bzr merge sort cache v2\n"
+
+
+class MergeSortNode:
+    """A node in the merge sorted history of a branch."""
+
+    __slots__ = ("end_of_merge", "key", "merge_depth", "revno")
+
+    def __init__(self, key, merge_depth, revno, end_of_merge):
+        self.key = key
+        self.merge_depth = merge_depth
+        self.revno = revno
+        self.end_of_merge = end_of_merge
+
+    def __repr__(self):
+        return "{}({!r}, {}, {!r}, {})".format(
+            self.__class__.__name__,
+            self.key,
+            self.merge_depth,
+            self.revno,
+            self.end_of_merge,
+        )
+
+
+def serialize(tip, ghosts, nodes):
+    """Serialize the merge sorted history for tip.
+
+    :param tip: The revision id the history was generated for.
+    :param ghosts: The ghosts in the ancestry of tip.
+    :param nodes: Merge sorted nodes, as returned by ``KnownGraph.merge_sort``.
+    :return: A list of bytestrings.
+    """
+    header = bencode.bencode([tip, sorted(ghosts)])
+    return [
+        FORMAT_MARKER,
+        b"%d\n" % len(header),
+        header,
+        bencode.bencode(
+            [[n.key, n.merge_depth, list(n.revno), int(n.end_of_merge)] for n in nodes]
+        ),
+    ]
+
+
+def read_header(f):
+    """Read the header of a merge sort cache.
+
+    :param f: A file object positioned at the start of the cache.
+    :return: Tuple with the tip revision id and the set of ghosts the
+        history was generated with. f is left positioned at the history.
+    :raises ValueError: if f does not contain a merge sort cache
+    """
+    marker = f.readline()
+    if marker != FORMAT_MARKER:
+        raise ValueError(f"unknown merge sort cache format {marker!r}")
+    length = f.readline()
+    try:
+        header = f.read(int(length))
+        tip, ghosts = bencode.bdecode(header)
+        if not isinstance(tip, bytes) or not all(
+            isinstance(ghost, bytes) for ghost in ghosts
+        ):
+            raise ValueError("unexpected types")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"invalid merge sort cache header: {e}") from e
+    return tip, set(ghosts)
+
+
+def read_nodes(f):
+    """Read the history of a merge sort cache, after its header.
+
+    :return: A list of MergeSortNode objects.
+    :raises ValueError: if the history is invalid
+    """
+    try:
+        return [
+            MergeSortNode(key, merge_depth, tuple(revno), bool(end_of_merge))
+            for key, merge_depth, revno, end_of_merge in bencode.bdecode(f.read())
+        ]
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"invalid merge sort cache: {e}") from e
+
+
+def truncate_merge_sort(nodes, revision_id):
+    """Return the merge sorted history of a revision in the left-hand history.
+
+    :param nodes: The merge sorted history of some tip.
+    :param revision_id: A revision id.
+    :return: The merge sorted history of revision_id, or None if it is not
+        in the left-hand history of the tip.
+    """
+    for i, node in enumerate(nodes):
+        if node.key == revision_id:
+            if node.merge_depth != 0:
+                return None
+            return nodes[i:]
+    return None
+
+
+def _bump_last(revno):
+    return revno[:-1] + (revno[-1] + 1,)
+
+
+def extend_merge_sort(old_nodes, parent_map, tip):
+    """Extend merge sorted history with newly added revisions.
+
+    This produces the same result as running merge_sort on the complete
+    ancestry of tip, provided that the old nodes were generated for a
+    revision in the left-hand ancestry of tip and parent_map contains
+    exactly the revisions in the ancestry of tip that are not in the
+    ancestry of that revision.
+
+    :param old_nodes: The merge sorted history of the old tip.
+    :param parent_map: Parent map for the new revisions, without
+        NULL_REVISION.
+    :param tip: The new tip.
+    :return: A list of merge sorted nodes for tip
+    """
+    # The sorter state at the point where the old tip has been completed
+    # can be recovered from the old output: a node was claimed as the
+    # left-hand parent by a child exactly when its first child exists (with
+    # the last revno component bumped), and branch numbers are allocated
+    # sequentially per base revno.
+    revnos = {}
+    for node in old_nodes:
+        revnos[node.key] = node.revno
+    known_revnos = set(revnos.values())
+    claimed = set()
+    branch_count = {}
+    for key, revno in revnos.items():
+        if _bump_last(revno) in known_revnos:
+            claimed.add(key)
+        if len(revno) == 3 and revno[1] > branch_count.get(revno[0], 0):
+            branch_count[revno[0]] = revno[1]
+    if old_nodes:
+        branch_count.setdefault(0, 0)
+
+    graph = dict(parent_map)
+    name_stack = []
+    depth_stack = []
+    pending_parents_stack = []
+    first_child_stack = []
+    left_subtree_pushed_stack = []
+    scheduled = []
+
+    def push_node(key, merge_depth, parents):
+        name_stack.append(key)
+        depth_stack.append(merge_depth)
+        left_subtree_pushed_stack.append(False)
+        first_child = None
+        if parents:
+            left_parent = parents[0]
+            if left_parent in revnos or left_parent in parent_map:
+                first_child = left_parent not in claimed
+                claimed.add(left_parent)
+        pending_parents_stack.append(list(parents))
+        first_child_stack.append(first_child)
+
+    def pop_node():
+        key = name_stack.pop()
+        merge_depth = depth_stack.pop()
+        first_child = first_child_stack.pop()
+        left_subtree_pushed_stack.pop()
+        pending_parents_stack.pop()
+        parents = parent_map[key]
+        parent_revno = None
+        if parents:
+            parent_revno = revnos.get(parents[0])
+        if parent_revno is not None:
+            if not first_child:
+                base = parent_revno[0]
+                count = branch_count.get(base, 0) + 1
+                branch_count[base] = count
+                revno = (base, count, 1)
+            else:
+                revno = _bump_last(parent_revno)
+        else:
+            # no (present) parents, use the root sequence
+            if 0 in branch_count:
+                root_count = branch_count[0] + 1
+            else:
+                root_count = 0
+            branch_count[0] = root_count
+            if root_count > 0:
+                revno = (0, root_count, 1)
+            else:
+                revno = (1,)
+        revnos[key] = revno
+        scheduled.append((key, merge_depth, revno))
+
+    if tip in graph:
+        push_node(tip, 0, graph.pop(tip))
+    while name_stack:
+        pending = pending_parents_stack[-1]
+        if not pending:
+            pop_node()
+            continue
+        while pending:
+            if not left_subtree_pushed_stack[-1]:
+                next_key = pending.pop(0)
+                is_left_subtree = True
+                left_subtree_pushed_stack[-1] = True
+            else:
+                next_key = pending.pop()
+                is_left_subtree = False
+            if next_key in revnos:
+                # completed, either by a child on the stack or as part of
+                # the old history
+                continue
+            try:
+                parents = graph.pop(next_key)
+            except KeyError as err:
+                if next_key in parent_map:
+                    raise errors.GraphCycleError(name_stack) from err
+                # ghost
+                continue
+            if is_left_subtree:
+                next_depth = depth_stack[-1]
+            else:
+                next_depth = depth_stack[-1] + 1
+            push_node(next_key, next_depth, parents)
+            break
+
+    result = []
+    for i in range(len(scheduled) - 1, -1, -1):
+        key, merge_depth, revno = scheduled[i]
+        if i > 0:
+            next_key, next_depth = scheduled[i - 1][:2]
+        elif old_nodes:
+            next_key = old_nodes[0].key
+            next_depth = old_nodes[0].merge_depth
+        else:
+            next_key = next_depth = None
+        if next_key is None or next_depth < merge_depth:
+            end_of_merge = True
+        elif next_depth == merge_depth and next_key not in parent_map[key]:
+            end_of_merge = True
+        else:
+            end_of_merge = False
+        result.append(MergeSortNode(key, merge_depth, revno, end_of_merge))
+    result.extend(old_nodes)
+    return result
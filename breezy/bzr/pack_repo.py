@@ -16,8 +16,10 @@
 
 import contextlib
 import hashlib
+import os
 import re
 import sys
+import threading
 from typing import Type
 
 from ..lazy_import import lazy_import
@@ -34,6 +36,9 @@ from breezy import (
     ui,
     )
 from breezy.bzr import (
+    annotation_cache,
+    changed_paths,
+    commit_graph,
     pack,
     )
 from breezy.bzr.index import (
@@ -41,14 +46,15 @@ from breezy.bzr.index import (
     )
 """,
 )
-from .. import debug, errors, lockdir, osutils
+from .. import debug, errors, lockdir, osutils, trace_events
 from .. import transport as _mod_transport
 from ..bzr import btree_index, lockable_files
 from ..bzr import index as _mod_index
 from ..decorators import only_raises
 from ..lock import LogicalLockResult
 from ..repository import RepositoryWriteLockResult, _LazyListJoin
-from ..trace import mutter, note, warning
+from ..revision import NULL_REVISION
+from ..trace import log_exception_quietly, mutter, note, warning
 from .repository import MetaDirRepository, RepositoryFormatMetaDir
 from .serializer import InventorySerializer, RevisionSerializer
 from .vf_repository import (
@@ -354,6 +360,10 @@ class ExistingPack(Pack):
     def __hash__(self):
         return hash((type(self), self.name))
 
+    def get_size(self):
+        """Return the size of the pack file in bytes."""
+        return self.pack_transport.stat(self.file_name()).st_size
+
 
 class ResumedPack(ExistingPack):
     def __init__(
@@ -914,6 +924,123 @@ class Packer:
         return new_pack.data_inserted()
 
 
+# Packs smaller than this are all in the lowest size tier
+_SIZE_TIER_BASE = 1000000
+# The ratio between the sizes of the packs in successive size tiers, and the
+# number of packs in a tier that get combined
+_SIZE_TIER_FACTOR = 4
+
+# The directory holding the changes made by the revisions of each pack
+CHANGED_PATHS_DIR = "changed-paths"
+
+
+def _size_tier(size):
+    """Return the size tier of a pack of size bytes."""
+    tier = 0
+    limit = _SIZE_TIER_BASE
+    while size >= limit:
+        tier += 1
+        limit *= _SIZE_TIER_FACTOR
+    return tier
+
+
+_background_autopacks_lock = threading.Lock()
+# Map from repository path to the process autopacking that repository
+_background_autopacks = {}
+
+_BACKGROUND_AUTOPACK_SCRIPT = (
+    "import sys\n"
+    "from breezy.bzr.pack_repo import _background_autopack_main\n"
+    "_background_autopack_main(sys.argv[1])\n"
+)
+
+
+def _background_autopack_main(path):
+    """Autopack a repository; run by the process _start_background_autopack starts.
+
+    Write locks of pack repositories are logical, so the repository is only
+    physically locked while _save_pack_names replaces the pack names, and
+    other processes can keep committing and pushing while packs are being
+    combined. Packs added by them in the meantime are picked up by the next
+    round.
+    """
+    import breezy
+
+    from ..repository import Repository
+
+    # No ui is set up, so progress is not reported anywhere.
+    with breezy.initialize(setup_ui=False):
+        try:
+            repo = Repository.open(path)
+            with repo.lock_write():
+                collection = repo._pack_collection
+                collection.ensure_loaded()
+                while True:
+                    try:
+                        if not collection._do_autopack():
+                            break
+                    except RetryAutopack:
+                        continue
+        except Exception:
+            mutter("Background auto-packing of %s failed", path)
+            log_exception_quietly()
+
+
+def _start_background_autopack(repo):
+    """Autopack a repository in a separate process.
+
+    The process is detached, so the current process does not wait for it.
+    If the repository is already being autopacked by a process started from
+    here, that process picks up the new packs when it is done.
+
+    :return: False if the repository is not local and so can not be
+        autopacked in the background.
+    """
+    import subprocess
+
+    import breezy
+
+    try:
+        path = repo.controldir.root_transport.local_abspath(".")
+    except errors.NotLocalUrl:
+        return False
+    with _background_autopacks_lock:
+        process = _background_autopacks.get(path)
+        if process is not None and process.poll() is None:
+            return True
+        env = dict(os.environ)
+        # breezy may not be installed, e.g. when running from a source tree
+        breezy_path = os.path.dirname(os.path.dirname(os.path.abspath(breezy.__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(
+            [breezy_path] + [p for p in [env.get("PYTHONPATH")] if p]
+        )
+        kwargs = {}
+        if sys.platform == "win32":
+            kwargs["creationflags"] = (
+                subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+            )
+        else:
+            kwargs["start_new_session"] = True
+        _background_autopacks[path] = subprocess.Popen(
+            [sys.executable, "-c", _BACKGROUND_AUTOPACK_SCRIPT, path],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            **kwargs,
+        )
+    return True
+
+
+def wait_for_background_autopacks():
+    """Wait until the background autopacks started by this process are done."""
+    with _background_autopacks_lock:
+        processes = list(_background_autopacks.values())
+        _background_autopacks.clear()
+    for process in processes:
+        process.wait()
+
+
 class RepositoryPackCollection:
     """Management of packs within a repository.
 
@@ -993,6 +1120,13 @@ class RepositoryPackCollection:
         # resumed packs
         self._resumed_packs = []
         self.config_stack = config.LocationStack(self.transport.base)
+        # the reachability index, and the pack names when it was read
+        self._commit_graph = None
+        self._commit_graph_names = None
+        # the index of the paths changed by each revision, and the pack names
+        # it covers
+        self._changed_paths = None
+        self._changed_paths_names = None
 
     def __repr__(self):
         return f"{self.__class__.__name__}({self.repo!r})"
@@ -1039,8 +1173,17 @@ class RepositoryPackCollection:
         in synchronisation with certain steps. Otherwise the names collection
         is not flushed.
 
+        The repository.autopack option selects the policy: "size" combines
+        packs of similar sizes instead, see plan_size_tiered_combinations,
+        and "background" does so in a separate process for local
+        repositories, in which case this returns without packing.
+
         :return: Something evaluating true if packing took place.
         """
+        if self.config_stack.get(
+            "repository.autopack"
+        ) == "background" and _start_background_autopack(self.repo):
+            return None
         while True:
             try:
                 return self._do_autopack()
@@ -1050,6 +1193,8 @@ class RepositoryPackCollection:
                 pass
 
     def _do_autopack(self):
+        if self.config_stack.get("repository.autopack") in ("size", "background"):
+            return self._do_size_tiered_autopack()
         # XXX: Should not be needed when the management of indices is sane.
         total_revisions = self.revision_index.combined_index.key_count()
         total_packs = len(self._names)
@@ -1098,6 +1243,37 @@ class RepositoryPackCollection:
         mutter("Auto-packing repository %s completed", str(self))
         return result
 
+    def _do_size_tiered_autopack(self):
+        if len(self._names) < _SIZE_TIER_FACTOR:
+            return None
+        existing_packs = []
+        for pack in self.all_packs():
+            revision_count = pack.get_revision_count()
+            if revision_count == 0:
+                # See _do_autopack
+                continue
+            existing_packs.append((pack.get_size(), revision_count, pack))
+        pack_operations = self.plan_size_tiered_combinations(
+            existing_packs, self.config_stack.get("repository.autopack_budget")
+        )
+        if not pack_operations:
+            return None
+        mutter(
+            "Auto-packing repository %s by size, which has %d pack files. "
+            "Packing %d files into %d",
+            str(self),
+            len(self._names),
+            sum(len(po[1]) for po in pack_operations),
+            len(pack_operations),
+        )
+        result = self._execute_pack_operations(
+            pack_operations,
+            packer_class=self.normal_packer_class,
+            reload_func=self._restart_autopack,
+        )
+        mutter("Auto-packing repository %s completed", str(self))
+        return result
+
     def _execute_pack_operations(self, pack_operations, packer_class, reload_func=None):
         """Execute a series of pack operations.
 
@@ -1105,13 +1281,16 @@ class RepositoryPackCollection:
         :param packer_class: The class of packer to use
         :return: The new pack names.
         """
-        for _revision_count, packs in pack_operations:
+        for revision_count, packs in pack_operations:
             # we may have no-ops from the setup logic
             if len(packs) == 0:
                 continue
             packer = packer_class(self, packs, ".autopack", reload_func=reload_func)
             try:
-                result = packer.pack()
+                with trace_events.span(
+                    "combine_packs", "pack", packs=len(packs), revisions=revision_count
+                ):
+                    result = packer.pack()
             except RetryWithNewPacks:
                 # An exception is propagating out of this context, make sure
                 # this packer has cleaned up. Packer() doesn't set its new_pack
@@ -1249,6 +1428,47 @@ class RepositoryPackCollection:
             return []
         return [[final_rev_count, final_pack_list]]
 
+    def plan_size_tiered_combinations(self, existing_packs, budget=None):
+        """Plan size-tiered pack operations.
+
+        Packs are grouped in tiers by size, with the packs in each tier up to
+        _SIZE_TIER_FACTOR times as large as those in the tier below. The
+        packs in a tier are combined once there are _SIZE_TIER_FACTOR of
+        them, and the new pack ends up in a higher tier. This keeps the
+        number of packs logarithmic in the size of the repository while
+        every byte is rewritten at most once per tier.
+
+        :param existing_packs: The packs to pack. (A list of (size, revcount,
+            Pack) tuples).
+        :param budget: The maximum number of bytes of packs to combine, or
+            None for no limit. The smallest packs of a tier are combined
+            first.
+        :return: A list of [revision_count, packs_to_combine].
+        """
+        tiers = {}
+        for size, revision_count, pack in existing_packs:
+            tiers.setdefault(_size_tier(size), []).append((size, revision_count, pack))
+        pack_operations = []
+        for tier in sorted(tiers):
+            packs = sorted(tiers[tier], key=lambda entry: entry[0])
+            if len(packs) < _SIZE_TIER_FACTOR:
+                continue
+            total_size = 0
+            total_revisions = 0
+            combined = []
+            for size, revision_count, pack in packs:
+                if budget is not None and total_size + size > budget:
+                    break
+                total_size += size
+                total_revisions += revision_count
+                combined.append(pack)
+            if len(combined) < 2:
+                continue
+            pack_operations.append([total_revisions, combined])
+            if budget is not None:
+                budget -= total_size
+        return pack_operations
+
     def ensure_loaded(self):
         """Ensure we have read names from disk.
 
@@ -1374,8 +1594,11 @@ class RepositoryPackCollection:
         else:
             transport = self._index_transport
             index_size = self._names[name][size_offset]
+        kwargs = {}
+        if self._index_class is btree_index.BTreeGraphIndex:
+            kwargs["use_mmap"] = self.config_stack.get("repository.mmap_indices")
         index = self._index_class(
-            transport, index_name, index_size, unlimited_cache=is_chk
+            transport, index_name, index_size, unlimited_cache=is_chk, **kwargs
         )
         if is_chk and self._index_class is btree_index.BTreeGraphIndex:
             index._leaf_factory = btree_index._gcchk_factory
@@ -1413,6 +1636,7 @@ class RepositoryPackCollection:
         :param return: None.
         """
         for pack in packs:
+            self._clear_pack_index_caches(pack)
             try:
                 try:
                     pack.pack_transport.move(
@@ -1442,6 +1666,12 @@ class RepositoryPackCollection:
                     )
                 except (errors.PathError, errors.TransportError) as e:
                     mutter(f"couldn't rename obsolete index, skipping it:\n{e}")
+            try:
+                self.transport.delete(CHANGED_PATHS_DIR + "/" + pack.name)
+            except _mod_transport.NoSuchFile:
+                pass
+            except (errors.PathError, errors.TransportError) as e:
+                mutter(f"couldn't delete changed paths of obsolete pack:\n{e}")
 
     def pack_distribution(self, total_revisions):
         """Generate a list of the number of revisions to put in each pack.
@@ -1472,6 +1702,17 @@ class RepositoryPackCollection:
         self._packs_by_name.pop(pack.name)
         self._remove_pack_indices(pack)
         self.packs.remove(pack)
+        self._clear_pack_index_caches(pack)
+
+    def _clear_pack_index_caches(self, pack):
+        """Drop the cached data of the indices of pack.
+
+        This also unmaps memory mapped index files.
+        """
+        for index_type in Pack.index_definitions:
+            pack_index = getattr(pack, index_type + "_index", None)
+            if pack_index is not None:
+                pack_index.clear_cache()
 
     def _remove_pack_indices(self, pack, ignore_missing=False):
         """Remove the indices for pack from the aggregated indices.
@@ -1492,6 +1733,8 @@ class RepositoryPackCollection:
 
     def reset(self):
         """Clear all cached data."""
+        for pack in self.packs:
+            self._clear_pack_index_caches(pack)
         # cached revision data
         self.revision_index.clear()
         # cached signature data
@@ -1510,6 +1753,10 @@ class RepositoryPackCollection:
         self.packs = []
         self._packs_by_name = {}
         self._packs_at_load = None
+        self._commit_graph = None
+        self._commit_graph_names = None
+        self._changed_paths = None
+        self._changed_paths_names = None
 
     def _unlock_names(self):
         """Release the mutex around the pack-names index."""
@@ -1634,7 +1881,14 @@ class RepositoryPackCollection:
             self._unlock_names()
         # synchronise the memory packs list with what we just wrote:
         self._syncronize_pack_names_from_disk_nodes(disk_nodes)
+        # Before the changed paths of the obsolete packs are removed
+        self._update_changed_paths(
+            [new_node[0] for new_node in new_nodes],
+            obsolete_packs,
+            {name for (name, value) in orig_disk_nodes},
+        )
         if obsolete_packs:
+            self._update_commit_graph(obsolete_packs)
             # TODO: We could add one more condition here. "if o.name not in
             #       orig_disk_nodes and o != the new_pack we haven't written to
             #       disk yet. However, the new pack object is not easily
@@ -1646,6 +1900,263 @@ class RepositoryPackCollection:
             self._obsolete_packs(obsolete_packs)
         return [new_node[0] for new_node in new_nodes]
 
+    def get_commit_graph(self):
+        """Return the reachability index of the repository.
+
+        The stored index is extended in memory with the revisions of packs
+        added since it was last written.
+
+        :return: A CommitGraph, or None if the repository does not have one
+            that covers the current packs.
+        """
+        if not self.config_stack.get("repository.commit_graph"):
+            return None
+        self.ensure_loaded()
+        names = tuple(self.names())
+        if self._commit_graph_names != names:
+            graph_index = self._extend_commit_graph(self._commit_graph, names)
+            if graph_index is None:
+                graph_index = self._extend_commit_graph(
+                    self._read_commit_graph(), names
+                )
+            self._commit_graph = graph_index
+            self._commit_graph_names = names
+        return self._commit_graph
+
+    def _read_commit_graph(self):
+        try:
+            data = self.transport.get_bytes("commit-graph")
+        except _mod_transport.NoSuchFile:
+            return None
+        try:
+            return commit_graph.CommitGraph.from_bytes(data)
+        except ValueError as e:
+            mutter("Ignoring commit graph of %s: %s", self, e)
+            return None
+
+    def _revision_parent_map(self, packs=None):
+        """Return the parents of all revisions in packs, or in all packs."""
+        if packs is None:
+            indices = [self.revision_index.combined_index]
+        else:
+            indices = [pack.revision_index for pack in packs]
+        parent_map = {}
+        for index in indices:
+            for _, key, _, refs in index.iter_all_entries():
+                parents = tuple(parent[0] for parent in refs[0])
+                parent_map[key[0]] = parents or (NULL_REVISION,)
+        return parent_map
+
+    def _extend_commit_graph(self, graph_index, names, replaced_names=()):
+        """Add the revisions of packs graph_index doesn't cover yet.
+
+        :param names: The names of the current packs.
+        :param replaced_names: Names of packs that were combined into the
+            current packs, whose revisions graph_index may still cover.
+        :return: graph_index, covering names, or None if it can not be
+            extended.
+        """
+        if graph_index is None:
+            return None
+        covered = set(graph_index.pack_names)
+        if not covered.issubset(set(names).union(replaced_names)):
+            return None
+        new_packs = [
+            self.get_pack_by_name(name) for name in names if name not in covered
+        ]
+        if new_packs and not graph_index.add_revisions(
+            self._revision_parent_map(new_packs)
+        ):
+            return None
+        if (
+            graph_index.revision_count()
+            != self.revision_index.combined_index.key_count()
+        ):
+            return None
+        graph_index.pack_names = names
+        return graph_index
+
+    def _update_commit_graph(self, obsolete_packs):
+        """Store the reachability index after packs were combined.
+
+        The index is only written when packs are combined, e.g. by autopack,
+        rather than on every commit; it is rebuilt from scratch if the
+        stored one can not be brought up to date.
+
+        :param obsolete_packs: The packs that were combined.
+        """
+        if not self.config_stack.get("repository.commit_graph"):
+            return
+        names = tuple(self.names())
+        replaced_names = [pack.name for pack in obsolete_packs]
+        graph_index = self._extend_commit_graph(
+            self._commit_graph, names, replaced_names
+        )
+        if graph_index is None:
+            graph_index = self._extend_commit_graph(
+                self._read_commit_graph(), names, replaced_names
+            )
+        if graph_index is None:
+            mutter("Building commit graph for %s", self)
+            graph_index = commit_graph.CommitGraph.from_parent_map(
+                self._revision_parent_map(), names
+            )
+        try:
+            self.transport.put_bytes(
+                "commit-graph",
+                graph_index.to_bytes(),
+                mode=self.repo.controldir._get_file_mode(),
+            )
+        except (errors.PathError, errors.TransportError) as e:
+            # The index is only a cache, so failing to store it doesn't matter.
+            mutter("Unable to store commit graph of %s: %s", self, e)
+            self._commit_graph = None
+            self._commit_graph_names = None
+            return
+        self._commit_graph = graph_index
+        self._commit_graph_names = names
+
+    def get_changed_paths_index(self):
+        """Return the index of the paths changed by each revision.
+
+        The changes of the revisions in each pack are stored separately,
+        when the pack is added. Packs that were added before the index was
+        enabled are left out until they are indexed by pack().
+
+        :return: A ChangedPathsIndex, or None if the repository doesn't have
+            one.
+        """
+        if not self.config_stack.get("repository.changed_paths_index"):
+            return None
+        self.ensure_loaded()
+        names = tuple(self.names())
+        if self._changed_paths is not None and self._changed_paths_names == names:
+            return self._changed_paths
+        index = changed_paths.ChangedPathsIndex()
+        for name in names:
+            pack_index = self._read_changed_paths(name)
+            if pack_index is not None:
+                index.update(pack_index)
+        self._changed_paths = index
+        self._changed_paths_names = names
+        return index
+
+    def _update_changed_paths(self, new_names, obsolete_packs, old_names):
+        """Index the changed paths of packs added by _save_pack_names.
+
+        The changes of revisions from combined packs are carried over. The
+        revisions of other new packs, e.g. from a commit or fetch, are
+        compared with their parents. If packs that were never indexed are
+        combined, the new pack is left for pack() to index.
+
+        Failures are only logged, since the index is optional.
+
+        :param new_names: Names of the packs added by this process.
+        :param obsolete_packs: Packs that were combined into the new packs.
+        :param old_names: Names of the packs on disk before the new ones were
+            added.
+        """
+        if not new_names or not self.config_stack.get(
+            "repository.changed_paths_index"
+        ):
+            return
+        try:
+            known = changed_paths.ChangedPathsIndex()
+            for pack in obsolete_packs or ():
+                pack_index = self._read_changed_paths(pack.name)
+                if pack_index is not None:
+                    known.update(pack_index)
+                elif pack.name in old_names:
+                    return
+            for name in new_names:
+                self._build_changed_paths(name, known)
+        except errors.BzrError as e:
+            mutter("Unable to index changed paths of %s: %s", self, e)
+
+    def _index_unindexed_packs(self):
+        """Index the changed paths of the packs that don't have them yet."""
+        if not self.config_stack.get("repository.changed_paths_index"):
+            return
+        try:
+            known = self.get_changed_paths_index()
+            for name in self.names():
+                if name not in known.pack_names:
+                    known.update(self._build_changed_paths(name, known))
+        except errors.BzrError as e:
+            mutter("Unable to index changed paths of %s: %s", self, e)
+
+    def _read_changed_paths(self, name):
+        """Read the stored changes of the revisions in a pack."""
+        try:
+            data = self.transport.get_bytes(CHANGED_PATHS_DIR + "/" + name)
+        except _mod_transport.NoSuchFile:
+            return None
+        try:
+            return changed_paths.ChangedPathsIndex.from_bytes(data)
+        except ValueError as e:
+            mutter("Ignoring changed paths of pack %s in %s: %s", name, self, e)
+            return None
+
+    def _build_changed_paths(self, name, known):
+        """Index the changes of the revisions in a pack, and store them.
+
+        :param known: A ChangedPathsIndex whose changes are reused for
+            revisions it already contains, e.g. when packs were combined.
+        :return: A ChangedPathsIndex for the pack.
+        """
+        mutter("Indexing changed paths of pack %s in %s", name, self)
+        pack_index = changed_paths.ChangedPathsIndex([name])
+        revision_ids = []
+        pack = self.get_pack_by_name(name)
+        for _, key, _, _ in pack.revision_index.iter_all_entries():
+            changes = known.get_changes(key[0])
+            if changes is None:
+                revision_ids.append(key[0])
+            else:
+                pack_index.add_revision(key[0], changes)
+        self._index_changed_paths(pack_index, revision_ids)
+        # The index is only a cache, so failing to store it doesn't matter.
+        path = CHANGED_PATHS_DIR + "/" + name
+        data = pack_index.to_bytes()
+        mode = self.repo.controldir._get_file_mode()
+        try:
+            try:
+                self.transport.put_bytes(path, data, mode=mode)
+            except _mod_transport.NoSuchFile:
+                self.transport.mkdir(
+                    CHANGED_PATHS_DIR, mode=self.repo.controldir._get_dir_mode()
+                )
+                self.transport.put_bytes(path, data, mode=mode)
+        except (errors.PathError, errors.TransportError) as e:
+            mutter("Unable to store changed paths of pack %s: %s", name, e)
+        return pack_index
+
+    def _index_changed_paths(self, index, revision_ids, batch_size=100):
+        """Compare revisions with their left-hand parents and index the changes.
+
+        Revisions whose left-hand parent is a ghost are left out.
+        """
+        repo = self.repo
+        with ui.ui_factory.nested_progress_bar() as pb:
+            for start in range(0, len(revision_ids), batch_size):
+                pb.update("indexing changed paths", start, len(revision_ids))
+                revisions = repo.get_revisions(revision_ids[start : start + batch_size])
+                # Ask the versioned files rather than the cached parents
+                # provider, which may still think revisions that were added
+                # in this write group are missing.
+                present = repo.revisions.get_parent_map(
+                    [(rev.parent_ids[0],) for rev in revisions if rev.parent_ids]
+                )
+                revisions = [
+                    rev
+                    for rev in revisions
+                    if not rev.parent_ids or (rev.parent_ids[0],) in present
+                ]
+                for rev, delta in zip(revisions, repo.get_revision_deltas(revisions)):
+                    index.add_revision(
+                        rev.revision_id, changed_paths.changes_from_delta(delta)
+                    )
+
     def reload_pack_names(self):
         """Sync our pack listing with what is present in the repository.
 
@@ -1831,6 +2342,11 @@ class RepositoryPackCollection:
             any_new_content = True
         del self._resumed_packs[:]
         if any_new_content:
+            if self.config_stack.get("repository.autopack") == "background":
+                # The background autopack reads the new pack names from disk
+                result = self._save_pack_names()
+                self.autopack()
+                return result
             result = self.autopack()
             if not result:
                 # when autopack takes no steps, the names list is still
@@ -1929,6 +2445,45 @@ class PackRepository(MetaDirVersionedFileRepository):
             _LazyListJoin([self._unstacked_provider], self._fallback_repositories)
         )
 
+    def get_graph(self, other_repository=None):
+        """Return the graph walker for this repository format."""
+        if other_repository is None or self.has_same_location(other_repository):
+            reachability_index = self._get_commit_graph()
+            if reachability_index is not None:
+                return graph.Graph(
+                    self._make_parents_provider(),
+                    reachability_index=reachability_index,
+                )
+        return super().get_graph(other_repository)
+
+    def _get_commit_graph(self):
+        # The index only describes this repository, and not revisions added
+        # in an open write group.
+        if (
+            not self.is_locked()
+            or self._fallback_repositories
+            or self.is_in_write_group()
+        ):
+            return None
+        return self._pack_collection.get_commit_graph()
+
+    def get_changed_paths_index(self):
+        """See Repository.get_changed_paths_index."""
+        # Revisions added in an open write group are not indexed yet, but
+        # that only means they are not in the index.
+        if not self.is_locked():
+            return None
+        return self._pack_collection.get_changed_paths_index()
+
+    def _get_annotation_cache(self):
+        """Return the cache for annotations of texts, if it is enabled."""
+        if not self._pack_collection.config_stack.get("repository.annotation_cache"):
+            return None
+        return annotation_cache.AnnotationCache(
+            self._transport.clone("annotation-cache"),
+            file_mode=self.controldir._get_file_mode(),
+        )
+
     def _refresh_data(self):
         if not self.is_locked():
             return
@@ -2037,6 +2592,8 @@ class PackRepository(MetaDirVersionedFileRepository):
             self._pack_collection.pack(
                 hint=hint, clean_obsolete_packs=clean_obsolete_packs
             )
+            if hint is None:
+                self._pack_collection._index_unindexed_packs()
 
     def reconcile(self, other=None, thorough=False):
         """Reconcile this repository."""
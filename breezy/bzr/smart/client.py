@@ -16,7 +16,7 @@
 
 import breezy
 
-from ... import debug, errors, hooks, trace
+from ... import debug, errors, hooks, trace, trace_events
 from . import message, protocol
 
 
@@ -28,7 +28,12 @@ class _SmartClient:
         """
         self._medium = medium
         if headers is None:
-            self._headers = {b"Software version": breezy.__version__.encode("utf-8")}
+            self._headers = {
+                b"Software version": breezy.__version__.encode("utf-8"),
+                protocol.ACCEPT_BODY_COMPRESSION_HEADER: b" ".join(
+                    protocol.available_body_compressions()
+                ),
+            }
         else:
             self._headers = dict(headers)
 
@@ -53,7 +58,10 @@ class _SmartClient:
             body_stream=body_stream,
             expect_response_body=expect_response_body,
         )
-        return request.call_and_read_response()
+        if not trace_events.is_recording():
+            return request.call_and_read_response()
+        with trace_events.span(method.decode("utf-8", "replace"), "smart"):
+            return request.call_and_read_response()
 
     def call(self, method, *args):
         """Call a method on the remote server."""
@@ -262,7 +270,9 @@ class _SmartClientRequest:
             request_encoder = protocol.ProtocolThreeRequester(request)
             response_handler = message.ConventionalResponseHandler()
             response_proto = protocol.ProtocolThreeDecoder(
-                response_handler, expect_version_marker=True
+                response_handler,
+                expect_version_marker=True,
+                accept_body_compression=True,
             )
             response_handler.setProtoAndMediumRequest(response_proto, request)
         elif version == 2:
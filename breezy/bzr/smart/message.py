@@ -98,6 +98,10 @@ class ConventionalRequestHandler(MessageHandler):
         self._should_finish_body = False
         self._response_sent = False
 
+    def headers_received(self, headers):
+        MessageHandler.headers_received(self, headers)
+        self.responder.request_headers_received(headers)
+
     def protocol_error(self, exception):
         if self.responder.response_sent:
             # We can only send one response to a request, no matter how many
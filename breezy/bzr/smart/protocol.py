@@ -21,6 +21,7 @@ client and server.
 import _thread
 import struct
 import sys
+import zlib
 from collections import deque
 from io import BytesIO
 
@@ -43,6 +44,126 @@ MESSAGE_VERSION_THREE = _smart_rs.MESSAGE_VERSION_THREE
 REQUEST_VERSION_THREE = _smart_rs.REQUEST_VERSION_THREE
 RESPONSE_VERSION_THREE = _smart_rs.RESPONSE_VERSION_THREE
 
+# Protocol three headers used to negotiate compression of message bodies.  A
+# peer lists the compressions it can decode in ACCEPT_BODY_COMPRESSION_HEADER;
+# a message whose body parts are compressed names the compression in
+# BODY_COMPRESSION_HEADER.
+ACCEPT_BODY_COMPRESSION_HEADER = b"Accept-Body-Compression"
+BODY_COMPRESSION_HEADER = b"Body-Compression"
+
+# Bodies smaller than this are not worth compressing.
+_MIN_COMPRESSED_BODY_SIZE = 512
+
+# The largest bytes part a compressed part is decompressed into at a time;
+# larger parts are split, so a small compressed part can't make the client
+# allocate arbitrary amounts of memory at once.
+_MAX_DECOMPRESSED_PART_SIZE = 1024 * 1024
+
+# The (name, level) of the compression used for response bodies sent to
+# clients that accept it, as set by enable_body_compression.
+_body_compression = None
+
+
+def _make_zlib_compressor(level):
+    if level is None:
+        level = zlib.Z_DEFAULT_COMPRESSION
+    compressor = zlib.compressobj(level)
+
+    def compress(data):
+        # Flush after every part so the receiver can decompress each part as
+        # soon as it arrives.
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    return compress
+
+
+def _make_zlib_decompressor():
+    decompressor = zlib.decompressobj()
+
+    def decompress(data, max_length):
+        while True:
+            chunk = decompressor.decompress(data, max_length)
+            data = decompressor.unconsumed_tail
+            yield chunk
+            if not data and len(chunk) < max_length:
+                break
+
+    return decompress
+
+
+def _get_zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise errors.DependencyNotPresent("zstandard", e) from e
+    return zstandard
+
+
+def _make_zstd_compressor(level):
+    zstandard = _get_zstandard()
+    if level is None:
+        level = 3
+    # Every part is a separate frame, as ZstdDecompressionObj can't limit
+    # the size of its output but read_to_iter can.
+    return zstandard.ZstdCompressor(level=level).compress
+
+
+def _make_zstd_decompressor():
+    decompressor = _get_zstandard().ZstdDecompressor()
+
+    def decompress(data, max_length):
+        chunks = decompressor.read_to_iter(data, write_size=max_length)
+        yield next(chunks, b"")
+        yield from chunks
+
+    return decompress
+
+
+# Map from compression name to (compressor factory, decompressor factory), in
+# order of preference. A decompressor is called with each compressed part and
+# the maximum size of a decompressed chunk, and returns an iterator over the
+# decompressed chunks of the part.
+_body_compressions = {
+    b"zstd": (_make_zstd_compressor, _make_zstd_decompressor),
+    b"zlib": (_make_zlib_compressor, _make_zlib_decompressor),
+}
+
+
+def available_body_compressions():
+    """Return the names of the body compressions supported by this process."""
+    names = []
+    for name, (_, make_decompressor) in _body_compressions.items():
+        try:
+            make_decompressor()
+        except errors.DependencyNotPresent:
+            continue
+        names.append(name)
+    return names
+
+
+def enable_body_compression(name, level=None):
+    """Compress the bodies of responses to clients that accept it.
+
+    :param name: The name of the compression to use, e.g. b"zlib".
+    :param level: The compression level, or None for the default level of
+        the compression.
+    :raises DependencyNotPresent: if the compression is not available.
+    """
+    global _body_compression
+    try:
+        make_compressor = _body_compressions[name][0]
+    except KeyError as e:
+        raise ValueError(f"unknown body compression {name!r}") from e
+    # Check that the compression is available and the level is valid.
+    make_compressor(level)
+    _body_compression = (name, level)
+
+
+def disable_body_compression():
+    """Stop compressing response bodies."""
+    global _body_compression
+    _body_compression = None
+
 
 class SmartMessageHandlerError(errors.InternalBzrError):
     _fmt = "The message handler raised an exception:\n" "%(traceback_text)s"
@@ -920,7 +1041,18 @@ class ProtocolThreeDecoder(_StatefulDecoder):
     response_marker = RESPONSE_VERSION_THREE
     request_marker = REQUEST_VERSION_THREE
 
-    def __init__(self, message_handler, expect_version_marker=False):
+    def __init__(
+        self,
+        message_handler,
+        expect_version_marker=False,
+        accept_body_compression=False,
+    ):
+        """Create a decoder.
+
+        :param accept_body_compression: Whether to decompress the body parts
+            of messages with a BODY_COMPRESSION_HEADER. Only clients accept
+            compressed (response) bodies.
+        """
         _StatefulDecoder.__init__(self)
         self._has_dispatched = False
         # Initial state
@@ -934,6 +1066,8 @@ class ProtocolThreeDecoder(_StatefulDecoder):
             self._number_needed_bytes = 4
         self.decoding_failed = False
         self.request_handler = self.message_handler = message_handler
+        self._accept_body_compression = accept_body_compression
+        self._body_decompressor = None
 
     def accept_bytes(self, bytes):
         self._number_needed_bytes = None
@@ -1029,6 +1163,19 @@ class ProtocolThreeDecoder(_StatefulDecoder):
         decoded = self._extract_prefixed_bencoded_data()
         if not isinstance(decoded, dict):
             raise errors.SmartProtocolError(f"Header object {decoded!r} is not a dict")
+        compression = decoded.get(BODY_COMPRESSION_HEADER)
+        if compression is not None:
+            if not self._accept_body_compression:
+                raise errors.SmartProtocolError(
+                    f"Unexpected body compression {compression!r}"
+                )
+            try:
+                make_decompressor = _body_compressions[compression][1]
+            except KeyError as e:
+                raise errors.SmartProtocolError(
+                    f"Unknown body compression {compression!r}"
+                ) from e
+            self._body_decompressor = make_decompressor()
         self.state_accept = self._state_accept_expecting_message_part
         try:
             self.message_handler.headers_received(decoded)
@@ -1063,10 +1210,15 @@ class ProtocolThreeDecoder(_StatefulDecoder):
         # the bytes as they arrive.
         prefixed_bytes = self._extract_length_prefixed_bytes()
         self.state_accept = self._state_accept_expecting_message_part
-        try:
-            self.message_handler.bytes_part_received(prefixed_bytes)
-        except BaseException as e:
-            raise SmartMessageHandlerError(sys.exc_info()) from e
+        if self._body_decompressor is not None:
+            parts = self._body_decompressor(prefixed_bytes, _MAX_DECOMPRESSED_PART_SIZE)
+        else:
+            parts = [prefixed_bytes]
+        for part in parts:
+            try:
+                self.message_handler.bytes_part_received(part)
+            except BaseException as e:
+                raise SmartMessageHandlerError(sys.exc_info()) from e
 
     def _state_accept_expecting_structure(self):
         structure = self._extract_prefixed_bencoded_data()
@@ -1183,10 +1335,23 @@ class ProtocolThreeResponder(_ProtocolThreeEncoder):
         _ProtocolThreeEncoder.__init__(self, write_func)
         self.response_sent = False
         self._headers = {b"Software version": breezy.__version__.encode("utf-8")}
+        self._body_compression = None
         if debug.debug_flag_enabled("hpss"):
             self._thread_id = _thread.get_ident()
             self._response_start_time = None
 
+    def request_headers_received(self, headers):
+        """Note the headers of the request this responder replies to.
+
+        If the client accepts the body compression enabled with
+        enable_body_compression, the response body will be compressed.
+        """
+        if _body_compression is None:
+            return
+        accepted = headers.get(ACCEPT_BODY_COMPRESSION_HEADER, b"").split()
+        if _body_compression[0] in accepted:
+            self._body_compression = _body_compression
+
     def _trace(self, action, message, extra_bytes=None, include_time=False):
         if self._response_start_time is None:
             self._response_start_time = osutils.perf_counter()
@@ -1229,7 +1394,20 @@ class ProtocolThreeResponder(_ProtocolThreeEncoder):
             )
         self.response_sent = True
         self._write_protocol_version()
-        self._write_headers(self._headers)
+        headers = self._headers
+        compress = None
+        if self._body_compression is not None and (
+            response.body_stream is not None
+            or (
+                response.body is not None
+                and len(response.body) >= _MIN_COMPRESSED_BODY_SIZE
+            )
+        ):
+            name, level = self._body_compression
+            compress = _body_compressions[name][0](level)
+            headers = dict(headers)
+            headers[BODY_COMPRESSION_HEADER] = name
+        self._write_headers(headers)
         if response.is_successful():
             self._write_success_status()
         else:
@@ -1238,7 +1416,10 @@ class ProtocolThreeResponder(_ProtocolThreeEncoder):
             self._trace("response", repr(response.args))
         self._write_structure(response.args)
         if response.body is not None:
-            self._write_prefixed_body(response.body)
+            if compress is not None:
+                self._write_prefixed_body(compress(response.body))
+            else:
+                self._write_prefixed_body(response.body)
             if debug.debug_flag_enabled("hpss"):
                 self._trace(
                     "body",
@@ -1264,7 +1445,10 @@ class ProtocolThreeResponder(_ProtocolThreeEncoder):
                     num_bytes += len(chunk)
                     if first_chunk is None:
                         first_chunk = chunk
-                    self._write_prefixed_body(chunk)
+                    if compress is not None:
+                        self._write_prefixed_body(compress(chunk))
+                    else:
+                        self._write_prefixed_body(chunk)
                     self.flush()
                     if debug.debug_flag_enabled("hpssdetail"):
                         # Not worth timing separately, as _write_func is
@@ -27,11 +27,11 @@ import zlib
 
 import fastbencode as bencode
 
-from ... import errors, osutils, trace, ui, zlib_util
+from ... import config, errors, osutils, trace, ui, zlib_util
 from ... import revision as _mod_revision
 from ...repository import _strip_NULL_ghosts, network_format_registry
+from .. import clone_bundle, inventory_delta, pack, vf_search
 from .. import inventory as _mod_inventory
-from .. import inventory_delta, pack, vf_search
 from ..bzrdir import BzrDir
 from ..versionedfile import (
     ChunkedContentFactory,
@@ -559,7 +559,12 @@ class SmartServerRepositoryGetStream(SmartServerRepositoryRequest):
                 repository.unlock()
                 return error
             source = repository._get_source(self._to_format)
-            stream = source.get_stream(search_result)
+            byte_stream = self._clone_bundle_byte_stream(
+                repository, source, search_result
+            )
+            if byte_stream is None:
+                stream = source.get_stream(search_result)
+                byte_stream = _stream_to_byte_stream(stream, repository._format)
         except Exception:
             try:
                 # On non-error, unlocking is done by the body stream handler.
@@ -567,11 +572,68 @@ class SmartServerRepositoryGetStream(SmartServerRepositoryRequest):
             finally:
                 raise
         return SuccessfulSmartServerResponse(
-            (b"ok",), body_stream=self.body_stream(stream, repository)
+            (b"ok",), body_stream=self._body_stream(byte_stream, repository)
+        )
+
+    def _clone_bundle_byte_stream(self, repository, source, search_result):
+        """Create a byte stream for search_result using a clone bundle.
+
+        Clone bundles are only used for fetches of the whole ancestry of some
+        heads in the format of the repository, which is what branching into
+        an empty repository asks for. If the repository has no bundle yet, or
+        the bundle is too far behind, the full stream is saved as the new
+        bundle while it is sent.
+
+        :return: A byte stream, or None if clone bundles do not apply.
+        """
+        network_name = repository._format.network_name()
+        if (
+            not isinstance(search_result, vf_search.PendingAncestryResult)
+            or self._to_format.network_name() != network_name
+            or repository._fallback_repositories
+            or getattr(repository, "_transport", None) is None
+        ):
+            return None
+        config_stack = config.LocationStack(repository.user_url)
+        if not config_stack.get("serve.clone_bundles"):
+            return None
+        heads = set(repository.get_parent_map(search_result.heads))
+        heads.discard(_mod_revision.NULL_REVISION)
+        if not heads:
+            return None
+        bundle = clone_bundle.read_clone_bundle(repository._transport)
+        if bundle is not None:
+            missing = None
+            if bundle.network_name == network_name:
+                missing = bundle.missing_revisions(repository.get_graph(), heads)
+            if missing is not None and len(missing) <= config_stack.get(
+                "serve.clone_bundle_refresh"
+            ):
+                missing = set(repository.get_parent_map(missing))
+                stream = None
+                if missing:
+                    stream = source.get_stream(
+                        repository.revision_ids_to_search_result(missing)
+                    )
+                return _clone_bundle_to_byte_stream(bundle, stream, repository._format)
+            bundle.close()
+            if missing is None and bundle.network_name == network_name:
+                # Unrelated to the bundled history, leave the bundle alone.
+                return None
+        if repository._transport.is_readonly():
+            # Nowhere to save a bundle, e.g. when serving read-only.
+            return None
+        writer = clone_bundle.CloneBundleWriter(
+            repository._transport, network_name, heads
         )
+        stream = source.get_stream(search_result)
+        return _stream_to_byte_stream(stream, repository._format, writer)
 
     def body_stream(self, stream, repository):
         byte_stream = _stream_to_byte_stream(stream, repository._format)
+        return self._body_stream(byte_stream, repository)
+
+    def _body_stream(self, byte_stream, repository):
         try:
             yield from byte_stream
         except errors.RevisionNotPresent as e:
@@ -597,11 +659,48 @@ class SmartServerRepositoryGetStream_1_19(SmartServerRepositoryGetStream):
         return False
 
 
-def _stream_to_byte_stream(stream, src_format):
-    """Convert a record stream to a self delimited byte stream."""
+def _stream_to_byte_stream(stream, src_format, bundle_writer=None):
+    """Convert a record stream to a self delimited byte stream.
+
+    :param bundle_writer: Optional CloneBundleWriter to save the records to.
+        The bundle is committed once the whole stream has been converted.
+    """
+    pack_writer = pack.ContainerSerialiser()
+    yield pack_writer.begin()
+    yield pack_writer.bytes_record(src_format.network_name(), b"")
+    records = _stream_to_records(stream, pack_writer)
+    if bundle_writer is None:
+        yield from records
+    else:
+        try:
+            for record_bytes in records:
+                bundle_writer.write(record_bytes)
+                yield record_bytes
+        except BaseException:
+            bundle_writer.abort()
+            raise
+        bundle_writer.commit()
+    yield pack_writer.end()
+
+
+def _clone_bundle_to_byte_stream(bundle, stream, src_format):
+    """Convert a clone bundle and a record stream to a byte stream.
+
+    :param bundle: A CloneBundle.
+    :param stream: A record stream for the revisions not in the bundle, or
+        None.
+    """
     pack_writer = pack.ContainerSerialiser()
     yield pack_writer.begin()
     yield pack_writer.bytes_record(src_format.network_name(), b"")
+    yield from bundle.iter_record_bytes()
+    if stream is not None:
+        yield from _stream_to_records(stream, pack_writer)
+    yield pack_writer.end()
+
+
+def _stream_to_records(stream, pack_writer):
+    """Serialise the records of a record stream as container records."""
     for substream_type, substream in stream:
         for record in substream:
             if record.storage_kind in ("chunked", "fulltext"):
@@ -617,7 +716,6 @@ def _stream_to_byte_stream(stream, src_format):
                 yield pack_writer.bytes_record(
                     serialised, [(substream_type.encode("ascii"),)]
                 )
-    yield pack_writer.end()
 
 
 class _ByteStreamDecoder:
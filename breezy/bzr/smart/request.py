@@ -40,6 +40,10 @@ from ... import transport as _mod_transport
 jail_info = threading.local()
 jail_info.transports = None
 
+# The RequestMetrics that handled requests are recorded in, if any. See
+# enable_request_metrics.
+request_metrics = None
+
 
 class DisabledMethod(errors.InternalBzrError):
     _fmt = "The smart server method '%(class_name)s' is disabled."
@@ -255,6 +259,175 @@ class SuccessfulSmartServerResponse(SmartServerResponse):
         return True
 
 
+def _histogram_bucket(value):
+    """Return the power-of-two histogram bucket for a non-negative integer.
+
+    Bucket 0 holds 0, bucket n holds values v with 2**(n-1) <= v < 2**n.
+    """
+    return int(value).bit_length()
+
+
+def _format_histogram(histogram):
+    """Describe a histogram as returned by RequestMetrics.stats().
+
+    Each bucket is shown with its exclusive upper bound, e.g.
+    "0: 2, <1024: 3".
+    """
+    return ", ".join(
+        f"{0 if bucket == 0 else f'<{2**bucket}'}: {count}"
+        for bucket, count in sorted(histogram.items())
+    )
+
+
+class RequestMetrics:
+    """Per-verb latency and size statistics of handled requests.
+
+    Latencies are measured from receiving the request arguments until the
+    response has been produced (or, for streamed responses, until the body
+    stream is exhausted). Histograms use power-of-two buckets, see
+    _histogram_bucket; latencies are bucketed in microseconds and sizes in
+    bytes.
+
+    Requests may be recorded from multiple server threads at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._verbs = {}
+
+    def record(self, verb, duration, bytes_received, bytes_sent):
+        """Record a handled request.
+
+        :param verb: The request verb, e.g. b'Repository.get_stream'.
+        :param duration: Time taken to handle the request, in seconds.
+        :param bytes_received: Size of the request arguments and body.
+        :param bytes_sent: Size of the response body.
+        """
+        with self._lock:
+            verb_stats = self._verbs.get(verb)
+            if verb_stats is None:
+                verb_stats = self._verbs[verb] = {
+                    "count": 0,
+                    "time": 0.0,
+                    "max_time": 0.0,
+                    "bytes_received": 0,
+                    "bytes_sent": 0,
+                    "latency_histogram": {},
+                    "received_histogram": {},
+                    "sent_histogram": {},
+                }
+            verb_stats["count"] += 1
+            verb_stats["time"] += duration
+            verb_stats["max_time"] = max(verb_stats["max_time"], duration)
+            verb_stats["bytes_received"] += bytes_received
+            verb_stats["bytes_sent"] += bytes_sent
+            for key, value in [
+                ("latency_histogram", duration * 1000000),
+                ("received_histogram", bytes_received),
+                ("sent_histogram", bytes_sent),
+            ]:
+                histogram = verb_stats[key]
+                bucket = _histogram_bucket(value)
+                histogram[bucket] = histogram.get(bucket, 0) + 1
+
+    def stats(self):
+        """Return a snapshot of the statistics.
+
+        :return: A dict mapping verbs to dicts with the keys 'count', 'time',
+            'max_time', 'bytes_received', 'bytes_sent', 'latency_histogram',
+            'received_histogram' and 'sent_histogram'. The histograms map
+            bucket numbers to counts.
+        """
+        with self._lock:
+            result = {}
+            for verb, verb_stats in self._verbs.items():
+                result[verb] = dict(verb_stats)
+                for key in (
+                    "latency_histogram",
+                    "received_histogram",
+                    "sent_histogram",
+                ):
+                    result[verb][key] = dict(verb_stats[key])
+            return result
+
+    def report_lines(self):
+        """Describe the statistics, slowest verbs (by total time) first.
+
+        Each verb gets a summary line, followed by indented lines with its
+        latency and size histograms.
+        """
+        lines = []
+        stats = self.stats()
+        for verb, verb_stats in sorted(
+            stats.items(), key=lambda item: item[1]["time"], reverse=True
+        ):
+            lines.append(
+                f"{verb.decode('ascii', 'replace')}: {verb_stats['count']} requests, "
+                f"{verb_stats['time']:.3f}s total, {verb_stats['max_time']:.3f}s max, "
+                f"{verb_stats['bytes_received']} bytes in, "
+                f"{verb_stats['bytes_sent']} bytes out"
+            )
+            for label, key in [
+                ("latency (us)", "latency_histogram"),
+                ("bytes in", "received_histogram"),
+                ("bytes out", "sent_histogram"),
+            ]:
+                lines.append(f"  {label}: {_format_histogram(verb_stats[key])}")
+        return lines
+
+
+class _MeasuredBodyStream:
+    """Count the bytes of a response body stream as it is sent.
+
+    The request is recorded once the stream is exhausted, fails, or is
+    dropped without being (fully) iterated, e.g. when the client
+    disconnected before the response was sent.
+    """
+
+    def __init__(self, body_stream, record):
+        self._body_stream = iter(body_stream)
+        self._record = record
+        self._bytes_sent = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._body_stream)
+        except BaseException:
+            self.close()
+            raise
+        if isinstance(chunk, bytes):
+            self._bytes_sent += len(chunk)
+        return chunk
+
+    def close(self):
+        """Record the request, if that hasn't happened yet."""
+        record, self._record = self._record, None
+        if record is not None:
+            record(self._bytes_sent)
+
+    def __del__(self):
+        self.close()
+
+
+def enable_request_metrics():
+    """Start recording metrics for all requests handled in this process.
+
+    :return: The RequestMetrics requests are recorded in.
+    """
+    global request_metrics
+    request_metrics = RequestMetrics()
+    return request_metrics
+
+
+def disable_request_metrics():
+    """Stop recording request metrics."""
+    global request_metrics
+    request_metrics = None
+
+
 class SmartServerRequestHandler:
     """Protocol logic for smart server.
 
@@ -288,6 +461,9 @@ class SmartServerRequestHandler:
         self.response = None
         self.finished_reading = False
         self._command = None
+        self._metrics = request_metrics
+        self._verb = None
+        self._bytes_received = 0
         if debug.debug_flag_enabled("hpss"):
             self._request_start_time = osutils.perf_counter()
             self._thread_id = get_ident()
@@ -314,6 +490,7 @@ class SmartServerRequestHandler:
         if self._command is None:
             # no active command object, so ignore the event.
             return
+        self._bytes_received += len(bytes)
         self._run_handler_code(self._command.do_chunk, (bytes,), {})
         if debug.debug_flag_enabled("hpss"):
             self._trace("accept body", f"{len(bytes)} bytes", bytes)
@@ -338,9 +515,36 @@ class SmartServerRequestHandler:
         result = self._call_converting_errors(callable, args, kwargs)
 
         if result is not None:
+            if self._verb is not None:
+                self._record_metrics(result)
             self.response = result
             self.finished_reading = True
 
+    def _record_metrics(self, response):
+        # Only the first response of a request is sent, so only record that.
+        verb = self._verb
+        self._verb = None
+        if response.body_stream is not None:
+            response.body_stream = self._measure_body_stream(verb, response.body_stream)
+        else:
+            self._metrics.record(
+                verb,
+                osutils.perf_counter() - self._metrics_start_time,
+                self._bytes_received,
+                len(response.body or b""),
+            )
+
+    def _measure_body_stream(self, verb, body_stream):
+        def record(bytes_sent):
+            self._metrics.record(
+                verb,
+                osutils.perf_counter() - self._metrics_start_time,
+                self._bytes_received,
+                bytes_sent,
+            )
+
+        return _MeasuredBodyStream(body_stream, record)
+
     def _call_converting_errors(self, callable, args, kwargs):
         """Call callable converting errors to Response objects."""
         # XXX: most of this error conversion is VFS-related, and thus ought to
@@ -379,6 +583,12 @@ class SmartServerRequestHandler:
             else:
                 action = "hpss request"
             self._trace(action, f"{cmd} {repr(args)[1:-1]}")
+        if self._metrics is not None:
+            self._verb = cmd
+            self._metrics_start_time = osutils.perf_counter()
+            self._bytes_received = sum(
+                len(arg) for arg in args if isinstance(arg, bytes)
+            )
         self._command = command(
             self._backing_transport, self._root_client_path, self._jail_root
         )
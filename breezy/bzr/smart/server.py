@@ -19,6 +19,7 @@
 import contextlib
 import errno
 import os.path
+import signal
 import socket
 import sys
 import threading
@@ -53,7 +54,9 @@ class SmartTCPServer:
     """Listens on a TCP socket and accepts connections from smart clients.
 
     Each connection will be served by a SmartServerSocketStreamMedium running in
-    a thread.
+    a thread. If max_connections is set, no more than that many connections
+    are served at once; further clients wait in the listen backlog until a
+    connection finishes.
 
     hooks: An instance of SmartServerHooks.
     """
@@ -67,7 +70,13 @@ class SmartTCPServer:
 
     _timer = time.time
 
-    def __init__(self, backing_transport, root_client_path="/", client_timeout=None):
+    def __init__(
+        self,
+        backing_transport,
+        root_client_path="/",
+        client_timeout=None,
+        max_connections=None,
+    ):
         """Construct a new server.
 
         To actually start it running, call either start_background_thread or
@@ -78,11 +87,18 @@ class SmartTCPServer:
             of backing_transport.
         :param client_timeout: See SmartServerSocketStreamMedium's timeout
             parameter.
+        :param max_connections: The maximum number of connections to serve
+            concurrently, or None for no limit.
         """
         self.backing_transport = backing_transport
         self.root_client_path = root_client_path
         self._client_timeout = client_timeout
         self._active_connections = []
+        self.max_connections = max_connections
+        if max_connections:
+            self._connection_slots = threading.BoundedSemaphore(max_connections)
+        else:
+            self._connection_slots = None
         # This is set to indicate we want to wait for clients to finish before
         # we disconnect.
         self._gracefully_stopping = False
@@ -117,7 +133,11 @@ class SmartTCPServer:
             raise errors.CannotBindAddress(host, port, message) from message
         self._sockname = self._server_socket.getsockname()
         self.port = self._sockname[1]
-        self._server_socket.listen(1)
+        if self.max_connections:
+            # Clients wait here while all connection slots are taken.
+            self._server_socket.listen(max(self.max_connections, 5))
+        else:
+            self._server_socket.listen(1)
         self._server_socket.settimeout(self._ACCEPT_TIMEOUT)
         # Once we start accept()ing connections, we set started.
         self._started = threading.Event()
@@ -207,23 +227,29 @@ class SmartTCPServer:
         try:
             try:
                 while not self._should_terminate:
+                    if not self._acquire_connection_slot():
+                        # All slots busy; check if we're asked to stop
+                        self._poll_active_connections()
+                        continue
                     try:
                         conn, client_addr = self._server_socket.accept()
                     except self._socket_timeout:
                         # just check if we're asked to stop
-                        pass
+                        self._release_connection_slot()
                     except self._socket_error as e:
                         # if the socket is closed by stop_background_thread
                         # we might get a EBADF here, or if we get a signal we
                         # can get EINTR, any other socket errors should get
                         # logged.
+                        self._release_connection_slot()
                         if e.args[0] not in (errno.EBADF, errno.EINTR):
                             trace.warning(gettext("listening socket error: %s") % (e,))
                     else:
                         if self._should_terminate:
+                            self._release_connection_slot()
                             conn.close()
                             break
-                        self.serve_conn(conn, thread_name_suffix)
+                        self.serve_conn(conn, thread_name_suffix, slot_acquired=True)
                     # Cleanout any threads that have finished processing.
                     self._poll_active_connections()
             except KeyboardInterrupt:
@@ -275,7 +301,33 @@ class SmartTCPServer:
                 still_active.append((handler, thread))
         self._active_connections = still_active
 
-    def serve_conn(self, conn, thread_name_suffix):
+    def _acquire_connection_slot(self):
+        """Wait for a connection slot to become available.
+
+        :return: True if a slot was acquired (or connections are not limited),
+            False if none became available within _ACCEPT_TIMEOUT.
+        """
+        if self._connection_slots is None:
+            return True
+        return self._connection_slots.acquire(timeout=self._ACCEPT_TIMEOUT)
+
+    def _release_connection_slot(self):
+        if self._connection_slots is not None:
+            self._connection_slots.release()
+
+    def _serve_handler(self, handler, slot_acquired):
+        try:
+            handler.serve()
+        finally:
+            if slot_acquired:
+                self._release_connection_slot()
+
+    def serve_conn(self, conn, thread_name_suffix, slot_acquired=False):
+        """Serve a connection in a new thread.
+
+        :param slot_acquired: Whether the caller acquired a connection slot
+            for conn, which is released once the connection is done.
+        """
         # For WIN32, where the timeout value from the listening socket
         # propagates to the newly accepted socket.
         conn.setblocking(True)
@@ -283,7 +335,11 @@ class SmartTCPServer:
         thread_name = "smart-server-child" + thread_name_suffix
         handler = self._make_handler(conn)
         connection_thread = threading.Thread(
-            None, handler.serve, name=thread_name, daemon=True
+            None,
+            self._serve_handler,
+            args=(handler, slot_acquired),
+            name=thread_name,
+            daemon=True,
         )
         self._active_connections.append((handler, connection_thread))
         connection_thread.start()
@@ -466,7 +522,12 @@ class BzrServerFactory:
                 host = medium.BZR_DEFAULT_INTERFACE
             if port is None:
                 port = medium.BZR_DEFAULT_PORT
-            smart_server = SmartTCPServer(self.transport, client_timeout=timeout)
+            max_connections = config.GlobalStack().get("serve.max_connections")
+            smart_server = SmartTCPServer(
+                self.transport,
+                client_timeout=timeout,
+                max_connections=max_connections,
+            )
             smart_server.start_server(host, port)
             trace.note(gettext("listening on port: %s"), str(smart_server.port))
         self.smart_server = smart_server
@@ -494,6 +555,50 @@ class BzrServerFactory:
             signals.restore_sighup_handler(orig)
 
         self.cleanups.append(restore_signals)
+        # All connections are served from this process, so let them share
+        # one warm CHK page cache rather than one per thread.
+        page_cache_size = config.GlobalStack().get("serve.chk_page_cache_size")
+        if page_cache_size:
+            from breezy.bzr import chk_map
+
+            chk_map.enable_shared_page_cache(page_cache_size)
+            self.cleanups.append(chk_map.disable_shared_page_cache)
+        if config.GlobalStack().get("serve.request_metrics"):
+            from . import request
+
+            metrics = request.enable_request_metrics()
+
+            def log_request_metrics(*args):
+                for line in metrics.report_lines():
+                    trace.mutter("request metrics: %s", line)
+
+            if getattr(signal, "SIGUSR1", None) is not None:
+                # Let the metrics be logged while the server is running
+                orig_sigusr1 = signal.signal(signal.SIGUSR1, log_request_metrics)
+
+                def restore_sigusr1():
+                    signal.signal(signal.SIGUSR1, orig_sigusr1)
+
+                self.cleanups.append(restore_sigusr1)
+
+            def report_request_metrics():
+                request.disable_request_metrics()
+                log_request_metrics()
+
+            self.cleanups.append(report_request_metrics)
+        body_compression = config.GlobalStack().get("serve.body_compression")
+        if body_compression:
+            from . import protocol
+
+            try:
+                protocol.enable_body_compression(
+                    body_compression.encode("ascii"),
+                    config.GlobalStack().get("serve.body_compression_level"),
+                )
+            except (ValueError, errors.DependencyNotPresent) as e:
+                trace.warning("Not compressing response bodies: %s", e)
+            else:
+                self.cleanups.append(protocol.disable_body_compression)
 
     def set_up(self, transport, host, port, inet, timeout):
         self._make_backing_transport(transport)
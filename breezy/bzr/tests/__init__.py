@@ -47,11 +47,14 @@ def load_tests(loader, basic_tests, pattern):
         "test__groupcompress",
         "test__simple_set",
         "test__static_tuple",
+        "test_annotation_cache",
         "test_btree_index",
         "test_bundle",
         "test_bzrdir",
+        "test_changed_paths",
         "test_chk_map",
         "test_chk_serializer",
+        "test_commit_graph",
         "test_conflicts",
         "test_generate_ids",
         "test_groupcompress",
@@ -62,6 +65,7 @@ def load_tests(loader, basic_tests, pattern):
         "test_knit",
         "test_lockable_files",
         "test_matchers",
+        "test_merge_sort_cache",
         "test_pack",
         "test_read_bundle",
         "test_remote",
@@ -0,0 +1,67 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Tests for breezy.bzr.annotation_cache."""
+
+from ... import config, tests
+from .. import annotation_cache
+
+key_a = (b"f-id", b"a-id")
+key_b = (b"f-id", b"b-id")
+
+
+class TestSerialization(tests.TestCase):
+    def test_roundtrip(self):
+        annotations = [(key_a,), (key_a, key_b), (key_b,), (key_a,)]
+        data = annotation_cache.serialize([key_a], annotations)
+        self.assertEqual(((key_a,), annotations), annotation_cache.deserialize(data))
+
+    def test_deserialize_invalid(self):
+        self.assertRaises(ValueError, annotation_cache.deserialize, b"garbage")
+        data = annotation_cache.serialize([], [(key_a,)])
+        self.assertRaises(ValueError, annotation_cache.deserialize, data[:-4])
+
+
+class TestAnnotationCache(tests.TestCaseWithMemoryTransport):
+    def test_put_get(self):
+        cache = annotation_cache.AnnotationCache(self.get_transport("cache"))
+        self.assertIs(None, cache.get(key_b, (key_a,)))
+        cache.put(key_b, (key_a,), [(key_a,), (key_b,)])
+        self.assertEqual([(key_a,), (key_b,)], cache.get(key_b, (key_a,)))
+        # Entries are ignored when the parents changed
+        self.assertIs(None, cache.get(key_b, ()))
+
+
+class TestPackRepositoryAnnotationCache(tests.TestCaseWithTransport):
+    def test_disabled_by_default(self):
+        tree = self.make_branch_and_tree(".", format="2a")
+        self.assertIs(None, tree.branch.repository.texts._annotation_cache)
+
+    def test_annotate(self):
+        config.GlobalStack().set("repository.annotation_cache", True)
+        tree = self.make_branch_and_tree(".", format="2a")
+        self.build_tree_contents([("a", b"one\n")])
+        tree.add(["a"])
+        rev1 = tree.commit("one")
+        self.build_tree_contents([("a", b"one\ntwo\n")])
+        rev2 = tree.commit("two")
+        repo = tree.branch.repository.controldir.open_repository()
+        with repo.lock_read():
+            revtree = repo.revision_tree(rev2)
+            expected = [(rev1, b"one\n"), (rev2, b"two\n")]
+            self.assertEqual(expected, revtree.annotate_iter("a"))
+            self.assertTrue(repo._transport.has("annotation-cache"))
+            self.assertEqual(expected, revtree.annotate_iter("a"))
@@ -684,6 +684,60 @@ class TestBTreeIndex(BTreeTestCase):
         self.assertEqual(internal_node_pre_clear, set(index._internal_node_cache))
         self.assertEqual(0, len(index._leaf_node_cache))
 
+    def test_mmap_iter_entries(self):
+        nodes = self.make_nodes(160, 2, 2)
+        builder = btree_index.BTreeBuilder(reference_lists=2, key_elements=2)
+        builder.add_nodes(nodes)
+        trans = self.get_transport("")
+        size = trans.put_file("index", builder.finish())
+        index = btree_index.BTreeGraphIndex(trans, "index", size, use_mmap=True)
+        self.assertEqual(
+            sorted(nodes[10:20]),
+            sorted(
+                (key, value, refs)
+                for _, key, value, refs in index.iter_entries(
+                    [node[0] for node in nodes[10:20]]
+                )
+            ),
+        )
+        self.assertIsNot(None, index._mmap)
+        self.assertEqual(
+            sorted(nodes),
+            sorted(
+                (key, value, refs) for _, key, value, refs in index.iter_all_entries()
+            ),
+        )
+        parent_map = {}
+        missing_keys = set()
+        index._find_ancestors([nodes[30][0]], 0, parent_map, missing_keys)
+        self.assertEqual(nodes[30][2][0], parent_map[nodes[30][0]])
+
+    def test_mmap_clear_cache(self):
+        nodes = self.make_nodes(160, 1, 0)
+        builder = btree_index.BTreeBuilder(reference_lists=0, key_elements=1)
+        builder.add_nodes(nodes)
+        trans = self.get_transport("")
+        size = trans.put_file("index", builder.finish())
+        index = btree_index.BTreeGraphIndex(trans, "index", size, use_mmap=True)
+        self.assertEqual(1, len(list(index.iter_entries([nodes[10][0]]))))
+        index_map = index._mmap
+        self.assertIsNot(None, index_map)
+        index.clear_cache()
+        self.assertIs(None, index._mmap)
+        self.assertTrue(index_map.closed)
+        # The file is mapped again when needed
+        self.assertEqual(1, len(list(index.iter_entries([nodes[100][0]]))))
+        self.assertIsNot(None, index._mmap)
+
+    def test_mmap_not_local(self):
+        index = self.make_index(nodes=[((b"name",), b"data", ())])
+        index._use_mmap = True
+        self.assertEqual(
+            [(index, (b"name",), b"data")], list(index.iter_entries([(b"name",)]))
+        )
+        self.assertIs(None, index._mmap)
+        self.assertFalse(index._use_mmap)
+
     def test_trivial_constructor(self):
         t = transport.get_transport_from_url("trace+" + self.get_url(""))
         btree_index.BTreeGraphIndex(t, "index", None)
@@ -1358,6 +1412,43 @@ class TestBTreeNodes(BTreeTestCase):
             dict(node.all_items()),
         )
 
+    def test_LazyLeafNode_2_2(self):
+        node_bytes = (
+            b"type=leaf\n"
+            b"00\x0000\x00\t00\x00ref00\x00value:0\n"
+            b"00\x0011\x0000\x00ref00\t00\x00ref00\r01\x00ref01\x00value:1\n"
+            b"11\x0033\x0011\x00ref22\t11\x00ref22\r11\x00ref22\x00value:3\n"
+            b"11\x0044\x00\t11\x00ref00\x00value:4\n"
+            b""
+        )
+        node = btree_index._LazyLeafNode(node_bytes, 2, 2)
+        self.assertEqual(
+            dict(btree_index._LeafNode(node_bytes, 2, 2).all_items()),
+            dict(node.all_items()),
+        )
+        self.assertEqual(4, len(node))
+        self.assertEqual((b"00", b"00"), node.min_key)
+        self.assertEqual((b"11", b"44"), node.max_key)
+        self.assertEqual(
+            (
+                b"value:3",
+                (((b"11", b"ref22"),), ((b"11", b"ref22"), (b"11", b"ref22"))),
+            ),
+            node[(b"11", b"33")],
+        )
+        self.assertIn((b"00", b"11"), node)
+        self.assertNotIn((b"00", b"22"), node)
+        self.assertNotIn((b"0", b"00"), node)
+        self.assertNotIn((b"22", b"00"), node)
+        self.assertRaises(KeyError, node.__getitem__, (b"11", b"34"))
+
+    def test_LazyLeafNode_empty(self):
+        node = btree_index._LazyLeafNode(b"type=leaf\n", 1, 0)
+        self.assertEqual(0, len(node))
+        self.assertIs(None, node.min_key)
+        self.assertIs(None, node.max_key)
+        self.assertNotIn((b"key",), node)
+
     def test_InternalNode_1(self):
         node_bytes = (
             b"type=internal\n"
@@ -0,0 +1,247 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Tests for breezy.bzr.changed_paths."""
+
+from ... import config, errors, log, repository, tests
+from .. import changed_paths
+
+
+class TestChangedPathsIndex(tests.TestCase):
+    def make_index(self):
+        index = changed_paths.ChangedPathsIndex(["pack1"])
+        index.add_revision(
+            b"rev1",
+            [
+                ("added", None, "", b"root-id"),
+                ("added", None, "dir", b"dir-id"),
+                ("added", None, "dir/a", b"a-id"),
+                ("added", None, "b", b"b-id"),
+            ],
+        )
+        index.add_revision(b"rev2", [("modified", "dir/a", "dir/a", b"a-id")])
+        index.add_revision(b"rev3", [("renamed", "dir", "newdir", b"dir-id")])
+        index.add_revision(b"rev4", [("modified", "b", "b", b"b-id")])
+        return index
+
+    def test_get_changes(self):
+        index = self.make_index()
+        self.assertEqual(4, index.revision_count())
+        self.assertIn(b"rev2", index)
+        self.assertNotIn(b"unknown", index)
+        self.assertEqual(
+            (("modified", "dir/a", "dir/a", b"a-id"),), index.get_changes(b"rev2")
+        )
+        self.assertEqual({"dir", "newdir"}, index.get_changed_paths(b"rev3"))
+        self.assertEqual({b"dir-id"}, index.get_changed_file_ids(b"rev3"))
+        self.assertIs(None, index.get_changes(b"unknown"))
+        self.assertIs(None, index.get_changed_paths(b"unknown"))
+
+    def test_touches_paths(self):
+        index = self.make_index()
+        self.assertTrue(index.touches_paths(b"rev2", ["dir/a"]))
+        # Changes below a directory and to its parents count
+        self.assertTrue(index.touches_paths(b"rev2", ["dir"]))
+        self.assertTrue(index.touches_paths(b"rev3", ["newdir/a"]))
+        self.assertFalse(index.touches_paths(b"rev2", ["b"]))
+        self.assertFalse(index.touches_paths(b"rev4", ["newdir/a", "dir"]))
+        self.assertIs(None, index.touches_paths(b"unknown", ["b"]))
+
+    def test_get_renamed_paths(self):
+        index = self.make_index()
+        self.assertEqual({"dir/a"}, index.get_renamed_paths(b"rev3", ["newdir/a"]))
+        self.assertEqual({"newdir"}, index.get_renamed_paths(b"rev3", ["dir"]))
+        self.assertEqual(set(), index.get_renamed_paths(b"rev2", ["dir/a"]))
+
+    def test_revisions_touching(self):
+        index = self.make_index()
+        self.assertEqual({b"rev1", b"rev2", b"rev3"}, index.revisions_touching("dir"))
+        self.assertEqual({b"rev1", b"rev2"}, index.revisions_touching("dir/a"))
+        self.assertEqual({b"rev1", b"rev4"}, index.revisions_touching("b"))
+        self.assertEqual(set(), index.revisions_touching("di"))
+        index.add_revision(b"rev5", [("added", None, "dir2", b"dir2-id")])
+        self.assertEqual({b"rev5"}, index.revisions_touching("dir2"))
+        self.assertEqual(5, len(index.revisions_touching("")))
+
+    def test_update(self):
+        index = self.make_index()
+        other = changed_paths.ChangedPathsIndex(["pack0"])
+        other.add_revision(b"rev0", [("modified", "b", "b", b"b-id")])
+        self.assertEqual({b"rev1", b"rev4"}, index.revisions_touching("b"))
+        index.update(other)
+        self.assertEqual(("pack0", "pack1"), index.pack_names)
+        self.assertEqual(5, index.revision_count())
+        self.assertEqual({b"rev0", b"rev1", b"rev4"}, index.revisions_touching("b"))
+
+    def test_to_bytes_round_trip(self):
+        index = self.make_index()
+        loaded = changed_paths.ChangedPathsIndex.from_bytes(index.to_bytes())
+        self.assertEqual(("pack1",), loaded.pack_names)
+        for revision_id in [b"rev1", b"rev2", b"rev3", b"rev4"]:
+            self.assertEqual(
+                index.get_changes(revision_id), loaded.get_changes(revision_id)
+            )
+
+    def test_from_bytes_invalid(self):
+        self.assertRaises(
+            ValueError, changed_paths.ChangedPathsIndex.from_bytes, b"garbage"
+        )
+        data = self.make_index().to_bytes()
+        self.assertRaises(
+            ValueError, changed_paths.ChangedPathsIndex.from_bytes, data[:-10]
+        )
+
+    def test_filter_untouched_revisions(self):
+        index = self.make_index()
+        revs = [((rev_id, None, 0), None, None) for rev_id in [b"rev4", b"rev3"]]
+        revs.extend(
+            ((rev_id, None, 0), None, None) for rev_id in [b"rev2", b"unknown", b"rev4"]
+        )
+        # rev3 renames dir, so rev2 touches the file by its old name; nothing
+        # is known about the revisions after unknown.
+        self.assertEqual(
+            [b"rev3", b"rev2", b"unknown", b"rev4"],
+            [
+                rev[0][0]
+                for rev in log._filter_untouched_revisions(index, revs, {"newdir/a"})
+            ],
+        )
+
+
+class TestPackRepositoryChangedPaths(tests.TestCaseWithTransport):
+    def make_tree(self):
+        config.GlobalStack().set("repository.changed_paths_index", True)
+        return self.make_branch_and_tree(".", format="2a")
+
+    def test_disabled_by_default(self):
+        tree = self.make_branch_and_tree(".", format="2a")
+        tree.commit("one")
+        repo = tree.branch.repository
+        self.assertFalse(repo._transport.has("changed-paths"))
+        with repo.lock_read():
+            self.assertIs(None, repo.get_changed_paths_index())
+
+    def test_indexed_on_commit(self):
+        tree = self.make_tree()
+        self.build_tree(["dir/", "dir/a", "b"])
+        tree.add(["dir", "dir/a", "b"])
+        rev1 = tree.commit("one")
+        self.build_tree_contents([("dir/a", b"new content\n")])
+        rev2 = tree.commit("two")
+        repo = tree.branch.repository
+        with repo.lock_read():
+            names = repo._pack_collection.names()
+        self.assertEqual(
+            sorted(names), sorted(repo._transport.list_dir("changed-paths"))
+        )
+        repo = repo.controldir.open_repository()
+        with repo.lock_read():
+            index = repo.get_changed_paths_index()
+            self.assertEqual(2, index.revision_count())
+            self.assertEqual({"dir/a"}, index.get_changed_paths(rev2))
+            self.assertEqual({rev1, rev2}, index.revisions_touching("dir"))
+
+    def test_carried_over_when_packed(self):
+        tree = self.make_tree()
+        rev1 = tree.commit("one")
+        rev2 = tree.commit("two")
+        repo = tree.branch.repository.controldir.open_repository()
+
+        def index_changed_paths(index, revision_ids, batch_size=100):
+            self.assertEqual([], revision_ids)
+
+        repo._pack_collection._index_changed_paths = index_changed_paths
+        repo.pack()
+        repo = repo.controldir.open_repository()
+        with repo.lock_read():
+            index = repo.get_changed_paths_index()
+            self.assertEqual({rev1, rev2}, set(index._changes))
+            names = repo._pack_collection.names()
+        self.assertEqual(1, len(names))
+        self.assertEqual(
+            sorted(names), sorted(repo._transport.list_dir("changed-paths"))
+        )
+
+    def test_index_failure_ignored(self):
+        tree = self.make_tree()
+        collection = tree.branch.repository._pack_collection
+
+        def index_changed_paths(index, revision_ids, batch_size=100):
+            raise errors.BzrError("indexing failed")
+
+        collection._index_changed_paths = index_changed_paths
+        rev1 = tree.commit("one")
+        self.assertEqual(rev1, tree.branch.last_revision())
+        self.assertFalse(tree.branch.repository._transport.has("changed-paths"))
+
+    def test_read_only(self):
+        tree = self.make_branch_and_tree(".", format="2a")
+        tree.commit("one")
+        config.GlobalStack().set("repository.changed_paths_index", True)
+        repo = repository.Repository.open(self.get_readonly_url("."))
+        with repo.lock_read():
+            self.assertEqual(0, repo.get_changed_paths_index().revision_count())
+        self.assertFalse(tree.branch.repository._transport.has("changed-paths"))
+
+    def test_maintained_at_fetch(self):
+        tree = self.make_tree()
+        tree.commit("one")
+        other = tree.controldir.sprout("other").open_workingtree()
+        self.build_tree(["other/a"])
+        other.add(["a"])
+        rev2 = other.commit("two")
+        rev3 = other.commit("three")
+        tree.branch.repository.fetch(other.branch.repository, rev3)
+        repo = tree.branch.repository.controldir.open_repository()
+        with repo.lock_read():
+            index = repo.get_changed_paths_index()
+            self.assertEqual(3, index.revision_count())
+            self.assertEqual({rev2}, index.revisions_touching("a"))
+            self.assertEqual(set(), index.get_changed_paths(rev3))
+
+    def test_existing_revisions_indexed_by_pack(self):
+        tree = self.make_branch_and_tree(".", format="2a")
+        self.build_tree(["a"])
+        tree.add(["a"])
+        rev1 = tree.commit("one")
+        config.GlobalStack().set("repository.changed_paths_index", True)
+        rev2 = tree.commit("two")
+        repo = tree.branch.repository.controldir.open_repository()
+        with repo.lock_read():
+            index = repo.get_changed_paths_index()
+            self.assertEqual({rev2}, set(index._changes))
+        repo.pack()
+        repo = repo.controldir.open_repository()
+        with repo.lock_read():
+            index = repo.get_changed_paths_index()
+            self.assertEqual(2, index.revision_count())
+            self.assertEqual({rev1}, index.revisions_touching("a"))
+
+    def test_log_directory(self):
+        tree = self.make_tree()
+        self.build_tree(["dir/", "dir/a", "b"])
+        tree.add(["dir", "dir/a", "b"])
+        tree.commit("one")
+        self.build_tree_contents([("b", b"changed\n")])
+        tree.commit("two")
+        tree.rename_one("dir", "newdir")
+        tree.commit("three")
+        self.build_tree_contents([("newdir/a", b"changed\n")])
+        tree.commit("four")
+        out, _err = self.run_bzr("log --line newdir")
+        self.assertEqual(
+            ["4", "3", "1"], [line.split(":")[0] for line in out.splitlines()]
+        )
@@ -16,6 +16,8 @@
 
 """Tests for maps built on a CHK versionedfiles facility."""
 
+import threading
+
 from ... import errors, osutils, tests
 from .. import chk_map, groupcompress
 from ..chk_map import (
@@ -59,6 +61,46 @@ class TestNode(tests.TestCase):
         self.assertCommonPrefix(b"", b"", b"")
 
 
+class TestSharedPageCache(tests.TestCase):
+    def test_get_set(self):
+        cache = chk_map.SharedPageCache(1024)
+        key = stuple(b"sha1:" + b"a" * 40)
+        self.assertRaises(KeyError, cache.__getitem__, key)
+        cache[key] = b"page bytes"
+        self.assertEqual(b"page bytes", cache[key])
+        self.assertIn(key, cache)
+        self.assertEqual(1, len(cache))
+        self.assertEqual(
+            {"hits": 1, "misses": 1, "entries": 1, "size": 10, "max_size": 1024},
+            cache.stats(),
+        )
+
+    def test_clear(self):
+        cache = chk_map.SharedPageCache(1024)
+        cache[stuple(b"sha1:" + b"a" * 40)] = b"page bytes"
+        cache[stuple(b"sha1:" + b"b" * 40)] = b"more bytes"
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
+    def test_size_bounded(self):
+        cache = chk_map.SharedPageCache(1024, stripes=1)
+        for i in range(100):
+            cache[stuple(b"sha1:%040d" % i)] = b"x" * 100
+        self.assertLessEqual(cache.stats()["size"], 1024)
+
+    def test_get_cache_uses_shared_cache(self):
+        self.addCleanup(chk_map.disable_shared_page_cache)
+        shared = chk_map.enable_shared_page_cache(1024)
+        self.assertIs(shared, chk_map._get_cache())
+        result = []
+        thread = threading.Thread(target=lambda: result.append(chk_map._get_cache()))
+        thread.start()
+        thread.join()
+        self.assertEqual([shared], result)
+        chk_map.disable_shared_page_cache()
+        self.assertIsNot(shared, chk_map._get_cache())
+
+
 class TestCaseWithStore(tests.TestCaseWithMemoryTransport):
     def get_chk_bytes(self):
         # This creates a standalone CHK store.
@@ -0,0 +1,220 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Tests for breezy.bzr.commit_graph."""
+
+from ... import config, errors, tests
+from ...graph import DictParentsProvider, Graph
+from ...revision import NULL_REVISION
+from ...tests import test_graph
+from .. import commit_graph
+
+
+class TestCommitGraph(tests.TestCase):
+    def make_commit_graph(self, parent_map):
+        parent_map = {
+            key: parents or (NULL_REVISION,)
+            for key, parents in parent_map.items()
+            if key != NULL_REVISION
+        }
+        return commit_graph.CommitGraph.from_parent_map(parent_map)
+
+    def test_generations(self):
+        graph = self.make_commit_graph(test_graph.ancestry_1)
+        self.assertEqual(1, graph.get_generation(NULL_REVISION))
+        self.assertEqual(2, graph.get_generation(b"rev1"))
+        self.assertEqual(3, graph.get_generation(b"rev2b"))
+        self.assertEqual(5, graph.get_generation(b"rev4"))
+        self.assertIs(None, graph.get_generation(b"unknown"))
+
+    def test_ghost(self):
+        graph = self.make_commit_graph(test_graph.with_ghost)
+        self.assertEqual(1, graph.get_generation(b"g"))
+        self.assertEqual(6, graph.revision_count())
+
+    def test_heads(self):
+        graph = self.make_commit_graph(test_graph.ancestry_1)
+        self.assertEqual({b"rev4"}, graph.heads([b"rev1", b"rev4"]))
+        self.assertEqual({b"rev3", b"rev2b"}, graph.heads([b"rev3", b"rev2b"]))
+        self.assertEqual({b"rev4"}, graph.heads([b"rev2a", b"rev2b", b"rev4"]))
+        self.assertIs(None, graph.heads([b"rev1", b"unknown"]))
+
+    def test_is_ancestor(self):
+        graph = self.make_commit_graph(test_graph.ancestry_1)
+        self.assertTrue(graph.is_ancestor(b"rev1", b"rev4"))
+        self.assertTrue(graph.is_ancestor(b"rev4", b"rev4"))
+        self.assertFalse(graph.is_ancestor(b"rev4", b"rev1"))
+        self.assertFalse(graph.is_ancestor(b"rev2a", b"rev2b"))
+        self.assertIs(None, graph.is_ancestor(NULL_REVISION, b"rev1"))
+        self.assertIs(None, graph.is_ancestor(b"unknown", b"rev1"))
+
+    def test_find_difference(self):
+        graph = self.make_commit_graph(test_graph.ancestry_1)
+        self.assertEqual(
+            ({b"rev2a", b"rev3"}, {b"rev2b"}),
+            graph.find_difference(b"rev3", b"rev2b"),
+        )
+        self.assertEqual((set(), set()), graph.find_difference(b"rev4", b"rev4"))
+        self.assertEqual(
+            (set(), {b"rev2a", b"rev2b", b"rev3", b"rev4"}),
+            graph.find_difference(b"rev1", b"rev4"),
+        )
+
+    def test_find_unique_ancestors(self):
+        graph = self.make_commit_graph(test_graph.ancestry_1)
+        self.assertEqual({b"rev2b"}, graph.find_unique_ancestors(b"rev2b", [b"rev3"]))
+        self.assertEqual(
+            set(), graph.find_unique_ancestors(b"rev2a", [b"rev3", b"rev2b"])
+        )
+        self.assertIs(None, graph.find_unique_ancestors(b"rev2a", [b"unknown"]))
+
+    def test_add_revisions(self):
+        graph = self.make_commit_graph({b"rev1": (), b"rev2": (b"rev1", b"ghost")})
+        self.assertTrue(
+            graph.add_revisions({b"rev3": (b"rev2",), b"rev2": (b"rev1", b"ghost")})
+        )
+        self.assertEqual(4, graph.get_generation(b"rev3"))
+        self.assertFalse(graph.add_revisions({b"rev2": (b"rev1",)}))
+        self.assertFalse(graph.add_revisions({b"ghost": (NULL_REVISION,)}))
+        self.assertEqual(4, graph.get_generation(b"rev3"))
+
+    def test_bytes_roundtrip(self):
+        graph = self.make_commit_graph(test_graph.with_ghost)
+        graph.pack_names = ("a" * 32, "b" * 32)
+        loaded = commit_graph.CommitGraph.from_bytes(graph.to_bytes())
+        self.assertEqual(graph.pack_names, loaded.pack_names)
+        self.assertEqual(graph.revision_count(), loaded.revision_count())
+        for key in test_graph.with_ghost:
+            self.assertEqual(graph.get_generation(key), loaded.get_generation(key))
+        self.assertEqual(
+            graph.find_difference(b"e", b"c"), loaded.find_difference(b"e", b"c")
+        )
+
+    def test_from_bytes_invalid(self):
+        self.assertRaises(ValueError, commit_graph.CommitGraph.from_bytes, b"garbage")
+        data = self.make_commit_graph(test_graph.ancestry_1).to_bytes()
+        self.assertRaises(ValueError, commit_graph.CommitGraph.from_bytes, data[:-10])
+
+    def test_graph_uses_index(self):
+        index = self.make_commit_graph(test_graph.ancestry_1)
+        graph = Graph(DictParentsProvider({}), reachability_index=index)
+        self.assertEqual({b"rev4"}, graph.heads([b"rev2b", b"rev4"]))
+        self.assertTrue(graph.is_ancestor(b"rev2b", b"rev4"))
+        self.assertEqual(
+            ({b"rev2a", b"rev3"}, {b"rev2b"}),
+            graph.find_difference(b"rev3", b"rev2b"),
+        )
+
+
+class TestPackRepositoryCommitGraph(tests.TestCaseWithTransport):
+    def make_tree(self):
+        config.GlobalStack().set("repository.commit_graph", True)
+        return self.make_branch_and_tree(".", format="2a")
+
+    def test_disabled_by_default(self):
+        tree = self.make_branch_and_tree(".", format="2a")
+        tree.commit("one")
+        repo = tree.branch.repository
+        self.assertFalse(repo._transport.has("commit-graph"))
+        with repo.lock_read():
+            self.assertIs(None, repo._get_commit_graph())
+
+    def test_written_when_packed(self):
+        tree = self.make_tree()
+        rev1 = tree.commit("one")
+        rev2 = tree.commit("two")
+        repo = tree.branch.repository
+        self.assertFalse(repo._transport.has("commit-graph"))
+        repo.pack()
+        data = repo._transport.get_bytes("commit-graph")
+        rev3 = tree.commit("three")
+        self.assertEqual(data, repo._transport.get_bytes("commit-graph"))
+        repo = repo.controldir.open_repository()
+        with repo.lock_read():
+            index = repo._get_commit_graph()
+            self.assertEqual(3, index.revision_count())
+            self.assertEqual(4, index.get_generation(rev3))
+            graph = repo.get_graph()
+            self.assertIs(index, graph._reachability_index)
+            self.assertTrue(graph.is_ancestor(rev1, rev2))
+            self.assertTrue(graph.is_ancestor(rev2, rev3))
+
+    def test_extended_at_fetch(self):
+        tree = self.make_tree()
+        rev1 = tree.commit("one")
+        tree.branch.repository.pack()
+        other = tree.controldir.sprout("other").open_workingtree()
+        rev2 = other.commit("two")
+        tree.branch.repository.fetch(other.branch.repository, rev2)
+        repo = tree.branch.repository.controldir.open_repository()
+        with repo.lock_read():
+            self.assertEqual(
+                ({rev2}, set()), repo.get_graph().find_difference(rev2, rev1)
+            )
+            self.assertEqual(2, repo._get_commit_graph().revision_count())
+
+    def test_stale_index_ignored_and_rebuilt(self):
+        tree = self.make_tree()
+        tree.commit("one")
+        repo = tree.branch.repository
+        repo.pack()
+        config.GlobalStack().set("repository.commit_graph", False)
+        rev2 = tree.commit("two")
+        repo.pack()
+        config.GlobalStack().set("repository.commit_graph", True)
+        rev3 = tree.commit("three")
+        repo = repo.controldir.open_repository()
+        with repo.lock_read():
+            self.assertIs(None, repo._get_commit_graph())
+        repo.pack()
+        repo = repo.controldir.open_repository()
+        with repo.lock_read():
+            index = repo._get_commit_graph()
+            self.assertEqual(3, index.revision_count())
+            self.assertEqual(4, index.get_generation(rev3))
+            self.assertTrue(index.is_ancestor(rev2, rev3))
+
+    def test_store_failure_ignored(self):
+        tree = self.make_tree()
+        tree.commit("one")
+        tree.commit("two")
+        repo = tree.branch.repository
+        collection = repo._pack_collection
+        put_bytes = collection.transport.put_bytes
+
+        def failing_put_bytes(relpath, *args, **kwargs):
+            if relpath == "commit-graph":
+                raise errors.TransportError("no space left")
+            return put_bytes(relpath, *args, **kwargs)
+
+        collection.transport.put_bytes = failing_put_bytes
+        repo.pack()
+        self.assertEqual(1, len(collection.names()))
+        self.assertIs(None, collection._commit_graph)
+        self.assertFalse(repo._transport.has("commit-graph"))
+
+    def test_not_used_in_write_group(self):
+        tree = self.make_tree()
+        tree.commit("one")
+        repo = tree.branch.repository
+        repo.pack()
+        with repo.lock_write():
+            self.assertIsNot(None, repo._get_commit_graph())
+            repo.start_write_group()
+            try:
+                self.assertIs(None, repo._get_commit_graph())
+            finally:
+                repo.abort_write_group()
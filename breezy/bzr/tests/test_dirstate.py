@@ -1777,6 +1777,50 @@ class TestDirStateHashUpdates(TestCaseWithDirState):
         self.assertEqual(0, len(state._known_hash_changes))
 
 
+class TestPrefetchSHA1s(TestCaseWithDirState):
+    def make_modified_tree(self):
+        tree = self.make_branch_and_tree("tree")
+        self.build_tree(["tree/a", "tree/b", "tree/dir/"])
+        tree.add(["a", "b", "dir"], ids=[b"a-id", b"b-id", b"dir-id"])
+        tree.commit("add a and b")
+        self.build_tree_contents([("tree/b", b"new content\n")])
+        tree.lock_read()
+        self.addCleanup(tree.unlock)
+        return tree
+
+    def prefetch_root(self, state):
+        state._read_dirblocks_if_needed()
+        root_abspath = osutils.realpath("tree").encode("utf-8")
+        dir_info = next(osutils._walkdirs_utf8(root_abspath))
+        state._prefetch_sha1s(state._dirblocks[1], dir_info)
+        return root_abspath
+
+    def test_disabled_by_default(self):
+        tree = self.make_modified_tree()
+        state = tree.current_dirstate()
+        self.prefetch_root(state)
+        self.assertEqual({}, state._sha1_prefetch)
+
+    def test_prefetch_modified_files(self):
+        tree = self.make_modified_tree()
+        state = tree.current_dirstate()
+        state._config_stack.set("dirstate.sha1_threads", 4)
+        root_abspath = self.prefetch_root(state)
+        b_path = root_abspath + b"/b"
+        self.assertIn(b_path, state._sha1_prefetch)
+        self.assertNotIn(root_abspath + b"/dir", state._sha1_prefetch)
+        statvalue, sha1 = state._take_prefetched_sha1(b_path)
+        self.assertEqual(osutils.sha_string(b"new content\n"), sha1)
+        self.assertEqual(len(b"new content\n"), statvalue.st_size)
+        self.assertEqual(None, state._take_prefetched_sha1(b_path))
+
+    def test_iter_changes(self):
+        tree = self.make_modified_tree()
+        tree.current_dirstate()._config_stack.set("dirstate.sha1_threads", 4)
+        changes = list(tree.iter_changes(tree.basis_tree()))
+        self.assertEqual([("b", "b")], [c.path for c in changes])
+
+
 class TestGetLines(TestCaseWithDirState):
     def test_get_line_with_2_rows(self):
         state = self.create_dirstate_with_root_and_subdir()
@@ -16,10 +16,12 @@
 
 """Tests for group compression."""
 
+import random
 import zlib
 
 from ... import config, osutils, tests, trace
 from ...osutils import sha_string
+from ...tests import features
 from ...tests.scenarios import load_tests_apply_scenarios
 from .. import btree_index, groupcompress, knit, versionedfile
 from .. import index as _mod_index
@@ -488,6 +490,46 @@ class TestGroupCompressBlock(tests.TestCase):
         # fully consumed
         self.assertIs(None, block._z_content_decompressor)
 
+    def test_zstd_roundtrip(self):
+        self.requireFeature(features.zstandard)
+        content = b"this is some content\n" b"this content will be compressed\n"
+        gcb = groupcompress.GroupCompressBlock("zstd")
+        gcb.set_content(content)
+        data = gcb.to_bytes()
+        self.assertStartsWith(
+            data, b"gcb1s\n%d\n%d\n" % (gcb._z_content_length, len(content))
+        )
+        block = groupcompress.GroupCompressBlock.from_bytes(data)
+        self.assertEqual("zstd", block._compressor_name)
+        block._ensure_content()
+        self.assertEqual(content, block._content)
+        # Serializing again keeps the zstd header
+        self.assertEqual(data, block.to_bytes())
+
+    def test_zstd_partial_decomp(self):
+        self.requireFeature(features.zstandard)
+        content_chunks = []
+        for i in range(2048):
+            next_content = b"%d\nThis is a bit of duplicate text\n" % (i,)
+            content_chunks.append(next_content)
+            next_sha1 = osutils.sha_string(next_content)
+            content_chunks.append(next_sha1 + b"\n")
+        content = b"".join(content_chunks)
+        gcb = groupcompress.GroupCompressBlock("zstd")
+        gcb.set_chunked_content(content_chunks, len(content))
+        block = groupcompress.GroupCompressBlock.from_bytes(gcb.to_bytes())
+        block._ensure_content(100)
+        self.assertGreaterEqual(len(block._content), 100)
+        self.assertLess(len(block._content), len(content))
+        self.assertEqualDiff(content[: len(block._content)], block._content)
+        cur_len = len(block._content) + 10
+        block._ensure_content(cur_len)
+        self.assertGreaterEqual(len(block._content), cur_len)
+        self.assertEqualDiff(content[: len(block._content)], block._content)
+        block._ensure_content(len(content))
+        self.assertEqualDiff(content, block._content)
+        self.assertIs(None, block._z_content_decompressor)
+
     def test__dump(self):
         dup_content = b"some duplicate content\nwhich is sufficiently long\n"
         key_to_text = {
@@ -624,6 +666,25 @@ class TestGroupCompressVersionedFiles(TestCaseWithGroupCompressVersionedFiles):
             {"max_bytes_to_index": 1234}, record._manager._get_compressor_settings()
         )
 
+    def test_get_record_stream_block_compressor_setting(self):
+        vf = self.make_test_vf(True, dir="source")
+        vf._block_compressor = "zstd"
+        vf._max_bytes_to_index = 1234
+        self.assertEqual(
+            {"max_bytes_to_index": 1234, "compressor": "zstd"},
+            vf._get_compressor_settings(),
+        )
+
+    def test__can_reuse_block(self):
+        vf = self.make_test_vf(True, dir="source")
+        zlib_block = groupcompress.GroupCompressBlock.from_bytes(b"gcb1z\n0\n0\n")
+        zstd_block = groupcompress.GroupCompressBlock.from_bytes(b"gcb1s\n0\n0\n")
+        self.assertTrue(vf._can_reuse_block(zlib_block))
+        self.assertFalse(vf._can_reuse_block(zstd_block))
+        vf._block_compressor = "zstd"
+        self.assertTrue(vf._can_reuse_block(zlib_block))
+        self.assertTrue(vf._can_reuse_block(zstd_block))
+
     @staticmethod
     def grouped_stream(revision_ids, first_parents=()):
         parents = first_parents
@@ -751,6 +812,99 @@ class TestGroupCompressVersionedFiles(TestCaseWithGroupCompressVersionedFiles):
             else:
                 self.assertIs(block, record._manager._block)
 
+    def make_large_stream(self, count=6, prefix=b"text", seed=42):
+        # Texts without common content, so that the groups fill up quickly
+        rand = random.Random(seed)  # noqa: S311
+        return [
+            versionedfile.ChunkedContentFactory(
+                (b"%s-%d" % (prefix, i),), (), None, [rand.randbytes(1536 * 1024)]
+            )
+            for i in range(count)
+        ]
+
+    def test__insert_record_stream_compression_threads(self):
+        vf = self.make_test_vf(True, dir="source")
+        vf._compression_threads = 2
+        stream = self.make_large_stream()
+        texts = {record.key: record.get_bytes_as("fulltext") for record in stream}
+        results = []
+        for sha1, length in vf._insert_record_stream(stream, reuse_blocks=False):
+            results.append((sha1, length))
+            # Texts are readable while their group is still being compressed
+            record = next(vf.get_record_stream([(b"text-0",)], "unordered", True))
+            self.assertEqual(texts[(b"text-0",)], record.get_bytes_as("fulltext"))
+        self.assertEqual(
+            [(sha_string(texts[r.key]), len(texts[r.key])) for r in stream], results
+        )
+        self.assertEqual({}, vf._unadded_refs)
+        self.assertIs(None, vf._write_pending_blocks)
+        vf.writer.end()
+        blocks = set()
+        for record in vf.get_record_stream(list(texts), "unordered", False):
+            blocks.add(record._manager._block)
+        self.assertGreater(len(blocks), 1)
+        for record in vf.get_record_stream(list(texts), "unordered", True):
+            self.assertEqual(texts[record.key], record.get_bytes_as("fulltext"))
+
+    def test__insert_record_stream_compression_threads_same_blocks(self):
+        serial = self.make_test_vf(True, dir="serial")
+        list(serial._insert_record_stream(self.make_large_stream()))
+        threaded = self.make_test_vf(True, dir="threaded")
+        threaded._compression_threads = 4
+        list(threaded._insert_record_stream(self.make_large_stream()))
+        keys = [(b"text-%d" % i,) for i in range(6)]
+
+        def positions(vf):
+            return {
+                key: details.index_memo[1:]
+                for key, details in vf._index.get_build_details(keys).items()
+            }
+
+        self.assertEqual(positions(serial), positions(threaded))
+
+    def test__insert_record_stream_compression_threads_reused_blocks(self):
+        source = self.make_test_vf(True, dir="source")
+        list(source._insert_record_stream(self.make_large_stream(prefix=b"src")))
+        source.writer.end()
+        source_keys = [(b"src-%d" % i,) for i in range(6)]
+
+        def make_mixed_stream():
+            # Full groups are compressed, then whole blocks of the source
+            # are reused as-is, then more texts are compressed
+            yield from self.make_large_stream(count=3)
+            yield from source.get_record_stream(source_keys, "groupcompress", False)
+            yield from self.make_large_stream(count=3, prefix=b"end", seed=43)
+
+        serial = self.make_test_vf(True, dir="serial")
+        list(serial._insert_record_stream(make_mixed_stream()))
+        threaded = self.make_test_vf(True, dir="threaded")
+        threaded._compression_threads = 4
+        list(threaded._insert_record_stream(make_mixed_stream()))
+        keys = (
+            [(b"text-%d" % i,) for i in range(3)]
+            + source_keys
+            + [(b"end-%d" % i,) for i in range(3)]
+        )
+
+        def positions(vf):
+            return {
+                key: details.index_memo[1:]
+                for key, details in vf._index.get_build_details(keys).items()
+            }
+
+        self.assertEqual(positions(serial), positions(threaded))
+        # The source blocks were reused, rather than recompressed
+        self.assertEqual(
+            positions(source)[(b"src-0",)][2:], positions(serial)[(b"src-0",)][2:]
+        )
+        threaded.writer.end()
+        texts = {
+            record.key: record.get_bytes_as("fulltext")
+            for record in source.get_record_stream(source_keys, "unordered", True)
+        }
+        for record in threaded.get_record_stream(source_keys, "unordered", True):
+            self.assertEqual(texts[record.key], record.get_bytes_as("fulltext"))
+
     def test_add_missing_noncompression_parent_unvalidated_index(self):
         unvalidated = self.make_g_index_missing_parent()
         combined = _mod_index.CombinedGraphIndex([unvalidated])
@@ -869,6 +1023,15 @@ class TestGroupCompressConfig(tests.TestCaseWithTransport):
         if isinstance(gc, groupcompress.PyrexGroupCompressor):
             self.assertEqual(10000, gc._delta_index._max_bytes_to_index)
 
+    def test_compression_threads_default(self):
+        vf = self.make_test_vf()
+        self.assertEqual(1, vf._get_compression_threads())
+
+    def test_compression_threads_in_config(self):
+        config.GlobalStack().set("bzr.groupcompress.compression_threads", "4")
+        vf = self.make_test_vf()
+        self.assertEqual(4, vf._get_compression_threads())
+
     def test_max_bytes_to_index_bad_config(self):
         c = config.GlobalConfig()
         c.set_user_option("bzr.groupcompress.max_bytes_to_index", "boogah")
@@ -0,0 +1,301 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Tests for breezy.bzr.merge_sort_cache."""
+
+from io import BytesIO
+
+from ... import config, tests
+from .. import merge_sort_cache
+
+
+def _as_tuples(nodes):
+    return [(n.key, n.merge_depth, n.revno, n.end_of_merge) for n in nodes]
+
+
+class TestExtendMergeSort(tests.TestCase):
+    # A 0   [D, B]
+    # B  1  [C, F]
+    # C  1  [H]
+    # D 0   [H, E]
+    # E  1  [G, F]
+    # F   2 [G]
+    # G  1  [H]
+    # H 0
+    graph = {
+        b"A": (b"D", b"B"),
+        b"B": (b"C", b"F"),
+        b"C": (b"H",),
+        b"D": (b"H", b"E"),
+        b"E": (b"G", b"F"),
+        b"F": (b"G",),
+        b"G": (b"H",),
+        b"H": (),
+    }
+    expected = [
+        (b"A", 0, (3,), False),
+        (b"B", 1, (1, 3, 2), False),
+        (b"C", 1, (1, 3, 1), True),
+        (b"D", 0, (2,), False),
+        (b"E", 1, (1, 1, 2), False),
+        (b"F", 2, (1, 2, 1), True),
+        (b"G", 1, (1, 1, 1), True),
+        (b"H", 0, (1,), True),
+    ]
+
+    def test_from_scratch(self):
+        nodes = merge_sort_cache.extend_merge_sort([], self.graph, b"A")
+        self.assertEqual(self.expected, _as_tuples(nodes))
+
+    def test_extend(self):
+        old_revs = {b"D", b"E", b"F", b"G", b"H"}
+        old_nodes = merge_sort_cache.extend_merge_sort(
+            [], {k: self.graph[k] for k in old_revs}, b"D"
+        )
+        self.assertEqual(self.expected[3:], _as_tuples(old_nodes))
+        nodes = merge_sort_cache.extend_merge_sort(
+            old_nodes,
+            {k: v for k, v in self.graph.items() if k not in old_revs},
+            b"A",
+        )
+        self.assertEqual(self.expected, _as_tuples(nodes))
+
+    def test_extend_ghost_and_new_root(self):
+        old_nodes = merge_sort_cache.extend_merge_sort(
+            [], {b"A": (), b"B": (b"A",)}, b"B"
+        )
+        nodes = merge_sort_cache.extend_merge_sort(
+            old_nodes,
+            {b"C": (b"B", b"D", b"ghost"), b"D": ()},
+            b"C",
+        )
+        self.assertEqual(
+            [
+                (b"C", 0, (3,), False),
+                (b"D", 1, (0, 1, 1), True),
+                (b"B", 0, (2,), False),
+                (b"A", 0, (1,), True),
+            ],
+            _as_tuples(nodes),
+        )
+
+    def test_truncate(self):
+        nodes = merge_sort_cache.extend_merge_sort([], self.graph, b"A")
+        self.assertEqual(
+            self.expected[3:],
+            _as_tuples(merge_sort_cache.truncate_merge_sort(nodes, b"D")),
+        )
+        self.assertEqual(
+            self.expected, _as_tuples(merge_sort_cache.truncate_merge_sort(nodes, b"A"))
+        )
+        # Merged revisions and unknown revisions can't be truncated to
+        self.assertIs(None, merge_sort_cache.truncate_merge_sort(nodes, b"E"))
+        self.assertIs(None, merge_sort_cache.truncate_merge_sort(nodes, b"X"))
+
+
+class TestSerialize(tests.TestCase):
+    nodes = [
+        merge_sort_cache.MergeSortNode(b"B", 0, (2,), False),
+        merge_sort_cache.MergeSortNode(b"C", 1, (1, 1, 1), True),
+        merge_sort_cache.MergeSortNode(b"A", 0, (1,), True),
+    ]
+
+    def test_roundtrip(self):
+        f = BytesIO(
+            b"".join(
+                merge_sort_cache.serialize(b"B", {b"ghost", b"odd\n id"}, self.nodes)
+            )
+        )
+        self.assertEqual(
+            (b"B", {b"ghost", b"odd\n id"}), merge_sort_cache.read_header(f)
+        )
+        self.assertEqual(
+            _as_tuples(self.nodes), _as_tuples(merge_sort_cache.read_nodes(f))
+        )
+
+    def test_no_ghosts(self):
+        f = BytesIO(b"".join(merge_sort_cache.serialize(b"B", set(), self.nodes)))
+        self.assertEqual((b"B", set()), merge_sort_cache.read_header(f))
+
+    def test_invalid(self):
+        self.assertRaises(
+            ValueError, merge_sort_cache.read_header, BytesIO(b"garbage\n")
+        )
+        self.assertRaises(
+            ValueError,
+            merge_sort_cache.read_header,
+            BytesIO(merge_sort_cache.FORMAT_MARKER + b"B\n"),
+        )
+        self.assertRaises(
+            ValueError,
+            merge_sort_cache.read_header,
+            BytesIO(merge_sort_cache.FORMAT_MARKER + b"10\nl1:Be"),
+        )
+        self.assertRaises(ValueError, merge_sort_cache.read_nodes, BytesIO(b"l1:Ae"))
+
+
+class TestBranchMergeSortCache(tests.TestCaseWithTransport):
+    expected = [
+        (b"3", 0, (3,), False),
+        (b"1.1.2", 1, (1, 1, 2), False),
+        (b"1.2.1", 2, (1, 2, 1), True),
+        (b"1.1.1", 1, (1, 1, 1), True),
+        (b"2", 0, (2,), False),
+        (b"1", 0, (1,), True),
+    ]
+
+    def make_merged_branch(self):
+        builder = self.make_branch_builder("branch")
+        builder.start_series()
+        builder.build_snapshot(
+            None, [("add", ("", b"TREE_ROOT", "directory", ""))], revision_id=b"1"
+        )
+        builder.build_snapshot([b"1"], [], revision_id=b"1.1.1")
+        builder.build_snapshot([b"1"], [], revision_id=b"2")
+        builder.build_snapshot([b"1.1.1"], [], revision_id=b"1.2.1")
+        builder.build_snapshot([b"1.1.1", b"1.2.1"], [], revision_id=b"1.1.2")
+        builder.build_snapshot([b"2", b"1.1.2"], [], revision_id=b"3")
+        builder.finish_series()
+        return builder
+
+    def merge_sorted(self, branch):
+        branch = branch.controldir.open_branch()
+        with branch.lock_read():
+            return [
+                (revid, depth, revno, eom)
+                for revid, depth, revno, eom in branch.iter_merge_sorted_revisions()
+            ]
+
+    def read_cache_header(self, branch):
+        with branch._transport.get("merge-sort-cache") as f:
+            return merge_sort_cache.read_header(f)
+
+    def test_disabled_by_default(self):
+        branch = self.make_merged_branch().get_branch()
+        self.merge_sorted(branch)
+        self.assertFalse(branch._transport.has("merge-sort-cache"))
+
+    def test_written_when_tip_changes(self):
+        config.GlobalStack().set("branch.merge_sort_cache", True)
+        branch = self.make_merged_branch().get_branch()
+        self.assertEqual((b"3", set()), self.read_cache_header(branch))
+        self.assertEqual(self.expected, self.merge_sorted(branch))
+
+    def test_not_written_when_reading(self):
+        branch = self.make_merged_branch().get_branch()
+        branch.get_config_stack().set("branch.merge_sort_cache", True)
+        self.assertEqual(self.expected, self.merge_sorted(branch))
+        self.assertFalse(branch._transport.has("merge-sort-cache"))
+
+    def test_used(self):
+        config.GlobalStack().set("branch.merge_sort_cache", True)
+        branch = self.make_merged_branch().get_branch()
+        with branch.lock_write():
+            branch._transport.put_bytes(
+                "merge-sort-cache",
+                b"".join(
+                    merge_sort_cache.serialize(
+                        b"3",
+                        set(),
+                        [merge_sort_cache.MergeSortNode(b"3", 0, (42,), True)],
+                    )
+                ),
+            )
+        self.assertEqual([(b"3", 0, (42,), True)], self.merge_sorted(branch))
+
+    def test_ignored_for_other_tip(self):
+        config.GlobalStack().set("branch.merge_sort_cache", True)
+        branch = self.make_merged_branch().get_branch()
+        # Move the tip without going through set_last_revision_info
+        with branch.lock_write():
+            branch._write_last_revision_info(2, b"2")
+        self.assertEqual(
+            [(b"2", 0, (2,), False), (b"1", 0, (1,), True)],
+            self.merge_sorted(branch),
+        )
+
+    def test_extended_when_tip_advances(self):
+        config.GlobalStack().set("branch.merge_sort_cache", True)
+        builder = self.make_merged_branch()
+        builder.start_series()
+        builder.build_snapshot([b"3"], [], revision_id=b"4")
+        builder.build_snapshot([b"1.1.2"], [], revision_id=b"1.1.3")
+        builder.build_snapshot([b"4", b"1.1.3"], [], revision_id=b"5")
+        builder.finish_series()
+        branch = builder.get_branch()
+        with branch.lock_write():
+            branch.set_last_revision_info(3, b"3")
+        self.assertEqual((b"3", set()), self.read_cache_header(branch))
+
+        def get_known_graph_ancestry(revision_ids):
+            self.fail("history recomputed")
+
+        branch.repository.get_known_graph_ancestry = get_known_graph_ancestry
+        with branch.lock_write():
+            branch.set_last_revision_info(5, b"5")
+        self.assertEqual((b"5", set()), self.read_cache_header(branch))
+        self.assertEqual(
+            [
+                (b"5", 0, (5,), False),
+                (b"1.1.3", 1, (1, 1, 3), True),
+                (b"4", 0, (4,), False),
+            ]
+            + self.expected,
+            self.merge_sorted(branch),
+        )
+
+    def test_after_uncommit(self):
+        config.GlobalStack().set("branch.merge_sort_cache", True)
+        branch = self.make_merged_branch().get_branch()
+        with branch.lock_write():
+            branch.set_last_revision_info(2, b"2")
+        self.assertEqual((b"2", set()), self.read_cache_header(branch))
+        self.assertEqual(
+            [(b"2", 0, (2,), False), (b"1", 0, (1,), True)],
+            self.merge_sorted(branch),
+        )
+
+    def test_ghost_filled_in(self):
+        config.GlobalStack().set("branch.merge_sort_cache", True)
+        builder = self.make_branch_builder("branch")
+        builder.start_series()
+        builder.build_snapshot(
+            None, [("add", ("", b"TREE_ROOT", "directory", ""))], revision_id=b"1"
+        )
+        builder.build_snapshot([b"1", b"ghost"], [], revision_id=b"2")
+        builder.finish_series()
+        branch = builder.get_branch()
+        self.assertEqual((b"2", {b"ghost"}), self.read_cache_header(branch))
+        self.assertEqual(
+            [(b"2", 0, (2,), False), (b"1", 0, (1,), True)],
+            self.merge_sorted(branch),
+        )
+        other = self.make_branch_builder("other")
+        other.start_series()
+        other.build_snapshot(
+            None, [("add", ("", b"TREE_ROOT", "directory", ""))], revision_id=b"1"
+        )
+        other.build_snapshot([b"1"], [], revision_id=b"ghost")
+        other.finish_series()
+        branch.repository.fetch(other.get_branch().repository, b"ghost")
+        self.assertEqual(
+            [
+                (b"2", 0, (2,), False),
+                (b"ghost", 1, (1, 1, 1), True),
+                (b"1", 0, (1,), True),
+            ],
+            self.merge_sorted(branch),
+        )
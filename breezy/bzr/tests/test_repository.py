@@ -27,6 +27,7 @@ from stat import S_ISDIR
 
 import breezy
 from breezy import (
+    config,
     controldir,
     errors,
     osutils,
@@ -598,6 +599,12 @@ class Test2a(tests.TestCaseWithMemoryTransport):
         repo = self.make_repository("repo", format="2a")
         self.assertTrue(repo._format.pack_compresses)
 
+    def test_zstd_format_uses_zstd_blocks(self):
+        repo = self.make_repository("repo", format="development-zstd")
+        self.assertEqual("zstd", repo._format._block_compressor)
+        for vf in (repo.texts, repo.inventories, repo.chk_bytes, repo.revisions):
+            self.assertEqual("zstd", vf._block_compressor)
+
     def test_inventories_use_chk_map_with_parent_base_dict(self):
         tree = self.make_branch_and_memory_tree("repo", format="2a")
         tree.lock_write()
@@ -1200,6 +1207,54 @@ class TestRepositoryPackCollection(TestCaseWithTransport):
         pack_operations = packs.plan_autopack_combinations(existing_packs, distribution)
         self.assertEqual([[130, ["a", "b", "c", "f", "g"]]], pack_operations)
 
+    def test_plan_size_tiered_combinations(self):
+        packs = self.get_packs()
+        existing_packs = [
+            (50000000, 100, "huge"),
+            (3000000, 1, "big1"),
+            (2000000, 1, "big2"),
+            (1000000, 3, "big3"),
+            (5000, 1, "small1"),
+            (3000, 2, "small2"),
+            (2000, 1, "small3"),
+        ]
+        # Neither tier has four packs yet
+        self.assertEqual([], packs.plan_size_tiered_combinations(existing_packs))
+        existing_packs.extend([(4000, 1, "small4"), (1500000, 1, "big4")])
+        self.assertEqual(
+            [
+                [5, ["small3", "small2", "small4", "small1"]],
+                [6, ["big3", "big4", "big2", "big1"]],
+            ],
+            packs.plan_size_tiered_combinations(existing_packs),
+        )
+
+    def test_plan_size_tiered_combinations_budget(self):
+        packs = self.get_packs()
+        existing_packs = [
+            (3000000, 1, "big1"),
+            (2000000, 1, "big2"),
+            (1000000, 3, "big3"),
+            (1500000, 1, "big4"),
+            (5000, 1, "small1"),
+            (3000, 2, "small2"),
+            (2000, 1, "small3"),
+            (4000, 1, "small4"),
+        ]
+        self.assertEqual(
+            [[5, ["small3", "small2", "small4", "small1"]], [4, ["big3", "big4"]]],
+            packs.plan_size_tiered_combinations(existing_packs, budget=2600000),
+        )
+        self.assertEqual(
+            [[3, ["small3", "small2"]]],
+            packs.plan_size_tiered_combinations(existing_packs, budget=5000),
+        )
+        # Combining a single pack would be pointless
+        self.assertEqual(
+            [[5, ["small3", "small2", "small4", "small1"]]],
+            packs.plan_size_tiered_combinations(existing_packs, budget=1020000),
+        )
+
     def test_all_packs_none(self):
         format = self.get_format()
         tree = self.make_branch_and_tree(".", format=format)
@@ -1371,6 +1426,39 @@ class TestRepositoryPackCollection(TestCaseWithTransport):
         self.assertEqual(1, len(packs.names()))
         self.assertEqual(tree.branch.repository._pack_collection.names(), packs.names())
 
+    def test_autopack_by_size(self):
+        tree, _r, packs, _revs = self.make_packs_and_alt_repo(write_lock=True)
+        config.GlobalStack().set("repository.autopack", "size")
+        # Three packs do not fill the smallest tier yet
+        self.assertFalse(packs.autopack())
+        self.assertEqual(3, len(packs.names()))
+        config.GlobalStack().set("repository.autopack", "revisions")
+        tree.commit("four")
+        config.GlobalStack().set("repository.autopack", "size")
+        packs.reload_pack_names()
+        self.assertEqual(4, len(packs.names()))
+        self.assertTrue(packs.autopack())
+        self.assertEqual(1, len(packs.names()))
+        self.assertEqual(tree.branch.repository._pack_collection.names(), packs.names())
+
+    def test_autopack_in_background(self):
+        self.addCleanup(pack_repo.wait_for_background_autopacks)
+        config.GlobalStack().set("repository.autopack", "background")
+        tree = self.make_branch_and_tree(".", format=self.get_format())
+        for message in ["one", "two", "three", "four"]:
+            tree.commit(message)
+        # The packs are combined by another process
+        self.assertEqual(
+            [tree.branch.repository.controldir.root_transport.local_abspath(".")],
+            list(pack_repo._background_autopacks),
+        )
+        pack_repo.wait_for_background_autopacks()
+        r = repository.Repository.open(".")
+        with r.lock_read():
+            self.assertEqual(1, len(r._pack_collection.names()))
+            self.assertEqual(4, len(r.all_revision_ids()))
+        self.assertFalse(r.control_files.get_physical_lock_status())
+
     def test__save_pack_names(self):
         tree, r, packs, revs = self.make_packs_and_alt_repo(write_lock=True)
         names = packs.names()
@@ -32,9 +32,9 @@ from io import BytesIO
 import fastbencode as bencode
 
 from breezy import branch as _mod_branch
-from breezy import controldir, errors, gpg, tests, transport, urlutils
+from breezy import config, controldir, errors, gpg, tests, transport, urlutils
 from breezy.bzr import branch as _mod_bzrbranch
-from breezy.bzr import inventory_delta, versionedfile
+from breezy.bzr import clone_bundle, inventory_delta, versionedfile
 from breezy.bzr.inventory import _make_delta
 from breezy.bzr.smart import branch as smart_branch
 from breezy.bzr.smart import bzrdir as smart_dir
@@ -1961,6 +1961,79 @@ class TestSmartServerRepositoryGetStream(GetStreamTestBase):
         self.assertStartsWith(stream_bytes, b"Bazaar pack format 1")
 
 
+class TestSmartServerRepositoryGetStreamCloneBundle(GetStreamTestBase):
+    def get_ancestry_stream(self, repo, heads):
+        request = smart_repo.SmartServerRepositoryGetStream_1_19(self.get_transport())
+        request.execute(b"", repo._format.network_name())
+        response = request.do_body(b"\n".join([b"ancestry-of"] + heads))
+        self.assertEqual((b"ok",), response.args)
+        return b"".join(response.body_stream)
+
+    def get_bundle_heads(self, repo):
+        bundle = clone_bundle.read_clone_bundle(repo._transport)
+        if bundle is None:
+            return None
+        bundle.close()
+        return bundle.heads
+
+    def insert_stream(self, stream_bytes):
+        src_format, stream = smart_repo._byte_stream_to_stream([stream_bytes])
+        target = self.make_repository("target")
+        with target.lock_write():
+            target._get_sink().insert_stream(stream, src_format, [])
+        return target
+
+    def test_disabled_by_default(self):
+        repo, _r1, r2 = self.make_two_commit_repo()
+        self.get_ancestry_stream(repo, [r2])
+        self.assertIs(None, self.get_bundle_heads(repo))
+
+    def test_saved_and_reused(self):
+        config.GlobalStack().set("serve.clone_bundles", True)
+        repo, r1, r2 = self.make_two_commit_repo()
+        self.get_ancestry_stream(repo, [r1])
+        self.assertEqual({r1}, self.get_bundle_heads(repo))
+        # The bundle is sent, followed by the revisions added since.
+        target = self.insert_stream(self.get_ancestry_stream(repo, [r2]))
+        with target.lock_read():
+            self.assertEqual({r2: (r1,)}, target.get_parent_map([r2]))
+            self.assertTrue(target.has_revision(r1))
+        self.assertEqual({r1}, self.get_bundle_heads(repo))
+
+    def test_refreshed(self):
+        config.GlobalStack().set("serve.clone_bundles", True)
+        config.GlobalStack().set("serve.clone_bundle_refresh", 0)
+        repo, r1, r2 = self.make_two_commit_repo()
+        self.get_ancestry_stream(repo, [r1])
+        target = self.insert_stream(self.get_ancestry_stream(repo, [r2]))
+        with target.lock_read():
+            self.assertTrue(target.has_revision(r2))
+        self.assertEqual({r2}, self.get_bundle_heads(repo))
+
+    def test_readonly_transport(self):
+        config.GlobalStack().set("serve.clone_bundles", True)
+        repo, _r1, r2 = self.make_two_commit_repo()
+        request = smart_repo.SmartServerRepositoryGetStream_1_19(
+            self.get_readonly_transport()
+        )
+        request.execute(b"", repo._format.network_name())
+        response = request.do_body(b"\n".join([b"ancestry-of", r2]))
+        self.assertEqual((b"ok",), response.args)
+        target = self.insert_stream(b"".join(response.body_stream))
+        with target.lock_read():
+            self.assertTrue(target.has_revision(r2))
+        self.assertIs(None, self.get_bundle_heads(repo))
+
+    def test_commit_failure_ignored(self):
+        repo = self.make_repository("repo")
+        writer = clone_bundle.CloneBundleWriter(
+            self.get_readonly_transport("repo"), b"network-name", {b"rev1"}
+        )
+        writer.write(b"data")
+        writer.commit()
+        self.assertIs(None, clone_bundle.read_clone_bundle(repo._transport))
+
+
 class TestSmartServerRequestHasRevision(tests.TestCaseWithMemoryTransport):
     def test_missing_revision(self):
         """For a missing revision, ('no', ) is returned."""
@@ -87,6 +87,18 @@ class CheckJailRequest(request.SmartServerRequest):
         self.jail_transports_log.append(request.jail_info.transports)
 
 
+class StreamingRequest(request.SmartServerRequest):
+    """A request that echoes its body back as a body stream."""
+
+    def do(self):
+        pass
+
+    def do_body(self, body_bytes):
+        return request.SuccessfulSmartServerResponse(
+            (b"ok",), body_stream=iter([body_bytes, body_bytes])
+        )
+
+
 class TestErrors(TestCase):
     def test_disabled_method(self):
         error = request.DisabledMethod("class name")
@@ -135,6 +147,88 @@ class TestSmartRequest(TestCase):
             )
 
 
+class TestRequestMetrics(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.metrics = request.enable_request_metrics()
+        self.addCleanup(request.disable_request_metrics)
+
+    def test_record(self):
+        self.metrics.record(b"foo", 0.5, 10, 0)
+        self.metrics.record(b"foo", 0.001, 3, 1000)
+        stats = self.metrics.stats()[b"foo"]
+        self.assertEqual(2, stats["count"])
+        self.assertEqual(0.5, stats["max_time"])
+        self.assertEqual(13, stats["bytes_received"])
+        self.assertEqual(1000, stats["bytes_sent"])
+        self.assertEqual({19: 1, 10: 1}, stats["latency_histogram"])
+        self.assertEqual({0: 1, 10: 1}, stats["sent_histogram"])
+
+    def test_report_lines(self):
+        self.metrics.record(b"fast", 0.001, 1, 1)
+        self.metrics.record(b"slow", 2.0, 1, 1)
+        lines = self.metrics.report_lines()
+        self.assertEqual(8, len(lines))
+        self.assertStartsWith(lines[0], "slow: 1 requests, 2.000s total")
+        self.assertEqual(
+            [
+                "  latency (us): <2097152: 1",
+                "  bytes in: <2: 1",
+                "  bytes out: <2: 1",
+            ],
+            lines[1:4],
+        )
+        self.assertStartsWith(lines[4], "fast: 1 requests")
+        self.assertEqual("  latency (us): <1024: 1", lines[5])
+
+    def test_handler_records_response(self):
+        handler = request.SmartServerRequestHandler(None, {b"foo": NoBodyRequest}, "/")
+        handler.args_received((b"foo", b"arg"))
+        handler.end_received()
+        stats = self.metrics.stats()
+        self.assertEqual([b"foo"], list(stats))
+        self.assertEqual(1, stats[b"foo"]["count"])
+        self.assertEqual(3, stats[b"foo"]["bytes_received"])
+        self.assertEqual(0, stats[b"foo"]["bytes_sent"])
+
+    def test_handler_records_body_stream(self):
+        handler = request.SmartServerRequestHandler(
+            None, {b"foo": StreamingRequest}, "/"
+        )
+        handler.args_received((b"foo",))
+        handler.accept_body(b"12345")
+        handler.end_received()
+        # Nothing is recorded until the body stream has been sent.
+        self.assertEqual({}, self.metrics.stats())
+        self.assertEqual([b"12345", b"12345"], list(handler.response.body_stream))
+        stats = self.metrics.stats()[b"foo"]
+        self.assertEqual(5, stats["bytes_received"])
+        self.assertEqual(10, stats["bytes_sent"])
+
+    def test_handler_records_dropped_body_stream(self):
+        handler = request.SmartServerRequestHandler(
+            None, {b"foo": StreamingRequest}, "/"
+        )
+        handler.args_received((b"foo",))
+        handler.accept_body(b"12345")
+        handler.end_received()
+        self.assertEqual({}, self.metrics.stats())
+        # e.g. the client went away before the response was sent
+        handler.response.body_stream.close()
+        stats = self.metrics.stats()[b"foo"]
+        self.assertEqual(1, stats["count"])
+        self.assertEqual(0, stats["bytes_sent"])
+        self.assertEqual([b"12345", b"12345"], list(handler.response.body_stream))
+        self.assertEqual(1, self.metrics.stats()[b"foo"]["count"])
+
+    def test_disabled(self):
+        request.disable_request_metrics()
+        handler = request.SmartServerRequestHandler(None, {b"foo": NoBodyRequest}, "/")
+        handler.args_received((b"foo",))
+        handler.end_received()
+        self.assertEqual({}, self.metrics.stats())
+
+
 class TestSmartRequestHandlerErrorTranslation(TestCase):
     """Tests that SmartServerRequestHandler will translate exceptions raised by
     a SmartServerRequest into FailedSmartServerResponses.
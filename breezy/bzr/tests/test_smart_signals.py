@@ -20,8 +20,8 @@ import signal
 import threading
 import weakref
 
-from breezy import tests, transport
-from breezy.bzr.smart import client, medium, server, signals
+from breezy import config, tests, transport
+from breezy.bzr.smart import client, medium, request, server, signals
 
 # Windows doesn't define SIGHUP. And while we could just skip a lot of these
 # tests, we often don't actually care about interaction with 'signal', so we
@@ -199,3 +199,27 @@ class TestInetServer(tests.TestCase):
             self.fail('Got the wrong content back, expected 1M "a"')
         stopped.wait()
         server_thread.join()
+
+
+class TestRequestMetricsSignal(tests.TestCase):
+    def test_sigusr1_logs_request_metrics(self):
+        if getattr(signal, "SIGUSR1", None) is None:
+            raise tests.TestNotApplicable("SIGUSR1 is not available")
+        config.GlobalStack().set("serve.request_metrics", True)
+        r, w = os.pipe()
+        server_read = os.fdopen(r, "rb")
+        self.addCleanup(server_read.close)
+        server_write = os.fdopen(w, "wb")
+        self.addCleanup(server_write.close)
+        factory = server.BzrServerFactory()
+        factory._get_stdin_stdout = lambda: (server_read, server_write)
+        factory.set_up(
+            transport.get_transport("memory:///"), None, None, inet=True, timeout=4.0
+        )
+        self.addCleanup(factory.tear_down)
+        request.request_metrics.record(b"foo", 0.001, 1, 1)
+        handler = signal.getsignal(signal.SIGUSR1)
+        handler(signal.SIGUSR1, None)
+        log = self.get_log()
+        self.assertContainsRe(log, "request metrics: foo: 1 requests")
+        self.assertContainsRe(log, r"request metrics:   latency \(us\): <1024: 1")
@@ -1289,7 +1289,7 @@ class TestGetProtocolFactoryForBytes(tests.TestCase):
 
 
 class TestSmartTCPServer(tests.TestCase):
-    def make_server(self):
+    def make_server(self, max_connections=None):
         """Create a SmartTCPServer that we can exercise.
 
         Note: we don't use SmartTCPServer_for_testing because the testing
@@ -1302,7 +1302,9 @@ class TestSmartTCPServer(tests.TestCase):
         :return: (server, server_thread)
         """
         t = _mod_transport.get_transport_from_url("memory:///")
-        server = _mod_server.SmartTCPServer(t, client_timeout=4.0)
+        server = _mod_server.SmartTCPServer(
+            t, client_timeout=4.0, max_connections=max_connections
+        )
         server._ACCEPT_TIMEOUT = 0.1
         # We don't use 'localhost' because that might be an IPv6 address.
         server.start_server("127.0.0.1", 0)
@@ -1401,6 +1403,34 @@ class TestSmartTCPServer(tests.TestCase):
         server._poll_active_connections(0.1)
         self.assertEqual(0, len(server._active_connections))
 
+    def test_serve_conn_keeps_connection_slots(self):
+        # Connections not accepted by serve() hold no slot, so finishing
+        # them must not release one.
+        server = _mod_server.SmartTCPServer(None, client_timeout=4.0, max_connections=1)
+        server_sock, client_sock = portable_socket_pair()
+        server.serve_conn(server_sock, f"-{self.id()}")
+        client_sock.close()
+        server._poll_active_connections(1.0)
+        self.assertEqual(0, len(server._active_connections))
+        self.assertTrue(server._acquire_connection_slot())
+        self.assertFalse(server._connection_slots.acquire(blocking=False))
+
+    def test_max_connections(self):
+        server, server_thread = self.make_server(max_connections=1)
+        client_sock = self.connect_to_server(server)
+        self.say_hello(client_sock)
+        # The second client is not served while the first is connected.
+        waiting_sock = self.connect_to_server(server)
+        waiting_sock.send(b"hello\n")
+        waiting_sock.settimeout(0.3)
+        self.assertRaises(socket.timeout, waiting_sock.recv, 5)
+        self.assertEqual(1, len(server._active_connections))
+        client_sock.close()
+        waiting_sock.settimeout(None)
+        self.assertEqual(b"ok\x012\n", waiting_sock.recv(5))
+        waiting_sock.close()
+        self.shutdown_server_cleanly(server, server_thread)
+
     def test_serve_closes_out_finished_connections(self):
         server, server_thread = self.make_server()
         # The server is started, connect to it.
@@ -3458,6 +3488,136 @@ class TestResponseEncodingProtocolThree(tests.TestCase):
         self.assertEqual(expected_response, out_stream.getvalue())
 
 
+class TestBodyCompressionProtocolThree(tests.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(protocol.disable_body_compression)
+
+    def send_response(self, response, request_headers):
+        out_stream = BytesIO()
+        responder = protocol.ProtocolThreeResponder(out_stream.write)
+        responder.request_headers_received(request_headers)
+        responder.send_response(response)
+        return out_stream.getvalue()
+
+    def make_response_handler(self, response_bytes):
+        response_handler = message.ConventionalResponseHandler()
+        protocol_decoder = protocol.ProtocolThreeDecoder(
+            response_handler, expect_version_marker=True, accept_body_compression=True
+        )
+        client_medium = medium.SmartSimplePipesClientMedium(
+            BytesIO(response_bytes), BytesIO(), "base"
+        )
+        medium_request = client_medium.get_request()
+        medium_request.finished_writing()
+        response_handler.setProtoAndMediumRequest(protocol_decoder, medium_request)
+        self.assertEqual((b"ok",), response_handler.read_response_tuple(True))
+        return response_handler
+
+    def test_not_compressed_by_default(self):
+        response = _mod_request.SuccessfulSmartServerResponse(
+            (b"ok",), body=b"text\n" * 1000
+        )
+        response_bytes = self.send_response(
+            response, {protocol.ACCEPT_BODY_COMPRESSION_HEADER: b"zlib"}
+        )
+        self.assertNotContainsString(response_bytes, b"Body-Compression")
+        self.assertEndsWith(response_bytes, b"text\ne")
+
+    def test_not_compressed_unless_accepted(self):
+        protocol.enable_body_compression(b"zlib")
+        response = _mod_request.SuccessfulSmartServerResponse(
+            (b"ok",), body=b"text\n" * 1000
+        )
+        response_bytes = self.send_response(response, {})
+        self.assertNotContainsString(response_bytes, b"Body-Compression")
+        response_bytes = self.send_response(
+            response, {protocol.ACCEPT_BODY_COMPRESSION_HEADER: b"zstd"}
+        )
+        self.assertNotContainsString(response_bytes, b"Body-Compression")
+
+    def test_small_body_not_compressed(self):
+        protocol.enable_body_compression(b"zlib")
+        response = _mod_request.SuccessfulSmartServerResponse(
+            (b"ok",), body=b"text\n"
+        )
+        response_bytes = self.send_response(
+            response, {protocol.ACCEPT_BODY_COMPRESSION_HEADER: b"zlib"}
+        )
+        self.assertNotContainsString(response_bytes, b"Body-Compression")
+
+    def test_compressed_body(self):
+        protocol.enable_body_compression(b"zlib", 9)
+        body = b"text\n" * 1000
+        response = _mod_request.SuccessfulSmartServerResponse((b"ok",), body=body)
+        response_bytes = self.send_response(
+            response, {protocol.ACCEPT_BODY_COMPRESSION_HEADER: b"zstd zlib"}
+        )
+        self.assertContainsString(response_bytes, b"16:Body-Compression4:zlib")
+        self.assertLess(len(response_bytes), len(body))
+        response_handler = self.make_response_handler(response_bytes)
+        self.assertEqual(body, response_handler.read_body_bytes())
+
+    def test_compressed_body_stream(self):
+        protocol.enable_body_compression(b"zlib")
+        chunks = [b"first chunk\n" * 100, b"", b"second chunk\n" * 100]
+        response = _mod_request.SuccessfulSmartServerResponse(
+            (b"ok",), body_stream=iter(chunks)
+        )
+        response_bytes = self.send_response(
+            response, {protocol.ACCEPT_BODY_COMPRESSION_HEADER: b"zlib"}
+        )
+        self.assertNotContainsString(response_bytes, b"second chunk")
+        response_handler = self.make_response_handler(response_bytes)
+        self.assertEqual(chunks, list(response_handler.read_streamed_body()))
+
+    def test_large_part_split(self):
+        self.overrideAttr(protocol, "_MAX_DECOMPRESSED_PART_SIZE", 1000)
+        protocol.enable_body_compression(b"zlib")
+        body = b"text\n" * 1000
+        response = _mod_request.SuccessfulSmartServerResponse(
+            (b"ok",), body_stream=iter([body])
+        )
+        response_bytes = self.send_response(
+            response, {protocol.ACCEPT_BODY_COMPRESSION_HEADER: b"zlib"}
+        )
+        response_handler = self.make_response_handler(response_bytes)
+        chunks = list(response_handler.read_streamed_body())
+        self.assertEqual(body, b"".join(chunks))
+        self.assertEqual([1000] * 5, [len(chunk) for chunk in chunks if chunk])
+
+    def test_compressed_request_rejected(self):
+        request_handler = message.ConventionalRequestHandler(
+            _mod_request.SmartServerRequestHandler(None, {}, "/"),
+            protocol.ProtocolThreeResponder(BytesIO().write),
+        )
+        decoder = protocol.ProtocolThreeDecoder(request_handler)
+        decoder.accept_bytes(b"\0\0\0\x1bd16:Body-Compression4:zlibe")
+        self.assertTrue(decoder.decoding_failed)
+
+    def test_unknown_compression(self):
+        self.assertRaises(ValueError, protocol.enable_body_compression, b"bogus")
+
+    def test_unknown_compression_in_headers(self):
+        response_bytes = (
+            protocol.MESSAGE_VERSION_THREE
+            + b"\0\0\0\x1cd16:Body-Compression5:boguse"  # headers
+            + b"oS"  # status flag (success)
+            + b"s\0\0\0\x06l2:oke"  # args struct ('ok',)
+            + b"e"  # end of message
+        )
+        self.assertRaises(
+            errors.SmartProtocolError, self.make_response_handler, response_bytes
+        )
+
+    def test_client_accepts_zlib(self):
+        smart_client = client._SmartClient("dummy medium")
+        self.assertIn(
+            b"zlib",
+            smart_client._headers[protocol.ACCEPT_BODY_COMPRESSION_HEADER].split(),
+        )
+
+
 class TestResponseEncoderBufferingProtocolThree(tests.TestCase):
     """Tests for buffering of responses.
 
@@ -20,7 +20,7 @@
 import os
 import time
 
-from ... import errors, osutils
+from ... import config, errors, osutils
 from ...bzr.inventory_delta import InventoryDelta
 from ...lockdir import LockDir
 from ...tests import TestCaseWithTransport, TestSkipped, features
@@ -814,6 +814,104 @@ class TestWorkingTreeFormat4(TestCaseWithTransport):
         self.assertEqual([b"contents of foo\n"], file_obj.readlines())
 
 
+class _FakeDirtyTracker:
+    def __init__(self):
+        self.paths = set()
+
+    def pop_relpaths(self):
+        paths = self.paths
+        self.paths = set()
+        return paths
+
+
+class TestTrackChanges(TestCaseWithTransport):
+    def make_tracked_tree(self):
+        tree = self.make_branch_and_tree("tree")
+        self.build_tree(["tree/a", "tree/b"])
+        tree.add(["a", "b"])
+        tree.commit("add a and b")
+        tracker = _FakeDirtyTracker()
+        tree.track_changes(tracker)
+        return tree, tracker
+
+    def changed_paths(self, tree):
+        with tree.lock_read():
+            return sorted(
+                c.path[1] or c.path[0]
+                for c in tree.iter_changes(tree.basis_tree(), want_unversioned=True)
+            )
+
+    def test_only_dirty_paths_examined(self):
+        tree, tracker = self.make_tracked_tree()
+        self.build_tree_contents([("tree/a", b"new a\n")])
+        self.assertEqual(["a"], self.changed_paths(tree))
+        # b is not reported by the tracker, so it is not examined
+        self.build_tree_contents([("tree/b", b"new b\n")])
+        self.assertEqual(["a"], self.changed_paths(tree))
+        tracker.paths = {"b"}
+        self.assertEqual(["a", "b"], self.changed_paths(tree))
+        # Paths that were changed are examined again
+        self.build_tree_contents([("tree/a", b"contents of tree/a\n")])
+        self.assertEqual(["b"], self.changed_paths(tree))
+
+    def test_unversioned_directory(self):
+        tree, tracker = self.make_tracked_tree()
+        self.assertEqual([], self.changed_paths(tree))
+        self.build_tree(["tree/unknown/", "tree/unknown/sub/", "tree/unknown/sub/f"])
+        tracker.paths = {"unknown/sub/f"}
+        self.assertEqual(["unknown"], self.changed_paths(tree))
+
+    def test_dirstate_change_walks_tree(self):
+        tree, _tracker = self.make_tracked_tree()
+        self.assertEqual([], self.changed_paths(tree))
+        self.build_tree(["tree/c"])
+        tree.add(["c"])
+        self.assertEqual(["c"], self.changed_paths(tree))
+
+    def test_overflow_walks_tree(self):
+        tree, tracker = self.make_tracked_tree()
+        self.assertEqual([], self.changed_paths(tree))
+        self.build_tree_contents([("tree/b", b"new b\n")])
+        tracker.paths = None
+        self.assertEqual(["b"], self.changed_paths(tree))
+
+
+class TestTrackChangesOption(TestCaseWithTransport):
+    def make_tree(self):
+        tree = self.make_branch_and_tree("tree")
+        self.build_tree(["tree/a"])
+        tree.add(["a"])
+        tree.commit("add a")
+        trackers = []
+
+        def make_dirty_tracker():
+            trackers.append(_FakeDirtyTracker())
+            return trackers[-1]
+
+        tree._make_dirty_tracker = make_dirty_tracker
+        return tree, trackers
+
+    def test_disabled_by_default(self):
+        tree, trackers = self.make_tree()
+        with tree.lock_read():
+            list(tree.iter_changes(tree.basis_tree()))
+        self.assertEqual([], trackers)
+        self.assertIs(None, tree._dirty_tracker)
+
+    def test_enabled(self):
+        tree, trackers = self.make_tree()
+        config.GlobalStack().set("bzr.workingtree.track_changes", True)
+        with tree.lock_read():
+            list(tree.iter_changes(tree.basis_tree()))
+            list(tree.iter_changes(tree.basis_tree()))
+        self.assertEqual(1, len(trackers))
+        self.assertIs(trackers[0], tree._dirty_tracker)
+        # Only the tracked paths are examined from now on
+        self.build_tree_contents([("tree/a", b"new a\n")])
+        with tree.lock_read():
+            self.assertEqual([], list(tree.iter_changes(tree.basis_tree())))
+
+
 class TestCorruptDirstate(TestCaseWithTransport):
     """Tests for how we handle when the dirstate has been corrupted."""
 
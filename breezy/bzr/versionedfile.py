@@ -1043,8 +1043,11 @@ class VersionedFiles:
     :ivar _immediate_fallback_vfs: For subclasses that support stacking,
         this is a list of other VersionedFiles immediately underneath this
         one.  They may in turn each have further fallbacks.
+    :ivar _annotation_cache: AnnotationCache for annotators to use, if any.
     """
 
+    _annotation_cache = None
+
     def add_lines(
         self,
         key,
@@ -1320,7 +1323,7 @@ class VersionedFiles:
     def get_annotator(self):
         from ..annotate import Annotator
 
-        return Annotator(self)
+        return Annotator(self, cache=self._annotation_cache)
 
     missing_keys = index._missing_keys_from_parent_map
 
@@ -23,6 +23,7 @@ WorkingTree.open(dir).
 """
 
 import os
+import weakref
 from io import BytesIO
 from typing import Dict
 
@@ -112,6 +113,10 @@ class DirStateWorkingTree(InventoryWorkingTree):
         self.views = self._make_views()
         # --- allow tests to select the dirstate iter_changes implementation
         self._iter_changes = dirstate._process_entry
+        # See track_changes
+        self._dirty_tracker = None
+        self._tracked_changes = None
+        self._tracking_configured = False
         self._repo_supports_tree_reference = getattr(
             self._branch.repository._format, "supports_tree_reference", False
         )
@@ -148,6 +153,112 @@ class DirStateWorkingTree(InventoryWorkingTree):
         self._dirty = True
         if reset_inventory and self._inventory is not None:
             self._inventory = None
+        self._tracked_changes = None
+
+    def track_changes(self, tracker):
+        """Limit iter_changes to the paths a dirty tracker saw modified.
+
+        Once the tree has been compared completely with one of its parents,
+        later comparisons with that parent only examine the paths that were
+        changed at that point and the paths the tracker has seen modified
+        since, rather than walking the whole tree. Any change to the
+        dirstate, by this or another process, causes a complete comparison
+        again.
+
+        :param tracker: An entered breezy.dirty_tracker.DirtyTracker for
+            the whole tree, or None to stop tracking. The tree takes over
+            marking the tracker clean.
+        """
+        self._dirty_tracker = tracker
+        self._tracked_changes = None
+        self._tracking_configured = True
+
+    def _make_dirty_tracker(self):
+        """Start watching the tree for changes with inotify.
+
+        :return: An entered DirtyTracker, or None if inotify is not
+            available.
+        """
+        try:
+            from ..dirty_tracker import DirtyTracker, TooManyOpenFiles
+        except ImportError as e:
+            trace.mutter("Not tracking changes of %s: %s", self, e)
+            return None
+        # The tracker must not keep the tree alive, as it is closed when the
+        # tree goes away.
+        tracker = DirtyTracker(weakref.proxy(self))
+        try:
+            tracker.__enter__()
+        except TooManyOpenFiles:
+            trace.warning("Too many files open; not using inotify")
+            return None
+        weakref.finalize(self, tracker.__exit__, None, None, None)
+        return tracker
+
+    def _configure_tracking(self):
+        """Track changes if bzr.workingtree.track_changes is enabled."""
+        self._tracking_configured = True
+        if self.get_config_stack().get("bzr.workingtree.track_changes"):
+            self._dirty_tracker = self._make_dirty_tracker()
+
+    def _dirstate_fingerprint(self, state):
+        st = os.fstat(state._state_file.fileno())
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _outermost_unversioned(self, path):
+        """Return the outermost unversioned directory containing path.
+
+        A complete comparison does not descend into unversioned directories,
+        so neither should a comparison limited to tracked paths.
+        """
+        parts = path.split("/")
+        for i in range(1, len(parts)):
+            parent = "/".join(parts[:i])
+            if not self.is_versioned(parent):
+                return parent
+        return path
+
+    def _tracked_specific_files(self, key):
+        """Return the paths iter_changes has to examine, if they are known.
+
+        :param key: Identifies the kind of comparison that is being made.
+        :return: A set of paths, or None if the whole tree has to be
+            compared.
+        """
+        if not self._tracking_configured:
+            self._configure_tracking()
+        tracker = self._dirty_tracker
+        baseline = self._tracked_changes
+        self._tracked_changes = None
+        if tracker is None:
+            return None
+        dirty_paths = tracker.pop_relpaths()
+        if (
+            dirty_paths is None
+            or baseline is None
+            or baseline[0] != key
+            or baseline[1] != self._dirstate_fingerprint(self.current_dirstate())
+        ):
+            return None
+        paths = set(baseline[2])
+        for path in dirty_paths:
+            paths.add(self._outermost_unversioned(path))
+        return paths
+
+    def _record_tracked_changes(self, changes, key, limited):
+        """Remember the paths that changed, for later use by iter_changes."""
+        paths = set()
+        for change in changes:
+            if limited and change.versioned == (False, False):
+                parent = osutils.dirname(change.path[1])
+                if parent and not self.is_versioned(parent):
+                    # Inside an unversioned directory that is reported itself
+                    continue
+            paths.update(path for path in change.path if path is not None)
+            yield change
+        state = self._dirstate
+        if state is not None and state._state_file is not None:
+            self._tracked_changes = (key, self._dirstate_fingerprint(state), paths)
 
     def add_reference(self, sub_tree):
         # use standard implementation, which calls back to self._add
@@ -1274,6 +1385,17 @@ class DirStateWorkingTree(InventoryWorkingTree):
             if self._dirstate is not None:
                 # This is a no-op if there are no modifications.
                 self._dirstate.save()
+                if (
+                    self._tracked_changes is not None
+                    and self._control_files._lock_mode == "r"
+                ):
+                    # Only hashes were updated by this process
+                    self._tracked_changes = self._tracked_changes[:1] + (
+                        self._dirstate_fingerprint(self._dirstate),
+                        self._tracked_changes[2],
+                    )
+                else:
+                    self._tracked_changes = None
                 self._dirstate.unlock()
             # TODO: jam 20070301 We shouldn't have to wipe the dirstate at this
             #       point. Instead, it could check if the header has been
@@ -2405,6 +2527,20 @@ class InterDirStateTree(InterInventoryTree):
             source_index = 1 + parent_ids.index(self.source._revision_id)
             indices = (source_index, target_index)
 
+        tracked_key = None
+        limited = False
+        if specific_files is None and not include_unchanged:
+            tracked_key = (
+                self.source._revision_id,
+                tuple(parent_ids),
+                want_unversioned,
+            )
+            tracked_files = self.target._tracked_specific_files(tracked_key)
+            if tracked_files is not None:
+                specific_files = tracked_files
+                require_versioned = False
+                limited = True
+
         if specific_files is None:
             specific_files = {""}
 
@@ -2454,6 +2590,10 @@ class InterDirStateTree(InterInventoryTree):
             want_unversioned,
             self.target,
         )
+        if self.target._dirty_tracker is not None and tracked_key is not None:
+            return self.target._record_tracked_changes(
+                iter_changes.iter_changes(), tracked_key, limited
+            )
         return iter_changes.iter_changes()
 
     @staticmethod
@@ -43,7 +43,7 @@ from breezy import (
 """,
 )
 
-from . import debug, errors, registry
+from . import debug, errors, registry, trace_events
 from .hooks import Hooks
 from .plugin import disable_plugins, load_plugins, plugin_name
 
@@ -1148,6 +1148,10 @@ def run_bzr(argv, load_plugins=load_plugins, disable_plugins=disable_plugins):
     --coverage
         Generate code coverage report
 
+    --trace-events FILE
+        Record timed spans of the operations of the command to FILE, in the
+        Chrome trace event format.
+
     --concurrency
         Specify the number of processes that can be run concurrently
         (selftest).
@@ -1160,6 +1164,7 @@ def run_bzr(argv, load_plugins=load_plugins, disable_plugins=disable_plugins):
         opt_no_l10n
     ) = opt_no_aliases = False
     opt_lsprof_file = None
+    opt_trace_events_file = None
 
     # --no-plugins is handled specially at a very early stage. We need
     # to load plugins before doing other command parsing so that they
@@ -1178,6 +1183,9 @@ def run_bzr(argv, load_plugins=load_plugins, disable_plugins=disable_plugins):
             opt_lsprof = True
             opt_lsprof_file = argv[i + 1]
             i += 1
+        elif a == "--trace-events":
+            opt_trace_events_file = argv[i + 1]
+            i += 1
         elif a == "--no-plugins":
             opt_no_plugins = True
         elif a == "--no-aliases":
@@ -1205,6 +1213,11 @@ def run_bzr(argv, load_plugins=load_plugins, disable_plugins=disable_plugins):
     cmdline_overrides._from_cmdline(override_config)
 
     debug.set_debug_flags_from_config()
+    if opt_trace_events_file is None and debug.debug_flag_enabled("trace_events"):
+        opt_trace_events_file = trace_events.default_path()
+    if trace_events.is_recording():
+        # Already recorded by the command we are called from
+        opt_trace_events_file = None
 
     if not opt_no_plugins:
         from breezy import config
@@ -1243,6 +1256,8 @@ def run_bzr(argv, load_plugins=load_plugins, disable_plugins=disable_plugins):
         # the verbosity level to propagate.
         saved_verbosity_level = option._verbosity_level
         option._verbosity_level = 0
+        if opt_trace_events_file is not None:
+            trace_events.start_recording()
         if opt_lsprof:
             if opt_coverage:
                 trace.warning("--coverage ignored, because --lsprof is in use.")
@@ -1263,6 +1278,8 @@ def run_bzr(argv, load_plugins=load_plugins, disable_plugins=disable_plugins):
         if debug.debug_flag_enabled("memory"):
             trace.debug_memory("Process status after command:", short=False)
         option._verbosity_level = saved_verbosity_level
+        if opt_trace_events_file is not None:
+            trace_events.stop_recording(opt_trace_events_file)
         # Reset the overrides
         cmdline_overrides._reset()
 
@@ -2536,9 +2536,54 @@ Whether revisions associated with tags should be fetched.
 """,
     )
 )
+option_registry.register(
+    Option(
+        "branch.merge_sort_cache",
+        default=False,
+        from_unicode=bool_from_store,
+        help="""\
+Whether to keep a persistent cache of dotted revision numbers.
+
+If true, the merge sorted history of the branch (dotted revnos and merge
+depths) is stored in the branch whenever its tip is changed, rather than
+being recomputed for every log. When the tip moves along its left-hand
+history, as for commit, pull and uncommit, the stored history is extended or
+truncated instead of being recomputed.
+""",
+    )
+)
 option_registry.register_lazy(
     "transform.orphan_policy", "breezy.transform", "opt_transform_orphan"
 )
+option_registry.register(
+    Option(
+        "bzr.groupcompress.compression_threads",
+        default=1,
+        from_unicode=int_from_store,
+        help="""\
+Number of threads used to compress groups of texts.
+
+When larger than 1, inserting texts into groupcompress repositories (e.g.
+during fetch or pack) compresses each full group in a worker thread while
+the next group is being filled. Groups are still written in order.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "bzr.workingtree.track_changes",
+        default=False,
+        from_unicode=bool_from_store,
+        help="""\
+Whether to watch working trees for changes with inotify.
+
+If true, a dirstate working tree starts watching its files the first time
+it is compared with one of its parents. Later comparisons made by the same
+process, such as repeated ``status`` calls from a long-running process, only
+examine the paths that changed since. This requires pyinotify.
+""",
+    )
+)
 option_registry.register(
     Option(
         "bzr.workingtree.worth_saving_limit",
@@ -2639,6 +2684,20 @@ should not be lost if the machine crashes.  See also repository.fdatasync.
 """,
     )
 )
+option_registry.register(
+    Option(
+        "dirstate.sha1_threads",
+        default=1,
+        from_unicode=int_from_store,
+        help="""\
+Number of threads used to hash modified files when comparing the working tree.
+
+When larger than 1, the files of a directory whose stat information changed
+are hashed concurrently before the directory is compared, which helps on cold
+caches and network filesystems.
+""",
+    )
+)
 option_registry.register(
     ListOption("debug_flags", default=[], help="Debug flags to activate.")
 )
@@ -2667,6 +2726,19 @@ This defaults to the first key associated with the users email.
 """,
     )
 )
+option_registry.register(
+    Option(
+        "http.readv_connections",
+        default=1,
+        from_unicode=int_from_store,
+        help="""\
+Number of connections used to read parts of a file over HTTP.
+
+When more than one, large readv requests that need several GET requests
+are sent concurrently over that many keep-alive connections per host.
+""",
+    )
+)
 option_registry.register(
     Option("language", help="Language to translate messages into.")
 )
@@ -2700,6 +2772,35 @@ may be provided by plugins.
     )
 )
 option_registry.register_lazy("mail_client", "breezy.mail_client", "opt_mail_client")
+option_registry.register(
+    Option(
+        "merge.prefetch_texts",
+        default=False,
+        from_unicode=bool_from_store,
+        help="""\
+Whether to read the texts of files to merge in batches.
+
+If true, the merge3 merge type reads the texts of the files that changed
+in all trees in batches ahead of merging them, rather than one file at a
+time. This mostly helps when merging from remote branches.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "merge.processes",
+        default=1,
+        from_unicode=int_from_store,
+        help="""\
+Number of processes used to merge the texts of files.
+
+When larger than 1, the merge3 merge type reads the texts of the files that
+changed in all trees in batches and merges them in a pool of worker
+processes, while conflicts and changes are still applied to the tree in file
+order. This helps when merging branches with many modified files.
+""",
+    )
+)
 option_registry.register(
     Option(
         "output_encoding",
@@ -2718,6 +2819,21 @@ This option is normally set when creating a branch, the first ``pull`` or by
 """,
     )
 )
+option_registry.register(
+    Option(
+        "plugin_cache",
+        default=False,
+        from_unicode=bool_from_store,
+        help="""\
+Cache what plugins register to import them only when needed.
+
+When enabled, what each plugin registers is recorded in plugin-cache.json
+in the cache directory. Plugins that only provide commands are then no
+longer imported at startup, but when one of their commands is used. Entries
+are refreshed when the files of a plugin change.
+""",
+    )
+)
 option_registry.register(
     Option(
         "post_commit",
@@ -2768,6 +2884,95 @@ uncommitted changes before sending a merge directive.
 """,
     )
 )
+option_registry.register(
+    Option(
+        "repository.annotation_cache",
+        default=False,
+        from_unicode=bool_from_store,
+        help="""\
+Keep a cache of the annotations of file texts in pack repositories?
+
+If true, the annotations computed by ``annotate`` are stored in the
+repository. Later annotations of the same file start from the cached
+annotations of its earlier texts, rather than from the start of its history.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "repository.autopack",
+        default="revisions",
+        help="""\
+How pack repositories combine packs after new data is added.
+
+``revisions`` (the default) keeps the number of packs in line with the
+number of revisions, which can occasionally rewrite most of the repository.
+``size`` combines packs of similar sizes, never rewriting more than
+repository.autopack_budget bytes at a time. ``background`` does the same
+in a separate process, so that commits and pushes do not wait for it. The
+repository is only locked while that process replaces the list of packs.
+Repositories that are not local are autopacked as with ``size``.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "repository.autopack_budget",
+        default="1G",
+        from_unicode=int_SI_from_store,
+        help="""\
+Maximum number of bytes of packs combined by one size-tiered autopack.
+
+Used when repository.autopack is ``size`` or ``background``; the remaining
+packs are combined by later autopacks.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "repository.changed_paths_index",
+        default=False,
+        from_unicode=bool_from_store,
+        help="""\
+Maintain an index of the paths changed by each revision in pack repositories?
+
+If true, the changes each revision makes against its left-hand parent are
+recorded for each pack when it is added, e.g. by commit or fetch, and used by
+commands such as ``log FILE`` to skip revisions that don't touch the files of
+interest. Revisions added before the index was enabled are indexed by
+``brz pack``.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "repository.commit_graph",
+        default=False,
+        from_unicode=bool_from_store,
+        help="""\
+Maintain a reachability index for pack repositories?
+
+If true, a file with the parents and generation number of every revision
+is written whenever packs are combined, e.g. by autopack or ``brz pack``, and
+is used to answer ancestry questions without walking all of history.
+Revisions added since are read from the newer packs.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "repository.mmap_indices",
+        default=False,
+        from_unicode=bool_from_store,
+        help="""\
+Memory map B+Tree indices of local repositories?
+
+If true, index files of repositories on the local filesystem are memory
+mapped rather than read in pages, and index entries are only parsed when
+they are looked up. This makes key lookups in large indices cheaper.
+""",
+    )
+)
 option_registry.register(
     Option(
         "repository.fdatasync",
@@ -2812,6 +3017,31 @@ uncommitted changes before sending a bundle.
     )
 )
 
+option_registry.register(
+    Option(
+        "serve.body_compression",
+        default=None,
+        help="""\
+Compression used for the response bodies of a smart server.
+
+Either "zlib" or "zstd". Bodies are only compressed for clients that
+support the compression; this mostly helps on slow links. If not set,
+response bodies are sent uncompressed.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "serve.body_compression_level",
+        default=None,
+        from_unicode=int_from_store,
+        help="""\
+Compression level for the response bodies of a smart server.
+
+If not set, the default level of serve.body_compression is used.
+""",
+    )
+)
 option_registry.register(
     Option(
         "serve.client_timeout",
@@ -2821,6 +3051,87 @@ option_registry.register(
         " X seconds, consider the client idle, and hangup.",
     )
 )
+option_registry.register(
+    Option(
+        "serve.chk_page_cache_size",
+        default=None,
+        from_unicode=int_SI_from_store,
+        help="""\
+Size of the CHK page cache shared by all connections of a smart server.
+
+If not set, each connection uses its own, smaller, page cache.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "serve.clone_bundles",
+        default=False,
+        from_unicode=bool_from_store,
+        help="""\
+Whether a smart server keeps clone bundles for its repositories.
+
+If true, the stream sent to a client that fetches the whole ancestry of a
+branch into an empty repository is saved in the repository. Later such
+fetches of the same or newer revisions are served from the saved stream,
+followed by a stream of just the revisions added since.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "serve.clone_bundle_refresh",
+        default=1000,
+        from_unicode=int_from_store,
+        help="""\
+Number of new revisions after which a clone bundle is regenerated.
+
+When a fetch needs more revisions than this on top of the saved clone
+bundle, the full stream is generated and saved as the new bundle instead.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "serve.max_connections",
+        default=None,
+        from_unicode=int_from_store,
+        help="""\
+Maximum number of connections a smart server serves concurrently.
+
+Further clients wait until a connection finishes. If not set, there is
+no limit.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "serve.request_metrics",
+        default=False,
+        from_unicode=bool_from_store,
+        help="""\
+Whether a smart server records per-verb request metrics.
+
+Request counts, latencies and sizes are collected for each verb, with
+histograms of the latencies and sizes, and written to the log file when the
+server stops or, where supported, receives SIGUSR1.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "sftp.read_window",
+        default=1,
+        from_unicode=int_from_store,
+        help="""\
+Number of SFTP read requests to keep outstanding per connection.
+
+When more than one, the reads of readv() calls are split into 32kB
+requests and issued concurrently, across calls, so that they wait for
+round trips together rather than one after the other.
+""",
+    )
+)
 option_registry.register(
     Option(
         "ssh", default=None, override_from_env=["BRZ_SSH"], help="SSH vendor to use."
@@ -1274,6 +1274,7 @@ class ControlDirFormat:
     def register_prober(klass, prober: Type["Prober"]):
         """Register a prober that can look for a control dir."""
         klass._probers.append(prober)
+        registry._notify_registration(klass, prober)
 
     @classmethod
     def unregister_prober(klass, prober: Type["Prober"]):
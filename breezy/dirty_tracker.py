@@ -18,7 +18,7 @@
 """Track whether a particular directory structure is dirty."""
 
 import os
-from typing import Set
+from typing import Optional, Set
 
 from pyinotify import (
     IN_ATTRIB,
@@ -48,10 +48,16 @@ class TooManyOpenFiles(Exception):
 class _Process(ProcessEvent):  # type: ignore
     paths: Set[str]
     created: Set[str]
+    overflowed: bool
 
     def my_init(self) -> None:
         self.paths = set()
         self.created = set()
+        self.overflowed = False
+
+    def process_IN_Q_OVERFLOW(self, event: Event) -> None:
+        # Events were dropped, so any path may have changed.
+        self.overflowed = True
 
     def process_default(self, event: Event) -> None:
         path = os.path.join(event.path, event.name)
@@ -111,11 +117,12 @@ class DirtyTracker:
         self._process_pending()
         self._process.paths.clear()
         self._process.created.clear()
+        self._process.overflowed = False
 
     def is_dirty(self) -> bool:
         """Check whether there are any changes."""
         self._process_pending()
-        return bool(self._paths)
+        return bool(self._paths) or self._process.overflowed
 
     def paths(self) -> Set[str]:
         """Return the paths that have changed."""
@@ -133,3 +140,19 @@ class DirtyTracker:
     def relpaths(self) -> Set[str]:
         """Return the paths relative to the tree root that changed."""
         return {self._tree.relpath(p) for p in self.paths()}
+
+    def pop_relpaths(self) -> Optional[set[str]]:
+        """Return the paths that changed and mark the subtree clean.
+
+        :return: The paths relative to the tree root that changed, or None
+            if the kernel dropped events and any path may have changed.
+        """
+        self._process_pending()
+        if self._process.overflowed:
+            paths = None
+        else:
+            paths = {self._tree.relpath(p) for p in self._paths}
+        self._process.paths.clear()
+        self._process.created.clear()
+        self._process.overflowed = False
+        return paths
@@ -173,6 +173,56 @@ def _export_iter_entries(tree, subdir, skip_special=True, recurse_nested=False):
         yield final_path, path, entry
 
 
+# Number of entries whose file texts are retrieved together by
+# _export_iter_contents.
+_FETCH_BATCH_SIZE = 500
+
+
+def _export_iter_contents(tree, subdir, recurse_nested=False):
+    """Iter the entries for tree suitable for exporting, with file texts.
+
+    File texts are retrieved in batches through ``Tree.iter_files_bytes``,
+    which lets repositories read texts that are stored together in one go
+    rather than one file at a time. Entries are still yielded in the order
+    of _export_iter_entries.
+
+    :param tree: A tree object.
+    :param subdir: None or the path of an entry to start exporting from.
+    :return: iterator over tuples with final path, tree path, inventory
+        entry and the text of the file (None for entries that are not files)
+    """
+    entries = _export_iter_entries(tree, subdir, recurse_nested=recurse_nested)
+    if recurse_nested:
+        # The texts of nested trees are not in the repository of tree.
+        for final_path, tree_path, entry in entries:
+            if entry.kind == "file":
+                yield final_path, tree_path, entry, tree.get_file_text(tree_path)
+            else:
+                yield final_path, tree_path, entry, None
+        return
+    batch = []
+    for item in entries:
+        batch.append(item)
+        if len(batch) >= _FETCH_BATCH_SIZE:
+            yield from _fetch_export_batch(tree, batch)
+            batch = []
+    yield from _fetch_export_batch(tree, batch)
+
+
+def _fetch_export_batch(tree, batch):
+    desired_files = [
+        (tree_path, i)
+        for i, (final_path, tree_path, entry) in enumerate(batch)
+        if entry.kind == "file"
+    ]
+    texts = {}
+    if desired_files:
+        for i, chunks in tree.iter_files_bytes(desired_files):
+            texts[i] = b"".join(chunks)
+    for i, (final_path, tree_path, entry) in enumerate(batch):
+        yield final_path, tree_path, entry, texts.get(i)
+
+
 def dir_exporter_generator(
     tree, dest, root, subdir=None, force_mtime=None, fileobj=None, recurse_nested=False
 ):
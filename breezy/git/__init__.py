@@ -479,7 +479,7 @@ install_lazy_named_hook(
 )
 
 
-from ..config import Option, bool_from_store, option_registry
+from ..config import Option, bool_from_store, int_from_store, option_registry
 
 option_registry.register(
     Option(
@@ -494,6 +494,34 @@ This enables support for fetching Git packs over HTTP in Loggerhead.
 """,
     )
 )
+option_registry.register(
+    Option(
+        "git.import_prefetch",
+        default=8,
+        from_unicode=int_from_store,
+        invalid="warning",
+        help="""\
+Number of commits to read ahead when importing from a local Git repository.
+
+The Git objects of upcoming commits are read and decompressed in a separate
+thread while earlier commits are imported. 0 disables reading ahead.
+""",
+    )
+)
+option_registry.register(
+    Option(
+        "git.export_threads",
+        default=1,
+        from_unicode=int_from_store,
+        invalid="warning",
+        help="""\
+Number of threads used to convert Bazaar revisions to Git objects.
+
+When larger than one, the trees of revisions in a local repository are
+converted in worker threads while earlier revisions are written out.
+""",
+    )
+)
 
 
 def test_suite():
@@ -18,13 +18,18 @@
 
 import contextlib
 import hashlib
+import heapq
+import mmap
 import os
+import struct
+import sys
 import threading
+from operator import itemgetter
 
 from dulwich.objects import ShaFile, hex_to_sha, sha_to_hex
 
 from .. import errors as bzr_errors
-from .. import registry, trace
+from .. import lockdir, registry, trace
 from .._git_rs import get_cache_dir
 from ..bzr import btree_index as _mod_btree_index
 from ..bzr import index as _mod_index
@@ -61,6 +66,10 @@ def mapdbs():
 class GitShaMap:
     """Git<->Bzr revision id mapping database."""
 
+    # Whether lookups can be done from other threads while the map is being
+    # updated.
+    concurrent_lookups = False
+
     def lookup_git_sha(self, sha):
         """Lookup a Git sha in the database.
         :param sha: Git object sha
@@ -71,6 +80,19 @@ class GitShaMap:
         """
         raise NotImplementedError(self.lookup_git_sha)
 
+    def lookup_git_shas(self, shas):
+        """Lookup multiple Git shas in the database.
+
+        :param shas: Iterable of Git object shas
+        :return: Dictionary mapping the shas that were found to lists of
+            (type, type_data) tuples, as returned by lookup_git_sha
+        """
+        ret = {}
+        for sha in shas:
+            with contextlib.suppress(KeyError):
+                ret[sha] = list(self.lookup_git_sha(sha))
+        return ret
+
     def lookup_blob_id(self, file_id, revision):
         """Retrieve a Git blob SHA by file id.
 
@@ -271,6 +293,8 @@ class DictCacheUpdater(CacheUpdater):
 class DictGitShaMap(GitShaMap):
     """Git SHA map that uses a dictionary."""
 
+    concurrent_lookups = True
+
     def __init__(self):
         self._by_sha = {}
         self._by_fileid = {}
@@ -920,12 +944,536 @@ class IndexGitShaMap(GitShaMap):
             yield key[1]
 
 
+# Type codes for objects in sorted sha tables, matching the git type numbers.
+_SORTED_TABLE_TYPES = {"commit": 1, "tree": 2, "blob": 3}
+_SORTED_TABLE_TYPE_NAMES = {
+    code: type_name for (type_name, code) in _SORTED_TABLE_TYPES.items()
+}
+
+# Rows of the tables in a sorted sha table file.  Strings are stored as
+# (offset, length) references into a heap at the end of the file.
+#   objects: git sha, type, two strings (fileid and revid for trees and blobs;
+#            revid and tree sha followed by testament3 sha for commits)
+#   commits: revid, git sha
+#   files: fileid, revid, git sha, type
+_SORTED_TABLE_HEADER = struct.Struct("<QQQQ")
+_OBJECT_ROW = struct.Struct("<20sB3xQIQI")
+_COMMIT_ROW = struct.Struct("<QI20s")
+_FILE_ROW = struct.Struct("<QIQI20sB3x")
+
+
+class _StringHeap:
+    """Interned strings of a sorted sha table being written."""
+
+    def __init__(self):
+        self._offsets = {}
+        self._chunks = []
+        self._size = 0
+
+    def add(self, s):
+        offset = self._offsets.get(s)
+        if offset is None:
+            offset = self._offsets[s] = self._size
+            self._chunks.append(s)
+            self._size += len(s)
+        return offset, len(s)
+
+    def chunks(self):
+        return self._chunks
+
+
+def _write_sorted_table(objects, commits, files):
+    """Serialize a sorted sha table.
+
+    :param objects: Sorted iterable of (sha, type, a, b) tuples, with sha a
+        binary git sha.
+    :param commits: Sorted iterable of (revid, sha) tuples.
+    :param files: Sorted iterable of (fileid, revid, type, sha) tuples.
+    :return: List of chunks
+    """
+    heap = _StringHeap()
+    object_rows = []
+    for sha, type_code, a, b in objects:
+        a_offset, a_len = heap.add(a)
+        b_offset, b_len = heap.add(b)
+        object_rows.append(
+            _OBJECT_ROW.pack(sha, type_code, a_offset, a_len, b_offset, b_len)
+        )
+    commit_rows = []
+    for revid, sha in commits:
+        revid_offset, revid_len = heap.add(revid)
+        commit_rows.append(_COMMIT_ROW.pack(revid_offset, revid_len, sha))
+    file_rows = []
+    for fileid, revid, type_code, sha in files:
+        fileid_offset, fileid_len = heap.add(fileid)
+        revid_offset, revid_len = heap.add(revid)
+        file_rows.append(
+            _FILE_ROW.pack(
+                fileid_offset, fileid_len, revid_offset, revid_len, sha, type_code
+            )
+        )
+    heap_chunks = heap.chunks()
+    header = _SORTED_TABLE_HEADER.pack(
+        len(object_rows), len(commit_rows), len(file_rows), sum(map(len, heap_chunks))
+    )
+    return (
+        [SortedGitShaMap.TABLE_SIGNATURE, header]
+        + object_rows
+        + commit_rows
+        + file_rows
+        + heap_chunks
+    )
+
+
+class _SortedTable:
+    """An immutable table of sha map entries, sorted for binary search.
+
+    Local tables are memory mapped, so opening a table is cheap and
+    lookups only touch the pages they need.
+    """
+
+    def __init__(self, transport, name):
+        self.name = name
+        self._buf = None
+        # mmapped files cannot be deleted on Windows, which is needed when
+        # tables are merged.
+        if sys.platform != "win32":
+            try:
+                path = transport.local_abspath(name)
+                with open(path, "rb") as f:
+                    self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (bzr_errors.NotLocalUrl, bzr_errors.TransportNotPossible):
+                pass
+            except FileNotFoundError as err:
+                raise NoSuchFile(name) from err
+        if self._buf is None:
+            self._buf = transport.get_bytes(name)
+        signature = SortedGitShaMap.TABLE_SIGNATURE
+        if self._buf[: len(signature)] != signature:
+            raise bzr_errors.BzrError(f"invalid sha table {name!r}")
+        (
+            self._num_objects,
+            self._num_commits,
+            self._num_files,
+            heap_size,
+        ) = _SORTED_TABLE_HEADER.unpack_from(self._buf, len(signature))
+        self._objects_start = len(signature) + _SORTED_TABLE_HEADER.size
+        self._commits_start = self._objects_start + self._num_objects * _OBJECT_ROW.size
+        self._files_start = self._commits_start + self._num_commits * _COMMIT_ROW.size
+        self._heap_start = self._files_start + self._num_files * _FILE_ROW.size
+        if self._heap_start + heap_size != len(self._buf):
+            raise bzr_errors.BzrError(f"truncated sha table {name!r}")
+
+    def __len__(self):
+        return self._num_objects + self._num_commits + self._num_files
+
+    def _string(self, offset, length):
+        start = self._heap_start + offset
+        return self._buf[start : start + length]
+
+    def _object(self, index):
+        sha, type_code, a_offset, a_len, b_offset, b_len = _OBJECT_ROW.unpack_from(
+            self._buf, self._objects_start + index * _OBJECT_ROW.size
+        )
+        return (
+            sha,
+            type_code,
+            self._string(a_offset, a_len),
+            self._string(b_offset, b_len),
+        )
+
+    def _object_sha(self, index):
+        start = self._objects_start + index * _OBJECT_ROW.size
+        return self._buf[start : start + 20]
+
+    def _commit(self, index):
+        revid_offset, revid_len, sha = _COMMIT_ROW.unpack_from(
+            self._buf, self._commits_start + index * _COMMIT_ROW.size
+        )
+        return self._string(revid_offset, revid_len), sha
+
+    def _file(self, index):
+        (
+            fileid_offset,
+            fileid_len,
+            revid_offset,
+            revid_len,
+            sha,
+            type_code,
+        ) = _FILE_ROW.unpack_from(self._buf, self._files_start + index * _FILE_ROW.size)
+        return (
+            self._string(fileid_offset, fileid_len),
+            self._string(revid_offset, revid_len),
+            type_code,
+            sha,
+        )
+
+    def iter_objects(self, shas):
+        """Find the objects for some shas.
+
+        :param shas: Sorted list of binary shas
+        :return: Iterator over (sha, type, a, b) tuples
+        """
+        lo = 0
+        for sha in shas:
+            hi = self._num_objects
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._object_sha(mid) < sha:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            # Later shas can only be found after this one
+            index = lo
+            while index < self._num_objects and self._object_sha(index) == sha:
+                yield self._object(index)
+                index += 1
+
+    def lookup_commit(self, revid):
+        lo, hi = 0, self._num_commits
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._commit(mid)[0] < revid:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._num_commits:
+            found_revid, sha = self._commit(lo)
+            if found_revid == revid:
+                return sha
+        return None
+
+    def lookup_file(self, fileid, revid, type_code):
+        key = (fileid, revid, type_code)
+        lo, hi = 0, self._num_files
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._file(mid)[:3] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._num_files:
+            entry = self._file(lo)
+            if entry[:3] == key:
+                return entry[3]
+        return None
+
+    def iter_all_objects(self):
+        return (self._object(i) for i in range(self._num_objects))
+
+    def iter_all_commits(self):
+        return (self._commit(i) for i in range(self._num_commits))
+
+    def iter_all_files(self):
+        return (self._file(i) for i in range(self._num_files))
+
+
+def _unique_merge(iterables, key=None):
+    """Merge sorted iterables, dropping all but the first of equal items.
+
+    Items from earlier iterables win over equal ones from later iterables.
+    """
+    last = object()
+    for item in heapq.merge(*iterables, key=key):
+        item_key = item if key is None else key(item)
+        if item_key != last:
+            last = item_key
+            yield item
+
+
+class SortedTableCacheUpdater(CacheUpdater):
+    """Cache updater for sorted table based caches."""
+
+    def __init__(self, cache, rev):
+        self.cache = cache
+        self.revid = rev.revision_id
+        self.parent_revids = rev.parent_ids
+        self._commit = None
+
+    def add_object(self, obj, bzr_key_data, path):
+        if isinstance(obj, tuple):
+            (type_name, hexsha) = obj
+        else:
+            type_name = obj.type_name.decode("ascii")
+            hexsha = obj.id
+        if type_name == "commit":
+            self._commit = obj
+            if not isinstance(bzr_key_data, dict):
+                raise TypeError(bzr_key_data)
+            self.cache.idmap._add_commit(
+                hexsha, self.revid, obj.tree, bzr_key_data.get("testament3-sha1")
+            )
+        elif type_name in ("blob", "tree"):
+            # Objects that are not represented in Git (perhaps an empty
+            # directory) have no sha.
+            if bzr_key_data is not None and hexsha is not None:
+                self.cache.idmap._add_file(
+                    type_name, hexsha, bzr_key_data[0], bzr_key_data[1]
+                )
+        else:
+            raise AssertionError
+
+    def finish(self):
+        if self._commit is None:
+            raise AssertionError("No commit object added")
+        return self._commit
+
+
+class SortedTableBzrGitCache(BzrGitCache):
+    def __init__(self, transport):
+        super().__init__(SortedGitShaMap(transport), SortedTableCacheUpdater)
+
+
+class SortedTableGitCacheFormat(BzrGitCacheFormat):
+    """Cache format that stores the SHA map in sorted, immutable tables."""
+
+    def get_format_string(self):
+        return b"bzr-git sha map using sorted tables version 1\n"
+
+    def open(self, transport):
+        return SortedTableBzrGitCache(transport)
+
+
+class SortedGitShaMap(GitShaMap):
+    """SHA Map that stores its entries in sorted, immutable tables.
+
+    Each write group adds a table with fixed-width rows, sorted by git sha,
+    by revision id and by (file id, revision id), so that lookups are binary
+    searches in memory mapped files. Tables are merged, newest first, once a
+    table has grown to half the size of the table before it, which keeps the
+    number of tables logarithmic in the number of entries.
+
+    The "tables" file lists the names of the current tables, newest first.
+    It is only replaced while holding the "lock" lockdir, so that concurrent
+    writers don't lose each others tables.
+    """
+
+    TABLE_SIGNATURE = b"bzr-git sha table version 1\n"
+
+    # Lookups only read the immutable tables and get() from the pending dicts
+    concurrent_lookups = True
+
+    def __init__(self, transport):
+        self._transport = transport
+        self._tables = self._open_tables()
+        self._pending = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self._transport.base!r})"
+
+    def _read_table_names(self):
+        try:
+            return self._transport.get_bytes("tables").split()
+        except NoSuchFile:
+            return []
+
+    def _open_tables(self):
+        try:
+            return [
+                _SortedTable(self._transport, name.decode("ascii"))
+                for name in self._read_table_names()
+            ]
+        except NoSuchFile:
+            # Another process merged the tables after we read their names.
+            return [
+                _SortedTable(self._transport, name.decode("ascii"))
+                for name in self._read_table_names()
+            ]
+
+    def start_write_group(self):
+        if self._pending is not None:
+            raise bzr_errors.BzrError("write group already active")
+        # Map from binary sha to list of (type, a, b) tuples, from revid to
+        # binary sha and from (fileid, revid, type) to binary sha.
+        self._pending = ({}, {}, {})
+
+    def abort_write_group(self):
+        if self._pending is None:
+            raise bzr_errors.BzrError("no write group active")
+        self._pending = None
+
+    def commit_write_group(self):
+        if self._pending is None:
+            raise bzr_errors.BzrError("no write group active")
+        objects, commits, files = self._pending
+        self._pending = None
+        if not objects and not commits and not files:
+            return
+        chunks = _write_sorted_table(
+            sorted(
+                (sha, type_code, a, b)
+                for (sha, entries) in objects.items()
+                for (type_code, a, b) in entries
+            ),
+            sorted(commits.items()),
+            sorted(key + (sha,) for (key, sha) in files.items()),
+        )
+        table = self._put_table(chunks)
+        lock = lockdir.LockDir(self._transport, "lock")
+        lock.lock_write()
+        try:
+            # Pick up tables added by other processes since we opened ours.
+            tables = [table] + self._open_tables()
+            obsolete = []
+            while len(tables) > 1 and len(tables[0]) * 2 >= len(tables[1]):
+                merged = tables[:2]
+                trace.mutter(
+                    "merging git sha tables %s and %s", merged[0].name, merged[1].name
+                )
+                tables[:2] = [self._put_table(self._merge_tables(merged))]
+                obsolete.extend(merged)
+            self._transport.put_bytes(
+                "tables", b"".join(t.name.encode("ascii") + b"\n" for t in tables)
+            )
+        finally:
+            lock.unlock()
+        self._tables = tables
+        # Any later list of tables is based on the one just written, so
+        # nothing refers to the merged tables anymore. Readers that already
+        # opened them keep them in memory or mapped.
+        for table in obsolete:
+            with contextlib.suppress(NoSuchFile):
+                self._transport.delete(table.name)
+
+    def _put_table(self, chunks):
+        name = hashlib.sha1()  # noqa: S324
+        for chunk in chunks:
+            name.update(chunk)
+        name = name.hexdigest() + ".gst"
+        self._transport.put_bytes(name, b"".join(chunks))
+        return _SortedTable(self._transport, name)
+
+    def _merge_tables(self, tables):
+        return _write_sorted_table(
+            _unique_merge(t.iter_all_objects() for t in tables),
+            _unique_merge((t.iter_all_commits() for t in tables), key=itemgetter(0)),
+            _unique_merge(
+                (t.iter_all_files() for t in tables), key=itemgetter(0, 1, 2)
+            ),
+        )
+
+    def _add_commit(self, hexsha, revid, tree_sha, testament3_sha1):
+        objects, commits, _files = self._pending
+        sha = hex_to_sha(hexsha)
+        objects.setdefault(sha, []).append(
+            (_SORTED_TABLE_TYPES["commit"], revid, tree_sha + (testament3_sha1 or b""))
+        )
+        commits[revid] = sha
+
+    def _add_file(self, type_name, hexsha, fileid, revid):
+        objects, _commits, files = self._pending
+        sha = hex_to_sha(hexsha)
+        type_code = _SORTED_TABLE_TYPES[type_name]
+        if (fileid, revid, type_code) in files:
+            return
+        objects.setdefault(sha, []).append((type_code, fileid, revid))
+        files[(fileid, revid, type_code)] = sha
+
+    def _decode_entry(self, type_code, a, b):
+        type_name = _SORTED_TABLE_TYPE_NAMES[type_code]
+        if type_name == "commit":
+            verifiers = {"testament3-sha1": b[40:]} if len(b) > 40 else {}
+            return (type_name, (a, b[:40], verifiers))
+        return (type_name, (a, b))
+
+    def lookup_git_shas(self, shas):
+        """Lookup multiple Git shas in the database.
+
+        All shas are looked up in a single sorted pass over each table.
+        """
+        by_binsha = {}
+        for sha in shas:
+            by_binsha[hex_to_sha(sha) if len(sha) == 40 else sha] = sha
+        binshas = sorted(by_binsha)
+        found = {}
+        if self._pending is not None:
+            pending_objects = self._pending[0]
+            for binsha in binshas:
+                for entry in pending_objects.get(binsha, []):
+                    found.setdefault(binsha, []).append(entry)
+        for table in self._tables:
+            for binsha, type_code, a, b in table.iter_objects(binshas):
+                entries = found.setdefault(binsha, [])
+                if (type_code, a, b) not in entries:
+                    entries.append((type_code, a, b))
+        return {
+            by_binsha[binsha]: [self._decode_entry(*entry) for entry in entries]
+            for (binsha, entries) in found.items()
+        }
+
+    def lookup_git_sha(self, sha):
+        try:
+            entries = self.lookup_git_shas([sha])[sha]
+        except KeyError as err:
+            raise KeyError(sha) from err
+        yield from entries
+
+    def lookup_commit(self, revid):
+        sha = None
+        if self._pending is not None:
+            sha = self._pending[1].get(revid)
+        for table in self._tables:
+            if sha is not None:
+                break
+            sha = table.lookup_commit(revid)
+        if sha is None:
+            raise KeyError(revid)
+        return sha_to_hex(sha)
+
+    def _lookup_file(self, type_name, fileid, revision):
+        type_code = _SORTED_TABLE_TYPES[type_name]
+        sha = None
+        if self._pending is not None:
+            sha = self._pending[2].get((fileid, revision, type_code))
+        for table in self._tables:
+            if sha is not None:
+                break
+            sha = table.lookup_file(fileid, revision, type_code)
+        if sha is None:
+            raise KeyError(fileid)
+        return sha_to_hex(sha)
+
+    def lookup_blob_id(self, fileid, revision):
+        return self._lookup_file("blob", fileid, revision)
+
+    def lookup_tree_id(self, fileid, revision):
+        return self._lookup_file("tree", fileid, revision)
+
+    def missing_revisions(self, revids):
+        """Return set of all the revisions that are not present."""
+        missing = set()
+        for revid in revids:
+            try:
+                self.lookup_commit(revid)
+            except KeyError:
+                missing.add(revid)
+        return missing
+
+    def revids(self):
+        """List the revision ids known."""
+        iterables = [t.iter_all_commits() for t in self._tables]
+        if self._pending is not None:
+            iterables.insert(0, sorted(self._pending[1].items()))
+        for revid, _sha in _unique_merge(iterables, key=itemgetter(0)):
+            yield revid
+
+    def sha1s(self):
+        """List the SHA1s."""
+        iterables = [(entry[0] for entry in t.iter_all_objects()) for t in self._tables]
+        if self._pending is not None:
+            iterables.insert(0, sorted(self._pending[0]))
+        for sha in _unique_merge(iterables):
+            yield sha_to_hex(sha)
+
+
 formats = registry.Registry[str, BzrGitCacheFormat, None]()
 formats.register(TdbGitCacheFormat().get_format_string(), TdbGitCacheFormat())
 formats.register(SqliteGitCacheFormat().get_format_string(), SqliteGitCacheFormat())
 formats.register(IndexGitCacheFormat().get_format_string(), IndexGitCacheFormat())
-# In the future, this will become the default:
-formats.register("default", IndexGitCacheFormat())
+formats.register(
+    SortedTableGitCacheFormat().get_format_string(), SortedTableGitCacheFormat()
+)
+formats.register("default", SortedTableGitCacheFormat())
 
 
 def migrate_ancient_formats(repo_transport):
@@ -17,12 +17,14 @@
 """Fetching from git into bzr."""
 
 import posixpath
+import queue
 import stat
+import threading
 
-from dulwich.object_store import tree_lookup_path
+from dulwich.object_store import BaseObjectStore, tree_lookup_path
 from dulwich.objects import S_IFGITLINK, S_ISGITLINK, ZERO_SHA, Commit, Tag, Tree
 
-from .. import debug, osutils, trace
+from .. import config, debug, osutils, trace
 from ..bzr.inventory import (
     InventoryDirectory,
     InventoryFile,
@@ -474,9 +476,148 @@ def ensure_inventories_in_repo(repo, trees):
             repo.add_inventory(revid, t.root_inventory, t.get_parent_ids())
 
 
+class _BufferedTexts:
+    """Collect new texts, to insert them into a VersionedFiles in batches.
+
+    Every insert_record_stream call on a groupcompress VersionedFiles ends
+    the current compression group, so inserting the texts of a commit one
+    at a time compresses poorly.
+    """
+
+    def __init__(self, texts, max_size=4 * 1024 * 1024):
+        self._texts = texts
+        self._max_size = max_size
+        self._records = []
+        self._size = 0
+
+    def insert_record_stream(self, stream):
+        for record in stream:
+            self._records.append(record)
+            self._size += record.size or 0
+        if self._size >= self._max_size:
+            self.flush()
+
+    def flush(self):
+        """Insert the buffered texts."""
+        if not self._records:
+            return
+        # Keep the texts of a file together so they compress against each
+        # other; the sort is stable, so they stay in import order.
+        records = sorted(self._records, key=lambda record: record.key[0])
+        self._records = []
+        self._size = 0
+        self._texts.insert_record_stream(records)
+
+
+# Maximum size of the blobs of a single commit to read ahead
+_PREFETCH_BLOB_BYTES = 8 * 1024 * 1024
+
+
+def _prefetch_commit_objects(object_store, lock, heads, queue_size):
+    """Read the git objects of commits in a separate thread.
+
+    For each commit, the commit itself and the trees and blobs that differ
+    from its first parent are read while earlier commits are imported.
+    Reading packs and decompressing objects releases the GIL for much of
+    the time.
+
+    :param object_store: Git object store to read from
+    :param lock: Lock to hold while reading from object_store
+    :param heads: Commit shas, in the order they are imported
+    :param queue_size: Maximum number of commits to read ahead
+    :return: Iterator over (head, objects) tuples, with objects a dictionary
+        with the objects read for the commit
+    """
+    pending = queue.Queue(queue_size)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def lookup(objects, sha):
+        try:
+            return objects[sha]
+        except KeyError:
+            with lock:
+                obj = object_store[sha]
+            objects[sha] = obj
+            return obj
+
+    def read_tree_changes(objects, base_sha, sha, budget):
+        if base_sha == sha:
+            return budget
+        tree = lookup(objects, sha)
+        if base_sha is None:
+            base_tree = None
+        else:
+            base_tree = lookup(objects, base_sha)
+        for name, mode, child_sha in tree.iteritems():
+            if type(base_tree) is Tree and name in base_tree:
+                base_mode, base_child_sha = base_tree[name]
+            else:
+                base_mode, base_child_sha = 0, None
+            if stat.S_ISDIR(mode):
+                if not stat.S_ISDIR(base_mode):
+                    base_child_sha = None
+                budget = read_tree_changes(objects, base_child_sha, child_sha, budget)
+            elif S_ISGITLINK(mode):
+                continue
+            elif child_sha != base_child_sha and budget > 0:
+                budget -= lookup(objects, child_sha).raw_length()
+        return budget
+
+    def worker():
+        try:
+            for head in heads:
+                objects = {}
+                try:
+                    commit = lookup(objects, head)
+                    if commit.parents:
+                        base_tree = lookup(objects, commit.parents[0]).tree
+                    else:
+                        base_tree = None
+                    read_tree_changes(
+                        objects, base_tree, commit.tree, _PREFETCH_BLOB_BYTES
+                    )
+                except KeyError:
+                    # Left for the importer to find elsewhere
+                    pass
+                if not put((head, objects)):
+                    return
+        except BaseException as e:
+            put((None, e))
+
+    thread = threading.Thread(target=worker, name="git-import-prefetch")
+    thread.start()
+    try:
+        for _i in range(len(heads)):
+            head, objects = pending.get()
+            if head is None:
+                raise objects
+            yield head, objects
+    finally:
+        stop.set()
+        thread.join()
+
+
 def import_git_commit(
-    repo, mapping, head, lookup_object, target_git_object_retriever, trees_cache, strict
+    repo,
+    mapping,
+    head,
+    lookup_object,
+    target_git_object_retriever,
+    trees_cache,
+    strict,
+    texts=None,
 ):
+    if texts is None:
+        texts = repo.texts
     o = lookup_object(head)
     # Note that this uses mapping.revision_id_foreign_to_bzr. If the parents
     # were bzr roundtripped revisions they would be specified in the
@@ -502,7 +643,7 @@ def import_git_commit(
         base_mode = stat.S_IFDIR
     store_updater = target_git_object_retriever._get_updater(rev)
     inv_delta, unusual_modes = import_git_tree(
-        repo.texts,
+        texts,
         mapping,
         b"",
         b"",
@@ -579,10 +720,12 @@ def import_git_objects(
     :param object_iter: Iterator over Git objects.
     :return: Tuple with pack hints and last imported revision id
     """
+    object_iter_lock = threading.Lock()
 
     def lookup_object(sha):
         try:
-            return object_iter[sha]
+            with object_iter_lock:
+                return object_iter[sha]
         except KeyError:
             return target_git_object_retriever[sha]
 
@@ -628,36 +771,72 @@ def import_git_objects(
     if limit is not None:
         revision_ids = revision_ids[:limit]
     last_imported = None
-    for offset in range(0, len(revision_ids), batch_size):
-        target_git_object_retriever.start_write_group()
-        try:
-            repo.start_write_group()
+    if debug.debug_flag_enabled("verify"):
+        # Verification reads the texts of each commit back
+        texts = _BufferedTexts(repo.texts, max_size=0)
+    else:
+        texts = _BufferedTexts(repo.texts)
+    prefetch = config.GlobalStack().get("git.import_prefetch")
+    if prefetch and isinstance(object_iter, BaseObjectStore):
+        # Thin packs fetched from remote repositories resolve external
+        # references through the target repository, which is being written
+        # to, so objects are only read ahead from actual object stores.
+        prefetched = _prefetch_commit_objects(
+            object_iter, object_iter_lock, revision_ids, prefetch
+        )
+    else:
+        prefetched = None
+    try:
+        for offset in range(0, len(revision_ids), batch_size):
+            target_git_object_retriever.start_write_group()
             try:
-                for i, head in enumerate(revision_ids[offset : offset + batch_size]):
-                    if pb is not None:
-                        pb.update("fetching revisions", offset + i, len(revision_ids))
-                    import_git_commit(
-                        repo,
-                        mapping,
-                        head,
-                        lookup_object,
-                        target_git_object_retriever,
-                        trees_cache,
-                        strict=True,
-                    )
-                    last_imported = head
+                repo.start_write_group()
+                try:
+                    for i, head in enumerate(
+                        revision_ids[offset : offset + batch_size]
+                    ):
+                        if pb is not None:
+                            pb.update(
+                                "fetching revisions", offset + i, len(revision_ids)
+                            )
+                        if prefetched is None:
+                            commit_lookup_object = lookup_object
+                        else:
+                            objects = next(prefetched)[1]
+
+                            def commit_lookup_object(sha, objects=objects):
+                                try:
+                                    return objects[sha]
+                                except KeyError:
+                                    return lookup_object(sha)
+
+                        import_git_commit(
+                            repo,
+                            mapping,
+                            head,
+                            commit_lookup_object,
+                            target_git_object_retriever,
+                            trees_cache,
+                            strict=True,
+                            texts=texts,
+                        )
+                        last_imported = head
+                    texts.flush()
+                except BaseException:
+                    repo.abort_write_group()
+                    raise
+                else:
+                    hint = repo.commit_write_group()
+                    if hint is not None:
+                        pack_hints.extend(hint)
             except BaseException:
-                repo.abort_write_group()
+                target_git_object_retriever.abort_write_group()
                 raise
             else:
-                hint = repo.commit_write_group()
-                if hint is not None:
-                    pack_hints.extend(hint)
-        except BaseException:
-            target_git_object_retriever.abort_write_group()
-            raise
-        else:
-            target_git_object_retriever.commit_write_group()
+                target_git_object_retriever.commit_write_group()
+    finally:
+        if prefetched is not None:
+            prefetched.close()
     return pack_hints, last_imported
 
 
@@ -17,16 +17,17 @@
 
 """Map from Git sha's to Bazaar objects."""
 
-import contextlib
 import posixpath
 import stat
+import threading
+from collections import deque
 from typing import Dict, Iterable, Iterator, List, Tuple
 
 from dulwich.object_store import BaseObjectStore
 from dulwich.objects import ZERO_SHA, Blob, Commit, ObjectID, ShaFile, Tree, sha_to_hex
 from dulwich.pack import Pack, PackData, pack_objects_to_data
 
-from .. import errors, lru_cache, osutils, trace, ui
+from .. import config, errors, lru_cache, osutils, trace, ui
 from ..bzr.testament import StrictTestament3
 from ..lock import LogicalLockResult
 from ..revision import NULL_REVISION
@@ -375,6 +376,122 @@ def _tree_to_objects(
             shamap[path] = obj.id
 
 
+def _parent_trees(repository, tree_cache, rev):
+    """Return the trees of the parents of a revision that are present."""
+    present_parents = repository.has_revisions(rev.parent_ids)
+    return tree_cache.revision_trees(
+        [p for p in rev.parent_ids if p in present_parents]
+    )
+
+
+class _ConvertedRevision:
+    """The tree and blob objects of a revision, converted in a worker thread.
+
+    :ivar objects: List of (path, object, bzr_key_data) tuples, as yielded by
+        _tree_to_objects
+    :ivar cache_entries: List of (object, bzr_key_data, path) tuples to add
+        to the cache
+    """
+
+    def __init__(self, rev, objects, cache_entries, root_key_data, verifiers):
+        self.rev = rev
+        self.objects = objects
+        self.cache_entries = cache_entries
+        self.root_key_data = root_key_data
+        self.verifiers = verifiers
+
+
+class _RevisionTreeConverter:
+    """Convert the trees of revisions to git objects in worker threads.
+
+    Repository objects are not thread safe, so every worker reads from its
+    own instance of the repository. Commit objects contain the shas of their
+    parents, so they are created by the caller, in topological order.
+    """
+
+    def __init__(self, repository, idmap, dummy_file_name, lossy, threads):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self._controldir = repository.controldir
+        self._idmap = idmap
+        self._dummy_file_name = dummy_file_name
+        self._lossy = lossy
+        self._threads = threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._repositories = []
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+
+    def _get_tree_cache(self):
+        try:
+            return self._local.tree_cache
+        except AttributeError:
+            repository = self._controldir.open_repository()
+            repository.lock_read()
+            with self._lock:
+                self._repositories.append(repository)
+            self._local.tree_cache = LRUTreeCache(repository)
+            return self._local.tree_cache
+
+    def _convert(self, revid):
+        tree_cache = self._get_tree_cache()
+        repository = tree_cache.repository
+        try:
+            rev = repository.get_revision(revid)
+        except errors.NoSuchRevision:
+            return None
+        tree = tree_cache.revision_tree(revid)
+        cache_entries = []
+
+        def add_cache_entry(obj, bzr_key_data, path):
+            cache_entries.append((obj, bzr_key_data, path))
+
+        objects = list(
+            _tree_to_objects(
+                tree,
+                _parent_trees(repository, tree_cache, rev),
+                self._idmap,
+                extract_unusual_modes(rev),
+                self._dummy_file_name,
+                add_cache_entry,
+            )
+        )
+        if self._lossy:
+            verifiers = {}
+        else:
+            verifiers = {"testament3-sha1": StrictTestament3(rev, tree).as_sha1()}
+        root_key_data = (tree.path2id(""), tree.get_revision_id())
+        return _ConvertedRevision(rev, objects, cache_entries, root_key_data, verifiers)
+
+    def iter_converted(self, revids):
+        """Convert revisions.
+
+        The converter can not be used again afterwards.
+
+        :param revids: Iterable over revision ids
+        :return: Iterator over (revid, converted) tuples, in the order of
+            revids, with converted a _ConvertedRevision or None if the
+            revision is not present
+        """
+        pending = deque()
+        try:
+            for revid in revids:
+                pending.append((revid, self._executor.submit(self._convert, revid)))
+                # Bound the number of converted revisions held in memory
+                if len(pending) > self._threads * 2:
+                    revid, future = pending.popleft()
+                    yield revid, future.result()
+            while pending:
+                revid, future = pending.popleft()
+                yield revid, future.result()
+        finally:
+            for _revid, future in pending:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+            for repository in self._repositories:
+                repository.unlock()
+
+
 class BazaarObjectStore(BaseObjectStore):
     """A Git-style object store backed onto a Bazaar repository."""
 
@@ -428,10 +545,17 @@ class BazaarObjectStore(BaseObjectStore):
         self.start_write_group()
         try:
             with ui.ui_factory.nested_progress_bar() as pb:
-                for i, revid in enumerate(graph.iter_topo_order(missing_revids)):
+                for i, (revid, objects) in enumerate(
+                    self._iter_revisions_objects(
+                        graph.iter_topo_order(missing_revids),
+                        lossy=(not self.mapping.roundtripping),
+                        get_updater=self._get_updater,
+                    )
+                ):
                     trace.mutter("processing %r", revid)
                     pb.update("updating git map", i, len(missing_revids))
-                    self._update_sha_map_revision(revid)
+                    for _path, _obj in objects:
+                        pass
             if stop_revision is None:
                 self._map_updated = True
         except BaseException:
@@ -472,12 +596,9 @@ class BazaarObjectStore(BaseObjectStore):
         :param lossy: Whether to not roundtrip all Bazaar revision data
         """
         unusual_modes = extract_unusual_modes(rev)
-        present_parents = self.repository.has_revisions(rev.parent_ids)
-        parent_trees = self.tree_cache.revision_trees(
-            [p for p in rev.parent_ids if p in present_parents]
-        )
+        parent_trees = _parent_trees(self.repository, self.tree_cache, rev)
         root_tree = None
-        for path, obj, bzr_key_data in _tree_to_objects(
+        for path, obj, _bzr_key_data in _tree_to_objects(
             tree,
             parent_trees,
             self._cache.idmap,
@@ -487,10 +608,51 @@ class BazaarObjectStore(BaseObjectStore):
         ):
             if path == "":
                 root_tree = obj
-                root_key_data = bzr_key_data
                 # Don't yield just yet
             else:
                 yield path, obj
+        if not lossy:
+            testament3 = StrictTestament3(rev, tree)
+            verifiers = {"testament3-sha1": testament3.as_sha1()}
+        else:
+            verifiers = {}
+        yield from self._commit_to_objects(
+            rev,
+            root_tree,
+            (tree.path2id(""), tree.get_revision_id()),
+            verifiers,
+            lossy,
+            add_cache_entry,
+        )
+
+    def _converted_revision_to_objects(self, converted, lossy, add_cache_entry=None):
+        """Convert a revision whose tree was converted in a worker thread."""
+        if add_cache_entry is not None:
+            for obj, bzr_key_data, path in converted.cache_entries:
+                add_cache_entry(obj, bzr_key_data, path)
+        root_tree = None
+        for path, obj, _bzr_key_data in converted.objects:
+            if path == "":
+                root_tree = obj
+            else:
+                yield path, obj
+        yield from self._commit_to_objects(
+            converted.rev,
+            root_tree,
+            converted.root_key_data,
+            converted.verifiers,
+            lossy,
+            add_cache_entry,
+        )
+
+    def _commit_to_objects(
+        self, rev, root_tree, root_key_data, verifiers, lossy, add_cache_entry
+    ):
+        """Yield the root tree and the commit object of a revision.
+
+        :param root_tree: The root tree object, or None if the root tree did
+            not change
+        """
         if root_tree is None:
             # Pointless commit - get the tree sha elsewhere
             if not rev.parent_ids:
@@ -498,15 +660,9 @@ class BazaarObjectStore(BaseObjectStore):
             else:
                 base_sha1 = self._lookup_revision_sha1(rev.parent_ids[0])
                 root_tree = self[self[base_sha1].tree]
-            root_key_data = (tree.path2id(""), tree.get_revision_id())
         if add_cache_entry is not None:
             add_cache_entry(root_tree, root_key_data, "")
         yield "", root_tree
-        if not lossy:
-            testament3 = StrictTestament3(rev, tree)
-            verifiers = {"testament3-sha1": testament3.as_sha1()}
-        else:
-            verifiers = {}
         commit_obj = self._reconstruct_commit(
             rev, root_tree.id, lossy=lossy, verifiers=verifiers
         )
@@ -521,6 +677,89 @@ class BazaarObjectStore(BaseObjectStore):
 
         yield None, commit_obj
 
+    def _get_revision_tree_converter(self, lossy):
+        """Return a converter for revision trees, if they can be converted
+        concurrently.
+        """
+        threads = config.GlobalStack().get("git.export_threads")
+        if not threads or threads <= 1:
+            return None
+        if not self._cache.idmap.concurrent_lookups:
+            return None
+        # Worker threads open the repository again, and would not see data
+        # in an active write group or share a smart server connection.
+        if self.repository.is_in_write_group():
+            return None
+        try:
+            self.repository.controldir.root_transport.local_abspath(".")
+        except errors.NotLocalUrl:
+            return None
+        return _RevisionTreeConverter(
+            self.repository,
+            self._cache.idmap,
+            self.mapping.BZR_DUMMY_FILE,
+            lossy,
+            threads,
+        )
+
+    def _iter_revisions_objects(self, revids, lossy, get_updater=None):
+        """Convert revisions to git objects.
+
+        If git.export_threads is larger than one, the trees of upcoming
+        revisions are converted in worker threads while the objects of
+        earlier revisions are processed.
+
+        :param revids: Iterable over revision ids, in topological order.
+            Revisions that are not present are skipped.
+        :param lossy: Whether to not roundtrip all Bazaar revision data
+        :param get_updater: Optional callable returning the CacheUpdater to
+            add the objects of a revision to
+        :return: Iterator over (revid, objects) tuples, with objects an
+            iterator over the (path, object) tuples of the revision that has
+            to be exhausted before the next revision is converted
+        """
+
+        def iter_objects(rev, objects):
+            if get_updater is None:
+                yield from objects(None)
+            else:
+                updater = get_updater(rev)
+                yield from objects(updater.add_object)
+                updater.finish()
+
+        converter = self._get_revision_tree_converter(lossy)
+        if converter is None:
+            for revid in revids:
+                try:
+                    rev = self.repository.get_revision(revid)
+                except errors.NoSuchRevision:
+                    continue
+                tree = self.tree_cache.revision_tree(revid)
+                yield (
+                    revid,
+                    iter_objects(
+                        rev,
+                        lambda add_cache_entry, rev=rev, tree=tree: (
+                            self._revision_to_objects(rev, tree, lossy, add_cache_entry)
+                        ),
+                    ),
+                )
+        else:
+            for revid, converted in converter.iter_converted(revids):
+                if converted is None:
+                    continue
+                yield (
+                    revid,
+                    iter_objects(
+                        converted.rev,
+                        lambda add_cache_entry, converted=converted: (
+                            self._converted_revision_to_objects(
+                                converted, lossy, add_cache_entry
+                            )
+                        ),
+                    ),
+                )
+
     def _get_updater(self, rev):
         return self._cache.get_updater(rev)
 
@@ -694,19 +933,18 @@ class BazaarObjectStore(BaseObjectStore):
         self.repository.unlock()
 
     def lookup_git_shas(self, shas: Iterable[ObjectID]) -> Dict[ObjectID, List]:
+        shas = set(shas)
         ret: Dict[ObjectID, List] = {}
-        for sha in shas:
-            if sha == ZERO_SHA:
-                ret[sha] = [("commit", (NULL_REVISION, None, {}))]
-                continue
-            try:
-                ret[sha] = list(self._cache.idmap.lookup_git_sha(sha))
-            except KeyError:
-                # if not, see if there are any unconverted revisions and
-                # add them to the map, search for sha in map again
-                self._update_sha_map()
-                with contextlib.suppress(KeyError):
-                    ret[sha] = list(self._cache.idmap.lookup_git_sha(sha))
+        if ZERO_SHA in shas:
+            shas.remove(ZERO_SHA)
+            ret[ZERO_SHA] = [("commit", (NULL_REVISION, None, {}))]
+        ret.update(self._cache.idmap.lookup_git_shas(shas))
+        missing = shas.difference(ret)
+        if missing:
+            # if not, see if there are any unconverted revisions and
+            # add them to the map, search for shas in map again
+            self._update_sha_map()
+            ret.update(self._cache.idmap.lookup_git_shas(missing))
         return ret
 
     def lookup_git_sha(self, sha):
@@ -842,14 +1080,11 @@ class BazaarObjectStore(BaseObjectStore):
             graph = self.repository.get_graph()
             todo = _find_missing_bzr_revids(graph, pending, processed, shallow)
             with ui.ui_factory.nested_progress_bar() as pb:
-                for i, revid in enumerate(graph.iter_topo_order(todo)):
+                for i, (_revid, objects) in enumerate(
+                    self._iter_revisions_objects(graph.iter_topo_order(todo), lossy)
+                ):
                     pb.update("generating git objects", i, len(todo))
-                    try:
-                        rev = self.repository.get_revision(revid)
-                    except errors.NoSuchRevision:
-                        continue
-                    tree = self.tree_cache.revision_tree(revid)
-                    for path, obj in self._revision_to_objects(rev, tree, lossy=lossy):
+                    for path, obj in objects:
                         if obj.id not in seen:
                             yield (obj.id, (obj.type_num, path))
                             seen.add(obj.id)
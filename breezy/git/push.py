@@ -54,11 +54,12 @@ class MissingObjectsIterator:
         :param revids: Revision ids of revisions to import
         :param lossy: Whether to not roundtrip bzr metadata
         """
-        for i, revid in enumerate(revids):
+        for i, (revid, objects) in enumerate(
+            self._object_store._iter_revisions_objects(revids, lossy)
+        ):
             if self.pb:
                 self.pb.update("pushing revisions", i, len(revids))
-            git_commit = self.import_revision(revid, lossy)
-            yield (revid, git_commit)
+            yield (revid, self._import_objects(revid, objects))
 
     def import_revision(self, revid, lossy):
         """Import a revision into this Git repository.
@@ -68,8 +69,13 @@ class MissingObjectsIterator:
         """
         tree = self._object_store.tree_cache.revision_tree(revid)
         rev = self.source.get_revision(revid)
+        return self._import_objects(
+            revid, self._object_store._revision_to_objects(rev, tree, lossy)
+        )
+
+    def _import_objects(self, revid, objects):
         commit = None
-        for path, obj in self._object_store._revision_to_objects(rev, tree, lossy):
+        for path, obj in objects:
             if obj.type_name == b"commit":
                 commit = obj
             self._pending.append((obj, path))
@@ -19,6 +19,7 @@
 import contextlib
 import os
 import stat
+import threading
 
 from dulwich.objects import Blob, Commit, Tree
 
@@ -26,9 +27,12 @@ from ...revision import Revision
 from ...tests import TestCase, TestCaseInTempDir, UnavailableFeature
 from ...transport import get_transport
 from ..cache import (
+    BzrGitCacheFormat,
     DictBzrGitCache,
     IndexBzrGitCache,
     IndexGitCacheFormat,
+    SortedTableBzrGitCache,
+    SortedTableGitCacheFormat,
     SqliteBzrGitCache,
     TdbBzrGitCache,
 )
@@ -145,6 +149,46 @@ class TestGitShaMap:
         with contextlib.suppress(NotImplementedError):
             self.assertEqual(t.id, self.map.lookup_tree_id(b"fileid", b"myrevid"))
 
+    def test_lookup_git_shas(self):
+        self.map.start_write_group()
+        updater = self.cache.get_updater(
+            Revision(
+                b"myrevid",
+                parent_ids=[],
+                message="",
+                committer="",
+                timezone=0,
+                timestamp=0,
+                properties={},
+                inventory_sha1=None,
+            )
+        )
+        c = self._get_test_commit()
+        updater.add_object(c, {"testament3-sha1": b"testament"}, None)
+        b = Blob()
+        b.data = b"TEH BLOB"
+        updater.add_object(b, (b"myfileid", b"myrevid"), None)
+        updater.finish()
+        self.map.commit_write_group()
+        self.assertEqual(
+            {
+                c.id: [
+                    (
+                        "commit",
+                        (
+                            b"myrevid",
+                            b"cc9462f7f8263ef5adfbeff2fb936bb36b504cba",
+                            {"testament3-sha1": b"testament"},
+                        ),
+                    )
+                ],
+                b.id: [("blob", (b"myfileid", b"myrevid"))],
+            },
+            self.map.lookup_git_shas(
+                [b.id, b"5686645d49063c73d35436192dfc9a160c672301", c.id]
+            ),
+        )
+
     def test_revids(self):
         self.map.start_write_group()
         updater = self.cache.get_updater(
@@ -220,3 +264,145 @@ class IndexGitShaMapTests(TestCaseInTempDir, TestGitShaMap):
         IndexGitCacheFormat().initialize(transport)
         self.cache = IndexBzrGitCache(transport)
         self.map = self.cache.idmap
+
+
+class SortedTableGitShaMapTests(TestCaseInTempDir, TestGitShaMap):
+    def setUp(self):
+        TestCaseInTempDir.setUp(self)
+        self.transport = get_transport(self.test_dir)
+        SortedTableGitCacheFormat().initialize(self.transport)
+        self.cache = SortedTableBzrGitCache(self.transport)
+        self.map = self.cache.idmap
+
+    def add_revision(self, revid, blob_data):
+        self.map.start_write_group()
+        updater = self.cache.get_updater(
+            Revision(
+                revid,
+                parent_ids=[],
+                message="",
+                committer="",
+                timezone=0,
+                timestamp=0,
+                properties={},
+                inventory_sha1=None,
+            )
+        )
+        c = self._get_test_commit()
+        c.message = revid
+        updater.add_object(c, {}, None)
+        b = Blob()
+        b.data = blob_data
+        updater.add_object(b, (b"fileid", revid), None)
+        updater.finish()
+        self.map.commit_write_group()
+        return c.id, b.id
+
+    def test_tables_merged(self):
+        shas = {}
+        for i in range(8):
+            revid = b"rev%d" % i
+            shas[revid] = self.add_revision(revid, b"blob %d" % i)
+        self.assertLess(len(self.map._tables), 4)
+        self.assertEqual(
+            len(self.map._tables),
+            len([n for n in self.transport.list_dir(".") if n.endswith(".gst")]),
+        )
+        idmap = SortedTableBzrGitCache(self.transport).idmap
+        self.assertEqual(sorted(shas), sorted(idmap.revids()))
+        for revid, (commit_sha, blob_sha) in shas.items():
+            self.assertEqual(commit_sha, idmap.lookup_commit(revid))
+            self.assertEqual(blob_sha, idmap.lookup_blob_id(b"fileid", revid))
+            self.assertEqual(
+                [("blob", (b"fileid", revid))], list(idmap.lookup_git_sha(blob_sha))
+            )
+
+    def test_concurrent_writers(self):
+        other = SortedTableBzrGitCache(self.transport)
+        self.add_revision(b"rev1", b"blob 1")
+        other.idmap.start_write_group()
+        other.idmap._add_commit(
+            b"5686645d49063c73d35436192dfc9a160c672301",
+            b"rev2",
+            b"cc9462f7f8263ef5adfbeff2fb936bb36b504cba",
+            None,
+        )
+        other.idmap.commit_write_group()
+        idmap = SortedTableBzrGitCache(self.transport).idmap
+        self.assertEqual([b"rev1", b"rev2"], sorted(idmap.revids()))
+        self.assertFalse(self.transport.has("lock/held"))
+
+    def test_merge_while_other_writer_holds_lock(self):
+        self.add_revision(b"rev1", b"blob 1")
+        other = SortedTableBzrGitCache(self.transport).idmap
+        merging = threading.Event()
+        finish_merge = threading.Event()
+        orig_merge_tables = other._merge_tables
+
+        def merge_tables(tables):
+            merging.set()
+            finish_merge.wait(10)
+            return orig_merge_tables(tables)
+
+        other._merge_tables = merge_tables
+        other.start_write_group()
+        other._add_commit(
+            b"5686645d49063c73d35436192dfc9a160c672301",
+            b"rev2",
+            b"cc9462f7f8263ef5adfbeff2fb936bb36b504cba",
+            None,
+        )
+        other_thread = threading.Thread(target=other.commit_write_group)
+        other_thread.start()
+        self.assertTrue(merging.wait(10))
+        self.assertTrue(self.transport.has("lock/held"))
+        # This commit has to wait until the other writer has replaced the
+        # tables it is merging.
+        writer_thread = threading.Thread(
+            target=self.add_revision, args=(b"rev3", b"blob 3")
+        )
+        writer_thread.start()
+        finish_merge.set()
+        other_thread.join()
+        writer_thread.join()
+        idmap = SortedTableBzrGitCache(self.transport).idmap
+        self.assertEqual([b"rev1", b"rev2", b"rev3"], sorted(idmap.revids()))
+        self.assertEqual(
+            sorted(t.name for t in idmap._tables),
+            sorted(n for n in self.transport.list_dir(".") if n.endswith(".gst")),
+        )
+        self.assertFalse(self.transport.has("lock/held"))
+
+    def test_default_format(self):
+        self.transport.mkdir("new")
+        transport = self.transport.clone("new")
+        cache = BzrGitCacheFormat.from_transport(transport)
+        self.assertIsInstance(cache, SortedTableBzrGitCache)
+        self.assertEqual(
+            SortedTableGitCacheFormat().get_format_string(),
+            transport.get_bytes("format"),
+        )
+
+    def test_shared_blob(self):
+        self.add_revision(b"rev1", b"same")
+        _, blob_sha = self.add_revision(b"rev2", b"same")
+        self.assertEqual(
+            [("blob", (b"fileid", b"rev1")), ("blob", (b"fileid", b"rev2"))],
+            sorted(self.map.lookup_git_sha(blob_sha)),
+        )
+
+    def test_abort_write_group(self):
+        self.map.start_write_group()
+        self.map._add_commit(
+            b"5686645d49063c73d35436192dfc9a160c672301",
+            b"myrevid",
+            b"cc9462f7f8263ef5adfbeff2fb936bb36b504cba",
+            None,
+        )
+        self.assertEqual(
+            b"5686645d49063c73d35436192dfc9a160c672301",
+            self.map.lookup_commit(b"myrevid"),
+        )
+        self.map.abort_write_group()
+        self.assertRaises(KeyError, self.map.lookup_commit, b"myrevid")
+        self.assertEqual(["format"], self.transport.list_dir("."))
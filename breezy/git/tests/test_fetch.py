@@ -23,14 +23,19 @@ import time
 from dulwich.objects import S_IFGITLINK, Blob, Tag, Tree
 from dulwich.repo import Repo as GitRepo
 
-from ... import osutils
+from ... import config, osutils
 from ...branch import Branch
 from ...bzr import knit, versionedfile
 from ...bzr.inventory import Inventory
 from ...controldir import ControlDir
 from ...repository import Repository
 from ...tests import TestCaseWithTransport
-from ..fetch import import_git_blob, import_git_submodule, import_git_tree
+from ..fetch import (
+    _BufferedTexts,
+    import_git_blob,
+    import_git_submodule,
+    import_git_tree,
+)
 from ..mapping import DEFAULT_FILE_MODE, BzrGitMappingv1
 from . import GitBranchBuilder
 
@@ -96,6 +101,31 @@ class RepositoryFetchTests:
         newrepo.fetch(oldrepo, revision_id=revid2)
         self.assertEqual({revid1, revid2}, set(newrepo.all_revision_ids()))
 
+    def test_prefetch(self):
+        self.make_git_repo("d")
+        os.chdir("d")
+        bb = GitBranchBuilder()
+        marks = []
+        for i in range(5):
+            bb.set_file("foobar", b"foo%d\n" % i, False)
+            bb.set_file("dir/file", b"file%d\n" % (i // 2), i % 2 == 1)
+            marks.append(bb.commit(b"Somebody <somebody@someorg.org>", b"msg"))
+        gitshas = bb.finish()
+        os.chdir("..")
+        mapping = self.open_git_repo("d").get_mapping()
+        revids = [mapping.revision_id_foreign_to_bzr(gitshas[m]) for m in marks]
+        config.GlobalStack().set("git.import_prefetch", 1)
+        prefetched = self.clone_git_repo("d", "f")
+        config.GlobalStack().set("git.import_prefetch", 0)
+        newrepo = self.clone_git_repo("d", "g")
+        self.assertEqual(set(revids), set(prefetched.all_revision_ids()))
+        with prefetched.lock_read(), newrepo.lock_read():
+            self.assertEqual(newrepo.texts.keys(), prefetched.texts.keys())
+            for revid in revids:
+                self.assertEqual(
+                    newrepo.get_inventory(revid), prefetched.get_inventory(revid)
+                )
+
     def test_dir_becomes_symlink(self):
         self.make_git_repo("d")
         os.chdir("d")
@@ -285,6 +315,28 @@ class LocalRepositoryFetchTests(RepositoryFetchTests, TestCaseWithTransport):
         return Repository.open(path)
 
 
+class BufferedTextsTests(TestCaseWithTransport):
+    def test_flush(self):
+        factory = knit.make_file_factory(True, versionedfile.PrefixMapper())
+        texts = factory(self.get_transport("texts"))
+        buffered = _BufferedTexts(texts)
+        buffered.insert_record_stream(
+            [versionedfile.ChunkedContentFactory((b"f", b"r1"), (), None, [b"a\n"])]
+        )
+        self.assertEqual(set(), texts.keys())
+        buffered.flush()
+        self.assertEqual({(b"f", b"r1")}, texts.keys())
+
+    def test_max_size(self):
+        factory = knit.make_file_factory(True, versionedfile.PrefixMapper())
+        texts = factory(self.get_transport("texts"))
+        buffered = _BufferedTexts(texts, max_size=0)
+        buffered.insert_record_stream(
+            [versionedfile.ChunkedContentFactory((b"f", b"r1"), (), None, [b"a\n"])]
+        )
+        self.assertEqual({(b"f", b"r1")}, texts.keys())
+
+
 class DummyStoreUpdater:
     def add_object(self, obj, ie, path):
         pass
@@ -22,6 +22,7 @@ import stat
 
 from dulwich.objects import Blob, Tree
 
+from ... import config
 from ...branchbuilder import BranchBuilder
 from ...bzr.inventory import InventoryDirectory, InventoryFile
 from ...errors import NoSuchRevision
@@ -34,6 +35,7 @@ from ..object_store import (
     LRUTreeCache,
     _check_expected_sha,
     _find_missing_bzr_revids,
+    _RevisionTreeConverter,
     _tree_to_objects,
     directory_to_tree,
 )
@@ -218,6 +220,54 @@ class BazaarObjectStoreTests(TestCaseWithTransport):
         self.store.lock_read()
         self.assertIn(b.id, self.store)
 
+    def test_export_threads(self):
+        bb = BranchBuilder(branch=self.branch)
+        bb.start_series()
+        revid1 = bb.build_snapshot(
+            None,
+            [
+                ("add", ("", None, "directory", None)),
+                ("add", ("foo", b"foo-id", "file", b"a\n")),
+                ("add", ("bar", b"bar-id", "directory", None)),
+            ],
+        )
+        revid2 = bb.build_snapshot(
+            [revid1],
+            [
+                ("modify", ("foo", b"b\n")),
+                ("add", ("bar/baz", b"baz-id", "file", b"c\n")),
+            ],
+        )
+        revid3 = bb.build_snapshot([revid2], [])
+        revid4 = bb.build_snapshot([revid1], [("modify", ("foo", b"d\n"))])
+        revid5 = bb.build_snapshot([revid3, revid4], [("modify", ("foo", b"e\n"))])
+        bb.finish_series()
+        revids = [revid1, revid2, revid3, revid4, revid5]
+        other = self.branch.controldir.sprout("other").open_branch()
+
+        converted = []
+        orig_convert = _RevisionTreeConverter._convert
+
+        def convert(converter, revid):
+            converted.append(revid)
+            return orig_convert(converter, revid)
+
+        self.overrideAttr(_RevisionTreeConverter, "_convert", convert)
+
+        def export(repository):
+            store = BazaarObjectStore(repository)
+            self.assertTrue(store._cache.idmap.concurrent_lookups)
+            with store.lock_read():
+                shas = [store._lookup_revision_sha1(revid) for revid in revids]
+                objects = sorted(store.find_missing_objects([], [shas[-1]]))
+            return shas, objects
+
+        expected = export(self.branch.repository)
+        self.assertEqual([], converted)
+        config.GlobalStack().set("git.export_threads", 4)
+        self.assertEqual(expected, export(other.repository))
+        self.assertEqual(set(revids), set(converted))
+
 
 class TreeToObjectsTests(TestCaseWithTransport):
     def setUp(self):
@@ -233,7 +233,7 @@ class Graph:
     specialize it for other repository types.
     """
 
-    def __init__(self, parents_provider):
+    def __init__(self, parents_provider, reachability_index=None):
         """Construct a Graph that uses several graphs as its input.
 
         This should not normally be invoked directly, because there may be
@@ -243,12 +243,18 @@ class Graph:
         :param parents_provider: An object providing a get_parent_map call
             conforming to the behavior of
             StackedParentsProvider.get_parent_map.
+        :param reachability_index: Optional object with precomputed
+            generation numbers (see breezy.bzr.commit_graph.CommitGraph),
+            whose heads, is_ancestor, find_difference and
+            find_unique_ancestors methods return None for questions it
+            can not answer.
         """
         if getattr(parents_provider, "get_parents", None) is not None:
             self.get_parents = parents_provider.get_parents
         if getattr(parents_provider, "get_parent_map", None) is not None:
             self.get_parent_map = parents_provider.get_parent_map
         self._parents_provider = parents_provider
+        self._reachability_index = reachability_index
 
     def __repr__(self):
         return f"Graph({self._parents_provider!r})"
@@ -295,6 +301,12 @@ class Graph:
 
     def find_difference(self, left_revision, right_revision):
         """Determine the graph difference between two revisions."""
+        if self._reachability_index is not None:
+            result = self._reachability_index.find_difference(
+                left_revision, right_revision
+            )
+            if result is not None:
+                return result
         border, common, searchers = self._find_border_ancestors(
             [left_revision, right_revision]
         )
@@ -427,6 +439,12 @@ class Graph:
         """
         if unique_revision in common_revisions:
             return set()
+        if self._reachability_index is not None:
+            result = self._reachability_index.find_unique_ancestors(
+                unique_revision, common_revisions
+            )
+            if result is not None:
+                return result
 
         # Algorithm description
         # 1) Walk backwards from the unique node and all common nodes.
@@ -868,6 +886,10 @@ class Graph:
                 return {_mod_revision.NULL_REVISION}
         if len(candidate_heads) < 2:
             return candidate_heads
+        if self._reachability_index is not None:
+            heads = self._reachability_index.heads(candidate_heads)
+            if heads is not None:
+                return heads
         searchers = {c: self._make_breadth_first_searcher([c]) for c in candidate_heads}
         active_searchers = dict(searchers)
         # skip over the actual candidate for each searcher
@@ -1096,6 +1118,12 @@ class Graph:
         smallest number of parent lookups to determine the ancestral
         relationship between N revisions.
         """
+        if self._reachability_index is not None:
+            result = self._reachability_index.is_ancestor(
+                candidate_ancestor, candidate_descendant
+            )
+            if result is not None:
+                return result
         return {candidate_descendant} == self.heads(
             [candidate_ancestor, candidate_descendant]
         )
@@ -227,6 +227,7 @@ class Hooks(dict):
             hook_lazy(callable_module, callable_member, name)
         if name is not None:
             self.name_hook_lazy(callable_module, callable_member, name)
+        registry._notify_registration(self, hook_name)
 
     def install_named_hook(self, hook_name, a_callable, name):
         """Install a_callable in to the hook hook_name, and label it name.
@@ -250,6 +251,7 @@ class Hooks(dict):
             hook.hook(a_callable, name)
         if name is not None:
             self.name_hook(a_callable, name)
+        registry._notify_registration(self, hook_name)
 
     def uninstall_named_hook(self, hook_name, label):
         """Uninstall named hooks.
@@ -457,3 +459,4 @@ def install_lazy_named_hook(
     key = (hookpoints_module, hookpoints_name, hook_name)
     obj_getter = registry._ObjectGetter(a_callable)
     _lazy_hooks.setdefault(key, []).append((obj_getter, name))
+    registry._notify_registration(_lazy_hooks, key)
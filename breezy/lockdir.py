@@ -109,7 +109,7 @@ but helps protect against colliding host names.
 
 import time
 
-from . import config, debug, errors, lock, ui, urlutils
+from . import config, debug, errors, lock, trace_events, ui, urlutils
 from ._cmd_rs import LockHeldInfo
 from .decorators import only_raises
 from .errors import (
@@ -612,7 +612,10 @@ class LockDir(lock.Lock):
                 raise LockContention(self)
             if time.time() + poll < deadline:
                 self._trace("waiting %ss", poll)
-                time.sleep(poll)
+                with trace_events.span(
+                    "wait_lock", "lock", lock=lock_url, attempt=attempt_count
+                ):
+                    time.sleep(poll)
             else:
                 # As timeout is always 0 for remote locks
                 # this block is applicable only for local
@@ -1108,13 +1108,17 @@ def _generate_deltas(repository, log_rev_iterator, delta_type, files, direction)
     if check_files:
         file_set = set(files)
         stop_on = "add" if direction == "reverse" else "remove"
+        changed_paths_index = repository.get_changed_paths_index()
     else:
         file_set = None
+        changed_paths_index = None
     for revs in log_rev_iterator:
         # If we were matching against files and we've run out,
         # there's nothing left to do
         if check_files and not file_set:
             return
+        if changed_paths_index is not None:
+            revs = _filter_untouched_revisions(changed_paths_index, revs, file_set)
         revisions = [rev[1] for rev in revs]
         new_revs = []
         if delta_type == "full" and not check_files:
@@ -1145,6 +1149,30 @@ def _generate_deltas(repository, log_rev_iterator, delta_type, files, direction)
         yield new_revs
 
 
+def _filter_untouched_revisions(changed_paths_index, revs, files):
+    """Drop the revisions that don't touch files according to an index.
+
+    :param changed_paths_index: A ChangedPathsIndex of the repository.
+    :param revs: A list of ((rev_id, revno, merge_depth), rev, delta).
+    :param files: The paths of interest in the first revision of revs.
+    :return: The revisions of revs that may touch files.
+    """
+    paths = set(files)
+    result = []
+    for i, rev in enumerate(revs):
+        rev_id = rev[0][0]
+        touched = changed_paths_index.touches_paths(rev_id, paths)
+        if touched is None:
+            # Without the changes of this revision the paths of the files
+            # in the remaining revisions are unknown.
+            result.extend(revs[i:])
+            break
+        if touched:
+            result.append(rev)
+            paths.update(changed_paths_index.get_renamed_paths(rev_id, paths))
+    return result
+
+
 def _update_files(delta, files, stop_on):
     """Update the set of files to search based on file lifecycle events.
 
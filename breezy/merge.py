@@ -14,6 +14,7 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
 
+import collections
 import contextlib
 import tempfile
 from typing import Type
@@ -749,6 +750,142 @@ class _InventoryNoneEntry:
 
 _none_entry = _InventoryNoneEntry()
 
+# Number of files whose texts are read ahead at a time
+_TEXT_PREFETCH_BATCH_SIZE = 64
+
+
+def _merge3_text(base_lines, other_lines, this_lines, cherrypick, show_base, reprocess):
+    """Merge the lines of a file with merge3.
+
+    This is a module level function so it can be run in worker processes.
+
+    :return: Tuple with the merged lines and whether there were text
+        conflicts.
+    """
+    from merge3 import Merge3
+
+    m3 = Merge3(
+        base_lines,
+        this_lines,
+        other_lines,
+        is_cherrypick=cherrypick,
+        sequence_matcher=patiencediff.PatienceSequenceMatcher,
+    )
+    start_marker = b"!START OF MERGE CONFLICT!" + b"I HOPE THIS IS UNIQUE"
+    base_marker = b"|" * 7 if show_base else None
+    text_conflicts = False
+    lines = []
+    for line in m3.merge_lines(
+        name_a=b"TREE",
+        name_b=b"MERGE-SOURCE",
+        name_base=b"BASE-REVISION",
+        start_marker=start_marker,
+        base_marker=base_marker,
+        reprocess=reprocess,
+    ):
+        if line.startswith(start_marker):
+            text_conflicts = True
+            line = line.replace(start_marker, b"<" * 7)
+        lines.append(line)
+    return lines, text_conflicts
+
+
+class _TextPrefetcher:
+    """Read the texts of the files a Merge3Merger will merge ahead of time.
+
+    The texts of the next batch of files are read with one iter_files_bytes
+    call per tree, rather than one call per file, which saves a round trip
+    per file for remote and repository trees.
+
+    If an executor is given, the texts are also merged ahead in it, while
+    the merger works through the preceding files. merge3 holds the GIL, so
+    this needs a process pool to use more than one core. The merger picks
+    the results up in file order, so the transform is built exactly as it
+    would be without the prefetcher.
+    """
+
+    def __init__(self, merger, candidates, executor=None):
+        self._merger = merger
+        self._pending = collections.deque(candidates)
+        self._candidates = {paths for paths, with_base in self._pending}
+        self._batch_size = _TEXT_PREFETCH_BATCH_SIZE
+        self._texts = collections.OrderedDict()
+        self._executor = executor
+        if self._executor is not None and self._pending:
+            self._read_batch()
+
+    def _read_lines(self, tree, paths_list, index):
+        desired_files = [(paths[index], paths) for paths in paths_list]
+        return {
+            paths: osutils.chunks_to_lines(chunks)
+            for paths, chunks in tree.iter_files_bytes(desired_files)
+        }
+
+    def _submit_merge(self, lines):
+        if self._executor is None:
+            return None
+        try:
+            for text_lines in lines:
+                textfile.check_text_lines(text_lines)
+        except errors.BinaryFile:
+            # Left for the merger to report
+            return None
+        merger = self._merger
+        return self._executor.submit(
+            _merge3_text,
+            *lines,
+            merger.cherrypick,
+            merger.show_base is True,
+            merger.reprocess,
+        )
+
+    def _read_batch(self):
+        batch = []
+        while self._pending and len(batch) < self._batch_size:
+            batch.append(self._pending.popleft())
+        all_paths = [paths for paths, with_base in batch]
+        base_lines = self._read_lines(
+            self._merger.base_tree,
+            [paths for paths, with_base in batch if with_base],
+            0,
+        )
+        other_lines = self._read_lines(self._merger.other_tree, all_paths, 1)
+        this_lines = self._read_lines(self._merger.this_tree, all_paths, 2)
+        for paths in all_paths:
+            lines = (base_lines.get(paths, []), other_lines[paths], this_lines[paths])
+            self._texts[paths] = lines + (self._submit_merge(lines),)
+
+    def get(self, paths):
+        """Return the texts of a file.
+
+        :param paths: Tuple with the base, other and this paths of the file.
+        :return: Tuple with the base, other and this lines and a future for
+            the result of _merge3_text (or None if the file is not being
+            merged ahead), or None if the file was not read ahead.
+        """
+        if paths not in self._candidates:
+            return None
+        self._candidates.discard(paths)
+        while paths not in self._texts and self._pending:
+            self._read_batch()
+        if paths not in self._texts:
+            return None
+        while True:
+            # Drop the texts of files that were merged by merge hooks instead
+            key, texts = self._texts.popitem(last=False)
+            if key == paths:
+                break
+            if texts[-1] is not None:
+                texts[-1].cancel()
+        if (
+            self._executor is not None
+            and len(self._texts) < self._batch_size
+            and self._pending
+        ):
+            # Keep the workers busy
+            self._read_batch()
+        return texts
+
 
 class Merge3Merger:
     """Three-way merger that uses the merge3 text merger."""
@@ -762,6 +899,7 @@ class Merge3Merger:
     winner_idx = {"this": 2, "other": 1, "conflict": 1}
     supports_lca_trees = True
     requires_file_merge_plan = False
+    supports_text_prefetch = True
 
     def __init__(
         self,
@@ -823,6 +961,7 @@ class Merge3Merger:
         #     self._lca_trees = [self.base_tree]
         self.change_reporter = change_reporter
         self.cherrypick = cherrypick
+        self._text_prefetcher = None
         if do_merge:
             self.do_merge()
 
@@ -858,7 +997,22 @@ class Merge3Merger:
         # One hook for each registered one plus our default merger
         hooks = [factory(self) for factory in factories] + [self]
         self.active_hooks = [hook for hook in hooks if hook is not None]
-        with ui.ui_factory.nested_progress_bar() as child_pb:
+        with contextlib.ExitStack() as stack:
+            processes = self._get_merge_processes()
+            if processes > 1:
+                from concurrent.futures import ProcessPoolExecutor
+
+                executor = ProcessPoolExecutor(processes)
+                stack.callback(executor.shutdown, cancel_futures=True)
+                self._text_prefetcher = _TextPrefetcher(
+                    self, self._iter_text_merge_candidates(entries), executor
+                )
+            elif self._get_prefetch_texts():
+                self._text_prefetcher = _TextPrefetcher(
+                    self, self._iter_text_merge_candidates(entries)
+                )
+            stack.callback(setattr, self, "_text_prefetcher", None)
+            child_pb = stack.enter_context(ui.ui_factory.nested_progress_bar())
             for num, (
                 file_id,
                 changed,
@@ -1353,24 +1507,25 @@ class Merge3Merger:
                 parent_trans_id = self.tt.trans_id_file_id(parent_id)
             self.tt.adjust_path(name, parent_trans_id, trans_id)
 
+    @staticmethod
+    def _contents_pair(tree, path):
+        if path is None:
+            return (None, None)
+        try:
+            kind = tree.kind(path)
+        except _mod_transport.NoSuchFile:
+            return (None, None)
+        if kind == "file":
+            contents = tree.get_file_sha1(path)
+        elif kind == "symlink":
+            contents = tree.get_symlink_target(path)
+        else:
+            contents = None
+        return kind, contents
+
     def _do_merge_contents(self, paths, trans_id, file_id):
         """Performs a merge on file_id contents."""
-
-        def contents_pair(tree, path):
-            if path is None:
-                return (None, None)
-            try:
-                kind = tree.kind(path)
-            except _mod_transport.NoSuchFile:
-                return (None, None)
-            if kind == "file":
-                contents = tree.get_file_sha1(path)
-            elif kind == "symlink":
-                contents = tree.get_symlink_target(path)
-            else:
-                contents = None
-            return kind, contents
-
+        contents_pair = self._contents_pair
         base_path, other_path, this_path = paths
         # See SPOT run.  run, SPOT, run.
         # So we're not QUITE repeating ourselves; we do tricky things with
@@ -1555,52 +1710,27 @@ class Merge3Merger:
 
     def text_merge(self, trans_id, paths):
         """Perform a three-way text merge on a file."""
-        from merge3 import Merge3
-
-        # it's possible that we got here with base as a different type.
-        # if so, we just want two-way text conflicts.
-        base_path, other_path, this_path = paths
-        base_lines = self.get_lines(self.base_tree, base_path)
-        other_lines = self.get_lines(self.other_tree, other_path)
-        this_lines = self.get_lines(self.this_tree, this_path)
-        textfile.check_text_lines(base_lines)
-        textfile.check_text_lines(other_lines)
-        textfile.check_text_lines(this_lines)
-        m3 = Merge3(
-            base_lines,
-            this_lines,
-            other_lines,
-            is_cherrypick=self.cherrypick,
-            sequence_matcher=patiencediff.PatienceSequenceMatcher,
-        )
-        start_marker = b"!START OF MERGE CONFLICT!" + b"I HOPE THIS IS UNIQUE"
-        base_marker = b"|" * 7 if self.show_base is True else None
-
-        def iter_merge3(retval):
-            retval["text_conflicts"] = False
-            if base_marker and self.reprocess:
-                raise CantReprocessAndShowBase()
-            lines = list(
-                m3.merge_lines(
-                    name_a=b"TREE",
-                    name_b=b"MERGE-SOURCE",
-                    name_base=b"BASE-REVISION",
-                    start_marker=start_marker,
-                    base_marker=base_marker,
-                    reprocess=self.reprocess,
-                )
+        texts = None
+        if self._text_prefetcher is not None:
+            texts = self._text_prefetcher.get(paths)
+        merged = None
+        if texts is not None:
+            base_lines, other_lines, this_lines, merged = texts
+        else:
+            # it's possible that we got here with base as a different type.
+            # if so, we just want two-way text conflicts.
+            base_path, other_path, this_path = paths
+            base_lines = self.get_lines(self.base_tree, base_path)
+            other_lines = self.get_lines(self.other_tree, other_path)
+            this_lines = self.get_lines(self.this_tree, this_path)
+        if merged is not None:
+            lines, text_conflicts = merged.result()
+        else:
+            lines, text_conflicts = self._merge3_lines(
+                base_lines, other_lines, this_lines
             )
-            for line in lines:
-                if line.startswith(start_marker):
-                    retval["text_conflicts"] = True
-                    yield line.replace(start_marker, b"<" * 7)
-                else:
-                    yield line
-
-        retval = {}
-        merge3_iterator = iter_merge3(retval)
-        self.tt.create_file(merge3_iterator, trans_id)
-        if retval["text_conflicts"] is True:
+        self.tt.create_file(lines, trans_id)
+        if text_conflicts:
             self._raw_conflicts.append(("text conflict", trans_id))
             name = self.tt.final_name(trans_id)
             parent_id = self.tt.final_parent(trans_id)
@@ -1609,6 +1739,69 @@ class Merge3Merger:
             )
             file_group.append(trans_id)
 
+    def _merge3_lines(self, base_lines, other_lines, this_lines):
+        """Merge the lines of a file with merge3.
+
+        :return: Tuple with the merged lines and whether there were text
+            conflicts.
+        """
+        textfile.check_text_lines(base_lines)
+        textfile.check_text_lines(other_lines)
+        textfile.check_text_lines(this_lines)
+        if self.show_base is True and self.reprocess:
+            raise CantReprocessAndShowBase()
+        return _merge3_text(
+            base_lines,
+            other_lines,
+            this_lines,
+            self.cherrypick,
+            self.show_base is True,
+            self.reprocess,
+        )
+
+    def _get_prefetch_texts(self):
+        if not self.supports_text_prefetch:
+            return False
+        from . import config
+
+        return config.GlobalStack().get("merge.prefetch_texts")
+
+    def _get_merge_processes(self):
+        if not self.supports_text_prefetch or (
+            self.show_base is True and self.reprocess
+        ):
+            return 1
+        from . import config
+
+        return config.GlobalStack().get("merge.processes")
+
+    def _iter_text_merge_candidates(self, entries):
+        """Find the files that will most likely need a text merge.
+
+        These are the files that differ between all three trees. Merge
+        hooks may still end up handling some of them.
+
+        :return: Iterator over tuples with the base, other and this paths
+            and whether base is a file.
+        """
+        for entry in entries:
+            changed, paths3, copied = entry[1], entry[2], entry[6]
+            if not changed or copied:
+                continue
+            base_path, other_path, this_path = paths3
+            if self._lca_trees:
+                base_path = base_path[0]
+            other_pair = self._contents_pair(self.other_tree, other_path)
+            if other_pair[0] != "file":
+                continue
+            base_pair = self._contents_pair(self.base_tree, base_path)
+            if base_pair == other_pair:
+                continue
+            this_pair = self._contents_pair(self.this_tree, this_path)
+            if this_pair[0] != "file" or this_pair in (base_pair, other_pair):
+                continue
+            yield (base_path, other_path, this_path), base_pair[0] == "file"
+
     def _get_filter_tree_path(self, path):
         if self.this_tree.supports_content_filtering():
             # We get the path from the working tree if it exists.
@@ -1715,6 +1908,7 @@ class WeaveMerger(Merge3Merger):
     supports_reverse_cherrypick = False
     history_based = True
     requires_file_merge_plan = True
+    supports_text_prefetch = False
 
     def _generate_merge_plan(self, this_path, base):
         return self.this_tree.plan_file_merge(this_path, self.other_tree, base=base)
@@ -1773,6 +1967,7 @@ class Diff3Merger(Merge3Merger):
     """Three-way merger using external diff3 for text merging."""
 
     requires_file_merge_plan = False
+    supports_text_prefetch = False
 
     def dump_file(self, temp_dir, name, tree, path):
         out_path = osutils.pathjoin(temp_dir, name)
@@ -72,6 +72,9 @@ def load_plugins(path=None, state=None, warn_load_problems=True):
     files (and whatever other extensions are used in the platform,
     such as `*.pyd`).
 
+    If the plugin_cache option is enabled, plugins that are known to only
+    provide commands are not imported until one of their commands is used.
+
     Args:
       path: The list of paths to search for plugins.  By default,
         it is populated from the __path__ of the breezy.plugins package.
@@ -88,7 +91,11 @@ def load_plugins(path=None, state=None, warn_load_problems=True):
         from breezy.plugins import __path__ as path
 
     state.plugin_warnings = {}
-    _load_plugins(state, path)
+    state.deferred_plugins = {}
+    cache = _open_plugin_cache()
+    _load_plugins(state, path, cache)
+    if cache is not None:
+        cache.save()
     state.plugins = plugins()
     if warn_load_problems:
         for _plugin, errors in state.plugin_warnings.items():
@@ -255,8 +262,22 @@ def _install_importer_if_needed(plugin_details):
         sys.meta_path.insert(2, finder)
 
 
-def _load_plugins(state, paths):
-    """Do the importing all plugins from paths."""
+def _open_plugin_cache():
+    """Open the plugin cache if the plugin_cache option is enabled."""
+    from . import config, plugin_cache
+
+    if not config.GlobalStack().get("plugin_cache"):
+        return None
+    return plugin_cache.PluginCache.open(plugin_cache.default_path())
+
+
+def _load_plugins(state, paths, cache=None):
+    """Do the importing all plugins from paths.
+
+    Args:
+      cache: Optional PluginCache used to defer importing plugins that only
+        provide commands, and updated with the plugins that are imported.
+    """
     imported_names = set()
     for name, path in _iter_possible_plugins(paths):
         if name not in imported_names:
@@ -268,12 +289,78 @@ def _load_plugins(state, paths):
                     f"it to {sanitised_name!r}."
                 )
                 continue
-            msg = _load_plugin_module(name, path)
+            if cache is None or _MODULE_PREFIX + name in sys.modules:
+                msg = _load_plugin_module(name, path)
+            else:
+                commands = cache.get_deferrable_commands(name, path)
+                if commands is not None:
+                    _defer_plugin(state, name, path, commands)
+                    imported_names.add(name)
+                    continue
+                msg = cache.record(name, path, _load_plugin_module)
             if msg is not None:
                 state.plugin_warnings.setdefault(name, []).append(msg)
             imported_names.add(name)
 
 
+class _DeferredCommand:
+    """Stands in for a command of a plugin that has not been imported yet.
+
+    Calling it imports the plugin, which registers the real command, and
+    returns an instance of that.
+    """
+
+    def __init__(self, state, plugin_name, command_name, aliases):
+        self.__name__ = command_name
+        self.aliases = aliases
+        self._state = state
+        self._plugin_name = plugin_name
+
+    def __call__(self):
+        from .commands import plugin_cmds
+
+        load_deferred_plugins([self._plugin_name], self._state)
+        return plugin_cmds.get(self.__name__)()
+
+
+def _defer_plugin(state, name, path, commands):
+    """Register the commands of a plugin without importing it."""
+    from .commands import plugin_cmds
+
+    for command_name, aliases in commands:
+        plugin_cmds.register(_DeferredCommand(state, name, command_name, aliases))
+    state.deferred_plugins[name] = (path, [command for command, _ in commands])
+
+
+def load_deferred_plugins(names=None, state=None):
+    """Import plugins whose import was deferred by the plugin cache.
+
+    Args:
+      names: The names of the plugins to import, or None for all of them.
+      state: The library state object that records loaded plugins.
+    """
+    from .commands import plugin_cmds
+
+    if state is None:
+        state = breezy.get_global_state()
+    deferred_plugins = getattr(state, "deferred_plugins", {})
+    if names is None:
+        names = list(deferred_plugins)
+    names = [name for name in names if name in deferred_plugins]
+    if not names:
+        return
+    for name in names:
+        path, command_names = deferred_plugins.pop(name)
+        # The plugin registers its commands again when it is imported
+        for command_name in command_names:
+            plugin_cmds.remove(command_name)
+        msg = _load_plugin_module(name, path)
+        if msg is not None:
+            state.plugin_warnings.setdefault(name, []).append(msg)
+            trace.warning("%s", msg)
+    state.plugins = plugins()
+
+
 def _block_plugins(names):
     """Add names to sys.modules to block future imports."""
     for name in names:
@@ -339,6 +426,7 @@ def describe_plugins(show_paths=False, state=None):
     """
     if state is None:
         state = breezy.get_global_state()
+    load_deferred_plugins(state=state)
     loaded_plugins = getattr(state, "plugins", {})
     plugin_warnings = set(getattr(state, "plugin_warnings", []))
     all_names = sorted(set(loaded_plugins.keys()).union(plugin_warnings))
@@ -498,6 +586,7 @@ class PluginsHelpIndex:
             return []
         if topic.startswith(self.prefix):
             topic = topic[len(self.prefix) :]
+        load_deferred_plugins([topic])
         plugin_module_name = _MODULE_PREFIX + topic
         try:
             module = sys.modules[plugin_module_name]
@@ -0,0 +1,186 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Cache of what plugins register when they are imported.
+
+When a plugin is imported, everything it registers is recorded: its
+commands, and the registries, hook points and probers it adds to. A plugin
+that registered nothing but new commands can later be deferred: its
+commands are registered from the cache, and the plugin is only imported
+when one of them is used.
+
+Entries are keyed on the name and location of the plugin and the latest
+modification time of its files, so they are refreshed whenever a plugin is
+installed, upgraded or edited.
+"""
+
+import json
+import os
+
+import breezy
+
+from . import osutils, registry, trace
+
+CACHE_NAME = "plugin-cache.json"
+
+FORMAT = 1
+
+_MODULE_EXTENSIONS = (".py", ".pyc")
+
+
+def plugin_signature(name, path):
+    """Return the latest modification time of the files of a plugin.
+
+    Args:
+      name: The name of the plugin.
+      path: The directory of a plugin package, the directory containing a
+        plugin module or the file of a plugin module.
+
+    Returns:
+      The modification time in nanoseconds, or None if the plugin could not
+      be found.
+    """
+    if os.path.isfile(path):
+        paths = [path]
+    elif os.path.basename(path) == name:
+        try:
+            paths = [path] + [osutils.pathjoin(path, f) for f in os.listdir(path)]
+        except OSError:
+            return None
+    else:
+        paths = [osutils.pathjoin(path, name + ext) for ext in _MODULE_EXTENSIONS]
+    mtimes = []
+    for p in paths:
+        try:
+            mtimes.append(os.stat(p).st_mtime_ns)
+        except OSError:
+            pass
+    return max(mtimes, default=None)
+
+
+class PluginCache:
+    """The recorded registrations of plugins, stored in a JSON file."""
+
+    def __init__(self, path, entries=None):
+        self._path = path
+        self._entries = {} if entries is None else entries
+        self._changed = False
+
+    @classmethod
+    def open(cls, path):
+        """Read the cache at path, or start an empty one if it is unusable."""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return cls(path)
+        except (OSError, ValueError) as e:
+            trace.mutter("ignoring plugin cache %s: %s", path, e)
+            return cls(path)
+        if (
+            not isinstance(data, dict)
+            or data.get("format") != FORMAT
+            or data.get("version") != breezy.version_string
+        ):
+            return cls(path)
+        return cls(path, data.get("plugins", {}))
+
+    def get_deferrable_commands(self, name, path):
+        """Return the commands of a plugin that can be deferred.
+
+        Returns:
+          A list of (command_name, aliases) tuples, or None if the plugin has
+          to be imported.
+        """
+        entry = self._entries.get(name)
+        if (
+            entry is None
+            or not entry["deferrable"]
+            or entry["path"] != path
+            or entry["signature"] != plugin_signature(name, path)
+        ):
+            return None
+        return [(command_name, aliases) for command_name, aliases in entry["commands"]]
+
+    def record(self, name, path, load):
+        """Import a plugin, recording what it registers.
+
+        Args:
+          name: The name of the plugin.
+          path: The location of the plugin.
+          load: Callable that imports the plugin when called with name and
+            path, and returns an error message or None.
+
+        Returns:
+          The return value of load.
+        """
+        from .commands import builtin_command_registry, plugin_cmds
+
+        signature = plugin_signature(name, path)
+        registrations = []
+
+        def observe(target, key):
+            registrations.append((target, key))
+
+        registry._registration_observers.append(observe)
+        try:
+            msg = load(name, path)
+        finally:
+            registry._registration_observers.remove(observe)
+        commands = []
+        others = []
+        for target, key in registrations:
+            if target is plugin_cmds and key not in builtin_command_registry:
+                commands.append((key, list(plugin_cmds.get_info(key).aliases)))
+            else:
+                others.append(f"{target.__class__.__name__} {key!r}")
+        self._entries[name] = {
+            "path": path,
+            "signature": signature,
+            "commands": commands,
+            "registrations": others,
+            "deferrable": bool(
+                msg is None and signature is not None and commands and not others
+            ),
+        }
+        self._changed = True
+        return msg
+
+    def save(self):
+        """Write the cache if it changed, ignoring failures."""
+        if not self._changed:
+            return
+        data = {
+            "format": FORMAT,
+            "version": breezy.version_string,
+            "plugins": self._entries,
+        }
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            trace.mutter("unable to write plugin cache %s: %s", self._path, e)
+            return
+        self._changed = False
+
+
+def default_path():
+    """Return the path of the plugin cache in the cache directory."""
+    from .bedding import cache_dir
+
+    return osutils.pathjoin(cache_dir(), CACHE_NAME)
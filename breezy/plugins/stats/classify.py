@@ -77,3 +77,19 @@ def classify_delta(delta):
     for d in delta.added + delta.modified:
         types.append(classify_filename(d.path[1] or d.path[0]))
     return types
+
+
+def classify_changes(changes):
+    """Determine what sort of changes a revision makes.
+
+    Like classify_delta, but for the changes recorded in the changed paths
+    index of a repository.
+
+    :param changes: (kind, old_path, new_path, file_id) tuples
+    :return: List with classes found (see classify_filename)
+    """
+    return [
+        classify_filename(new_path or old_path)
+        for (kind, old_path, new_path, _file_id) in changes
+        if kind in ("added", "modified")
+    ]
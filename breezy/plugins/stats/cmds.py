@@ -17,7 +17,7 @@
 
 from ... import branch, commands, config, errors, option, trace, tsort, ui, workingtree
 from ...revision import NULL_REVISION
-from .classify import classify_delta
+from .classify import classify_changes, classify_delta
 
 
 def collapse_by_person(revisions, canonical_committer):
@@ -299,13 +299,36 @@ class cmd_ancestor_growth(commands.Command):
                     self.outf.write("%4d, %4d\n" % (revno, cur_parents))
 
 
+def iter_revision_classes(repository, revs):
+    """Determine what sort of changes each of revs makes.
+
+    The changed paths index of the repository is used for the revisions it
+    contains; the others are compared with their left-hand parent.
+
+    :return: Iterator over a list of classes for each revision (see
+        classify_filename)
+    """
+    index = repository.get_changed_paths_index()
+    if index is None:
+        missing = revs
+    else:
+        missing = [rev for rev in revs if rev.revision_id not in index]
+    deltas = repository.get_revision_deltas(missing)
+    for rev in revs:
+        changes = None if index is None else index.get_changes(rev.revision_id)
+        if changes is None:
+            yield classify_delta(next(deltas))
+        else:
+            yield classify_changes(changes)
+
+
 def gather_class_stats(repository, revs):
     ret = {}
     total = 0
     with ui.ui_factory.nested_progress_bar() as pb, repository.lock_read():
-        for i, delta in enumerate(repository.get_revision_deltas(revs)):
+        for i, classes in enumerate(iter_revision_classes(repository, revs)):
             pb.update("classifying commits", i, len(revs))
-            for c in classify_delta(delta):
+            for c in classes:
                 if c not in ret:
                     ret[c] = 0
                 ret[c] += 1
@@ -350,13 +373,13 @@ def find_credits(repository, revid):
         ]
         revs = repository.get_revisions(ancestry)
         with ui.ui_factory.nested_progress_bar() as pb:
-            iterator = zip(revs, repository.get_revision_deltas(revs))
-            for i, (rev, delta) in enumerate(iterator):
+            iterator = zip(revs, iter_revision_classes(repository, revs))
+            for i, (rev, classes) in enumerate(iterator):
                 pb.update("analysing revisions", i, len(revs))
                 # Don't count merges
                 if len(rev.parent_ids) > 1:
                     continue
-                for c in set(classify_delta(delta)):
+                for c in set(classes):
                     for author in rev.get_apparent_authors():
                         if author not in ret[c]:
                             ret[c][author] = 0
@@ -1,6 +1,11 @@
+from ... import config
 from ...revision import Revision
 from ...tests import TestCase, TestCaseWithTransport
-from .cmds import collapse_by_person, get_revisions_and_committers
+from .cmds import (
+    collapse_by_person,
+    get_revisions_and_committers,
+    iter_revision_classes,
+)
 
 
 class TestGetRevisionsAndCommitters(TestCaseWithTransport):
@@ -225,3 +230,33 @@ class TestCollapseByPerson(TestCase):
         self.assertEqual(3, info[0][0])
         self.assertEqual({"foo@example.com": 2, "bar@example.com": 1}, info[0][2])
         self.assertEqual({"Foo": 2, "FOO": 1}, info[0][3])
+
+
+class TestIterRevisionClasses(TestCaseWithTransport):
+    def make_history(self):
+        wt = self.make_branch_and_tree(".", format="2a")
+        self.build_tree(["foo.c", "README"])
+        wt.add(["foo.c", "README"])
+        wt.commit(message="1", rev_id=b"1")
+        self.build_tree_contents([("foo.c", b"int x;\n")])
+        wt.commit(message="2", rev_id=b"2")
+        repo = wt.branch.repository
+        return repo, repo.get_revisions([b"1", b"2"])
+
+    def test_deltas(self):
+        repo, revs = self.make_history()
+        with repo.lock_read():
+            self.assertEqual(
+                [["documentation", "code"], ["code"]],
+                list(iter_revision_classes(repo, revs)),
+            )
+
+    def test_changed_paths_index(self):
+        config.GlobalStack().set("repository.changed_paths_index", True)
+        repo, revs = self.make_history()
+        with repo.lock_read():
+            self.assertEqual(2, repo.get_changed_paths_index().revision_count())
+            self.assertEqual(
+                [["documentation", "code"], ["code"]],
+                list(iter_revision_classes(repo, revs)),
+            )
@@ -108,6 +108,17 @@ V = TypeVar("V")
 I = TypeVar("I")
 
 
+# Callables that are called with the registry (or other target) and key of
+# every registration; breezy.plugin_cache uses this to find out what
+# importing a plugin registers.
+_registration_observers: list[Callable[[Any, Any], None]] = []
+
+
+def _notify_registration(target, key):
+    for observer in _registration_observers:
+        observer(target, key)
+
+
 class Registry(Generic[K, V, I]):
     """A class that registers objects to a name.
 
@@ -171,6 +182,7 @@ class Registry(Generic[K, V, I]):
             raise KeyError(f"Key {key!r} already registered")
         self._dict[key] = _ObjectGetter[V](obj)
         self._add_help_and_info(key, help=help, info=info)
+        _notify_registration(self, key)
 
     def register_lazy(
         self,
@@ -200,6 +212,7 @@ class Registry(Generic[K, V, I]):
             raise KeyError(f"Key {key!r} already registered")
         self._dict[key] = _LazyObjectGetter[V](module_name, member_name)
         self._add_help_and_info(key, help=help, info=info)
+        _notify_registration(self, key)
 
     def register_alias(self, key: K, target: K, info: Optional[I] = None):
         """Register an alias.
@@ -214,6 +227,7 @@ class Registry(Generic[K, V, I]):
         if info is None:
             info = self._info_dict[target]
         self._add_help_and_info(key, help=self._help_dict[target], info=info)
+        _notify_registration(self, key)
 
     def _add_help_and_info(self, key: K, help=None, info: Optional[I] = None):
         """Add the help and information about this key."""
@@ -969,6 +969,18 @@ class Repository(controldir.ControlComponent, _RelockDebugMixin):
                     if p is not None
                 ]
 
+    def get_changed_paths_index(self):
+        """Return an index of the paths changed by each revision, if any.
+
+        The index has the changes get_revision_deltas would find for the
+        revisions it contains, and can be used to skip revisions that don't
+        touch some paths without comparing their trees.
+
+        :return: A breezy.bzr.changed_paths.ChangedPathsIndex, or None if
+            the repository doesn't maintain one.
+        """
+        return None
+
     def store_revision_signature(self, gpg_strategy, plaintext, revision_id):
         raise NotImplementedError(self.store_revision_signature)
 
@@ -4112,6 +4112,7 @@ def _test_suite_testmod_names():
         "breezy.tests.test_annotate",
         "breezy.tests.test_atomicfile",
         "breezy.tests.test_bad_files",
+        "breezy.tests.test_benchmarks",
         "breezy.tests.test_bisect",
         "breezy.tests.test_bisect_multi",
         "breezy.tests.test_branch",
@@ -4236,6 +4237,7 @@ def _test_suite_testmod_names():
         "breezy.tests.test_cethread",
         "breezy.tests.test_timestamp",
         "breezy.tests.test_trace",
+        "breezy.tests.test_trace_events",
         "breezy.tests.test_transactions",
         "breezy.tests.test_transform",
         "breezy.tests.test_transport",
@@ -4348,6 +4350,7 @@ def test_suite(keep_only=None, starting_with=None):
         suite.addTest(doc_suite)
 
     default_encoding = sys.getdefaultencoding()
+    _mod_plugin.load_deferred_plugins()
     for name, plugin in _mod_plugin.plugins().items():
         if not interesting_module(plugin.module.__name__):
             continue
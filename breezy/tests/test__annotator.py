@@ -17,7 +17,7 @@
 """Tests for Annotators."""
 
 from .. import annotate, errors, revision, tests
-from ..bzr import knit
+from ..bzr import annotation_cache, knit
 
 
 def load_tests(loader, standard_tests, pattern):
@@ -443,3 +443,40 @@ class TestAnnotator(tests.TestCaseWithMemoryTransport):
             ],
             self.fb_key,
         )
+
+    def test_annotate_with_cache(self):
+        self.make_merge_and_restored_text()
+        cache = annotation_cache.AnnotationCache(self.get_transport("annotations"))
+        self.ann = self.module.Annotator(self.vf, cache=cache)
+        annotations, _lines = self.ann.annotate(self.fd_key)
+        self.assertEqual(
+            annotations, cache.get(self.fd_key, (self.fa_key, self.fc_key))
+        )
+        self.vf.add_lines(
+            self.fe_key, [self.fd_key], [b"simple\n", b"content\n", b"more\n"]
+        )
+        self.ann = self.module.Annotator(self.vf, cache=cache)
+        self.assertAnnotateEqual(
+            [(self.fa_key,), (self.fa_key, self.fc_key), (self.fe_key,)],
+            self.fe_key,
+        )
+        # The ancestry of the cached text was not annotated again
+        self.assertEqual({self.fd_key}, self.ann._cached_keys)
+        self.assertNotIn(self.fc_key, self.ann._parent_map)
+        self.assertEqual(
+            [
+                (self.fa_key, b"simple\n"),
+                (self.fc_key, b"content\n"),
+                (self.fe_key, b"more\n"),
+            ],
+            self.ann.annotate_flat(self.fe_key),
+        )
+
+    def test_cache_not_used_for_special_text(self):
+        self.make_simple_text()
+        cache = annotation_cache.AnnotationCache(self.get_transport("annotations"))
+        self.ann = self.module.Annotator(self.vf, cache=cache)
+        spec_key = (b"f-id", revision.CURRENT_REVISION)
+        self.ann.add_special_text(spec_key, [self.fb_key], b"simple\nlocal\n")
+        self.ann.annotate(spec_key)
+        self.assertIs(None, cache.get(spec_key, (self.fb_key,)))
@@ -0,0 +1,100 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Tests for the benchmarks of synthetic repositories."""
+
+import json
+
+from .. import benchmarks
+from ..branch import Branch
+from . import TestCase, TestCaseWithTransport
+
+
+class TestBuildRepository(TestCaseWithTransport):
+    def test_build(self):
+        scenario = benchmarks.Scenario(7, 5, lines=10, changes=2, merge_interval=3)
+        repo = benchmarks.build_repository("repo", scenario)
+        self.assertEqual(7, len(repo.mainline))
+        self.assertEqual(5, len(repo.paths))
+        branch = Branch.open("repo")
+        self.assertEqual(repo.mainline[-1], branch.last_revision())
+        with branch.repository.lock_read():
+            parent_map = branch.repository.get_parent_map(repo.mainline)
+        self.assertEqual(2, len(parent_map[repo.mainline[3]]))
+        self.assertEqual(2, len(parent_map[repo.mainline[6]]))
+        self.assertEqual(1, len(parent_map[repo.mainline[4]]))
+        tree = branch.controldir.open_workingtree()
+        self.assertEqual([], list(tree.iter_changes(tree.basis_tree())))
+
+    def test_deterministic(self):
+        scenario = benchmarks.Scenario(4, 3, lines=5, changes=1)
+        one = benchmarks.build_repository("one", scenario)
+        two = benchmarks.build_repository("two", scenario)
+        self.assertEqual(one.mainline, two.mainline)
+        self.assertEqual(one.most_modified_path, two.most_modified_path)
+
+
+class TestCompareResults(TestCase):
+    def test_compare(self):
+        baseline = {"operations": {"log": {"min": 1.0}, "status": {"min": 2.0}}}
+        results = {
+            "operations": {
+                "log": {"min": 1.05},
+                "status": {"min": 2.5},
+                "diff": {"min": 3.0},
+            }
+        }
+        self.assertEqual(
+            [("status", 2.0, 2.5)], benchmarks.compare_results(baseline, results)
+        )
+        self.assertEqual(
+            [], benchmarks.compare_results(baseline, results, threshold=0.5)
+        )
+
+
+class TestRunBenchmarks(TestCaseWithTransport):
+    def test_run_all(self):
+        results = benchmarks.run_benchmarks("tiny", repeat=1)
+        self.assertEqual("tiny", results["scenario"])
+        self.assertEqual(
+            sorted(benchmarks.operation_registry.keys()),
+            sorted(results["operations"]),
+        )
+        for result in results["operations"].values():
+            self.assertEqual(1, len(result["runs"]))
+        json.dumps(results)
+
+
+class TestBenchmarkCommand(TestCaseWithTransport):
+    def test_baseline(self):
+        self.run_bzr("benchmark --scenario=tiny --repeat=1 --output=out.json log")
+        with open("out.json") as f:
+            results = json.load(f)
+        self.assertEqual(["log"], list(results["operations"]))
+        results["operations"]["log"]["min"] = 0.0
+        with open("base.json", "w") as f:
+            json.dump(results, f)
+        out, _ = self.run_bzr(
+            "benchmark --scenario=tiny --repeat=1 --baseline=base.json log",
+            retcode=1,
+        )
+        self.assertContainsRe(out, "log regressed from 0.000s")
+
+    def test_unknown_operation(self):
+        self.run_bzr_error(
+            ["Unknown benchmark operation 'frobnicate'"],
+            "benchmark --scenario=tiny frobnicate",
+        )
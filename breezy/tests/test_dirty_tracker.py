@@ -111,3 +111,10 @@ class DirtyTrackerTests(TestCaseWithTransport):
             self.build_tree_contents([("tree/foo", "bar")])
             self.assertTrue(self.tracker.is_dirty())
             self.assertEqual(self.tracker.relpaths(), {"foo"})
+
+    def test_pop_relpaths(self):
+        with self.tracker:
+            self.build_tree_contents([("tree/foo", "bar")])
+            self.assertEqual({"foo"}, self.tracker.pop_relpaths())
+            self.assertFalse(self.tracker.is_dirty())
+            self.assertEqual(set(), self.tracker.pop_relpaths())
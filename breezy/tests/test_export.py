@@ -284,6 +284,56 @@ class TarExporterTests(tests.TestCaseWithTransport):
         self.addCleanup(ball2.close)
         self.assertEqual(["bar/a"], ball2.getnames())
 
+    def test_tbz2_contents_in_batches(self):
+        self.overrideAttr(export, "_FETCH_BATCH_SIZE", 2)
+        wt = self.make_branch_and_tree(".")
+        self.build_tree(["a", "b/", "b/c", "d", "e"])
+        wt.add(["a", "b", "b/c", "d", "e"])
+        revid = wt.commit("1")
+        revtree = wt.branch.repository.revision_tree(revid)
+        export.export(revtree, "target.tar.bz2", format="tbz2")
+        with tarfile.open("target.tar.bz2") as tf:
+            self.assertEqual(
+                ["target/a", "target/b", "target/d", "target/e", "target/b/c"],
+                tf.getnames(),
+            )
+            self.assertEqual(b"contents of b/c\n", tf.extractfile("target/b/c").read())
+
+
+class TestExportIterContents(tests.TestCaseWithTransport):
+    def test_batches(self):
+        self.overrideAttr(export, "_FETCH_BATCH_SIZE", 2)
+        wt = self.make_branch_and_tree(".")
+        self.build_tree(["a", "b/", "b/c"])
+        self.build_tree_contents([("empty", b"")])
+        wt.add(["a", "b", "b/c", "empty"])
+        revid = wt.commit("1")
+        revtree = wt.branch.repository.revision_tree(revid)
+        fetched = []
+        orig = revtree.iter_files_bytes
+
+        def iter_files_bytes(desired_files):
+            fetched.append([path for path, identifier in desired_files])
+            return orig(desired_files)
+
+        revtree.iter_files_bytes = iter_files_bytes
+        with revtree.lock_read():
+            self.assertEqual(
+                [
+                    ("a", "file", b"contents of a\n"),
+                    ("b", "directory", None),
+                    ("empty", "file", b""),
+                    ("b/c", "file", b"contents of b/c\n"),
+                ],
+                [
+                    (final_path, entry.kind, content)
+                    for final_path, tree_path, entry, content in (
+                        export._export_iter_contents(revtree, None)
+                    )
+                ],
+            )
+        self.assertEqual([["a"], ["empty", "b/c"]], fetched)
+
 
 class ZipExporterTests(tests.TestCaseWithTransport):
     def test_per_file_timestamps(self):
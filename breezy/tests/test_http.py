@@ -820,6 +820,21 @@ class TestRangeRequestServer(TestSpecificRequestHandler):
         # The server should have issued 3 requests
         self.assertEqual(3, server.GET_request_nb)
 
+    def test_readv_concurrent_get_requests(self):
+        config.GlobalStack().set("http.readv_connections", 3)
+        server = self.get_readonly_server()
+        t = self.get_readonly_transport()
+        # force transport to issue multiple requests
+        t._max_readv_combine = 1
+        t._max_get_ranges = 1
+        l = list(t.readv("a", ((9, 1), (0, 1), (1, 1), (3, 2), (6, 2))))
+        self.assertEqual([(9, b"9"), (0, b"0"), (1, b"1"), (3, b"34"), (6, b"67")], l)
+        self.assertEqual(5, server.GET_request_nb)
+        # The extra connections are kept for later use
+        self.assertNotEqual([], t._shared_connection.readv_pool._idle)
+        t.disconnect()
+        self.assertEqual([], t._shared_connection.readv_pool._idle)
+
     def test_complete_readv_leave_pipe_clean(self):
         server = self.get_readonly_server()
         t = self.get_readonly_transport()
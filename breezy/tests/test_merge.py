@@ -18,7 +18,7 @@ import contextlib
 import os
 
 from .. import branch as _mod_branch
-from .. import errors, memorytree, option, tests
+from .. import config, errors, memorytree, option, tests
 from .. import merge as _mod_merge
 from .. import revision as _mod_revision
 from ..bzr import inventory, knit, versionedfile
@@ -511,6 +511,65 @@ class TestMerge(TestCaseWithTransport):
         with this_tree.get_file("file") as tree_file:
             self.assertEqual(b"2b\n1\n2a\n", tree_file.read())
 
+    def test_do_merge_prefetch_texts(self):
+        config.GlobalStack().set("merge.prefetch_texts", True)
+        self.check_merge_batches()
+
+    def test_do_merge_processes(self):
+        config.GlobalStack().set("merge.processes", 2)
+        submitted = []
+        submit_merge = _mod_merge._TextPrefetcher._submit_merge
+
+        def record_submit_merge(prefetcher, lines):
+            future = submit_merge(prefetcher, lines)
+            submitted.append(future)
+            return future
+
+        self.overrideAttr(
+            _mod_merge._TextPrefetcher, "_submit_merge", record_submit_merge
+        )
+        self.check_merge_batches()
+        self.assertEqual(5, len(submitted))
+        self.assertNotIn(None, submitted)
+
+    def check_merge_batches(self):
+        self.overrideAttr(_mod_merge, "_TEXT_PREFETCH_BATCH_SIZE", 2)
+        this_tree = self.make_branch_and_tree("this")
+        names = [f"file{i}" for i in range(7)]
+        self.build_tree_contents([("this/" + name, b"1\n") for name in names])
+        this_tree.add(names)
+        this_tree.commit("rev1", rev_id=b"rev1")
+        other_tree = this_tree.controldir.sprout("other").open_workingtree()
+        self.build_tree_contents(
+            [("this/" + name, b"1\n2a\n") for name in names if name != "file3"]
+        )
+        this_tree.commit("rev2", rev_id=b"rev2a")
+        self.build_tree_contents(
+            [("other/" + name, b"2b\n1\n") for name in names if name != "file5"]
+            + [("other/file1", b"1\n2b\n")]
+        )
+        other_tree.commit("rev2", rev_id=b"rev2b")
+        this_tree.lock_write()
+        self.addCleanup(this_tree.unlock)
+        merger = _mod_merge.Merger.from_revision_ids(
+            this_tree, b"rev2b", other_branch=other_tree.branch
+        )
+        merger.merge_type = _mod_merge.Merge3Merger
+        tree_merger = merger.make_merger()
+        tree_merger.do_merge()
+        self.assertEqual(
+            [TextConflict("file1", file_id=this_tree.path2id("file1"))],
+            this_tree.conflicts(),
+        )
+        self.assertFileEqual(
+            b"1\n<<<<<<< TREE\n2a\n=======\n2b\n>>>>>>> MERGE-SOURCE\n",
+            "this/file1",
+        )
+        self.assertFileEqual(b"2b\n1\n", "this/file3")
+        self.assertFileEqual(b"1\n2a\n", "this/file5")
+        for name in ["file0", "file2", "file4", "file6"]:
+            self.assertFileEqual(b"2b\n1\n2a\n", "this/" + name)
+
     def test_merge_require_tree_root(self):
         tree = self.make_branch_and_tree(".")
         tree.lock_write()
@@ -27,7 +27,7 @@ from typing import Any, Dict, List
 
 import breezy
 
-from .. import osutils, plugin, tests
+from .. import commands, config, osutils, plugin, plugin_cache, tests
 
 # TODO: Write a test for plugin decoration of commands.
 
@@ -935,3 +935,74 @@ good 0.1.0
 """,
             "".join(plugin.describe_plugins(state=self)),
         )
+
+
+class TestPluginCache(BaseTestPlugins):
+    command_source = """\
+from breezy import commands
+
+class cmd_test_deferred_plugin(commands.Command):
+    pass
+
+commands.register_command(cmd_test_deferred_plugin)
+"""
+
+    def setUp(self):
+        super().setUp()
+        self.overrideAttr(plugin_cache, "default_path", lambda: "plugin-cache.json")
+        config.GlobalStack().set("plugin_cache", True)
+        self.addCleanup(self.remove_command)
+        self.create_plugin("commandonly", source=self.command_source)
+        self.create_plugin(
+            "registers",
+            source="from breezy import registry\nregistry.Registry().register(1, 1)\n",
+        )
+
+    def remove_command(self):
+        if "test-deferred-plugin" in commands.plugin_cmds:
+            commands.plugin_cmds.remove("test-deferred-plugin")
+
+    def load_again(self):
+        self.reset()
+        self.remove_command()
+        self.load_with_paths(["."])
+
+    def test_records_registrations(self):
+        self.load_with_paths(["."])
+        self.assertEqual({}, self.deferred_plugins)
+        cache = plugin_cache.PluginCache.open("plugin-cache.json")
+        self.assertEqual(
+            [("test-deferred-plugin", [])],
+            cache.get_deferrable_commands("commandonly", os.path.abspath(".")),
+        )
+        self.assertIs(
+            None, cache.get_deferrable_commands("registers", os.path.abspath("."))
+        )
+
+    def test_defers_command_only_plugins(self):
+        self.load_with_paths(["."])
+        self.load_again()
+        self.assertEqual(["commandonly"], list(self.deferred_plugins))
+        self.assertPluginUnknown("commandonly")
+        self.assertPluginKnown("registers")
+        command = commands.plugin_cmds.get("test-deferred-plugin")()
+        self.assertEqual("cmd_test_deferred_plugin", command.__class__.__name__)
+        self.assertPluginKnown("commandonly")
+        self.assertEqual({}, self.deferred_plugins)
+        self.assertIn("commandonly", self.plugins)
+
+    def test_changed_plugin_is_imported(self):
+        self.load_with_paths(["."])
+        mtime = os.stat("commandonly.py").st_mtime
+        os.utime("commandonly.py", (mtime + 10, mtime + 10))
+        self.load_again()
+        self.assertEqual({}, self.deferred_plugins)
+        self.assertPluginKnown("commandonly")
+
+    def test_describe_plugins_imports_deferred(self):
+        self.load_with_paths(["."])
+        self.load_again()
+        self.assertContainsRe(
+            "".join(plugin.describe_plugins(state=self)), "commandonly"
+        )
+        self.assertPluginKnown("commandonly")
@@ -469,6 +469,49 @@ class Test_SFTPReadvHelper(tests.TestCase):
             [(0, 1), (10, 1), (4, 3), (1, 3)],
         )
 
+    def test__get_requests_max_request_size(self):
+        self.requireFeature(features.paramiko)
+        helper = _mod_sftp._SFTPReadvHelper(
+            [(0, 40000), (50000, 10)], "artificial_test", _null_report_activity
+        )
+        self.assertEqual(
+            [(0, 32768), (32768, 7232), (50000, 10)],
+            helper._get_requests(max_request_size=32768),
+        )
+
+    def test_request_and_yield_offsets_scheduled(self):
+        self.requireFeature(features.paramiko)
+        data = b"abcdefghijklmnopqrstuvwxyz"
+        offsets = [(0, 1), (10, 1), (4, 3), (1, 3), (20, 6)]
+        helper = _mod_sftp._SFTPReadvHelper(
+            offsets, "artificial_test", _null_report_activity
+        )
+        requests = helper._get_requests(max_request_size=2)
+        scheduler = _mod_sftp._SFTPReadScheduler(3)
+        self.addCleanup(scheduler.shutdown)
+        data_f = ReadvFile(data)
+        result = list(
+            helper.request_and_yield_offsets(
+                data_f, requests, scheduler.read(data_f, requests)
+            )
+        )
+        self.assertEqual(
+            [(0, b"a"), (10, b"k"), (4, b"efg"), (1, b"bcd"), (20, b"uvwxyz")],
+            result,
+        )
+
+
+class TestSFTPReadScheduler(tests.TestCase):
+    def test_reads_in_order(self):
+        self.requireFeature(features.paramiko)
+        scheduler = _mod_sftp._SFTPReadScheduler(2)
+        self.addCleanup(scheduler.shutdown)
+        data_f = ReadvFile(b"0123456789")
+        reads = scheduler.read(data_f, [(8, 2), (0, 3), (5, 1), (3, 2)])
+        # The first requests are issued straight away
+        self.assertEqual(2, len(reads._pending))
+        self.assertEqual([b"89", b"012", b"5", b"34"], list(reads))
+
 
 class TestUsesAuthConfig(TestCaseWithSFTPServer):
     """Test that AuthenticationConfig can supply default usernames."""
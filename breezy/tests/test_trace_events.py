@@ -0,0 +1,100 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Tests for recording spans in the trace event format."""
+
+import json
+import threading
+
+from .. import trace_events
+from . import TestCase, TestCaseWithTransport
+
+
+class TestSpans(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(trace_events.stop_recording)
+
+    def spans(self, recorder):
+        return [event for event in recorder.get_events() if event["ph"] == "X"]
+
+    def test_not_recording(self):
+        self.assertFalse(trace_events.is_recording())
+        with trace_events.span("nothing", "test", size=1):
+            pass
+        iterable = iter([1, 2])
+        self.assertIs(iterable, trace_events.iter_in_span(iterable, "nothing"))
+
+    def test_nested(self):
+        recorder = trace_events.start_recording()
+        outer = trace_events.span("outer", "test", size=3)
+        with outer, trace_events.span("inner", "test"):
+            pass
+        self.assertIs(recorder, trace_events.stop_recording())
+        self.assertFalse(trace_events.is_recording())
+        inner, outer = self.spans(recorder)
+        self.assertEqual(("inner", "outer"), (inner["name"], outer["name"]))
+        self.assertEqual({"size": 3}, outer["args"])
+        self.assertNotIn("args", inner)
+        self.assertLessEqual(outer["ts"], inner["ts"])
+        self.assertLessEqual(inner["ts"] + inner["dur"], outer["ts"] + outer["dur"])
+
+    def test_error(self):
+        recorder = trace_events.start_recording()
+        with self.assertRaises(KeyError), trace_events.span("failing", "test"):
+            raise KeyError("key")
+        [event] = self.spans(recorder)
+        self.assertEqual({"error": "KeyError"}, event["args"])
+
+    def test_iter_in_span(self):
+        recorder = trace_events.start_recording()
+        iterable = trace_events.iter_in_span(iter([1, 2]), "readv", "test")
+        self.assertEqual([], self.spans(recorder))
+        self.assertEqual([1, 2], list(iterable))
+        [event] = self.spans(recorder)
+        self.assertEqual("readv", event["name"])
+
+    def test_threads(self):
+        recorder = trace_events.start_recording()
+
+        def run():
+            with trace_events.span("in thread", "test"):
+                pass
+
+        thread = threading.Thread(target=run, name="worker")
+        thread.start()
+        thread.join()
+        [event] = self.spans(recorder)
+        self.assertEqual(thread.ident, event["tid"])
+        self.assertIn(
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": event["pid"],
+                "tid": thread.ident,
+                "args": {"name": "worker"},
+            },
+            recorder.get_events(),
+        )
+
+
+class TestRecordCommand(TestCaseWithTransport):
+    def test_trace_events_option(self):
+        self.run_bzr(["--trace-events", "trace.json", "init", "branch"])
+        self.assertFalse(trace_events.is_recording())
+        with open("trace.json") as f:
+            trace = json.load(f)
+        self.assertIsInstance(trace["traceEvents"], list)
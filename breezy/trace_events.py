@@ -0,0 +1,203 @@
+# Copyright (C) 2026 Breezy Developers
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+
+"""Recording of timed spans in the Chrome trace event format.
+
+Code that may take a noticeable amount of wall-clock time wraps itself in a
+span::
+
+    with trace_events.span("readv", "transport", path=relpath):
+        ...
+
+When recording is enabled, with ``--trace-events FILE`` or ``-Dtrace_events``,
+each span is saved as a complete event with its thread, start time,
+duration and attributes. The file can be loaded in a trace viewer such as
+Perfetto or chrome://tracing, which shows the spans of each thread nested
+on a timeline. When recording is disabled a span costs a function call.
+"""
+
+import json
+import os
+import threading
+import time
+
+_recorder = None
+
+
+class TraceEventRecorder:
+    """Collects the spans of all threads in the process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = []
+        self._thread_names = {}
+        self._pid = os.getpid()
+        self._start = time.perf_counter()
+
+    def now(self):
+        """Return the time since recording started, in microseconds."""
+        return (time.perf_counter() - self._start) * 1000000
+
+    def add_span(self, name, category, start, duration, args=None):
+        """Record a span that ran in the current thread.
+
+        :param start: The start of the span, as returned by now().
+        :param duration: The duration of the span, in microseconds.
+        :param args: Optional dict with attributes of the span.
+        """
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start,
+            "dur": duration,
+            "pid": self._pid,
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._thread_names.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    def get_events(self):
+        """Return the recorded events, preceded by the names of the threads."""
+        with self._lock:
+            events = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self._thread_names.items()
+            ]
+            events.extend(self._events)
+        return events
+
+    def save(self, path):
+        """Write the recorded events to a file in the trace event format."""
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.get_events(), "displayTimeUnit": "ms"}, f)
+
+
+class _Span:
+    __slots__ = ("_args", "_category", "_name", "_recorder", "_start")
+
+    def __init__(self, recorder, name, category, args):
+        self._recorder = recorder
+        self._name = name
+        self._category = category
+        self._args = args
+
+    def __enter__(self):
+        self._start = self._recorder.now()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = self._recorder.now() - self._start
+        if exc_type is not None:
+            self._args["error"] = exc_type.__name__
+        self._recorder.add_span(
+            self._name, self._category, self._start, duration, self._args
+        )
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_null_span = _NullSpan()
+
+
+def span(name, category="brz", **args):
+    """Return a context manager that records the time spent in its block.
+
+    :param name: The name of the operation.
+    :param category: The subsystem the operation belongs to.
+    :param args: Attributes of the operation, which must be serializable
+        as JSON.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _null_span
+    return _Span(recorder, name, category, args)
+
+
+def iter_in_span(iterable, name, category="brz", **args):
+    """Record the time until an iterable is exhausted or closed as a span.
+
+    This is meant for generators that do their work lazily, such as
+    Transport.readv; the span includes the time spent by the consumer
+    between items.
+    """
+    if _recorder is None or iterable is None:
+        return iterable
+    return _iter_in_span(iterable, span(name, category, **args))
+
+
+def _iter_in_span(iterable, a_span):
+    with a_span:
+        yield from iterable
+
+
+def is_recording():
+    """Return True if spans are being recorded."""
+    return _recorder is not None
+
+
+def start_recording():
+    """Start recording spans.
+
+    :return: The TraceEventRecorder the spans are recorded in.
+    """
+    global _recorder
+    _recorder = TraceEventRecorder()
+    return _recorder
+
+
+def stop_recording(path=None):
+    """Stop recording spans.
+
+    :param path: Optional path of the file to save the recorded spans to.
+    :return: The TraceEventRecorder the spans were recorded in, or None if
+        no spans were being recorded.
+    """
+    global _recorder
+    recorder = _recorder
+    _recorder = None
+    if recorder is not None and path is not None:
+        recorder.save(path)
+        from .trace import note
+
+        note('Trace events written to "%s".', path)
+    return recorder
+
+
+def default_path():
+    """Return the file spans are saved to when enabled with -Dtrace_events."""
+    from .bedding import cache_dir
+
+    return os.path.join(cache_dir(), f"trace-events-{os.getpid()}.json")
@@ -39,6 +39,7 @@ from .. import (
     hooks,
     osutils,
     registry,
+    trace_events,
     ui,
     urlutils,
 )
@@ -121,9 +122,11 @@ class TransportListRegistry(registry.Registry):
 
     def register_transport_provider(self, key, obj):
         self.get(key).insert(0, registry._ObjectGetter(obj))
+        registry._notify_registration(self, key)
 
     def register_lazy_transport_provider(self, key, module_name, member_name):
         self.get(key).insert(0, registry._LazyObjectGetter(module_name, member_name))
+        registry._notify_registration(self, key)
 
     def register_transport(self, key, help=None):
         self.register(key, [], help)
@@ -661,11 +664,12 @@ class Transport:
 
         :param relpath: The relative path to the file
         """
-        f = self.get(relpath)
-        try:
-            return f.read()
-        finally:
-            f.close()
+        with trace_events.span("get_bytes", "transport", path=relpath):
+            f = self.get(relpath)
+            try:
+                return f.read()
+            finally:
+                f.close()
 
     def get_smart_medium(self):
         """Return a smart client medium for this transport if possible.
@@ -710,7 +714,9 @@ class Transport:
             #    baseline behaviour (which the current transport
             #    adjust_for_latency tests could be repurposed to).
             offsets = self._sort_expand_and_combine(offsets, upper_limit)
-        return self._readv(relpath, offsets)
+        return trace_events.iter_in_span(
+            self._readv(relpath, offsets), "readv", "transport", path=relpath
+        )
 
     def _readv(self, relpath, offsets):
         """Get parts of the file at the given relative path.
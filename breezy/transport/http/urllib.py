@@ -30,6 +30,7 @@ import re
 import socket
 import ssl
 import sys
+import threading
 import time
 import urllib
 import urllib.request
@@ -1788,6 +1789,79 @@ class Opener:
             pprint.pprint(self._opener.__dict__)
 
 
+class _BufferedRange:
+    """The data received for a coalesced offset, read like a response file."""
+
+    def __init__(self, start, data):
+        self._start = start
+        self._data = data
+        self._pos = 0
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence != os.SEEK_SET:
+            raise ValueError(f"unsupported whence {whence!r}")
+        self._pos = offset - self._start
+
+    def read(self, size=-1):
+        if size < 0:
+            data = self._data[self._pos :]
+        else:
+            data = self._data[self._pos : self._pos + size]
+        self._pos += len(data)
+        return data
+
+
+class _ReadvConnectionPool:
+    """Extra keep-alive connections to a host, used to issue range requests
+    concurrently.
+
+    Each slot is a (_SharedConnection, Opener) pair. Slots are handed out to
+    one thread at a time and are kept open between readv calls.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def acquire(self, http_transport):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        credentials = http_transport._get_credentials()
+        if credentials is not None:
+            # Authenticate the new connection like the existing one rather
+            # than prompting again.
+            auth, proxy_auth = credentials
+            credentials = (dict(auth), dict(proxy_auth))
+        return (
+            transport._SharedConnection(credentials=credentials),
+            Opener(
+                report_activity=http_transport._report_activity,
+                ca_certs=http_transport._ca_certs,
+            ),
+        )
+
+    def release(self, slot):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(slot)
+                return
+        connection = slot[0].connection
+        if connection is not None:
+            connection.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for shared_connection, _ in idle:
+            if shared_connection.connection is not None:
+                shared_connection.connection.close()
+
+
+_readv_pool_lock = threading.Lock()
+
+
 class HttpTransport(ConnectedTransport):
     """HTTP Client implementations.
 
@@ -1820,11 +1894,13 @@ class HttpTransport(ConnectedTransport):
         if _from_transport is not None:
             self._range_hint = _from_transport._range_hint
             self._opener = _from_transport._opener
+            self._ca_certs = _from_transport._ca_certs
         else:
             self._range_hint = "multi"
             self._opener = Opener(
                 report_activity=self._report_activity, ca_certs=ca_certs
             )
+            self._ca_certs = ca_certs
 
     def request(self, method, url, fields=None, headers=None, **urlopen_kw):
         body = urlopen_kw.pop("body", None)
@@ -1848,6 +1924,10 @@ class HttpTransport(ConnectedTransport):
             # Clean the httplib.HTTPConnection pipeline in case the previous
             # request couldn't do it
             connection.cleanup_pipe()
+        elif self._get_credentials() is not None:
+            # A new connection for known credentials (see
+            # _ReadvConnectionPool).
+            (auth, proxy_auth) = self._get_credentials()
         else:
             # First request, initialize credentials.
             # scheme and realm will be set by the _urllib2_wrappers.AuthHandler
@@ -1946,6 +2026,9 @@ class HttpTransport(ConnectedTransport):
         connection = self._get_connection()
         if connection is not None:
             connection.close()
+        pool = getattr(self._shared_connection, "readv_pool", None)
+        if pool is not None:
+            pool.close()
 
     def has(self, relpath):
         """Does the target location exist?"""
@@ -2196,34 +2279,98 @@ class HttpTransport(ConnectedTransport):
         if self._range_hint is None:
             # Download whole file
             yield from get_and_yield(relpath, coalesced)
+            return
+        total = len(coalesced)
+        if self._range_hint == "multi":
+            max_ranges = self._max_get_ranges
+        elif self._range_hint == "single":
+            max_ranges = total
         else:
-            total = len(coalesced)
-            if self._range_hint == "multi":
-                max_ranges = self._max_get_ranges
-            elif self._range_hint == "single":
-                max_ranges = total
+            raise AssertionError(f"Unknown _range_hint {self._range_hint!r}")
+        # TODO: Some web servers may ignore the range requests and return
+        # the whole file, we may want to detect that and avoid further
+        # requests.
+        # Hint: test_readv_multiple_get_requests will fail once we do that
+        requests = []
+        cumul = 0
+        ranges = []
+        for coal in coalesced:
+            if (
+                self._get_max_size > 0 and cumul + coal.length > self._get_max_size
+            ) or len(ranges) >= max_ranges:
+                requests.append(ranges)
+                # Restart with the current offset
+                ranges = [coal]
+                cumul = coal.length
             else:
-                raise AssertionError(f"Unknown _range_hint {self._range_hint!r}")
-            # TODO: Some web servers may ignore the range requests and return
-            # the whole file, we may want to detect that and avoid further
-            # requests.
-            # Hint: test_readv_multiple_get_requests will fail once we do that
-            cumul = 0
-            ranges = []
-            for coal in coalesced:
-                if (
-                    self._get_max_size > 0 and cumul + coal.length > self._get_max_size
-                ) or len(ranges) >= max_ranges:
-                    # Get that much and yield
-                    yield from get_and_yield(relpath, ranges)
-                    # Restart with the current offset
-                    ranges = [coal]
-                    cumul = coal.length
-                else:
-                    ranges.append(coal)
-                    cumul += coal.length
-            # Get the rest and yield
-            yield from get_and_yield(relpath, ranges)
+                ranges.append(coal)
+                cumul += coal.length
+        requests.append(ranges)
+        pool = None
+        if len(requests) > 1:
+            pool = self._get_readv_pool()
+        if pool is None:
+            for ranges in requests:
+                yield from get_and_yield(relpath, ranges)
+        else:
+            yield from self._get_ranges_concurrently(pool, relpath, requests)
+
+    def _get_readv_pool(self):
+        """Get the pool of extra connections used by readv, if enabled."""
+        size = config.GlobalStack().get("http.readv_connections")
+        if size is None or size < 2:
+            return None
+        with _readv_pool_lock:
+            pool = getattr(self._shared_connection, "readv_pool", None)
+            if pool is None:
+                pool = _ReadvConnectionPool(size)
+                self._shared_connection.readv_pool = pool
+        return pool
+
+    def _get_ranges_concurrently(self, pool, relpath, requests):
+        """Issue GET requests over several connections at once.
+
+        The responses are buffered and yielded in the order of requests, so
+        at most pool.size requests worth of data is held in memory.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        def get_ranges(ranges):
+            slot = pool.acquire(self)
+            worker = self.__class__(self.base, _from_transport=self)
+            worker._shared_connection, worker._opener = slot
+            try:
+                _code, rfile = worker._get(relpath, ranges)
+                result = []
+                for coal in ranges:
+                    rfile.seek(coal.start, os.SEEK_SET)
+                    result.append(
+                        (coal, _BufferedRange(coal.start, rfile.read(coal.length)))
+                    )
+            except BaseException:
+                # The connection may be left in an unknown state
+                connection = slot[0].connection
+                if connection is not None:
+                    connection.close()
+                raise
+            else:
+                pool.release(slot)
+            return result
+
+        executor = ThreadPoolExecutor(max_workers=pool.size)
+        pending = []
+        try:
+            for ranges in requests:
+                pending.append(executor.submit(get_ranges, ranges))
+                if len(pending) < pool.size:
+                    continue
+                yield from pending.pop(0).result()
+            while pending:
+                yield from pending.pop(0).result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
 
     def recommended_page_size(self):
         """See Transport.recommended_page_size().
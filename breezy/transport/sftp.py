@@ -24,12 +24,14 @@
 # these methods when we officially drop support for those formats.
 
 import bisect
+import collections
 import errno
 import itertools
 import os
 import random
 import stat
 import sys
+import threading
 import time
 
 from .. import config, debug, errors, urlutils
@@ -48,6 +50,8 @@ from ..transport import (
 
 SFTPError = _sftp_rs.SFTPError
 
+_read_scheduler_lock = threading.Lock()
+
 
 class WriteStream:
     def __init__(self, f):
@@ -92,6 +96,78 @@ class SFTPLock:
             pass
 
 
+class _ScheduledReads:
+    """The data for a list of read requests, fetched by a _SFTPReadScheduler.
+
+    The first requests are issued as soon as this object is created, so reads
+    for several readv() calls are in flight while earlier ones are being
+    consumed. Iterating yields the data in request order.
+    """
+
+    def __init__(self, scheduler, fp, requests):
+        self._scheduler = scheduler
+        self._fp = fp
+        self._requests = iter(requests)
+        self._pending = collections.deque()
+        self._fill()
+
+    def _fill(self):
+        while len(self._pending) < self._scheduler.window:
+            try:
+                request = next(self._requests)
+            except StopIteration:
+                return
+            self._pending.append(self._scheduler.submit(self._fp, request))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self._pending:
+            raise StopIteration
+        future = self._pending.popleft()
+        self._fill()
+        return future.result()
+
+
+class _SFTPReadScheduler:
+    """Keeps a window of SFTP read requests outstanding on a connection.
+
+    Reads are issued from a pool of window threads sharing the connection, so
+    up to window requests - from any number of readv() calls - wait on a
+    round trip at the same time.
+    """
+
+    def __init__(self, window):
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.window = window
+        self._executor = ThreadPoolExecutor(
+            max_workers=window, thread_name_prefix="sftp-read"
+        )
+
+    @staticmethod
+    def _read(fp, request):
+        return b"".join(fp.readv([request]))
+
+    def submit(self, fp, request):
+        """Issue a read of request, a (start, length) tuple, on fp.
+
+        :return: A Future for the data read.
+        """
+        return self._executor.submit(self._read, fp, request)
+
+    def read(self, fp, requests):
+        """Start reading requests from fp.
+
+        :return: An iterator over the data read for each request.
+        """
+        return _ScheduledReads(self, fp, requests)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
 class _SFTPReadvHelper:
     """A class to help with managing the state of a readv request."""
 
@@ -108,7 +184,7 @@ class _SFTPReadvHelper:
         self.relpath = relpath
         self._report_activity = _report_activity
 
-    def _get_requests(self):
+    def _get_requests(self, max_request_size=None):
         """Break up the offsets into individual requests over sftp.
 
         The SFTP spec only requires implementers to support 32kB requests. We
@@ -118,6 +194,9 @@ class _SFTPReadvHelper:
         asyncronously requests them.
         Newer versions of paramiko would do the chunking for us, but we want to
         start processing results right away, so we do it ourselves.
+
+        :param max_request_size: If not None, split requests so they are no
+            larger than this, so that they can be pipelined.
         """
         # TODO: Because we issue async requests, we don't 'fudge' any extra
         #       data.  I'm not 100% sure that is the best choice.
@@ -131,6 +210,12 @@ class _SFTPReadvHelper:
             )
         )
         requests = [(c_offset.start, c_offset.length) for c_offset in coalesced]
+        if max_request_size is not None:
+            requests = [
+                (start + offset, min(max_request_size, length - offset))
+                for start, length in requests
+                for offset in range(0, length, max_request_size)
+            ]
 
         if debug.debug_flag_enabled("sftp"):
             mutter(
@@ -142,14 +227,21 @@ class _SFTPReadvHelper:
             )
         return requests
 
-    def request_and_yield_offsets(self, fp):
+    def request_and_yield_offsets(self, fp, requests=None, data=None):
         """Request the data from the remote machine, yielding the results.
 
         :param fp: A Paramiko SFTPFile object that supports readv.
+        :param requests: The requests to issue, as returned by _get_requests.
+            By default, requests are generated from the original offsets.
+        :param data: An iterable with the data for each of the requests, if
+            they have already been issued. By default fp.readv() is used.
         :return: Yield the data requested by the original readv caller, one by
             one.
         """
-        requests = self._get_requests()
+        if requests is None:
+            requests = self._get_requests()
+        if data is None:
+            data = fp.readv(requests)
         offset_iter = iter(self.original_offsets)
         cur_offset, cur_size = next(offset_iter)
         # paramiko .readv() yields strings that are in the order of the requests
@@ -166,7 +258,7 @@ class _SFTPReadvHelper:
         # Create an 'unlimited' data stream, so we stop based on requests,
         # rather than just because the data stream ended. This lets us detect
         # short readv.
-        data_stream = itertools.chain(fp.readv(requests), itertools.repeat(None))
+        data_stream = itertools.chain(data, itertools.repeat(None))
         for (start, length), data in zip(requests, data_stream):
             if data is None and cur_coalesced is not None:
                 raise errors.ShortReadvError(self.relpath, start, length, len(data))
@@ -297,6 +389,9 @@ class SFTPTransport(ConnectedTransport):
     # so it is better to download extra bytes.
     # 8KiB had good performance for both local and remote network operations
     _bytes_to_read_before_seek = 8192
+    # The SFTP spec only requires servers to support 32kB reads; this is the
+    # size requests are split into when they are pipelined.
+    _max_request_size = 32768
 
     def _pump(self, infile, outfile):
         return pumpfile(infile, WriteStream(outfile))
@@ -346,6 +441,10 @@ class SFTPTransport(ConnectedTransport):
         return connection, (user, password)
 
     def disconnect(self):
+        scheduler = getattr(self._shared_connection, "read_scheduler", None)
+        if scheduler is not None:
+            scheduler.shutdown()
+            self._shared_connection.read_scheduler = None
         connection = self._get_connection()
         if connection is not None:
             connection.close()
@@ -429,7 +528,27 @@ class SFTPTransport(ConnectedTransport):
         just reads until it gets all the stuff it wants.
         """
         helper = _SFTPReadvHelper(offsets, relpath, self._report_activity)
-        return helper.request_and_yield_offsets(fp)
+        scheduler = self._get_read_scheduler()
+        if scheduler is None:
+            return helper.request_and_yield_offsets(fp)
+        requests = helper._get_requests(max_request_size=self._max_request_size)
+        return helper.request_and_yield_offsets(
+            fp, requests, scheduler.read(fp, requests)
+        )
+
+    def _get_read_scheduler(self):
+        """Get the read scheduler for this connection, if enabled."""
+        window = config.GlobalStack().get("sftp.read_window")
+        if window is None or window < 2:
+            return None
+        with _read_scheduler_lock:
+            scheduler = getattr(self._shared_connection, "read_scheduler", None)
+            if scheduler is None or scheduler.window != window:
+                if scheduler is not None:
+                    scheduler.shutdown()
+                scheduler = _SFTPReadScheduler(window)
+                self._shared_connection.read_scheduler = scheduler
+        return scheduler
 
     def put_file(self, relpath, f, mode=None):
         """Copy the file-like object into the location.
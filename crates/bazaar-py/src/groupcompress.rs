@@ -355,14 +355,18 @@ impl TraditionalGroupCompressor {
     ) -> PyResult<(PyObject, usize, usize, &str)> {
         let chunks_l = chunks.iter().map(|x| x.as_slice()).collect::<Vec<_>>();
         if let Some(c) = self.0.as_mut() {
-            c.compress(
-                &key,
-                chunks_l.as_slice(),
-                length,
-                expected_sha,
-                nostore_sha,
-                soft,
-            )
+            // Delta compression only touches data owned by the compressor, so
+            // other threads can run meanwhile, e.g. to compress earlier groups.
+            py.allow_threads(|| {
+                c.compress(
+                    &key,
+                    chunks_l.as_slice(),
+                    length,
+                    expected_sha,
+                    nostore_sha,
+                    soft,
+                )
+            })
             .map_err(|e| PyValueError::new_err(format!("Error during compress: {:?}", e)))
             .map(|(hash, size, chunks, kind)| {
                 (